@@ -14,6 +14,16 @@
 #define MAX_LINES 12 // Number of lines to allocate
 #define TX_LENGTH 10 // Transmission length 8 bytes
 
+// Binary framing, see devices/framing.py
+#define FRAME_START 0xA5 // Can't start a line of the text protocol
+#define FRAME_VERSION 1
+#define MAX_FRAME_LENGTH 560 // Bytes of register blocks in a frame
+#define ACK_OK 0
+#define ACK_BAD_VERSION 1
+#define ACK_BAD_CRC 2
+#define ACK_BAD_BLOCK 3
+#define ACK_TIMEOUT 4
+
 bool T_DONE = false; // Set to true when the transmission is finished
 int C_FLAG = 1; // Set to true when the transmission is finished
 
@@ -25,10 +35,14 @@ profile** profiles;
 
 byte** bytesFromPython;
 
+byte frameBuffer[MAX_FRAME_LENGTH];
+
 void initProgram(void);
 void initProfiles(void);
 void zeroProfiles(void);
 int readLineFromPython(void);
+int readFrameFromSerial(void);
+void loadBlock(short index, short type, byte* data, int length);
 
 void disableLines(void);
 int findEnabledLines(void);
@@ -69,12 +83,12 @@ void zeroProfiles(void) {
 }
 
 /*  Reads and processes a line from the Serial port
-    If the line is "cxn?" then close the handshake by replying "ad9910\n"
+    If the line is "*IDN?" then close the handshake by replying "ad9910,<FRAME_VERSION>\n"
       Return -1
     If the line is "Done" then do nothing -- this is the end of the transmission
       Return -2
     If line is not "Done", then the data should be actual DDS data
-      Return "index" after loading the data into the global array bytesFromPython[index]
+      Return "index" after loading the data with loadBlock
     If no data, return -3
 */
 int readLineFromSerial(void) {
@@ -91,7 +105,10 @@ int readLineFromSerial(void) {
       str = Serial.readStringUntil('\n');
 
     if (str.equals("*IDN?")) {
-      Serial.print("ad9910\n");
+      // The version of the binary framing follows the name
+      Serial.print("ad9910,");
+      Serial.print(FRAME_VERSION);
+      Serial.print("\n");
       return -1;
     }
     else if (str.equals("Done")) {
@@ -119,61 +136,17 @@ int readLineFromSerial(void) {
       temp_byte = byte(strtol(token, NULL, 16));
       short type = temp_byte;
 
-      byte* ptr;
-      int readLength;
-      if (index < 12) {
-        program[index]->enabled = true;
-        switch (type) {
-          case 0:
-            ptr = program[index]->single;
-            program[index]->mode = 0;
-            readLength = AMPL_LENGTH + POW_LENGTH + FTW_LENGTH;
-            break;
-          case 1:
-            ptr = program[index]->drLimits;
-            program[index]->mode = 1;
-            readLength = 2 * FTW_LENGTH;
-            break;
-          case 2:
-            ptr = program[index]->drStepSize;
-            program[index]->mode = 1;
-            readLength = 2 * FTW_LENGTH;
-            break;
-          case 3:
-            ptr = program[index]->drRate;
-            program[index]->mode = 1;
-            readLength = 2 * RAMP_RATE_LENGTH;
-            break;
-          case 4:
-            bool invert = false;
-            token = strtok(NULL, &sep);
-            if (token != NULL) {
-              temp_byte = byte(strtol(token, NULL, 16));
-
-              if (temp_byte == 1)
-                invert = true;
-              else
-                invert = false;
-            }
-            program[index]->sweepInvert = invert;
-            readLength = 0;
-        }
-      }
-      else {
-        short profileIndex = index - 12;
-        ptr = profiles[profileIndex]->dataArray;
-        readLength = AMPL_LENGTH + POW_LENGTH + FTW_LENGTH;
-      }
-
-      int i = 0;
+      // The rest of the line is the data
+      byte data[2 * FTW_LENGTH];
+      int length = 0;
       token = strtok(NULL, &sep);
       while (token!=NULL) {
         temp_byte = byte(strtol(token, NULL, 16));
-        if (i < readLength)
-          *(ptr + i) = temp_byte;
+        if (length < 2 * FTW_LENGTH)
+          data[length++] = temp_byte;
         token = strtok(NULL, &sep);
-        i++;
       }
+      loadBlock(index, type, data, length);
       return index;
     }
  }
@@ -181,6 +154,142 @@ int readLineFromSerial(void) {
     return -4;
 }
 
+/*  Loads a register block into a program line (index < 12) or a profile (index - 12)
+    type is the data type, as in tx_types_dictionary in devices/arduino.py
+    Bytes beyond the register's length are ignored
+*/
+void loadBlock(short index, short type, byte* data, int length) {
+  byte* ptr;
+  int readLength;
+  if (index < MAX_LINES) {
+    program[index]->enabled = true;
+    switch (type) {
+      case 0:
+        ptr = program[index]->single;
+        program[index]->mode = 0;
+        readLength = AMPL_LENGTH + POW_LENGTH + FTW_LENGTH;
+        break;
+      case 1:
+        ptr = program[index]->drLimits;
+        program[index]->mode = 1;
+        readLength = 2 * FTW_LENGTH;
+        break;
+      case 2:
+        ptr = program[index]->drStepSize;
+        program[index]->mode = 1;
+        readLength = 2 * FTW_LENGTH;
+        break;
+      case 3:
+        ptr = program[index]->drRate;
+        program[index]->mode = 1;
+        readLength = 2 * RAMP_RATE_LENGTH;
+        break;
+      case 4:
+        program[index]->sweepInvert = (length > 0 && data[0] == 1);
+        readLength = 0;
+        break;
+      default:
+        readLength = 0;
+    }
+  }
+  else if (index - MAX_LINES < NUM_PROFILES) {
+    ptr = profiles[index - MAX_LINES]->dataArray;
+    readLength = AMPL_LENGTH + POW_LENGTH + FTW_LENGTH;
+  }
+  else
+    readLength = 0;
+
+  for (int i = 0; i < length && i < readLength; i++) {
+    *(ptr + i) = data[i];
+  }
+}
+
+// CRC-16/CCITT-FALSE (polynomial 0x1021), starting from 0xFFFF
+uint16_t crc16Update(uint16_t crc, byte b) {
+  crc ^= (uint16_t)b << 8;
+  for (int i = 0; i < 8; i++) {
+    if (crc & 0x8000)
+      crc = (crc << 1) ^ 0x1021;
+    else
+      crc = crc << 1;
+  }
+  return crc;
+}
+
+void sendAck(byte status, uint16_t crc) {
+  byte ack[4] = {FRAME_START, status, byte(crc >> 8), byte(crc & 0xFF)};
+  Serial.write(ack, 4);
+}
+
+// Discards input until the host stops sending
+void discardInput(void) {
+  byte b;
+  while (Serial.readBytes(&b, 1) == 1) {}
+}
+
+/*  Reads a binary frame from the Serial port:
+      FRAME_START, FRAME_VERSION, length (2 bytes, MSB first),
+      length bytes of register blocks, each {index, type, n, n bytes of data},
+      CRC-16 of everything after FRAME_START (2 bytes, MSB first)
+    The program is only replaced if the whole frame is valid. The rest of a rejected frame is discarded, so that it isn't read as text.
+    Replies with FRAME_START, a status and the CRC of the frame, instead of echoing the data
+      Return -5 if the program was loaded
+      Return -6 otherwise
+*/
+int readFrameFromSerial(void) {
+  byte header[4];
+  if (Serial.readBytes(header, 4) < 4) {
+    discardInput();
+    sendAck(ACK_TIMEOUT, 0);
+    return -6;
+  }
+  uint16_t crc = 0xFFFF;
+  for (int i = 1; i < 4; i++)
+    crc = crc16Update(crc, header[i]);
+
+  uint16_t length = ((uint16_t)header[2] << 8) | header[3];
+  if (header[1] != FRAME_VERSION || length > MAX_FRAME_LENGTH) {
+    discardInput();
+    sendAck(ACK_BAD_VERSION, crc);
+    return -6;
+  }
+
+  byte received[2];
+  if (Serial.readBytes(frameBuffer, length) < length || Serial.readBytes(received, 2) < 2) {
+    discardInput();
+    sendAck(ACK_TIMEOUT, crc);
+    return -6;
+  }
+  for (int i = 0; i < length; i++)
+    crc = crc16Update(crc, frameBuffer[i]);
+  if ((((uint16_t)received[0] << 8) | received[1]) != crc) {
+    discardInput();
+    sendAck(ACK_BAD_CRC, crc);
+    return -6;
+  }
+
+  // Check that the blocks fit in the frame before loading any of them
+  int i = 0;
+  while (i < length) {
+    if (i + 3 > length || i + 3 + frameBuffer[i + 2] > length || frameBuffer[i] >= MAX_LINES + NUM_PROFILES) {
+      discardInput();
+      sendAck(ACK_BAD_BLOCK, crc);
+      return -6;
+    }
+    i += 3 + frameBuffer[i + 2];
+  }
+
+  // A frame holds the whole program, so lines from a previous, longer program are disabled
+  disableLines();
+  i = 0;
+  while (i < length) {
+    loadBlock(frameBuffer[i], frameBuffer[i + 1], frameBuffer + i + 3, frameBuffer[i + 2]);
+    i += 3 + frameBuffer[i + 2];
+  }
+  sendAck(ACK_OK, crc);
+  return -5;
+}
+
 void disableLines(void) {
   for (int i=0; i < MAX_LINES; i++) {
     program[i]->enabled = false;
@@ -4,7 +4,7 @@
 #include "SPI.h"
 
 int flag = 0;
-enum fsm{DATA_INVALID, CXN, DATA_LOAD, ECHO, PROFILES_LOAD, PROGRAM_RUN};
+enum fsm{DATA_INVALID, CXN, DATA_LOAD, ECHO, FRAME_LOADED, PROFILES_LOAD, PROGRAM_RUN};
 enum fsm state = CXN;
 
 int numLines = 0; // Length of the program in modules
@@ -24,7 +24,11 @@ void loop() {
   // Look for serial data
   // Interrupt sequence if new data is incoming!
   if (Serial.available() > 0) {
-    int res = readLineFromSerial();
+    int res;
+    if (Serial.peek() == FRAME_START)
+      res = readFrameFromSerial();
+    else
+      res = readLineFromSerial();
 
     if (res == -1) {
       state = CXN;
@@ -32,6 +36,12 @@ void loop() {
     else if (res == -2) {
       state = ECHO;
     }
+    else if (res == -5) {
+      state = FRAME_LOADED;
+    }
+    else if (res == -6) {
+      state = CXN;
+    }
     else if (res >= 0) {
       state = DATA_LOAD;
     }
@@ -61,6 +71,15 @@ void loop() {
         state = PROFILES_LOAD;
       }
       break;
+    case FRAME_LOADED:
+      {
+        // Already acknowledged, so no echo
+        int last = findEnabledLines();
+        currPos = 0;
+        numLines = last + 1;
+        state = PROFILES_LOAD;
+      }
+      break;
     case PROFILES_LOAD:
       {
         ddsCFRInit();
@@ -1,10 +1,13 @@
 import json
 from twisted.internet.defer import inlineCallbacks, returnValue
-import sys
+import os, sys
 
 sys.path.append('../../')
 from server_tools.device_server import DeviceWrapper
 
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from framing import FRAME_VERSION, ACK_LENGTH, hex_bytes, encode_frame, check_ack, parse_idn
+
 from time import sleep
 
 tx_types_dictionary = {
@@ -17,6 +20,7 @@ tx_types_dictionary = {
 
 SYSCLK = 1000 # MHz\
 FORCE_TRIGGER = "trigger\n"
+N_LINES = 12 # program lines held by the Arduino; profiles are addressed after them
 
 # Returns string of bytes MSB
 # In format "byte_3,byte_2,byte_1,byte_0,"
@@ -143,59 +147,108 @@ def create_program_string(line, data_type, byte_string):
 
 def create_profile_string(profile, byte_string):
     data_type = "0x00,"
-    addr = "0x{0:02X},".format(profile + 12)
+    addr = "0x{0:02X},".format(profile + N_LINES)
     return addr + data_type + byte_string + "\n"
 
-def compile_program_strings(program_array):
-    program = ""
-    for (i, line) in enumerate(program_array):
-        line_str = ""
+def program_blocks(program_array):
+    """
+    program_blocks(program_array)
+
+    Args:
+        program_array (list(ProgramLine)): list of ``ProgramLine``s
 
+    Returns:
+        list: ``(line, data_type, byte_string)`` of each register to write, with ``data_type`` a key of ``tx_types_dictionary``
+    """
+    blocks = []
+    for (i, line) in enumerate(program_array):
         if line.mode == 'single':
             ampl_str = calc_ampl(line.amplitude)
             pow_str = calc_pow(line.phase)
             ftw_str = calc_ftw(line.frequency)
-            line_str = create_program_string(i, 'single', ampl_str + pow_str + ftw_str) + "\n"
+            blocks.append((i, 'single', ampl_str + pow_str + ftw_str))
 
         elif line.mode == 'sweep':
             sweep_dict = calc_ramp_parameters(line.start, line.stop, line.dt, line.nsteps)
             
             # Create ramp limits string (DDS reg 0x0B)
             limits_string = calc_ftw(sweep_dict['upper']) + calc_ftw(sweep_dict['lower'])
-            line_str = create_program_string(i, 'drLimits', limits_string) + "\n"
+            blocks.append((i, 'drLimits', limits_string))
 
             # Create frequency step size string (DDS reg 0x0C)
             steps_string = calc_ftw(sweep_dict['n_step']) + calc_ftw(sweep_dict['p_step'])
-            line_str += create_program_string(i, 'drStepSize', steps_string) + "\n"
+            blocks.append((i, 'drStepSize', steps_string))
 
             # Create ramp rate string (DDS reg 0x0D)
             ramp_rate_str = calc_step_interval(sweep_dict['n_interval']) + calc_step_interval(sweep_dict['p_interval'])
-            line_str += create_program_string(i, 'drRate', ramp_rate_str) + "\n"
+            blocks.append((i, 'drRate', ramp_rate_str))
 
             # Create instruction string to tell the DDS whether the ramp should have a positive or negative slope
             if sweep_dict['slope'] == 1:
-                line_str += create_program_string(i, 'sweepInvert', "0x00,") + "\n"
+                blocks.append((i, 'sweepInvert', "0x00,"))
             else:
-                line_str += create_program_string(i, 'sweepInvert', "0x01,") + "\n"
-        program += line_str
-    return program
+                blocks.append((i, 'sweepInvert', "0x01,"))
+    return blocks
 
-def compile_profile_strings(profiles_array):
-    profile_string = ""
+def profile_blocks(profiles_array):
+    """
+    profile_blocks(profiles_array)
+
+    Args:
+        profiles_array (list(Profile)): list of ``Profile``s
+
+    Returns:
+        list: ``(profile, byte_string)`` of each profile register to write
+    """
+    blocks = []
     for line in profiles_array:
         ftw_str = calc_ftw(line.frequency)
         ampl_str = calc_ampl(line.amplitude)
         pow_str = calc_pow(line.phase)
-        line_str = create_profile_string(line.index, ampl_str + pow_str + ftw_str) + "\n"
-        profile_string += line_str
+        blocks.append((line.index, ampl_str + pow_str + ftw_str))
+    return blocks
+
+def compile_program_strings(program_array):
+    program = ""
+    for (i, data_type, byte_string) in program_blocks(program_array):
+        program += create_program_string(i, data_type, byte_string) + "\n"
+    return program
+
+def compile_profile_strings(profiles_array):
+    profile_string = ""
+    for (index, byte_string) in profile_blocks(profiles_array):
+        profile_string += create_profile_string(index, byte_string) + "\n"
     return profile_string
 
+def compile_frame(program_array, profiles_array):
+    """
+    compile_frame(program_array, profiles_array)
+
+    Args:
+        program_array (list(ProgramLine)): list of ``ProgramLine``s
+        profiles_array (list(Profile)): list of ``Profile``s
+
+    Returns:
+        bytes: The program and profiles as a binary frame (see :mod:`ad9910.devices.framing`)
+    """
+    blocks = [(i, tx_types_dictionary[data_type], hex_bytes(byte_string)) for (i, data_type, byte_string) in program_blocks(program_array)]
+    blocks += [(index + N_LINES, 0, hex_bytes(byte_string)) for (index, byte_string) in profile_blocks(profiles_array)]
+    return encode_frame(blocks)
+
 class Arduino(DeviceWrapper):
+    """
+    Arduino(DeviceWrapper)
+
+    Arduino programming an AD9910. If the firmware supports it, programs are uploaded as a binary frame (see :mod:`ad9910.devices.framing`), which is acknowledged with its CRC. Otherwise, or if ``"protocol": "text"`` is set in the device's config, or if the binary upload fails ``retries`` times, programs are uploaded as text, which is echoed back in full.
+    """
     def __init__(self, config):
         """ defaults """
         self.program = []
         self.profiles = []
         self.echo = ""
+        self.protocol = 'binary'
+        self.retries = 2
+        self.frame_version = 0
 
         """ non-defaults"""
         for key, value in config.items():
@@ -206,7 +259,8 @@ class Arduino(DeviceWrapper):
     def verify_interface(self):
         yield self.connection.write(b'*IDN?\n')
         response = yield self.connection.read_line()
-        returnValue(response == 'ad9910')
+        (name, self.frame_version) = parse_idn(response)
+        returnValue(name == 'ad9910')
 
     @inlineCallbacks
     def initialize(self):
@@ -234,6 +288,40 @@ class Arduino(DeviceWrapper):
         self.program = program
         self.profiles = profiles
 
+        if self.protocol == 'binary' and self.frame_version == FRAME_VERSION:
+            frame = compile_frame(program, profiles)
+            for attempt in range(self.retries):
+                try:
+                    yield self.write_frame(frame)
+                    returnValue(None)
+                except Exception as e:
+                    print("{}: binary upload failed ({})".format(self.address, e))
+            print("{}: falling back to text upload".format(self.address))
+        yield self.write_text(program, profiles)
+
+    @inlineCallbacks
+    def write_frame(self, frame):
+        """
+        write_frame(self, frame)
+
+        Writes a binary frame to the Arduino, and checks its acknowledgement.
+
+        Args:
+            frame (bytes): As returned by :func:`compile_frame`
+        """
+        yield self.connection.flush_input()
+        yield self.connection.write_bytes(frame)
+        ack = yield self.connection.read_bytes(ACK_LENGTH)
+        check_ack(ack, frame)
+        self.echo = 'ack {}'.format(frame[-2:].hex())
+
+    @inlineCallbacks
+    def write_text(self, program, profiles):
+        """
+        write_text(self, program, profiles)
+
+        Writes the program and profiles to the Arduino as text, and reads back the echo.
+        """
         program_string = compile_program_strings(program)
         profile_string = compile_profile_strings(profiles)
 
@@ -0,0 +1,223 @@
+"""
+Pure-Python emulation of the serial parser in ``ad9910_arduino``, for checking the text and binary upload protocols offline.
+
+Running this module uploads random programs to the emulated firmware with both protocols, and prints how many bytes each protocol sends. The protocols are tested in ``test_firmware_emulator.py``.
+
+.. code-block:: bash
+
+    python firmware_emulator.py
+"""
+import os, sys
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from framing import FRAME_START, FRAME_VERSION, MAX_FRAME_LENGTH, ACK_OK, crc16
+
+# From Constants.h and ArduinoFunctions.h
+MAX_LINES = 12
+NUM_PROFILES = 8
+READ_LENGTHS = {0: 8, 1: 8, 2: 8, 3: 4}
+ZERO_REG = [0x3F, 0xFF, 0, 0, 0, 0, 0, 0]
+ACK_BAD_VERSION = 1
+ACK_BAD_CRC = 2
+ACK_BAD_BLOCK = 3
+ACK_TIMEOUT = 4
+
+BAUD = 2400 # of the Arduino's serial port
+BITS_PER_BYTE = 10 # including the start and stop bits
+
+
+class Line(object):
+    """ A program line, as the ``line`` struct in Constants.h """
+    def __init__(self):
+        self.mode = 0
+        self.enabled = False
+        self.sweep_invert = False
+        self.registers = {0: [0] * 8, 1: [0] * 8, 2: [0] * 8, 3: [0] * 4}
+
+
+class FirmwareEmulator(object):
+    """
+    FirmwareEmulator(object)
+
+    Emulates how the firmware parses what is written to the serial port, and what it writes back.
+
+    Args:
+        version (int, optional): The framing version that the firmware supports, or 0 for firmware that only supports the text protocol. Defaults to ``FRAME_VERSION``.
+    """
+    def __init__(self, version=FRAME_VERSION):
+        self.version = version
+        self.program = [Line() for _ in range(MAX_LINES)]
+        self.profiles = [list(ZERO_REG) for _ in range(NUM_PROFILES)]
+        self.buffer = bytearray()
+        self.num_lines = 0
+
+    def write(self, data):
+        """
+        write(self, data)
+
+        Args:
+            data (bytes or str): Data written to the Arduino's serial port
+
+        Returns:
+            bytes: What the Arduino writes back once it has processed all the data. An incomplete frame is processed as if the serial read timed out.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        self.buffer += data
+        output = bytearray()
+        while self.buffer:
+            if self.version and self.buffer[0] == FRAME_START:
+                output += self.read_frame()
+            else:
+                output += self.read_line()
+        return bytes(output)
+
+    def read_line(self):
+        # As readLineFromSerial, which reads blank lines as empty strings
+        (line, _, rest) = bytes(self.buffer).partition(b'\n')
+        self.buffer = bytearray(rest)
+        line = line.decode()
+        if not line:
+            return b''
+        if line == '*IDN?':
+            return 'ad9910,{}\n'.format(self.version).encode() if self.version else b'ad9910\n'
+        if line == 'Done':
+            return self.echo()
+
+        tokens = [token for token in line.split(',') if token]
+        index = int(tokens[0], 16) & 0xFF
+        data_type = int(tokens[1], 16) & 0xFF
+        data = [int(token, 16) & 0xFF for token in tokens[2:]][:8]
+        self.load_block(index, data_type, data)
+        return b''
+
+    def read_frame(self):
+        # As readFrameFromSerial
+        frame = self.buffer
+        self.buffer = bytearray()
+        if len(frame) < 4:
+            return self.ack(ACK_TIMEOUT, 0)
+        crc = crc16(frame[1:4])
+        length = struct.unpack('>H', bytes(frame[2:4]))[0]
+        if frame[1] != self.version or length > MAX_FRAME_LENGTH:
+            return self.ack(ACK_BAD_VERSION, crc)
+        if len(frame) < 4 + length + 2:
+            return self.ack(ACK_TIMEOUT, crc)
+        payload = frame[4:4 + length]
+        crc = crc16(payload, crc)
+        if struct.unpack('>H', bytes(frame[4 + length:4 + length + 2]))[0] != crc:
+            return self.ack(ACK_BAD_CRC, crc)
+
+        blocks = []
+        i = 0
+        while i < length:
+            if i + 3 > length or i + 3 + payload[i + 2] > length or payload[i] >= MAX_LINES + NUM_PROFILES:
+                return self.ack(ACK_BAD_BLOCK, crc)
+            blocks.append((payload[i], payload[i + 1], list(payload[i + 3:i + 3 + payload[i + 2]])))
+            i += 3 + payload[i + 2]
+
+        # Anything after a valid frame is left for the next read, as the rest of a rejected one is discarded
+        self.buffer = frame[4 + length + 2:]
+        for line in self.program:
+            line.enabled = False
+        for block in blocks:
+            self.load_block(*block)
+        self.num_lines = self.find_enabled_lines() + 1
+        return self.ack(ACK_OK, crc)
+
+    def load_block(self, index, data_type, data):
+        # As loadBlock
+        if index < MAX_LINES:
+            line = self.program[index]
+            line.enabled = True
+            if data_type in READ_LENGTHS:
+                line.mode = 0 if data_type == 0 else 1
+                register = line.registers[data_type]
+                register[:min(len(data), len(register))] = data[:len(register)]
+            elif data_type == 4:
+                line.sweep_invert = len(data) > 0 and data[0] == 1
+        elif index - MAX_LINES < NUM_PROFILES:
+            profile = self.profiles[index - MAX_LINES]
+            profile[:min(len(data), 8)] = data[:8]
+
+    def ack(self, status, crc):
+        return struct.pack('>BBH', FRAME_START, status, crc)
+
+    def find_enabled_lines(self):
+        for (i, line) in enumerate(self.program):
+            if not line.enabled:
+                return i - 1
+        return MAX_LINES
+
+    def echo(self):
+        # As echoData
+        last = self.find_enabled_lines()
+        self.num_lines = last + 1
+        lines = []
+        for (i, line) in enumerate(self.program[:last + 1]):
+            lines.append('{},{:X},{},'.format(i, line.mode, int(line.sweep_invert)))
+            registers = [0] if line.mode == 0 else [1, 2, 3]
+            lines += [''.join('{:X},'.format(b) for b in line.registers[r]) for r in registers]
+        for (i, profile) in enumerate(self.profiles):
+            lines.append('{:X},'.format(i))
+            lines.append(''.join('{:X},'.format(b) for b in profile))
+        return ''.join(line + '\n' for line in lines).encode()
+
+    def state(self):
+        """
+        state(self)
+
+        Returns:
+            tuple: The enabled program lines and the profiles, as the firmware would run them
+        """
+        lines = []
+        for line in self.program[:self.num_lines]:
+            registers = [0] if line.mode == 0 else [1, 2, 3]
+            lines.append((line.mode, line.sweep_invert if line.mode else False, tuple(tuple(line.registers[r]) for r in registers)))
+        return (tuple(lines), tuple(tuple(profile) for profile in self.profiles))
+
+
+def random_program(rng):
+    # Stand-ins for ProgramLine and Profile in ad9910_server.py
+    program = []
+    for _ in range(rng.integers(1, 12)):
+        if rng.random() < 0.3:
+            program.append(SimpleNamespace(mode='single', frequency=rng.uniform(0, 400), amplitude=rng.uniform(-80, 0), phase=rng.uniform(-360, 360)))
+        else:
+            program.append(SimpleNamespace(mode='sweep', start=rng.uniform(0, 400), stop=rng.uniform(0, 400), dt=rng.uniform(0.01, 10), nsteps=int(rng.integers(1, 10000))))
+    profiles = [SimpleNamespace(index=i, frequency=rng.uniform(0, 400), amplitude=rng.uniform(-80, 0), phase=rng.uniform(0, 360)) for i in rng.permutation(8)[:rng.integers(0, 9)]]
+    return (program, profiles)
+
+
+def upload_sizes(trials=200, seed=0):
+    """
+    upload_sizes(trials=200, seed=0)
+
+    Uploads random programs to the emulated firmware with each protocol.
+
+    Returns:
+        (float, float): The mean number of bytes sent and received per upload with the text protocol, including the echo, and with binary framing, including the ack
+    """
+    from arduino import compile_program_strings, compile_profile_strings, compile_frame
+
+    rng = np.random.default_rng(seed)
+    text_bytes = 0
+    binary_bytes = 0
+    for _ in range(trials):
+        (program, profiles) = random_program(rng)
+        upload = compile_program_strings(program) + compile_profile_strings(profiles) + "Done\n"
+        text_bytes += len(upload) + len(FirmwareEmulator().write(upload))
+        frame = compile_frame(program, profiles)
+        binary_bytes += len(frame) + len(FirmwareEmulator().write(frame))
+    return (float(text_bytes) / trials, float(binary_bytes) / trials)
+
+
+if __name__ == '__main__':
+    (text_bytes, binary_bytes) = upload_sizes()
+    seconds = lambda n: n * BITS_PER_BYTE / BAUD
+    print("text:   {:6.0f} bytes, {:5.2f} s per upload at {} baud, including the echo".format(text_bytes, seconds(text_bytes), BAUD))
+    print("binary: {:6.0f} bytes, {:5.2f} s per upload at {} baud, including the ack".format(binary_bytes, seconds(binary_bytes), BAUD))
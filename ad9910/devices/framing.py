@@ -0,0 +1,119 @@
+"""
+Binary framing for uploading programs to the AD9910 Arduino, instead of sending each register as a line of hex text and reading back an echo of the whole program.
+
+A frame is::
+
+    FRAME_START, FRAME_VERSION, length (2 bytes, MSB first), register blocks, CRC (2 bytes, MSB first)
+
+where each of the ``length`` bytes of register blocks is ``index, type, n`` followed by ``n`` bytes of register data. ``index`` and ``type`` are as in the text protocol: program lines are 0 to 11 and profiles are 12 to 19, and the types are those of ``tx_types_dictionary`` in :mod:`ad9910.devices.arduino`. The CRC is CRC-16/CCITT-FALSE of everything after ``FRAME_START``.
+
+The firmware replies with ``ACK_LENGTH`` bytes: ``FRAME_START``, a status (see ``ACK_STATUS``), and the CRC that it calculated, MSB first. The program is only replaced if the status is ``ACK_OK``.
+
+The firmware reports the framing version that it supports after its name in reply to ``*IDN?``, e.g. ``ad9910,1``. Firmware that only replies ``ad9910`` only supports the text protocol.
+
+:mod:`ad9910.devices.firmware_emulator` checks the framing against an emulation of the firmware's parser.
+"""
+import struct
+
+FRAME_START = 0xA5
+FRAME_VERSION = 1
+MAX_FRAME_LENGTH = 560 # bytes of register blocks that the firmware can buffer
+ACK_LENGTH = 4
+
+ACK_OK = 0
+ACK_STATUS = {
+    ACK_OK: 'ok',
+    1: 'unsupported version or frame too long',
+    2: 'bad CRC',
+    3: 'bad register block',
+    4: 'timed out',
+}
+
+def crc16(data, crc=0xFFFF):
+    """
+    crc16(data, crc=0xFFFF)
+
+    Args:
+        data (bytes): The data to check
+        crc (int, optional): The CRC to continue from. Defaults to 0xFFFF, to start a new CRC.
+
+    Returns:
+        int: The CRC-16/CCITT-FALSE of ``data``
+    """
+    for b in bytearray(data):
+        crc ^= b << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+def hex_bytes(byte_string):
+    """
+    hex_bytes(byte_string)
+
+    Args:
+        byte_string (str): Bytes in the format of the text protocol, e.g. ``"0x3F,0xFF,"``
+
+    Returns:
+        bytes: e.g. ``b'\\x3f\\xff'``
+    """
+    return bytes(bytearray(int(token, 16) for token in byte_string.split(',') if token))
+
+def encode_frame(blocks, version=FRAME_VERSION):
+    """
+    encode_frame(blocks, version=FRAME_VERSION)
+
+    Args:
+        blocks (list): ``(index, type, data)`` of each register block, with ``type`` an int and ``data`` bytes
+        version (int, optional): Defaults to ``FRAME_VERSION``.
+
+    Returns:
+        bytes: The frame
+    """
+    payload = b''.join(struct.pack('>BBB', index, data_type, len(data)) + data for (index, data_type, data) in blocks)
+    if len(payload) > MAX_FRAME_LENGTH:
+        raise Exception('Frame too long; must be <= {} bytes of register blocks'.format(MAX_FRAME_LENGTH))
+    body = struct.pack('>BH', version, len(payload)) + payload
+    return struct.pack('>B', FRAME_START) + body + struct.pack('>H', crc16(body))
+
+def check_ack(ack, frame):
+    """
+    check_ack(ack, frame)
+
+    Checks that the firmware acknowledged receiving ``frame`` intact.
+
+    Args:
+        ack (bytes): The ``ACK_LENGTH`` bytes that the firmware replied with
+        frame (bytes): The frame that was sent
+
+    Raises:
+        Exception: If the frame was not loaded, or the acknowledgement doesn't match the frame
+    """
+    ack = bytes(ack)
+    if len(ack) != ACK_LENGTH or bytearray(ack)[0] != FRAME_START:
+        raise Exception('Invalid acknowledgement {!r}'.format(ack))
+    (_, status, crc) = struct.unpack('>BBH', ack)
+    if status != ACK_OK:
+        raise Exception('Frame rejected: {}'.format(ACK_STATUS.get(status, status)))
+    expected = struct.unpack('>H', frame[-2:])[0]
+    if crc != expected:
+        raise Exception('Acknowledged CRC {:04X} does not match frame CRC {:04X}'.format(crc, expected))
+
+def parse_idn(response):
+    """
+    parse_idn(response)
+
+    Args:
+        response (str): The reply to ``*IDN?``, e.g. ``'ad9910,1'``
+
+    Returns:
+        (str, int): The name, and the framing version, which is 0 for firmware that only supports the text protocol
+    """
+    parts = response.strip().split(',')
+    try:
+        version = int(parts[1])
+    except (IndexError, ValueError):
+        version = 0
+    return (parts[0], version)
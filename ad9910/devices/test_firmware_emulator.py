@@ -0,0 +1,95 @@
+"""
+Tests of the text and binary upload protocols in :mod:`arduino`, against the emulated firmware of :mod:`firmware_emulator`.
+
+.. code-block:: bash
+
+    python -m unittest test_firmware_emulator
+"""
+import unittest
+
+import numpy as np
+
+from arduino import compile_program_strings, compile_profile_strings, compile_frame
+from firmware_emulator import FirmwareEmulator, random_program, upload_sizes
+from framing import FRAME_VERSION, ACK_OK, check_ack, parse_idn
+
+TRIALS = 200
+
+
+def text_upload(program, profiles):
+    firmware = FirmwareEmulator()
+    firmware.write('*IDN?\n')
+    firmware.write(compile_program_strings(program) + compile_profile_strings(profiles) + "Done\n")
+    return firmware
+
+
+class TestFirmwareEmulator(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def test_binary_matches_text(self):
+        for _ in range(TRIALS):
+            (program, profiles) = random_program(self.rng)
+            binary = FirmwareEmulator()
+            self.assertEqual(parse_idn(binary.write('*IDN?\n').decode()), ('ad9910', FRAME_VERSION))
+            frame = compile_frame(program, profiles)
+            check_ack(binary.write(frame), frame)
+            self.assertEqual(binary.state(), text_upload(program, profiles).state())
+
+    def test_shorter_program(self):
+        for _ in range(TRIALS):
+            (program, profiles) = random_program(self.rng)
+            (shorter, _) = random_program(self.rng)
+            shorter = shorter[:max(1, len(program) - 1)]
+            firmware = FirmwareEmulator()
+            firmware.write(compile_frame(program, profiles))
+            firmware.write(compile_frame(shorter, []))
+            self.assertEqual(len(firmware.state()[0]), len(shorter))
+
+    def test_bad_frames(self):
+        for _ in range(TRIALS):
+            (program, profiles) = random_program(self.rng)
+            frame = bytearray(compile_frame(program, profiles))
+            firmware = FirmwareEmulator()
+            firmware.write(bytes(frame))
+            before = firmware.state()
+
+            corrupted = bytearray(frame)
+            corrupted[self.rng.integers(2, len(frame))] ^= 1 << int(self.rng.integers(0, 8))
+            bad_version = bytearray(frame)
+            bad_version[1] = FRAME_VERSION + 1
+            truncated = frame[:self.rng.integers(1, len(frame))]
+            for bad in [corrupted, bad_version, truncated]:
+                ack = firmware.write(bytes(bad))
+                self.assertNotEqual(bytearray(ack)[1], ACK_OK)
+                with self.assertRaises(Exception):
+                    check_ack(ack, bytes(frame))
+                self.assertEqual(firmware.state(), before)
+
+    def test_corrupted_length(self):
+        # The rest of the frame is discarded, rather than read as text
+        for _ in range(TRIALS):
+            (program, profiles) = random_program(self.rng)
+            frame = compile_frame(program, profiles)
+            firmware = FirmwareEmulator()
+            firmware.write(frame)
+            before = firmware.state()
+            length = (frame[2] << 8) | frame[3]
+            for bad_length in [int(self.rng.integers(0, length)), length + 1]:
+                corrupted = bytearray(frame)
+                corrupted[2:4] = bytes([bad_length >> 8, bad_length & 0xFF])
+                ack = firmware.write(bytes(corrupted))
+                self.assertNotEqual(bytearray(ack)[1], ACK_OK)
+                self.assertEqual(firmware.buffer, bytearray())
+                self.assertEqual(firmware.state(), before)
+
+    def test_text_only_firmware(self):
+        self.assertEqual(parse_idn(FirmwareEmulator(version=0).write('*IDN?\n').decode()), ('ad9910', 0))
+
+    def test_upload_sizes(self):
+        (text_bytes, binary_bytes) = upload_sizes(trials=20)
+        self.assertLess(binary_bytes, text_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,10 +56,18 @@ class Andor(object):
     """
     initdir = "C:\\Program Files\\Andor SDK\\" #'/usr/local/etc/andor/'
     verbose = True
+    # Functions that are polled while acquiring, so only print when they fail
+    polled = ['WaitForAcquisitionTimeOut', 'GetStatus', 'GetAcquisitionProgress']
 
-    def __init__(self):
+    def __init__(self, dll=None):
+        """
+        Args:
+            dll (optional): the SDK library to use, e.g. :class:`andor.simulated_sdk.SimulatedSDK`. Defaults to None, in which case the Andor SDK for the platform is loaded.
+        """
         self.error = {}
-        if platform.system() == 'Windows':
+        if dll is not None:
+            self.dll = dll
+        elif platform.system() == 'Windows':
             if platform.architecture()[0] == '64bit':
                 self.dll = ctypes.cdll.LoadLibrary("C:\\Program Files\\Andor SDK\\atmcd64d.dll")
             else:
@@ -72,7 +80,7 @@ class Andor(object):
     
     def _log(self, function, error):
         self.error[function] = error
-        if self.verbose:
+        if self.verbose and not (function in self.polled and ERROR_CODE[error] in ['DRV_SUCCESS', 'DRV_NO_NEW_DATA']):
             print("{}: {}".format(function, ERROR_CODE[error]))
     
     def AbortAcquisition(self):
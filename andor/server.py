@@ -17,17 +17,23 @@ timeout = 5
 """
 
 import os, sys
+import threading
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
 from server_tools.hardware_interface_server import HardwareInterfaceServer
 
-from labrad.server import setting
+from labrad.server import setting, Signal
 
 from andor import Andor, ERROR_CODE
-from time import sleep
+from simulated_sdk import SimulatedSDK
+from time import sleep, time
 
 from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.threads import deferToThread
 
+# Length of each call to WaitForAcquisitionTimeOut while waiting for frames, so that waits can be cancelled promptly (ms)
+WAIT_SLICE = 100
+ACQUISITION_COMPLETE_ID = 314170
+
 def handle_error(err):
     if ERROR_CODE[err] == 'DRV_SUCCESS':
         return 0
@@ -38,34 +44,43 @@ class AndorServer(HardwareInterfaceServer):
     """ Provides access to andor camera using pyandor """
     name = '%LABRADNODE%_andor'
     current_camera = None
+    acquisition_complete = Signal(ACQUISITION_COMPLETE_ID, 'signal: acquisition complete', '(si)')
 
     def initServer(self):
         global andor
-        andor = Andor()
+        if os.environ.get('ANDOR_SDK') == 'simulated':
+            andor = Andor(SimulatedSDK())
+        else:
+            andor = Andor()
+        # The SDK selects cameras globally, so only one thread at a time can select one and use it
+        self.sdk_lock = threading.RLock()
+        self.cancel_events = {}
         super(AndorServer, self).initServer()
     
     def stopServer(self):
-        c = {}
-        cameras = self.get_interface_list(c)
+        for event in self.cancel_events.values():
+            event.set()
+        cameras = self.get_interface_list({})
 
         for camera in cameras:
-            self.select_interface(c, camera)
-
-            errf = handle_error(self.cooler_off(c))
+            (errf, _) = self._call(camera, 'CoolerOFF')
+            errf = handle_error(errf)
             if errf:
                 print("Error turning off cooler of camera " + str(camera) + ": " + errf)
 
-            (errf, status) = self.get_status(c)
+            (errf, status) = self._call(camera, 'GetStatus')
             errf = handle_error(errf)
             if errf:
                 print("Error getting status of camera " + str(camera) + ": " + errf)
 
             elif status == 'DRV_ACQUIRING':
-                errf = handle_error(self.abort_acquisition(c))
+                (errf, _) = self._call(camera, 'AbortAcquisition')
+                errf = handle_error(errf)
                 if errf:
                     print("Error aborting acquisition of camera " + str(camera) + ": " + errf)
 
-            errf = handle_error(self.set_shutter(c, 1, 2, 0, 0))
+            (errf, _) = self._call(camera, 'SetShutter', 1, 2, 0, 0)
+            errf = handle_error(errf)
             if errf:
                 print("Error setting shutter of camera " + str(camera) + ": " + errf)
         
@@ -73,9 +88,7 @@ class AndorServer(HardwareInterfaceServer):
             warm = True
             min_temp = -20 # C
             for camera in cameras:
-                self.select_interface(c, camera)
-
-                (errf, temp) = self.get_temperature(c)
+                (errf, temp) = self._call(camera, 'GetTemperature')
                 errf = handle_error(errf)
                 if errf == "DRV_TEMP_OFF" and temp < min_temp:
                     warm = False
@@ -91,12 +104,15 @@ class AndorServer(HardwareInterfaceServer):
                 break
             sleep(1)
 
-        andor.ShutDown()
+        self._call(None, 'ShutDown')
         super(AndorServer, self).stopServer()
 
     def refresh_available_interfaces(self):
+        with self.sdk_lock:
+            self._refresh_available_interfaces()
 
-        (errf, nCameras) = self.get_available_cameras(None)
+    def _refresh_available_interfaces(self):
+        (errf, nCameras) = self._call(None, 'GetAvailableCameras')
         errf = handle_error(errf)
         if not errf:
             print("Found " + str(nCameras) + " cameras.")
@@ -104,18 +120,18 @@ class AndorServer(HardwareInterfaceServer):
             raise(Exception("Error getting number of cameras: " + errf))
 
         for i in range(nCameras):
-            (errf, handle) = self.get_camera_handle(None, i)
+            (errf, handle) = self._call(None, 'GetCameraHandle', i)
             errf = handle_error(errf)
             if errf:
                 print("Error getting handle for camera {}: {}".format(i, errf))
 
-            self.set_current_camera(None, handle)
-            (errf, initdir) = self.initialize(None)
+            self._call(None, 'SetCurrentCamera', handle)
+            (errf, initdir) = self._call(None, 'Initialize')
             errf = handle_error(errf)
             if errf:
                 print("Error initializing camera {}: {}".format(i, errf))
             
-            (errf, ser) = self.get_camera_serial_number(None)
+            (errf, ser) = self._call(None, 'GetCameraSerialNumber')
             errf = handle_error(errf)
             if not errf:
                 self.interfaces[str(ser)] = handle
@@ -124,511 +140,486 @@ class AndorServer(HardwareInterfaceServer):
             else:
                 print("Error connecting to camera " + str(i) + " with handle " + str(handle) + ": " + errf)
 
-    def _select_interface(self, c):
-        if c is not None and 'address' in c and c['address'] != self.current_camera:
-            self.set_current_camera(c, self.interfaces[c['address']])
-            self.current_camera = c['address']
+    def _get_camera(self, c):
+        if c is not None and 'address' in c:
+            return c['address']
+        return self.current_camera
+
+    def _call(self, camera, function, *args):
+        """
+        _call(self, camera, function, *args)
+
+        Selects a camera and calls an SDK function, holding ``sdk_lock`` so that no other thread selects another camera in between. Blocks, so should be run in a worker thread, as by :meth:`_sdk`.
+
+        Args:
+            camera (str): The serial number of the camera to select. If None, the selected camera isn't changed.
+            function (str): The name of the :class:`andor.andor.Andor` method
+            *args: The method's arguments
+
+        Returns:
+            (int, ...): The error code of the call, and what it returned
+        """
+        with self.sdk_lock:
+            if camera is not None and camera != self.current_camera:
+                andor.SetCurrentCamera(self.interfaces[camera])
+                self.current_camera = camera
+            result = getattr(andor, function)(*args)
+            if function == 'SetCurrentCamera':
+                handles = {handle: serial for serial, handle in self.interfaces.items()}
+                self.current_camera = handles.get(args[0])
+            return andor.error[function], result
+
+    def _sdk(self, c, function, *args):
+        """
+        _sdk(self, c, function, *args)
+
+        Calls an SDK function on the context's camera in a worker thread, so that the server doesn't wait for ``sdk_lock`` while another thread is using the SDK.
+
+        Args:
+            c: The LabRAD context, or None to call the function without selecting a camera
+            function (str): The name of the :class:`andor.andor.Andor` method
+            *args: The method's arguments
+
+        Returns:
+            Deferred: Fires with the error code of the call, and what it returned
+        """
+        camera = self._get_camera(c) if c is not None else None
+        return deferToThread(self._call, camera, function, *args)
+
+    def _wait_for_frames(self, camera, n_frames, timeout, cancel):
+        """
+        _wait_for_frames(self, camera, n_frames, timeout, cancel)
+
+        Waits for acquisition events from a camera, calling WaitForAcquisitionTimeOut in slices of ``WAIT_SLICE`` so that ``cancel`` is checked regularly. Blocks, so should be run in a worker thread.
+
+        Args:
+            camera (str): The serial number of the camera
+            n_frames (int): The number of frames to wait for
+            timeout (float): The maximum time to wait, in ms. If None, waits until the frames are acquired, the acquisition ends, or the wait is cancelled.
+            cancel (threading.Event): Set to stop waiting
+
+        Returns:
+            (int, int): The error code of the last wait, and the number of frames acquired
+        """
+        deadline = time() + timeout/1000. if timeout is not None else None
+        frames = 0
+        error_code = 0
+        while frames < n_frames and not cancel.is_set():
+            wait = WAIT_SLICE
+            if deadline is not None:
+                wait = int(min(wait, max(0, deadline - time())*1000))
+            with self.sdk_lock:
+                (error_code, _) = self._call(camera, 'WaitForAcquisitionTimeOut', wait)
+                if ERROR_CODE[error_code] == 'DRV_SUCCESS':
+                    # Events that arrive while not waiting are merged, so count frames from the progress
+                    (_, (_, series)) = self._call(camera, 'GetAcquisitionProgress')
+                    frames = max(frames + 1, series)
+                elif self._call(camera, 'GetStatus')[1] != 'DRV_ACQUIRING':
+                    break
+            if deadline is not None and time() >= deadline:
+                break
+        return error_code, frames
+
+    @inlineCallbacks
+    def _wait(self, c, n_frames, timeout=None):
+        camera = self._get_camera(c)
+        cancel = self.cancel_events.setdefault(camera, threading.Event())
+        cancel.clear()
+        error_code, frames = yield deferToThread(self._wait_for_frames, camera, n_frames, timeout, cancel)
+        self.acquisition_complete((str(camera), frames))
+        returnValue((error_code, frames))
 
     @setting(10, returns='i')
     def abort_acquisition(self, c):
-        self._select_interface(c)
-        andor.AbortAcquisition()
-        error_code = andor.error['AbortAcquisition']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'AbortAcquisition')
+        returnValue(error_code)
 
     @setting(11, returns='i')
     def cancel_wait(self, c):
-        self._select_interface(c)
-        andor.CancelWait()
-        error_code = andor.error['CancelWait']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'CancelWait')
+        returnValue(error_code)
 
     @setting(12, returns='i')
     def cooler_off(self, c):
-        self._select_interface(c)
-        andor.CoolerOFF()
-        error_code = andor.error['CoolerOFF']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'CoolerOFF')
+        returnValue(error_code)
 
     @setting(13, returns='i')
     def cooler_on(self, c):
-        self._select_interface(c)
-        andor.CoolerON()
-        error_code = andor.error['CoolerON']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'CoolerON')
+        returnValue(error_code)
 
     @setting(14, size='i', returns='i*i')
     def get_acquired_data(self, c, size):
-        self._select_interface(c)
-        arr = andor.GetAcquiredData(size)
-        error_code = andor.error['GetAcquiredData']
-        return error_code, arr
+        error_code, arr = yield self._sdk(c, 'GetAcquiredData', size)
+        returnValue((error_code, arr))
     
     @setting(15, size='i', returns='i*i')
     def get_acquired_data_16(self, c, size):
-        self._select_interface(c)
-        arr = andor.GetAcquiredData16(size)
-        error_code = andor.error['GetAcquiredData16']
-        return error_code, arr
+        error_code, arr = yield self._sdk(c, 'GetAcquiredData16', size)
+        returnValue((error_code, arr))
 
     @setting(16, returns='iii')
     def get_acquisition_progress(self, c):
-        self._select_interface(c)
-        acc, series = andor.GetAcquisitionProgress()
-        error_code = andor.error['GetAcquisitionProgress']
-        return error_code, acc, series
+        error_code, (acc, series) = yield self._sdk(c, 'GetAcquisitionProgress')
+        returnValue((error_code, acc, series))
 
     @setting(17, returns='ivvv')
     def get_acquisition_timings(self, c):
-        self._select_interface(c)
-        exposure, accumulate, kinetic = andor.GetAcquisitionTimings()
-        error_code = andor.error['GetAcquisitionTimings']
-        return error_code, exposure, accumulate, kinetic
+        error_code, (exposure, accumulate, kinetic) = yield self._sdk(c, 'GetAcquisitionTimings')
+        returnValue((error_code, exposure, accumulate, kinetic))
 
     @setting(18, returns='ii')
     def get_available_cameras(self, c):
-        totalCameras = andor.GetAvailableCameras()
-        error_code = andor.error['GetAvailableCameras']
-        return error_code, totalCameras
+        error_code, totalCameras = yield self._sdk(None, 'GetAvailableCameras')
+        returnValue((error_code, totalCameras))
 
     @setting(19, channel='i', returns='ii')
     def get_bit_depth(self, c, channel):
-        self._select_interface(c)
-        depth = andor.GetBitDepth(channel)
-        error_code = andor.error['GetBitDepth']
-        return error_code, depth
+        error_code, depth = yield self._sdk(c, 'GetBitDepth', channel)
+        returnValue((error_code, depth))
 
     @setting(20, cameraIndex='i', returns='ii')
     def get_camera_handle(self, c, cameraIndex):
-        cameraHandle = andor.GetCameraHandle(cameraIndex)
-        error_code = andor.error['GetCameraHandle']
-        return error_code, cameraHandle
+        error_code, cameraHandle = yield self._sdk(None, 'GetCameraHandle', cameraIndex)
+        returnValue((error_code, cameraHandle))
 
     @setting(21, returns='ii')
     def get_camera_serial_number(self, c):
-        self._select_interface(c)
-        number = andor.GetCameraSerialNumber()
-        error_code = andor.error['GetCameraSerialNumber']
-        return error_code, number
+        error_code, number = yield self._sdk(c, 'GetCameraSerialNumber')
+        returnValue((error_code, number))
 
     @setting(22, returns='ii')
     def get_current_camera(self, c):
-        self._select_interface(c)
-        cameraHandle = andor.GetCurrentCamera()
-        error_code = andor.error['GetCurrentCamera']
-        return error_code, cameraHandle
+        error_code, cameraHandle = yield self._sdk(c, 'GetCurrentCamera')
+        returnValue((error_code, cameraHandle))
 
     @setting(23, returns='iii')
     def get_detector(self, c):
-        self._select_interface(c)
-        xpixels, ypixels = andor.GetDetector()
-        error_code = andor.error['GetDetector']
-        return error_code, xpixels, ypixels
+        error_code, (xpixels, ypixels) = yield self._sdk(c, 'GetDetector')
+        returnValue((error_code, xpixels, ypixels))
 
     @setting(24, returns='ii')
     def get_emccd_gain(self, c):
-        self._select_interface(c)
-        gain = andor.GetEMCCDGain()
-        error_code = andor.error['GetEMCCDGain']
-        return error_code, gain
+        error_code, gain = yield self._sdk(c, 'GetEMCCDGain')
+        returnValue((error_code, gain))
 
     @setting(25, returns='iii')
     def get_em_gain_range(self, c):
-        self._select_interface(c)
-        low, high = andor.GetEMGainRange()
-        error_code = andor.error['GetEmGainRange']
-        return error_code, low, high
+        error_code, (low, high) = yield self._sdk(c, 'GetEMGainRange')
+        returnValue((error_code, low, high))
 
     @setting(26, returns='iiv')
     def get_fastest_recommended_vs_speed(self, c):
-        self._select_interface(c)
-        index, speed = andor.GetFastestRecommendedVSSpeed()
-        error_code = andor.error['GetFastestRecommendedVSSpeed']
-        return error_code, index, speed
+        error_code, (index, speed) = yield self._sdk(c, 'GetFastestRecommendedVSSpeed')
+        returnValue((error_code, index, speed))
 
     @setting(27, channel='i', typ='i', index='i', returns='iv')
     def get_hs_speed(self, c, channel, typ, index):
-        self._select_interface(c)
-        speed = andor.GetHSSpeed(channel, typ, index)
-        error_code = andor.error['GetHSSpeed']
-        return error_code, speed
+        error_code, speed = yield self._sdk(c, 'GetHSSpeed', channel, typ, index)
+        returnValue((error_code, speed))
 
     @setting(28, returns='ii')
     def get_number_ad_channels(self, c):
-        self._select_interface(c)
-        channels = andor.GetNumberADChannels()
-        error_code = andor.error['GetNumberADChannels']
-        return error_code, channels
+        error_code, channels = yield self._sdk(c, 'GetNumberADChannels')
+        returnValue((error_code, channels))
 
     @setting(29, channel='i', typ='i', returns='ii')
     def get_number_hs_speeds(self, c, channel, typ):
-        self._select_interface(c)
-        speeds = andor.GetNumberHSSpeeds(channel, typ)
-        error_code = andor.error['GetNumberHSSpeeds']
-        return error_code, speeds
+        error_code, speeds = yield self._sdk(c, 'GetNumberHSSpeeds', channel, typ)
+        returnValue((error_code, speeds))
 
     @setting(30, returns='ii')
     def get_number_pre_amp_gains(self, c):
-        self._select_interface(c)
-        noGains = andor.GetNumberPreAmpGains()
-        error_code = andor.error['GetNumberPreAmpGains']
-        return error_code, noGains
+        error_code, noGains = yield self._sdk(c, 'GetNumberPreAmpGains')
+        returnValue((error_code, noGains))
 
     @setting(31, returns='ii')
     def get_number_vs_speeds(self, c):
-        self._select_interface(c)
-        speeds = andor.GetNumberVSSpeeds()
-        error_code = andor.error['GetNumberVSSpeeds']
-        return error_code, speeds
+        error_code, speeds = yield self._sdk(c, 'GetNumberVSSpeeds')
+        returnValue((error_code, speeds))
 
     @setting(32, index='i', returns='iv')
     def get_pre_amp_gain(self, c, index):
-        self._select_interface(c)
-        gain = andor.GetPreAmpGain(index)
-        error_code = andor.error['GetPreAmpGain']
-        return error_code, gain
+        error_code, gain = yield self._sdk(c, 'GetPreAmpGain', index)
+        returnValue((error_code, gain))
 
     @setting(33, returns='is')
     def get_status(self, c):
-        self._select_interface(c)
-        status = andor.GetStatus()
-        error_code = andor.error['GetStatus']
-        return error_code, status
+        error_code, status = yield self._sdk(c, 'GetStatus')
+        returnValue((error_code, status))
 
     @setting(34, returns='ii')
     def get_temperature(self, c):
-        self._select_interface(c)
-        temperature = andor.GetTemperature()
-        error_code = andor.error['GetTemperature']
-        return error_code, temperature
+        error_code, temperature = yield self._sdk(c, 'GetTemperature')
+        returnValue((error_code, temperature))
 
     @setting(35, index='i', returns='iv')
     def get_vs_speed(self, c, index):
-        self._select_interface(c)
-        speed = andor.GetVSSpeed(index)
-        error_code = andor.error['GetVSSpeed']
-        return error_code, speed
+        error_code, speed = yield self._sdk(c, 'GetVSSpeed', index)
+        returnValue((error_code, speed))
 
     @setting(36, returns='is')
     def initialize(self, c):
-        self._select_interface(c)
-        initdir = andor.Initialize()
-        error_code = andor.error['Initialize']
-        return error_code, initdir
+        error_code, initdir = yield self._sdk(c, 'Initialize')
+        returnValue((error_code, initdir))
 
     @setting(37, returns='ii')
     def is_cooler_on(self, c):
-        self._select_interface(c)
-        iCoolerStatus = andor.IsCoolerOn()
-        error_code = andor.error['IsCoolerOn']
-        return error_code, iCoolerStatus
+        error_code, iCoolerStatus = yield self._sdk(c, 'IsCoolerOn')
+        returnValue((error_code, iCoolerStatus))
 
     @setting(38, time='v', returns='i')
     def set_accumulation_cycle_time(self, c, time):
-        self._select_interface(c)
-        andor.SetAccumulationCycleTime(time)
-        error_code = andor.error['SetAccumulationCycleTime']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetAccumulationCycleTime', time)
+        returnValue(error_code)
 
     @setting(39, mode='i', returns='i')
     def set_acquisition_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetAcquisitionMode(mode)
-        error_code = andor.error['SetAcquisitionMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetAcquisitionMode', mode)
+        returnValue(error_code)
 
     @setting(40, channel='i', returns='i')
     def set_ad_channel(self, c, channel):
-        self._select_interface(c)
-        andor.SetADChannel(channel)
-        error_code = andor.error['SetADChannel']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetADChannel', channel)
+        returnValue(error_code)
 
     @setting(41, mode='i', returns='i')
     def set_cooler_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetCoolerMode(mode)
-        error_code = andor.error['SetCoolerMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetCoolerMode', mode)
+        returnValue(error_code)
 
     @setting(42, cameraHandle='i', returns='i')
     def set_current_camera(self, c, cameraHandle):
-        andor.SetCurrentCamera(cameraHandle)
-        error_code = andor.error['SetCurrentCamera']
-        return error_code
+        error_code, _ = yield self._sdk(None, 'SetCurrentCamera', cameraHandle)
+        returnValue(error_code)
 
     @setting(43, gainAdvanced='i', returns='i')
     def set_em_advanced(self, c, gainAdvanced):
-        self._select_interface(c)
-        andor.SetEMAdvanced(gainAdvanced)
-        error_code = andor.error['SetEMAdvanced']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetEMAdvanced', gainAdvanced)
+        returnValue(error_code)
 
     @setting(44, gain='i', returns='i')
     def set_emccd_gain(self, c, gain):
-        self._select_interface(c)
-        andor.SetEMCCDGain(gain)
-        error_code = andor.error['SetEMCCDGain']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetEMCCDGain', gain)
+        returnValue(error_code)
 
     @setting(45, mode='i', returns='i')
     def set_em_gain_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetEMGainMode(mode)
-        error_code = andor.error['SetEMGainMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetEMGainMode', mode)
+        returnValue(error_code)
 
     @setting(46, time='v', returns='i')
     def set_exposure_time(self, c, time):
-        self._select_interface(c)
-        andor.SetExposureTime(time)
-        error_code = andor.error['SetExposureTime']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetExposureTime', time)
+        returnValue(error_code)
 
     @setting(47, mode='i', returns='i')
     def set_fan_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetFanMode(mode)
-        error_code = andor.error['SetFanMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFanMode', mode)
+        returnValue(error_code)
     
     @setting(48, exposedRows='i', seriesLength='i', time='v', 
              mode='i', hbin='i', vbin='i', returns='i')
     def set_fast_kinetics(self, c, exposedRows, seriesLength, time,
                              mode, hbin, vbin):
-        self._select_interface(c)
-        andor.SetFastKinetics(exposedRows, seriesLength, time, mode, hbin, vbin)
-        error_code = andor.error['SetFastKinetics']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFastKinetics', exposedRows, seriesLength, time, mode, hbin, vbin)
+        returnValue(error_code)
 
     @setting(49, exposedRows='i', seriesLength='i', time='v', 
              mode='i', hbin='i', vbin='i', offset='i', returns='i')
     def set_fast_kinetics_ex(self, c, exposedRows, seriesLength, time,
                              mode, hbin, vbin, offset):
-        self._select_interface(c)
-        andor.SetFastKineticsEx(exposedRows, seriesLength, time, mode, hbin, vbin,
-                              offset)
-        error_code = andor.error['SetFastKineticsEx']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFastKineticsEx', exposedRows, seriesLength, time, mode, hbin, vbin, offset)
+        returnValue(error_code)
 
     @setting(50, mode='i', returns='i')
     def set_frame_transfer_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetFrameTransferMode(mode)
-        error_code = andor.error['SetFrameTransferMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFrameTransferMode', mode)
+        returnValue(error_code)
 
     @setting(51, typ='i', index='i', returns='i')
     def set_hs_speed(self, c, typ, index):
-        self._select_interface(c)
-        andor.SetHSSpeed(typ, index)
-        error_code = andor.error['SetHSSpeed']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetHSSpeed', typ, index)
+        returnValue(error_code)
 
     @setting(52, hbin='i', vbin='i', hstart='i', hend='i', 
              vstart='i', vend='i', returns='i')
     def set_image(self, c, hbin, vbin, hstart, hend, vstart, vend):
-        self._select_interface(c)
-        andor.SetImage(hbin, vbin, hstart, hend, vstart, vend)
-        error_code = andor.error['SetImage']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetImage', hbin, vbin, hstart, hend, vstart, vend)
+        returnValue(error_code)
 
     @setting(53, iHFlip='i', iVFlip='i', returns='i')
     def set_image_flip(self, c, iHFlip, iVFlip):
-        self._select_interface(c)
-        andor.SetImageFlip(iHFlip, iVFlip)
-        error_code = andor.error['SetImageFlip']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetImageFlip', iHFlip, iVFlip)
+        returnValue(error_code)
 
     @setting(54, iRotate='i', returns='i')
     def set_image_rotate(self, c, iRotate):
-        self._select_interface(c)
-        andor.SetImageRotate(iRotate)
-        error_code = andor.error['SetImageRotate']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetImageRotate', iRotate)
+        returnValue(error_code)
 
     @setting(55, time='v', returns='i')
     def set_kinetic_cycle_time(self, c, time):
-        self._select_interface(c)
-        andor.SetKineticCycleTime(time)
-        error_code = andor.error['SetKineticCycleTime']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetKineticCycleTime', time)
+        returnValue(error_code)
 
     @setting(56, number='i', returns='i')
     def set_number_accumulations(self, c, number):
-        self._select_interface(c)
-        andor.SetNumberAccumulations(number)
-        error_code = andor.error['SetNumberAccumulations']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetNumberAccumulations', number)
+        returnValue(error_code)
 
     @setting(57, number='i', returns='i')
     def set_number_kinetics(self, c, number):
-        self._select_interface(c)
-        andor.SetNumberKinetics(number)
-        error_code = andor.error['SetNumberKinetics']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetNumberKinetics', number)
+        returnValue(error_code)
 
     @setting(58, index='i', returns='i')
     def set_output_amplifier(self, c, index):
-        self._select_interface(c)
-        andor.SetOutputAmplifier(index)
-        error_code = andor.error['SetOutputAmplifier']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetOutputAmplifier', index)
+        returnValue(error_code)
 
     @setting(59, index='i', returns='i')
     def set_pre_amp_gain(self, c, index):
-        self._select_interface(c)
-        andor.SetPreAmpGain(index)
-        error_code = andor.error['SetPreAmpGain']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetPreAmpGain', index)
+        returnValue(error_code)
 
     @setting(60, mode='i', returns='i')
     def set_read_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetReadMode(mode)
-        error_code = andor.error['SetReadMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetReadMode', mode)
+        returnValue(error_code)
 
     @setting(61, typ='i', mode='i', closingtime='i', 
              openingtime='i', returns='i')
     def set_shutter(self, c, typ, mode, closingtime, openingtime):
-        self._select_interface(c)
-        andor.SetShutter(typ, mode, closingtime, openingtime)
-        error_code = andor.error['SetShutter']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetShutter', typ, mode, closingtime, openingtime)
+        returnValue(error_code)
 
     @setting(62, typ='i', mode='i', closingtime='i', 
              openingtime='i', extmode='i')
     def set_shutter_ex(self, c, typ, mode, closingtime, openingtime, 
                        extmode):
-        self._select_interface(c)
-        andor.SetShutterEx(typ, mode, closingtime, openingtime, extmode)
-        error_code = andor.error['SetShutterEx']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetShutterEx', typ, mode, closingtime, openingtime, extmode)
+        returnValue(error_code)
 
     @setting(63, temperature='i', returns='i')
     def set_temperature(self, c, temperature):
-        self._select_interface(c)
-        andor.SetTemperature(temperature)
-        error_code = andor.error['SetTemperature']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetTemperature', temperature)
+        returnValue(error_code)
 
     @setting(64, mode='i', returns='i')
     def set_trigger_mode(self, c, mode):
-        self._select_interface(c)
-        andor.SetTriggerMode(mode)
-        error_code = andor.error['SetTriggerMode']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetTriggerMode', mode)
+        returnValue(error_code)
 
     @setting(65, index='i', returns='i')
     def set_vs_speed(self, c, index):
-        self._select_interface(c)
-        andor.SetVSSpeed(index)
-        error_code = andor.error['SetVSSpeed']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetVSSpeed', index)
+        returnValue(error_code)
 
     @setting(66, returns='i')
     def shut_down(self, c):
-        andor.ShutDown()
-        error_code = andor.error['ShutDown']
-        return error_code
+        error_code, _ = yield self._sdk(None, 'ShutDown')
+        returnValue(error_code)
 
     @setting(67, returns='i')
     def start_acquisition(self, c):
-        self._select_interface(c)
-        andor.StartAcquisition()
-        error_code = andor.error['StartAcquisition']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'StartAcquisition')
+        returnValue(error_code)
 
-    # @inlineCallbacks
     @setting(68, returns='i')
     def wait_for_acquisition(self, c):
-        self._select_interface(c)
-        # yield deferToThread(andor.WaitForAcquisition)
-        andor.WaitForAcquisition()
-        error_code = andor.error['WaitForAcquisition']
-        # returnValue(error_code)
-        return error_code
+        error_code, frames = yield self._wait(c, 1)
+        returnValue(error_code)
 
     @setting(69, returns='i')
     def set_single_track(self, c, center, height):
-        self._select_interface(c)
-        andor.SetSingleTrack(center, height)
-        error_code = andor.error['SetSingleTrack']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetSingleTrack', center, height)
+        returnValue(error_code)
 
     @setting(70, returns='i')
     def set_baseline_clamp(self, c, state):
-        self._select_interface(c)
-        andor.SetBaselineClamp(state)
-        error_code = andor.error['SetBaselineClamp']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetBaselineClamp', state)
+        returnValue(error_code)
 
-    @inlineCallbacks
-    @setting(71, returns='i')
+    @setting(71, iTimeOutMs='i', returns='i')
     def wait_for_acquisition_timeout(self, c, iTimeOutMs):
-        self._select_interface(c)
-        # yield deferToThread(andor.WaitForAcquisitionTimeOut, iTimeOutMs)
-        andor.WaitForAcquisitionTimeOut(iTimeOutMs)
-        error_code = andor.error['WaitForAcquisitionTimeOut']
-        # returnValue(error_code)
-        return error_code
+        error_code, frames = yield self._wait(c, 1, iTimeOutMs)
+        returnValue(error_code)
     
     @setting(72, returns='i')
     def set_fk_vs_speed(self, c, index):
-        self._select_interface(c)
-        andor.SetFKVShiftSpeed(index)
-        error_code = andor.error['SetFKVShiftSpeed']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFKVShiftSpeed', index)
+        returnValue(error_code)
     
     @setting(73, returns='i')
     def set_fast_ext_trigger(self, c, mode):
-        self._select_interface(c)
-        andor.SetFastExtTrigger(mode)
-        error_code = andor.error['SetFastExtTrigger']
-        return error_code
+        error_code, _ = yield self._sdk(c, 'SetFastExtTrigger', mode)
+        returnValue(error_code)
     
     @setting(74, returns='iii')
     def get_number_available_images(self, c):
-        self._select_interface(c)
-        first, last = andor.GetNumberAvailableImages()
-        error_code = andor.error['GetNumberAvailableImages']
-        return error_code, first, last
+        error_code, (first, last) = yield self._sdk(c, 'GetNumberAvailableImages')
+        returnValue((error_code, first, last))
     
     @setting(75, returns='iii')
     def get_number_new_images(self, c):
-        self._select_interface(c)
-        first, last = andor.GetNumberNewImages()
-        error_code = andor.error['GetNumberNewImages']
-        return error_code, first, last
+        error_code, (first, last) = yield self._sdk(c, 'GetNumberNewImages')
+        returnValue((error_code, first, last))
     
     @setting(76, returns='i*iii')
     def get_images(self, c, first, last, size):
-        self._select_interface(c)
-        arr, validfirst, validlast = andor.GetImages(first, last, size)
-        error_code = andor.error['GetImages']
-        return error_code, arr, validfirst, validlast
+        error_code, (arr, validfirst, validlast) = yield self._sdk(c, 'GetImages', first, last, size)
+        returnValue((error_code, arr, validfirst, validlast))
     
     @setting(77, returns='ii')
     def get_size_of_circular_buffer(self, c):
-        self._select_interface(c)
-        size = andor.GetSizeOfCircularBuffer()
-        error_code = andor.error['GetSizeOfCircularBuffer']
-        return error_code, size
+        error_code, size = yield self._sdk(c, 'GetSizeOfCircularBuffer')
+        returnValue((error_code, size))
     
     @setting(78, returns='i*i')
     def get_most_recent_image(self, c, size):
-        self._select_interface(c)
-        arr = andor.GetMostRecentImage(size)
-        error_code = andor.error['GetMostRecentImage']
-        return error_code, arr
+        error_code, arr = yield self._sdk(c, 'GetMostRecentImage', size)
+        returnValue((error_code, arr))
     
-    # @setting(79)
-    # def cancel_waits(self, c):
-    #     cameras = self.get_interface_list(c)
-    #     for camera in cameras:
-    #         self.select_interface(c, camera)
-    #         self.cancel_wait(c)
+    @setting(79, abort='b', returns='i')
+    def cancel_acquisition(self, c, abort=True):
+        """
+        cancel_acquisition(self, c, abort=True)
+
+        Stops any waits for frames from the selected camera within ``WAIT_SLICE``, and optionally aborts its acquisition. Runs once a wait in progress releases the SDK, which takes at most ``WAIT_SLICE``.
+
+        Args:
+            c: The LabRAD context
+            abort (bool, optional): Whether to also abort the acquisition. Defaults to True.
+
+        Returns:
+            int: The error code of AbortAcquisition if aborting, otherwise of CancelWait
+        """
+        camera = self._get_camera(c)
+        self.cancel_events.setdefault(camera, threading.Event()).set()
+        error_code, _ = yield self._sdk(c, 'CancelWait')
+        if abort:
+            error_code, _ = yield self._sdk(c, 'AbortAcquisition')
+        returnValue(error_code)
+
+    @setting(80, n_frames='i', timeout='v', returns='ii')
+    def wait_for_frames(self, c, n_frames, timeout=None):
+        """
+        wait_for_frames(self, c, n_frames, timeout=None)
+
+        Waits in a worker thread for the selected camera to acquire a number of frames, so that the server stays responsive. When done, the number of frames acquired is sent with the ``acquisition_complete`` signal, as is the case for :meth:`wait_for_acquisition` and :meth:`wait_for_acquisition_timeout`.
+
+        Args:
+            c: The LabRAD context
+            n_frames (int): The number of frames to wait for
+            timeout (float, optional): The maximum time to wait, in ms. Defaults to None, in which case waits until the frames are acquired, the acquisition ends, or :meth:`cancel_acquisition` is called.
+
+        Returns:
+            (int, int): The error code of the last call to WaitForAcquisitionTimeOut, and the number of frames acquired
+        """
+        error_code, frames = yield self._wait(c, n_frames, timeout)
+        returnValue((error_code, frames))
 
     
 Server = AndorServer
@@ -0,0 +1,265 @@
+"""
+Simulated Andor SDK library, for running :mod:`andor.server` without a camera (e.g. on Linux).
+
+Stands in for the ``ctypes`` library loaded by :class:`andor.andor.Andor`, taking and filling in the same ``ctypes`` arguments and returning the same error codes. Acquisitions are simulated in real time from the exposure time, kinetic cycle time and number of kinetics, so that waits block and :code:`CancelWait` wakes them up as with the real SDK. Functions that are not simulated do nothing and return :code:`DRV_SUCCESS`.
+
+To use it, start the server with the ``ANDOR_SDK`` environment variable set to ``simulated``.
+"""
+import threading
+from time import time
+
+import numpy as np
+
+DRV_SUCCESS = 20002
+DRV_NO_NEW_DATA = 20024
+DRV_TEMP_OFF = 20034
+DRV_TEMP_STABILIZED = 20036
+DRV_P1INVALID = 20066
+DRV_ACQUIRING = 20072
+DRV_IDLE = 20073
+
+SERIAL_NUMBERS = [12345]
+DETECTOR = (512, 512)
+
+
+def _set(ref, value):
+    # Fill in an argument passed with ctypes.byref
+    ref._obj.value = value
+
+
+def _fill(ptr, data):
+    # Fill in an array passed with ctypes.pointer
+    arr = ptr.contents
+    n = min(len(arr), len(data))
+    arr[:n] = [int(x) for x in data[:n]]
+
+
+class SimulatedCamera(object):
+    def __init__(self, serial):
+        self.serial = serial
+        self.exposure = 0.01
+        self.accumulate = 0.0
+        self.kinetic = 0.0
+        self.n_kinetics = 1
+        self.mode = 1
+        self.cooler = False
+        self.start = None
+        self.acknowledged = 0
+        self.retrieved = 0
+        self.cancel = threading.Event()
+
+    def cycle_time(self):
+        return max(self.exposure, self.kinetic)
+
+    def n_frames(self):
+        if self.mode == 5:
+            return np.inf
+        if self.mode == 3:
+            return self.n_kinetics
+        return 1
+
+    def frames(self):
+        if self.start is None:
+            return self.acknowledged
+        dt = time() - self.start - self.exposure
+        if dt < 0:
+            return 0
+        return int(min(self.n_frames(), dt // self.cycle_time() + 1))
+
+    def acquiring(self):
+        return self.start is not None and self.frames() < self.n_frames()
+
+    def next_frame_time(self):
+        return self.start + self.exposure + self.frames()*self.cycle_time()
+
+    def image(self, index):
+        rng = np.random.default_rng(index)
+        return rng.poisson(100, DETECTOR[0]*DETECTOR[1])
+
+
+class SimulatedSDK(object):
+    """
+    SimulatedSDK(object)
+
+    Simulated replacement for the Andor SDK ``ctypes`` library.
+
+    Args:
+        serial_numbers (list, optional): Serial numbers of the simulated cameras. Defaults to ``SERIAL_NUMBERS``.
+    """
+    def __init__(self, serial_numbers=SERIAL_NUMBERS):
+        self.cameras = [SimulatedCamera(s) for s in serial_numbers]
+        self.current = 0
+
+    def __getattr__(self, name):
+        # Anything that isn't simulated succeeds without doing anything
+        return lambda *args: DRV_SUCCESS
+
+    @property
+    def camera(self):
+        return self.cameras[self.current]
+
+    def GetAvailableCameras(self, totalCameras):
+        _set(totalCameras, len(self.cameras))
+        return DRV_SUCCESS
+
+    def GetCameraHandle(self, cameraIndex, cameraHandle):
+        if cameraIndex >= len(self.cameras):
+            return DRV_P1INVALID
+        _set(cameraHandle, 100 + cameraIndex)
+        return DRV_SUCCESS
+
+    def SetCurrentCamera(self, cameraHandle):
+        if not 0 <= cameraHandle - 100 < len(self.cameras):
+            return DRV_P1INVALID
+        self.current = cameraHandle - 100
+        return DRV_SUCCESS
+
+    def GetCurrentCamera(self, cameraHandle):
+        _set(cameraHandle, 100 + self.current)
+        return DRV_SUCCESS
+
+    def GetCameraSerialNumber(self, number):
+        _set(number, self.camera.serial)
+        return DRV_SUCCESS
+
+    def GetDetector(self, xpixels, ypixels):
+        _set(xpixels, DETECTOR[0])
+        _set(ypixels, DETECTOR[1])
+        return DRV_SUCCESS
+
+    def CoolerON(self):
+        self.camera.cooler = True
+        return DRV_SUCCESS
+
+    def CoolerOFF(self):
+        self.camera.cooler = False
+        return DRV_SUCCESS
+
+    def IsCoolerOn(self, iCoolerStatus):
+        _set(iCoolerStatus, int(self.camera.cooler))
+        return DRV_SUCCESS
+
+    def GetTemperature(self, temperature):
+        if self.camera.cooler:
+            _set(temperature, -60)
+            return DRV_TEMP_STABILIZED
+        _set(temperature, 20)
+        return DRV_TEMP_OFF
+
+    def SetAcquisitionMode(self, mode):
+        self.camera.mode = mode
+        return DRV_SUCCESS
+
+    def SetExposureTime(self, time):
+        self.camera.exposure = time.value
+        return DRV_SUCCESS
+
+    def SetKineticCycleTime(self, time):
+        self.camera.kinetic = time.value
+        return DRV_SUCCESS
+
+    def SetAccumulationCycleTime(self, time):
+        self.camera.accumulate = time.value
+        return DRV_SUCCESS
+
+    def SetNumberKinetics(self, number):
+        self.camera.n_kinetics = number
+        return DRV_SUCCESS
+
+    def GetAcquisitionTimings(self, exposure, accumulate, kinetic):
+        _set(exposure, self.camera.exposure)
+        _set(accumulate, self.camera.accumulate)
+        _set(kinetic, self.camera.cycle_time())
+        return DRV_SUCCESS
+
+    def GetStatus(self, status):
+        _set(status, DRV_ACQUIRING if self.camera.acquiring() else DRV_IDLE)
+        return DRV_SUCCESS
+
+    def StartAcquisition(self):
+        camera = self.camera
+        if camera.acquiring():
+            return DRV_ACQUIRING
+        camera.cancel.clear()
+        camera.acknowledged = 0
+        camera.retrieved = 0
+        camera.start = time()
+        return DRV_SUCCESS
+
+    def AbortAcquisition(self):
+        camera = self.camera
+        if not camera.acquiring():
+            return DRV_IDLE
+        camera.acknowledged = camera.frames()
+        camera.start = None
+        camera.cancel.set()
+        return DRV_SUCCESS
+
+    def CancelWait(self):
+        self.camera.cancel.set()
+        return DRV_SUCCESS
+
+    def GetAcquisitionProgress(self, acc, series):
+        _set(acc, 0)
+        _set(series, self.camera.frames())
+        return DRV_SUCCESS
+
+    def WaitForAcquisitionTimeOut(self, iTimeOutMs):
+        camera = self.camera
+        deadline = time() + iTimeOutMs/1000.
+        while True:
+            if camera.cancel.is_set():
+                camera.cancel.clear()
+                return DRV_NO_NEW_DATA
+            frames = camera.frames()
+            if frames > camera.acknowledged:
+                camera.acknowledged = frames
+                return DRV_SUCCESS
+            if not camera.acquiring() or time() >= deadline:
+                return DRV_NO_NEW_DATA
+            camera.cancel.wait(max(0, min(deadline, camera.next_frame_time()) - time()))
+
+    def WaitForAcquisition(self):
+        return self.WaitForAcquisitionTimeOut(np.inf)
+
+    def GetNumberNewImages(self, first, last):
+        frames = self.camera.frames()
+        if frames <= self.camera.retrieved:
+            return DRV_NO_NEW_DATA
+        _set(first, self.camera.retrieved + 1)
+        _set(last, frames)
+        return DRV_SUCCESS
+
+    def GetNumberAvailableImages(self, first, last):
+        frames = self.camera.frames()
+        if frames == 0:
+            return DRV_NO_NEW_DATA
+        _set(first, 1)
+        _set(last, frames)
+        return DRV_SUCCESS
+
+    def GetImages(self, first, last, arr, size, validfirst, validlast):
+        frames = self.camera.frames()
+        if first < 1 or last > frames or first > last:
+            return DRV_P1INVALID
+        _fill(arr, np.concatenate([self.camera.image(i) for i in range(first, last + 1)]))
+        _set(validfirst, first)
+        _set(validlast, last)
+        self.camera.retrieved = max(self.camera.retrieved, last)
+        return DRV_SUCCESS
+
+    def GetMostRecentImage(self, arr, size):
+        frames = self.camera.frames()
+        if frames == 0:
+            return DRV_NO_NEW_DATA
+        _fill(arr, self.camera.image(frames))
+        return DRV_SUCCESS
+
+    def GetAcquiredData(self, arr, size):
+        frames = self.camera.frames()
+        if self.camera.acquiring():
+            return DRV_ACQUIRING
+        _fill(arr, np.concatenate([self.camera.image(i) for i in range(1, frames + 1)]))
+        return DRV_SUCCESS
+
+    GetAcquiredData16 = GetAcquiredData
@@ -0,0 +1,96 @@
+"""
+Tests of :mod:`andor.server` with two cameras of :mod:`andor.simulated_sdk`, checking that a wait for frames from one camera, in a worker thread, doesn't let calls for the other camera reach the wrong one.
+
+.. code-block:: bash
+
+    python -m unittest test_server
+"""
+import os
+import threading
+import unittest
+from time import time
+
+import server
+from andor import Andor
+from server import AndorServer, WAIT_SLICE
+from simulated_sdk import SimulatedSDK
+
+SERIAL_NUMBERS = [111, 222]
+
+
+class TestAndorServer(unittest.TestCase):
+    def setUp(self):
+        os.environ['ANDOR_SDK'] = 'simulated'
+        self.server = AndorServer()
+        self.server.initServer()
+        server.andor = Andor(SimulatedSDK(SERIAL_NUMBERS))
+        server.andor.verbose = False
+        self.server.interfaces = {}
+        self.server.current_camera = None
+        self.server.refresh_available_interfaces()
+        self.cameras = [str(s) for s in SERIAL_NUMBERS]
+
+    def start_acquisition(self, camera, n_frames, cycle_time):
+        self.server._call(camera, 'SetAcquisitionMode', 3)
+        self.server._call(camera, 'SetExposureTime', 0.001)
+        self.server._call(camera, 'SetKineticCycleTime', cycle_time)
+        self.server._call(camera, 'SetNumberKinetics', n_frames)
+        (error_code, _) = self.server._call(camera, 'StartAcquisition')
+        self.assertEqual(server.handle_error(error_code), 0)
+
+    def wait_in_thread(self, camera, n_frames, timeout=None):
+        cancel = threading.Event()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(self.server._wait_for_frames(camera, n_frames, timeout, cancel)))
+        thread.start()
+        return thread, cancel, result
+
+    def test_interfaces(self):
+        self.assertEqual(sorted(self.server.interfaces), self.cameras)
+
+    def test_calls_while_waiting(self):
+        (camera, other) = self.cameras
+        self.start_acquisition(camera, 5, 0.05)
+        thread, cancel, result = self.wait_in_thread(camera, 5)
+        while thread.is_alive():
+            (error_code, serial) = self.server._call(other, 'GetCameraSerialNumber')
+            self.assertEqual(str(serial), other)
+            (error_code, status) = self.server._call(other, 'GetStatus')
+            self.assertEqual(status, 'DRV_IDLE')
+        thread.join()
+        (error_code, frames) = result[0]
+        self.assertEqual(frames, 5)
+        self.assertEqual(server.ERROR_CODE[error_code], 'DRV_SUCCESS')
+
+    def test_set_current_camera(self):
+        (camera, other) = self.cameras
+        self.server._call(camera, 'GetStatus')
+        self.server._call(None, 'SetCurrentCamera', self.server.interfaces[other])
+        self.assertEqual(self.server.current_camera, other)
+        (error_code, serial) = self.server._call(camera, 'GetCameraSerialNumber')
+        self.assertEqual(str(serial), camera)
+
+    def test_cancel(self):
+        (camera, other) = self.cameras
+        self.start_acquisition(camera, 100, 1)
+        thread, cancel, result = self.wait_in_thread(camera, 100)
+        ti = time()
+        cancel.set()
+        self.server._call(camera, 'CancelWait')
+        thread.join()
+        self.assertLess(time() - ti, 2*WAIT_SLICE/1000.)
+        self.assertLess(result[0][1], 100)
+        self.server._call(camera, 'AbortAcquisition')
+
+    def test_timeout(self):
+        (camera, other) = self.cameras
+        self.start_acquisition(camera, 100, 1)
+        ti = time()
+        thread, cancel, result = self.wait_in_thread(camera, 100, 250)
+        thread.join()
+        self.assertLess(abs(time() - ti - 0.25), WAIT_SLICE/1000.)
+        self.server._call(camera, 'AbortAcquisition')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -38,27 +38,24 @@ class ArduinoServer(HardwareInterfaceServer):
     advanceSignal = Signal(825700, 'signal: case', 's')
     killClientSignal = Signal(825701, 'signal: kill', 'b')
 
-    def refresh_available_interfaces(self):
-        addresses = [cp[0] for cp in serial.tools.list_ports.comports()]
-        descriptions = [cp[1] for cp in serial.tools.list_ports.comports()]
-
-        for (address, d) in zip(addresses, descriptions):
-            if address in self.interfaces.keys():
-                try:
-                    self.interfaces[address].isOpen()
-                except:
-                    print('{} unavailable'.format(address))
-                    del self.interfaces[address]
-            else:
-                try:
-                    if address[0:-1] == '/dev/ttyACM' and d.find("Arduino") >= 0:
-                        ser = Serial(address, timeout=1)
-                        ser.close()
-                        self.interfaces[address] = ser
-                        print('{} available'.format(address))
-                except:
-                    pass
-        
+    def list_addresses(self):
+        """ Addresses of the serial ports with Arduinos """
+        return [cp[0] for cp in serial.tools.list_ports.comports()
+                if cp[0][0:-1] == '/dev/ttyACM' and cp[1].find("Arduino") >= 0]
+
+    def open_interface(self, address):
+        ser = Serial(address, timeout=1)
+        ser.close()
+        print('{} available'.format(address))
+        return ser
+
+    def interface_alive(self, interface):
+        try:
+            interface.isOpen()
+            return True
+        except:
+            return False
+
     def get_interface(self, c):
         interface = super(ArduinoServer, self).get_interface(c)
         if not interface.isOpen():
@@ -67,9 +64,6 @@ class ArduinoServer(HardwareInterfaceServer):
     
     @setting(2, returns='b')
     def disconnect(self, c):
-        self.refresh_available_interfaces()
-        if c['address'] not in self.interfaces:
-            raise Exception(c['address'] + 'is unavailable')
         interface = self.get_interface(c)
         interface.close()
         del c['address']
@@ -159,6 +153,21 @@ class ArduinoServer(HardwareInterfaceServer):
     def reset_input_buffer(self, c):
         self.call_if_available('reset_input_buffer', c)
 
+    @setting(20, returns='s')
+    def get_interface_discovery_stats(self, c):
+        """
+        get_interface_discovery_stats(self, c)
+
+        Gets how many times the Arduino devices were listed, opened and removed, and how many times each was rediscovered after failing.
+
+        Args:
+            c: The LabRAD context
+
+        Returns:
+            str: A serialized json of ``{"enumerations": ..., "rescans": ..., "opened": ..., "removed": ..., "addresses": {address: {"rediscoveries": ..., "failures": ..., "skipped": ..., "backoff": ...}}}``, where ``skipped`` counts rediscoveries not tried during a backoff, and ``backoff`` is in seconds
+        """
+        return self.get_discovery_stats()
+
     @setting(17, 'Emit Advance Signal', case='s')
     def emitAdvanceSignal(self, c, case):
         self.advanceSignal(case)
@@ -170,6 +179,7 @@ class ArduinoServer(HardwareInterfaceServer):
     @setting(19)
     def stopServer(self):
         self.killClientSignal(True)
+        super(ArduinoServer, self).stopServer()
 
 __server__ = ArduinoServer()
 
@@ -18,16 +18,26 @@ Provides access to Rigol DG800 series AWGs.
     timeout = 20
     ### END NODE INFO
 """
+import json
 import sys
 from labrad.util import getNodeName
 from labrad.server import LabradServer, setting
 from twisted.internet.defer import inlineCallbacks, returnValue
 
+from rigol_state import FIELDS, diff_commands, readback_queries, parse_readback
+
+MAX_FREQ = 35E6 # Hz
+
 class DG800Server(LabradServer):
     """Provides access to Rigol DG800 series AWGs."""
     name = '%LABRADNODE%_dg800'
 
+    fields = FIELDS
+
     def __init__(self):
+        self.device = None
+        # Last state acknowledged by each device, {device: {channel: {field: value}}}
+        self.shadow = {}
         LabradServer.__init__(self)
     
     @inlineCallbacks
@@ -77,7 +87,14 @@ class DG800Server(LabradServer):
             c: A LabRAD context (not used)
             device (string): The ID of the DG800 AWG to connect to, as returned by :meth:`get_devices`
         """
-        self.USB.select_interface(device)
+        yield self.USB.select_interface(device)
+        self.device = device
+        self.shadow.setdefault(device, {})
+
+    def _invalidate(self, channel, fields):
+        # Forget fields written without an acknowledgement, so that apply_state resends them
+        for k in fields:
+            self.shadow.get(self.device, {}).get(channel, {}).pop(k, None)
 
     @setting(7, channel='i', freq='v', amplitude='v', offset='v', phase='v')
     def set_sin(self, c, channel, freq, amplitude, offset, phase):
@@ -97,7 +114,8 @@ class DG800Server(LabradServer):
         """
         if channel not in [1,2]:
             raise ValueError("Channel {} invalid. Acceptable values are 1 or 2.".format(channel))
-        yield self.USB.write(":SOUR%d:APPL:SIN %f,%f,%f,%f" % (channel, min(35E6,max(1E-6,freq)), amplitude, offset, phase))
+        self._invalidate(channel, ['freq', 'amplitude', 'offset', 'phase'])
+        yield self.USB.write(":SOUR%d:APPL:SIN %f,%f,%f,%f" % (channel, min(MAX_FREQ,max(1E-6,freq)), amplitude, offset, phase))
 
     @setting(8, channel='i', enable='b')
     def set_output(self, c, channel, enable):
@@ -117,6 +135,7 @@ class DG800Server(LabradServer):
             stringthing = 'ON'
         else:
             stringthing = 'OFF'
+        self._invalidate(channel, ['output'])
         yield self.USB.write(":OUTP%d %s" % (channel, stringthing))
 
     @setting(11, channel='i', impedance='i', inf='b', low='b')
@@ -159,6 +178,7 @@ class DG800Server(LabradServer):
         """
         if channel not in [1,2]:
             raise ValueError("Channel {} invalid. Acceptable values are 1 or 2.".format(channel))
+        self._invalidate(channel, ['ncycles'])
         yield self.USB.write(":SOUR%d:BURS:NCYC %d" % (channel, min(500000,max(1,ncycles))))
 
     @setting(13, channel='i', gated='b')
@@ -175,6 +195,7 @@ class DG800Server(LabradServer):
         """
         if channel not in [1,2]:
             raise ValueError("Channel {} invalid. Acceptable values are 1 or 2.".format(channel))
+        self._invalidate(channel, ['gated'])
         if gated:
             yield self.USB.write(":SOUR%d:BURS:MODE GAT" % (channel))
         else:
@@ -223,6 +244,62 @@ class DG800Server(LabradServer):
         out = 'ON' in stringthing
         returnValue(out)
 
+    @setting(14, state='s', force='b', returns='s')
+    def apply_state(self, c, state, force=False):
+        """
+        apply_state(self, c, state, force=False)
+
+        Sets the selected AWG to the given state, only sending the commands for settings that differ from the last acknowledged state. The commands are sent as one SCPI string, followed by a single :code:`*OPC?` which is waited on before the shadow state is updated.
+
+        Args:
+            c: A LabRAD context (not used)
+            state (str): JSON-encoded dict of the desired state, with keys of the form :code:`"freq1"` or :code:`"output2"`. See :mod:`awgs.rigol_state` for the allowed fields. Fields that are not given are left alone.
+            force (bool, optional): Whether to re-read the instrument state with :meth:`resync_state` before computing the difference. Defaults to False.
+
+        Returns:
+            str: The SCPI commands that were sent, or an empty string if the AWG was already in the desired state
+        """
+        if self.device is None:
+            raise Exception("No device selected")
+        if force:
+            yield self.resync_state(c)
+        shadow = self.shadow[self.device]
+        commands, updates = diff_commands(shadow, json.loads(state), MAX_FREQ, self.fields)
+        if not commands:
+            returnValue('')
+        try:
+            yield self.USB.query(';'.join(commands + ['*OPC?']))
+        except Exception:
+            # The instrument may have applied some of the commands
+            self.shadow[self.device] = {}
+            raise
+        for ch, values in updates.items():
+            shadow.setdefault(ch, {}).update(values)
+        returnValue(';'.join(commands))
+
+    @setting(15, returns='s')
+    def resync_state(self, c):
+        """
+        resync_state(self, c)
+
+        Re-reads the state of the selected AWG, replacing the shadow state used by :meth:`apply_state`.
+
+        Args:
+            c: A LabRAD context (not used)
+
+        Returns:
+            str: JSON-encoded dict of the state read back, in the format taken by :meth:`apply_state`
+        """
+        if self.device is None:
+            raise Exception("No device selected")
+        self.shadow[self.device] = {}
+        shadow = {}
+        for ch, group, query in readback_queries(self.fields):
+            reply = yield self.USB.query(query)
+            shadow.setdefault(ch, {}).update(parse_readback(group, reply))
+        self.shadow[self.device] = shadow
+        returnValue(json.dumps({k + str(ch): v for (ch, values) in shadow.items() for (k, v) in values.items()}))
+
 if __name__ == '__main__':
     from labrad import util
     util.runServer(DG800Server())
@@ -0,0 +1,176 @@
+"""
+Shadow state of the channels of a Rigol AWG, shared by :mod:`awgs.RigolDG800Server` and :mod:`awgs.RigolDG4000Server`.
+
+A state is a flat dict using the same keys as the conductor's ``sin`` parameters, with the channel number appended to each field name:
+
+.. code-block:: json
+
+    {
+        "freq1": 100, "amplitude1": 0.2, "offset1": 0, "phase1": 0, "output1": 1,
+        "ncycles1": 5, "gated1": 1
+    }
+
+:func:`diff_commands` compares a desired state against the last state acknowledged by the instrument and returns only the SCPI commands needed to get there. :func:`parse_readback` builds a state from the instrument's replies to the queries in :func:`readback_queries`, for resynchronizing.
+"""
+from math import isclose
+
+CHANNELS = [1, 2]
+
+# Fields set together by :APPL:SIN
+SIN_FIELDS = ['freq', 'amplitude', 'offset', 'phase']
+FIELDS = SIN_FIELDS + ['output', 'ncycles', 'gated']
+
+# SCPI replies are formatted with %E, so compare to a bit better than the precision of %f
+ABS_TOL = 1e-6
+REL_TOL = 1e-9
+
+COMMANDS = {
+    'output': lambda ch, v: ":OUTP%d %s" % (ch, 'ON' if v else 'OFF'),
+    'ncycles': lambda ch, v: ":SOUR%d:BURS:NCYC %d" % (ch, v),
+    'gated': lambda ch, v: ":SOUR%d:BURS:MODE %s" % (ch, 'GAT' if v else 'TRIG'),
+    'FSKfreq': lambda ch, v: ":SOUR%d:MOD:FSK:FREQ %f" % (ch, v),
+}
+
+QUERIES = {
+    'sin': ":SOUR%d:APPL?",
+    'output': ":OUTP%d?",
+    'ncycles': ":SOUR%d:BURS:NCYC?",
+    'gated': ":SOUR%d:BURS:MODE?",
+    'FSKfreq': ":SOUR%d:MOD:FSK:FREQ?",
+}
+
+
+def coerce(field, value, max_freq):
+    """
+    coerce(field, value, max_freq)
+
+    Converts a value to the type and range that the instrument will actually be set to, so that it can be compared with the shadow state.
+
+    Args:
+        field (str): The field name, without the channel number
+        value: The requested value
+        max_freq (float): The maximum frequency of the AWG in Hertz
+
+    Returns:
+        The coerced value
+    """
+    if field == 'freq':
+        return min(max_freq, max(1E-6, float(value)))
+    if field == 'ncycles':
+        return min(500000, max(1, int(value)))
+    if field in ['output', 'gated']:
+        return bool(value)
+    return float(value)
+
+
+def split_state(state, fields=FIELDS):
+    """
+    split_state(state, fields=FIELDS)
+
+    Args:
+        state (dict): A flat state dict, e.g. ``{"freq1": 100, "output2": 0}``
+        fields (list, optional): The allowed field names. Defaults to ``FIELDS``.
+
+    Raises:
+        ValueError: if a key is not a known field followed by a valid channel number
+
+    Returns:
+        dict: ``{channel: {field: value}}``
+    """
+    out = {ch: {} for ch in CHANNELS}
+    for key, value in state.items():
+        field, ch = key[:-1], key[-1:]
+        if field not in fields or not ch.isdigit() or int(ch) not in CHANNELS:
+            raise ValueError("Invalid state key {}. Acceptable fields are {} followed by a channel number in {}.".format(key, fields, CHANNELS))
+        out[int(ch)][field] = value
+    return out
+
+
+def same(field, a, b):
+    if a is None or b is None:
+        return False
+    if field in ['output', 'gated', 'ncycles']:
+        return a == b
+    return isclose(a, b, rel_tol=REL_TOL, abs_tol=ABS_TOL)
+
+
+def diff_commands(shadow, state, max_freq, fields=FIELDS):
+    """
+    diff_commands(shadow, state, max_freq, fields=FIELDS)
+
+    Computes the minimal list of SCPI commands that take the instrument from ``shadow`` to ``state``. Fields that are not in ``state`` are left alone.
+
+    Since :APPL:SIN sets the frequency, amplitude, offset and phase at once, changing any of them resends all four, taking the missing ones from ``shadow``.
+
+    Args:
+        shadow (dict): ``{channel: {field: value}}`` of the last acknowledged state. Unknown fields are missing.
+        state (dict): The desired flat state dict
+        max_freq (float): The maximum frequency of the AWG in Hertz
+        fields (list, optional): The allowed field names. Defaults to ``FIELDS``.
+
+    Raises:
+        ValueError: if some, but not all, of the sine fields are given for a channel whose sine settings are not in ``shadow``
+
+    Returns:
+        (list, dict): The SCPI commands, and the new ``{channel: {field: value}}`` values that they set
+    """
+    commands = []
+    updates = {ch: {} for ch in CHANNELS}
+    for ch, desired in sorted(split_state(state, fields).items()):
+        current = shadow.get(ch, {})
+        desired = {k: coerce(k, v, max_freq) for (k, v) in desired.items()}
+
+        sin = [k for k in SIN_FIELDS if k in desired]
+        if any(not same(k, desired[k], current.get(k)) for k in sin):
+            values = [desired.get(k, current.get(k)) for k in SIN_FIELDS]
+            if None in values:
+                raise ValueError("Channel {} needs all of {} to set a sine wave, since its state is unknown.".format(ch, SIN_FIELDS))
+            commands.append(":SOUR%d:APPL:SIN %f,%f,%f,%f" % tuple([ch] + values))
+            updates[ch].update(zip(SIN_FIELDS, values))
+
+        for k, v in sorted(desired.items()):
+            if k in SIN_FIELDS or same(k, v, current.get(k)):
+                continue
+            commands.append(COMMANDS[k](ch, v))
+            updates[ch][k] = v
+    return commands, updates
+
+
+def readback_queries(fields=FIELDS):
+    """
+    readback_queries(fields=FIELDS)
+
+    Args:
+        fields (list, optional): The fields to read back. Defaults to ``FIELDS``.
+
+    Returns:
+        list: ``(channel, group, query)`` tuples, where ``group`` is ``'sin'`` or a field name
+    """
+    groups = ['sin'] + [k for k in fields if k not in SIN_FIELDS]
+    return [(ch, g, QUERIES[g] % ch) for ch in CHANNELS for g in groups]
+
+
+def parse_readback(group, reply):
+    """
+    parse_readback(group, reply)
+
+    Args:
+        group (str): ``'sin'`` or a field name, as returned by :func:`readback_queries`
+        reply (str): The instrument's reply
+
+    Returns:
+        dict: ``{field: value}``. Empty if the channel is not outputting a sine wave and ``group`` is ``'sin'``.
+    """
+    reply = reply.strip().replace('"', '')
+    if group == 'sin':
+        splits = reply.split(',')
+        if 'SIN' not in splits[0]:
+            return {}
+        return dict(zip(SIN_FIELDS, [float(v) for v in splits[1:5]]))
+    if group == 'output':
+        return {group: 'ON' in reply}
+    if group == 'gated':
+        return {group: 'GAT' in reply}
+    if group == 'ncycles':
+        return {group: int(float(reply))}
+    return {group: float(reply)}
@@ -0,0 +1,102 @@
+"""
+Tests of :mod:`rigol_state` against the fake Rigol AWG of :mod:`usb.test_usb`.
+
+.. code-block:: bash
+
+    python -m unittest test_rigol_state
+"""
+import os, sys
+import unittest
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(DIRECTORY))
+
+from awgs.rigol_state import FIELDS, diff_commands, readback_queries, parse_readback, split_state
+from usb.test_usb import FakeRigol
+
+MAX_FREQ = 200e6 # Hz, of the DG4000 series
+DG4000_FIELDS = FIELDS + ['FSKfreq']
+
+STATE = {
+    'freq1': 100e3, 'amplitude1': 0.2, 'offset1': 0.05, 'phase1': 90, 'output1': 1, 'ncycles1': 5, 'gated1': 1,
+    'freq2': 1.5e6, 'amplitude2': 1.0, 'offset2': 0, 'phase2': 0, 'output2': 0, 'ncycles2': 1, 'gated2': 0, 'FSKfreq2': 20e3,
+}
+
+
+def read_back(rigol, fields=DG4000_FIELDS):
+    """ the shadow state read back from the instrument, as by the AWG servers' resync """
+    shadow = {}
+    for (ch, group, query) in readback_queries(fields):
+        shadow.setdefault(ch, {}).update(parse_readback(group, rigol.query(query)))
+    return shadow
+
+
+class TestRigolState(unittest.TestCase):
+    def setUp(self):
+        self.rigol = FakeRigol('DG4202')
+
+    def apply(self, shadow, state):
+        (commands, updates) = diff_commands(shadow, state, MAX_FREQ, DG4000_FIELDS)
+        if commands:
+            self.rigol.write(';'.join(commands))
+        return (commands, updates)
+
+    def test_round_trip(self):
+        (commands, updates) = self.apply({}, STATE)
+        shadow = read_back(self.rigol)
+        # What was read back is what the commands were expected to set
+        for ch in updates:
+            for (k, v) in updates[ch].items():
+                self.assertAlmostEqual(shadow[ch][k], v, places=6)
+        self.assertEqual(shadow[1]['output'], True)
+        self.assertEqual(shadow[1]['gated'], True)
+        self.assertEqual(shadow[1]['ncycles'], 5)
+        self.assertEqual(shadow[2]['FSKfreq'], 20e3)
+        # Nothing needs to be sent again
+        self.assertEqual(diff_commands(shadow, STATE, MAX_FREQ, DG4000_FIELDS)[0], [])
+
+    def test_only_changes_are_sent(self):
+        self.apply({}, STATE)
+        shadow = read_back(self.rigol)
+        (commands, updates) = self.apply(shadow, dict(STATE, amplitude1=0.3, output2=1))
+        self.assertEqual(commands, [":SOUR1:APPL:SIN 100000.000000,0.300000,0.050000,90.000000", ":OUTP2 ON"])
+        self.assertEqual(updates, {1: {'freq': 100e3, 'amplitude': 0.3, 'offset': 0.05, 'phase': 90.0}, 2: {'output': True}})
+        self.assertEqual(self.rigol.channels[1]['amplitude'], 0.3)
+        self.assertEqual(self.rigol.channels[2]['output'], True)
+
+    def test_partial_state(self):
+        # Fields that aren't given are left alone, and missing sine fields are taken from the shadow state
+        self.apply({}, STATE)
+        shadow = read_back(self.rigol)
+        (commands, _) = self.apply(shadow, {'phase2': 45})
+        self.assertEqual(commands, [":SOUR2:APPL:SIN 1500000.000000,1.000000,0.000000,45.000000"])
+        self.assertEqual(read_back(self.rigol)[1], shadow[1])
+
+    def test_unknown_sine(self):
+        with self.assertRaises(ValueError):
+            diff_commands({}, {'freq1': 100e3}, MAX_FREQ)
+
+    def test_coerced(self):
+        # Values are compared as the instrument will be set
+        (commands, updates) = diff_commands({}, dict(STATE, freq1=1e9, ncycles1=2.7), MAX_FREQ, DG4000_FIELDS)
+        self.assertEqual(updates[1]['freq'], MAX_FREQ)
+        self.assertEqual(updates[1]['ncycles'], 2)
+        self.assertIn(":SOUR1:BURS:NCYC 2", commands)
+
+    def test_not_sine(self):
+        self.rigol.channels[1]['function'] = 'SQU'
+        shadow = read_back(self.rigol, FIELDS)
+        for k in ['freq', 'amplitude', 'offset', 'phase']:
+            self.assertNotIn(k, shadow[1])
+        # So the whole sine wave is sent
+        (commands, _) = diff_commands(shadow, {'freq1': 100e3, 'amplitude1': 0.2, 'offset1': 0, 'phase1': 0}, MAX_FREQ)
+        self.assertEqual(commands, [":SOUR1:APPL:SIN 100000.000000,0.200000,0.000000,0.000000"])
+
+    def test_invalid_key(self):
+        for key in ['freq3', 'FSKfreq1', 'volume1']:
+            with self.assertRaises(ValueError):
+                split_state({key: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -398,7 +398,7 @@ class Camera(object):
         return np_image, meta
 
     # -------------------------------------------------------------------------
-    def images(self, roi=None, blocksize=None,):
+    def images(self, roi=None, blocksize=None, out=None):
         """
         Returns all recorded images from the recorder.
 
@@ -410,45 +410,25 @@ class Camera(object):
                           'fifo' mode and special conditions.
         :type blocksize: int
 
+        :param out: Preallocated uint16 array of shape (n, height, width) to
+                    copy the images into. Allocated if None.
+
         :return: images
-        :rtype: list(numpy arrays)
+        :rtype: numpy array of shape (n, height, width)
 
         >>> images()
-        image_list, metadata_list
+        image_array, metadata_list
 
         >>> images(blocksize=8)
-        image_list[:8], metadata_list[:8]
+        image_array[:8], metadata_list[:8]
 
         """
 
-        image_list = []
-        meta_list = []
-
         if blocksize is None:
-
-            for index in range(self.__number_of_images):
-
-                if roi is None:
-                    image = self.rec.copy_image(index, 1, 1,
-                                                (self.__roi['x1'] - self.__roi['x0'] + 1),
-                                                (self.__roi['y1'] - self.__roi['y0'] + 1))
-
-                    np_image = np.asarray(image['image']).reshape((self.__roi['y1']-self.__roi['y0']+1),
-                                                                  (self.__roi['x1']-self.__roi['x0']+1))
-
-                else:
-                    image = self.rec.copy_image(index, roi[0], roi[1], roi[2], roi[3])
-
-                    np_image = np.asarray(image['image']).reshape((roi[3] - roi[1] + 1), (roi[2] - roi[0] + 1))
-
-                meta = {}
-                meta.update({'serial number': image['serial number']})
-                meta.update({'camera image number': image['camera image number']})
-
-                meta_list.append(meta)
-                image_list.append(np_image)
+            number_of_images = self.__number_of_images
 
         else:
+            number_of_images = blocksize
 
             while True:
                 level = self.rec.get_status()['dwProcImgCount']
@@ -456,30 +436,15 @@ class Camera(object):
                 if level >= blocksize:
                     break
 
-            for index in range(blocksize):
-
-                if roi is None:
-                    image = self.rec.copy_image(index, 1, 1,
-                                                (self.__roi['x1'] - self.__roi['x0'] + 1),
-                                                (self.__roi['y1'] - self.__roi['y0'] + 1))
-
-                    np_image = np.asarray(image['image']).reshape((self.__roi['y1']-self.__roi['y0']+1),
-                                                                  (self.__roi['x1']-self.__roi['x0']+1))
-
-                else:
-                    image = self.rec.copy_image(index, roi[0], roi[1], roi[2], roi[3])
-
-                    np_image = np.asarray(image['image']).reshape((roi[3] - roi[1] + 1), (roi[2] - roi[0] + 1))
-
-                meta = {}
-                meta.update({'serial number': image['serial number']})
-                meta.update({'camera image number': image['camera image number']})
+        if roi is None:
+            roi = (1, 1,
+                   (self.__roi['x1'] - self.__roi['x0'] + 1),
+                   (self.__roi['y1'] - self.__roi['y0'] + 1))
 
-                meta_list.append(meta)
-                image_list.append(np_image)
+        image_array, meta_list = self.rec.copy_images(range(number_of_images), roi[0], roi[1], roi[2], roi[3], out=out)
 
         time.sleep(0.001)
-        return image_list, meta_list
+        return image_array, meta_list
 
 
     # -------------------------------------------------------------------------
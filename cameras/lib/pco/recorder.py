@@ -11,6 +11,68 @@ import time
 from datetime import datetime
 import platform
 
+import numpy as np
+
+
+class PCO_RECORDER_COMPRESSION_PARAMETER(C.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("dGainK", C.c_double),
+        ("dDarkNoise_e", C.c_double),
+        ("dDSNU_e", C.c_double),
+        ("dPRNU_pct", C.c_double),
+        ("dLightSourceNoise_pct", C.c_double)]
+
+
+class PCO_METADATA_STRUCT(C.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("wSize", C.c_uint16),
+        ("wVersion", C.c_uint16),
+        ("bIMAGE_COUNTER_BCD", C.c_uint8 * 4),
+        ("bIMAGE_TIME_US_BCD", C.c_uint8 * 3),
+        ("bIMAGE_TIME_SEC_BCD", C.c_uint8),
+        ("bIMAGE_TIME_MIN_BCD", C.c_uint8),
+        ("bIMAGE_TIME_HOUR_BCD", C.c_uint8),
+        ("bIMAGE_TIME_DAY_BCD", C.c_uint8),
+        ("bIMAGE_TIME_MON_BCD", C.c_uint8),
+        ("bIMAGE_TIME_YEAR_BCD", C.c_uint8),
+        ("bIMAGE_TIME_STATUS", C.c_uint8),
+        ("wEXPOSURE_TIME_BASE", C.c_uint16),
+        ("dwEXPOSURE_TIME", C.c_uint32),
+        ("dwFRAMERATE_MILLIHZ", C.c_uint32),
+        ("sSENSOR_TEMPERATURE", C.c_short),
+        ("wIMAGE_SIZE_X", C.c_uint16),
+        ("wIMAGE_SIZE_Y", C.c_uint16),
+        ("bBINNING_X", C.c_uint8),
+        ("bBINNING_Y", C.c_uint8),
+        ("dwSENSOR_READOUT_FREQUENCY", C.c_uint32),
+        ("wSENSOR_CONV_FACTOR", C.c_uint16),
+        ("dwCAMERA_SERIAL_NO", C.c_uint32),
+        ("wCAMERA_TYPE", C.c_uint16),
+        ("bBIT_RESOLUTION", C.c_uint8),
+        ("bSYNC_STATUS", C.c_uint8),
+        ("wDARK_OFFSET", C.c_uint16),
+        ("bTRIGGER_MODE", C.c_uint8),
+        ("bDOUBLE_IMAGE_MODE", C.c_uint8),
+        ("bCAMERA_SYNC_MODE", C.c_uint8),
+        ("bIMAGE_TYPE", C.c_uint8),
+        ("wCOLOR_PATTERN", C.c_uint16)]
+
+
+class PCO_TIMESTAMP_STRUCT(C.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("wSize", C.c_uint16),
+        ("dwImgCounter", C.c_uint32),
+        ("wYear", C.c_uint16),
+        ("wMonth", C.c_uint16),
+        ("wDay", C.c_uint16),
+        ("wHour", C.c_uint16),
+        ("wMinute", C.c_uint16),
+        ("wSecond", C.c_uint16),
+        ("dwMicroSeconds", C.c_uint32)]
+
 
 class recorder:
 
@@ -449,15 +511,6 @@ class recorder:
         """
         """
 
-        class PCO_RECORDER_COMPRESSION_PARAMETER(C.Structure):
-            _pack_ = 1
-            _fields_ = [
-                ("dGainK", C.c_double),
-                ("dDarkNoise_e", C.c_double),
-                ("dDSNU_e", C.c_double),
-                ("dPRNU_pct", C.c_double),
-                ("dLightSourceNoise_pct", C.c_double)]
-
         self.PCO_Recorder.PCO_RecorderSetCompressionParams.argtypes = [C.c_void_p,
                                                                        C.c_void_p,
                                                                        C.POINTER(PCO_RECORDER_COMPRESSION_PARAMETER)]
@@ -550,54 +603,6 @@ class recorder:
         """
         """
 
-        class PCO_METADATA_STRUCT(C.Structure):
-            _pack_ = 1
-            _fields_ = [
-                ("wSize", C.c_uint16),
-                ("wVersion", C.c_uint16),
-                ("bIMAGE_COUNTER_BCD", C.c_uint8 * 4),
-                ("bIMAGE_TIME_US_BCD", C.c_uint8 * 3),
-                ("bIMAGE_TIME_SEC_BCD", C.c_uint8),
-                ("bIMAGE_TIME_MIN_BCD", C.c_uint8),
-                ("bIMAGE_TIME_HOUR_BCD", C.c_uint8),
-                ("bIMAGE_TIME_DAY_BCD", C.c_uint8),
-                ("bIMAGE_TIME_MON_BCD", C.c_uint8),
-                ("bIMAGE_TIME_YEAR_BCD", C.c_uint8),
-                ("bIMAGE_TIME_STATUS", C.c_uint8),
-                ("wEXPOSURE_TIME_BASE", C.c_uint16),
-                ("dwEXPOSURE_TIME", C.c_uint32),
-                ("dwFRAMERATE_MILLIHZ", C.c_uint32),
-                ("sSENSOR_TEMPERATURE", C.c_short),
-                ("wIMAGE_SIZE_X", C.c_uint16),
-                ("wIMAGE_SIZE_Y", C.c_uint16),
-                ("bBINNING_X", C.c_uint8),
-                ("bBINNING_Y", C.c_uint8),
-                ("dwSENSOR_READOUT_FREQUENCY", C.c_uint32),
-                ("wSENSOR_CONV_FACTOR", C.c_uint16),
-                ("dwCAMERA_SERIAL_NO", C.c_uint32),
-                ("wCAMERA_TYPE", C.c_uint16),
-                ("bBIT_RESOLUTION", C.c_uint8),
-                ("bSYNC_STATUS", C.c_uint8),
-                ("wDARK_OFFSET", C.c_uint16),
-                ("bTRIGGER_MODE", C.c_uint8),
-                ("bDOUBLE_IMAGE_MODE", C.c_uint8),
-                ("bCAMERA_SYNC_MODE", C.c_uint8),
-                ("bIMAGE_TYPE", C.c_uint8),
-                ("wCOLOR_PATTERN", C.c_uint16)]
-
-        class PCO_TIMESTAMP_STRUCT(C.Structure):
-            _pack_ = 1
-            _fields_ = [
-                ("wSize", C.c_uint16),
-                ("dwImgCounter", C.c_uint32),
-                ("wYear", C.c_uint16),
-                ("wMonth", C.c_uint16),
-                ("wDay", C.c_uint16),
-                ("wHour", C.c_uint16),
-                ("wMinute", C.c_uint16),
-                ("wSecond", C.c_uint16),
-                ("dwMicroSeconds", C.c_uint32)]
-
         self.PCO_Recorder.PCO_RecorderCopyImage.argtypes = [C.c_void_p,
                                                             C.c_void_p,
                                                             C.c_uint32,
@@ -656,6 +661,69 @@ class recorder:
             raise self.exception(sys._getframe().f_code.co_name, error)
         return ret
 
+    # -------------------------------------------------------------------------
+    # 2.14 PCO_RecorderCopyImage, for several images at once
+    # -------------------------------------------------------------------------
+    def copy_images(self, indices, x0, y0, x1, y1, out=None):
+        """
+        Copies several images straight into one (n, height, width) uint16
+        array, without an intermediate ctypes buffer for each image.
+
+        :param indices: Recorder indices of the images to copy
+        :param out: Preallocated C-contiguous uint16 array of shape
+                    (len(indices), y1-y0+1, x1-x0+1). Allocated if None.
+
+        :return: the images, and a list of dicts with the serial number and
+                 camera image number of each image
+        :rtype: numpy array, list(dict)
+        """
+        shape = (len(indices), (y1-y0)+1, (x1-x0)+1)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint16)
+        elif out.shape != shape or out.dtype != np.uint16 or not out.flags['C_CONTIGUOUS']:
+            raise ValueError('out must be a C-contiguous uint16 array of shape {}'.format(shape))
+
+        self.PCO_Recorder.PCO_RecorderCopyImage.argtypes = [C.c_void_p,
+                                                            C.c_void_p,
+                                                            C.c_uint32,
+                                                            C.c_uint16,
+                                                            C.c_uint16,
+                                                            C.c_uint16,
+                                                            C.c_uint16,
+                                                            C.POINTER(C.c_uint16),
+                                                            C.POINTER(C.c_uint32),
+                                                            C.POINTER(PCO_METADATA_STRUCT),
+                                                            C.POINTER(PCO_TIMESTAMP_STRUCT)]
+
+        dwImgNumber = C.c_uint32()
+        metadata = PCO_METADATA_STRUCT()
+        metadata.wSize = C.sizeof(PCO_METADATA_STRUCT)
+        timestamp = PCO_TIMESTAMP_STRUCT()
+        timestamp.wSize = C.sizeof(PCO_TIMESTAMP_STRUCT)
+        frame_bytes = out[0].nbytes if len(out) else 0
+        p_out = out.ctypes.data
+
+        meta_list = []
+        for (i, index) in enumerate(indices):
+            p_wImgBuf = C.cast(p_out + i*frame_bytes, C.POINTER(C.c_uint16))
+            error = self.PCO_Recorder.PCO_RecorderCopyImage(self.recorder_handle,
+                                                            self.camera_handle,
+                                                            index,
+                                                            x0,
+                                                            y0,
+                                                            x1,
+                                                            y1,
+                                                            p_wImgBuf,
+                                                            dwImgNumber,
+                                                            metadata,
+                                                            timestamp)
+            if error:
+                raise self.exception(sys._getframe().f_code.co_name, error)
+            meta_list.append({'serial number': metadata.dwCAMERA_SERIAL_NO,
+                              'camera image number': timestamp.dwImgCounter})
+
+        return out, meta_list
+
     # -------------------------------------------------------------------------
     #
     # -------------------------------------------------------------------------
@@ -713,54 +781,6 @@ class recorder:
         """
         """
 
-        class PCO_METADATA_STRUCT(C.Structure):
-            _pack_ = 1
-            _fields_ = [
-                ("wSize", C.c_uint16),
-                ("wVersion", C.c_uint16),
-                ("bIMAGE_COUNTER_BCD", C.c_uint8 * 4),
-                ("bIMAGE_TIME_US_BCD", C.c_uint8 * 3),
-                ("bIMAGE_TIME_SEC_BCD", C.c_uint8),
-                ("bIMAGE_TIME_MIN_BCD", C.c_uint8),
-                ("bIMAGE_TIME_HOUR_BCD", C.c_uint8),
-                ("bIMAGE_TIME_DAY_BCD", C.c_uint8),
-                ("bIMAGE_TIME_MON_BCD", C.c_uint8),
-                ("bIMAGE_TIME_YEAR_BCD", C.c_uint8),
-                ("bIMAGE_TIME_STATUS", C.c_uint8),
-                ("wEXPOSURE_TIME_BASE", C.c_uint16),
-                ("dwEXPOSURE_TIME", C.c_uint32),
-                ("dwFRAMERATE_MILLIHZ", C.c_uint32),
-                ("sSENSOR_TEMPERATURE", C.c_short),
-                ("wIMAGE_SIZE_X", C.c_uint16),
-                ("wIMAGE_SIZE_Y", C.c_uint16),
-                ("bBINNING_X", C.c_uint8),
-                ("bBINNING_Y", C.c_uint8),
-                ("dwSENSOR_READOUT_FREQUENCY", C.c_uint32),
-                ("wSENSOR_CONV_FACTOR", C.c_uint16),
-                ("dwCAMERA_SERIAL_NO", C.c_uint32),
-                ("wCAMERA_TYPE", C.c_uint16),
-                ("bBIT_RESOLUTION", C.c_uint8),
-                ("bSYNC_STATUS", C.c_uint8),
-                ("wDARK_OFFSET", C.c_uint16),
-                ("bTRIGGER_MODE", C.c_uint8),
-                ("bDOUBLE_IMAGE_MODE", C.c_uint8),
-                ("bCAMERA_SYNC_MODE", C.c_uint8),
-                ("bIMAGE_TYPE", C.c_uint8),
-                ("wCOLOR_PATTERN", C.c_uint16)]
-
-        class PCO_TIMESTAMP_STRUCT(C.Structure):
-            _pack_ = 1
-            _fields_ = [
-                ("wSize", C.c_uint16),
-                ("dwImgCounter", C.c_uint32),
-                ("wYear", C.c_uint16),
-                ("wMonth", C.c_uint16),
-                ("wDay", C.c_uint16),
-                ("wHour", C.c_uint16),
-                ("wMinute", C.c_uint16),
-                ("wSecond", C.c_uint16),
-                ("dwMicroSeconds", C.c_uint32)]
-
         self.PCO_Recorder.PCO_RecorderCopyImage.argtypes = [C.c_void_p,
                                                             C.c_void_p,
                                                             C.c_uint32,
@@ -19,9 +19,10 @@ r"""
     ### END NODE INFO
 """
 import os, sys
-from labrad.server import LabradServer, setting
-from twisted.internet import reactor
-from twisted.internet.error import AlreadyCalled, AlreadyCancelled
+import threading
+from labrad.server import LabradServer, setting, Signal
+from twisted.internet.defer import Deferred, inlineCallbacks
+from twisted.internet.threads import deferToThread
 from datetime import datetime
 
 import json
@@ -57,7 +58,8 @@ PCO_RECORD_UNINIT = 0
 PCO_RECORD_READY = 1
 PCO_RECORD_RUNNING = 2
 
-POLL_TIME = 1.0 # seconds
+WAIT_TIME = 0.01 # seconds between checks of the recorder's image count while waiting for images
+IMAGES_ACQUIRED_ID = 314180
 
 class PcoConfigError(Exception):
     """
@@ -88,14 +90,15 @@ class PcoServer(HardwareInterfaceServer):
     name = '%LABRADNODE%_pco'
     cam_info = {}
     callbacks = {}
+    cancel_events = {}
+    workers = {}
+
+    images_acquired = Signal(IMAGES_ACQUIRED_ID, 'signal: images acquired', '(si)')
 
     path_base = "K:/data/{}/Pixelfly/"
     pattern = r"pixelfly_(\d+).npz"
     fname_base = "pixelfly_{}.npz"
 
-    n_images = 0
-    saved = False
-
     @staticmethod
     def get_camera_identifier(cam):
         """
@@ -543,9 +546,9 @@ class PcoServer(HardwareInterfaceServer):
         return out
 
     # @setting(16, path='s', n_images='i', roi='*i', returns='s')
-    def save_images(self, c, path, n_images, roi=None):
+    def save_images(self, c, path, n_images, roi=None, images=None):
         """
-        save_images(self, c, path, n_images, roi)
+        save_images(self, c, path, n_images, roi=None, images=None)
 
         Saves the latest :code:`n_image` images if available. If :meth:`record` has not been run, throws a :class:`PcoRecordError`. If fewer than :code:`n_image` have been acquired, throws a :class:`PcoSaveError`.
 
@@ -556,32 +559,30 @@ class PcoServer(HardwareInterfaceServer):
             path (str): Path to saved images. The extension is automatically changed to ".npz"
             n_images (int): Number of images to save. An image taken with interframing enabled will only count as one here, but will be saved as two images, one for each frame.
             roi ((int), optional): A 4-tuple of integers (xmin, ymin, xmax, ymax) representing the bounds of the image to be saved. Defaults to None, in which case the whole image is saved.
+            images (numpy array, optional): The images to save, of shape (n_images, y dimension, x dimension), if already retrieved from the camera. Defaults to None, in which case they are retrieved with :meth:`get_images`.
 
         Returns:
-            str: Path to saved image
+            Deferred: fires with the path to the saved image once it has been written in a worker thread
         """
         if roi is not None:
             if len(roi) != 4:
                 roi = None
             else:
                 roi = self.check_roi(c, *roi)
-        images = self.get_images(c, roi)
+        if images is None:
+            images = self.get_images(c, roi)
         
         if len(images) < n_images:
             raise(PcoSaveError("Fewer than {} images were recorded; only got {} images").format(n_images, len(images)))
         if len(images) > n_images:
             images = images[-n_images:]
 
+        images = np.asarray(images)
         interframing_enabled = self.get_interframing_enabled(c)
         if interframing_enabled:
-            new_images = []
-            for image in images:
-                frame_height = image.shape[0] // 2
-                new_images.append(image[:frame_height, :])
-                new_images.append(image[frame_height:, :])
-            images = new_images
-        
-        images = np.array(images)
+            # Split each image into its two frames, in order
+            (n, height, width) = images.shape
+            images = images[:, :2*(height//2), :].reshape(2*n, height//2, width)
 
         config = self._get_config(c)
         metadata = {
@@ -596,9 +597,13 @@ class PcoServer(HardwareInterfaceServer):
             'timestamp': time.strftime("%H:%M:%S", time.localtime())
         }
 
+        path = os.path.splitext(path)[0]+".npz"
+        return deferToThread(self.write_images, path, images, metadata)
+
+    @staticmethod
+    def write_images(path, images, metadata):
         # Define a temporary path to avoid conflicts when writing file
 		# Otherwise, fitting program autoloads the file before writing is complete
-        path = os.path.splitext(path)[0]+".npz"
         path_temp = path + "_temp"
         with open(path_temp, 'wb') as f:
             np.savez_compressed(f, data=images, meta=metadata)
@@ -639,30 +644,25 @@ class PcoServer(HardwareInterfaceServer):
         """
         stop_record(self, c)
 
-        Stop recording on the current camera.
+        Stop recording on the current camera, once any worker thread from :meth:`record_and_save` has stopped waiting for images, or finished copying them.
 
         Args:
             c: Labrad context
         """
         
-        self.call_if_available('stop', c)
+        # Stop any wait for images from record_and_save
+        if c['address'] in self.cancel_events:
+            self.cancel_events[c['address']].set()
+        if c['address'] in self.workers:
+            yield self.workers[c['address']]
 
-        # Try to cancel poll_for_images call
-        try:
-            self.callbacks[c['address']].cancel()
+        self.call_if_available('stop', c)
 
+        if c['address'] in self.callbacks:
             still_running = self.is_running(c) # sets self.cam_info[c['address']]['record_status']
             if still_running:
                 raise(PcoRecordError("Problem stopping record."))
-        except KeyError: # self.record_and_save never called
-            pass
-        except AlreadyCalled: # Callback already finished
-            pass
-        except AlreadyCancelled: # Callback already cancelled
-            pass
-    
 
-        
     @setting(20, path='s', n_images='i', mode='s', roi='*i')
     def record_and_save(self, c, path, n_images=1, mode='sequence non blocking', roi=None, timeout=None):
         """
@@ -678,31 +678,70 @@ class PcoServer(HardwareInterfaceServer):
             roi ((int), optional): A 4-tuple of integers (xmin, ymin, xmax, ymax) representing the bounds of the image to be saved. Defaults to None, in which case the whole image is saved.
             timeout (float, optional): The time, in seconds, before acquisition is cancelled and an error is thrown. Defaults to None.           
         """
-        self.n_images = 0
-        self.saved = False
-
         if not self._is_running(c):
             self.start_record(c, n_images=n_images, mode=mode)
-            self.callbacks[c['address']] = reactor.callLater(POLL_TIME, self.poll_for_images, c, path, n_images, roi, timeout, datetime.now())
-    
-    def poll_for_images(self, c, path, n_images, roi, timeout, start_time):
-        if self.saved:
+            if roi is not None:
+                roi = self.check_roi(c, *roi) if len(roi) == 4 else None
+            cancel = threading.Event()
+            self.cancel_events[c['address']] = cancel
+            cam = self.get_interface(c)
+            d = deferToThread(self.wait_for_images, cam, n_images, roi, timeout, cancel)
+            self.callbacks[c['address']] = d
+            worker = self.workers[c['address']] = Deferred()
+            d.addBoth(self.worker_finished, worker)
+            d.addCallback(self.images_ready, c, path, n_images, roi)
+            d.addErrback(self.record_failed, c)
+
+    @staticmethod
+    def wait_for_images(cam, n_images, roi, timeout, cancel):
+        """
+        wait_for_images(cam, n_images, roi, timeout, cancel)
+
+        Waits for a camera's recorder to have :code:`n_images` images, checking every :data:`WAIT_TIME`, then copies them all into one array. Blocks, so should be run in a worker thread.
+
+        Args:
+            cam (pco.Camera()): The camera
+            n_images (int): The number of images to wait for
+            roi ((int)): A 4-tuple of integers (xmin, ymin, xmax, ymax), or None for the whole image
+            timeout (float): The time, in seconds, before giving up, or None to wait until cancelled
+            cancel (threading.Event): Set to stop waiting
+
+        Returns:
+            numpy array: The images, of shape (n_images, y dimension, x dimension), or None if cancelled
+        """
+        start_time = time.time()
+        while cam.rec.get_status()['dwProcImgCount'] < n_images:
+            if timeout is not None and time.time() - start_time > timeout:
+                raise(PcoRecordError("Timed out after {} seconds".format(timeout)))
+            if cancel.wait(WAIT_TIME):
+                return None
+        (images, _) = cam.images(roi=roi)
+        return images[-n_images:]
+
+    @staticmethod
+    def worker_finished(result, worker):
+        # Fires the Deferred that stop_record waits on, which doesn't wait for the images to be saved
+        worker.callback(None)
+        return result
+
+    @inlineCallbacks
+    def images_ready(self, images, c, path, n_images, roi):
+        if images is None:
+            print("Recording cancelled")
             return
-        n_old = self.n_images
-        self.n_images = self.available_images(c)
-        if self.n_images != n_old:
-            print("Polling for images, have {}".format(self.n_images))
-        timed_out = timeout is not None and (datetime.now() - start_time).TotalSeconds > timeout
-        if self.available_images(c) >= n_images:
-            print("Saving images!")
-            self.saved = True
-            self.save_images(c, path, n_images, roi=roi)
-            self.stop_record(c)
-        elif not timed_out:
-            reactor.callLater(POLL_TIME, self.poll_for_images, c, path, n_images, roi, timeout, start_time)
-        else:
-            raise(PcoRecordError("record_and_save for {} timed out after {} seconds".format(c['address'], timeout)))
-   
+        print("Got {} images".format(len(images)))
+        self.images_acquired((c['address'], n_images))
+        yield self.stop_record(c)
+        path = yield self.save_images(c, path, n_images, roi=roi, images=images)
+        print("Saved images to {}".format(path))
+
+    def record_failed(self, failure, c):
+        warn("record_and_save for {} failed: {}".format(c['address'], failure.getErrorMessage()))
+        try:
+            self.call_if_available('stop', c)
+        except Exception as e:
+            warn(e)
+
     @setting(21, returns='s')
     def get_fname(self, c):
         """get_fname(self, c)
@@ -1,3 +1,4 @@
+import os
 import labrad
 import time
 import numpy as np
@@ -14,12 +15,14 @@ server.stop_record()
 # print(server.available_images())
 server.set_interframing_enabled(True)
 server.set_trigger_mode('auto sequence')
-server.start_record(2)
+# Saves the images from a worker thread once they have been recorded
+server.record_and_save(path, 2)
 
-time.sleep(2)
-print(server.available_images())
-server.save_images(path, 2)
-print(server.available_images())
+start_time = time.time()
+while not os.path.exists(path):
+    if time.time() - start_time > 10:
+        raise Exception("Images were not saved")
+    time.sleep(0.1)
 
 data = np.load(path, allow_pickle=True)
 print(data['data'])
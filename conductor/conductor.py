@@ -84,12 +84,13 @@ from twisted.internet.defer import inlineCallbacks
 from twisted.internet.defer import returnValue
 from twisted.internet.threads import deferToThread
 
-from lib.helpers import import_parameter
 from lib.helpers import remaining_points
 from lib.exceptions import ParameterAlreadyRegistered
 from lib.exceptions import ParameterNotImported
 from lib.exceptions import ParameterNotRegistered
 from lib.exceptions import ParameterNotInitialized
+from lib.journal import QueueJournal
+from lib.registry import ParameterRegistry
 
 from clients import variables_config
 
@@ -198,6 +199,18 @@ class ConductorServer(LabradServer):
         self.logging = False
 
         self.load_config(config_path)
+        self.parameter_registry = ParameterRegistry()
+        try:
+            self.journal = QueueJournal(getattr(self, "journal_path", None))
+        except Exception as e:
+            print("Could not open queue journal, so the queue won't be recoverable: ", e)
+            self.journal = QueueJournal()
+        if self.journal.recovered:
+            print(
+                "{} experiments can be recovered from the queue journal with resume_queue, or discarded with resume_queue(True)".format(
+                    len(self.journal.recovered)
+                )
+            )
         LabradServer.__init__(self)
 
         # added KM 09/10/2017
@@ -239,11 +252,19 @@ class ConductorServer(LabradServer):
 
         Registers default parameters and loads sequencer variables after connected to LabRAD
         """
-        callLater(
-            0.1, self.register_parameters, None, json.dumps(self.default_parameters)
-        )
+        callLater(0.1, self.register_default_parameters)
         callLater(0.5, self.load_variables)
 
+    @inlineCallbacks
+    def register_default_parameters(self):
+        """
+        register_default_parameters(self)
+
+        Registers the default parameters defined in the ``config.json`` file, then prints how long each took to import.
+        """
+        yield self.register_parameters(None, json.dumps(self.default_parameters))
+        print(self.parameter_registry.report())
+
     # Re-initialize parameters
     # Added KM 03/18/18
     @setting(18)
@@ -343,7 +364,7 @@ class ConductorServer(LabradServer):
 
         Populate ``self.parameters`` with specified parameter.
 
-        Look in ``./devices/`` for specified parameter.
+        Look in ``./devices/`` for specified parameter, using ``self.parameter_registry``.
 
         If no suitable parameter is found and generic_parameter is ``True``, create generic parameter for holding values.
 
@@ -365,7 +386,9 @@ class ConductorServer(LabradServer):
         if self.parameters[device_name].get(parameter_name):
             raise ParameterAlreadyRegistered(device_name, parameter_name)
         else:
-            Parameter = import_parameter(device_name, parameter_name, generic_parameter)
+            Parameter = self.parameter_registry.get(
+                device_name, parameter_name, generic_parameter
+            )
             if not Parameter:
                 raise ParameterNotImported(device_name, parameter_name)
             else:
@@ -628,15 +651,18 @@ class ConductorServer(LabradServer):
                 * ``parameter_values`` (Dict, optional): {name: value}.
                 * ``append data`` (bool, optional): Save data to previous file?
                 * ``loop`` (bool, optional): Inserts experiment back into begining of queue.
+                * ``skip_points`` (int, optional): Number of points at the start of the experiment not to run, e.g. points already taken before the conductor was restarted.
             run_next (bool, optional): Add the experiment at the beginning of the queue. Defaults to False.
 
         Returns:
             int: Number of experiments in the queue
         """
+        experiment = json.loads(experiment)
         if run_next:
-            self.experiment_queue.appendleft(json.loads(experiment))
+            self.experiment_queue.appendleft(experiment)
         else:
-            self.experiment_queue.append(json.loads(experiment))
+            self.experiment_queue.append(experiment)
+        self.journal.append(experiment, left=run_next)
         return len(self.experiment_queue)
 
     @setting(9, experiment_queue="s", returns="i")
@@ -654,10 +680,33 @@ class ConductorServer(LabradServer):
             int: Number of experiments in the queue
         """
         self.experiment_queue = deque([])
+        self.journal.clear()
         if experiment_queue:
             experiment_queue = json.loads(experiment_queue)
             for experiment in experiment_queue:
                 self.experiment_queue.append(experiment)
+                self.journal.append(experiment)
+        return len(self.experiment_queue)
+
+    @setting(20, discard="b", returns="i")
+    def resume_queue(self, c, discard=False):
+        """
+        resume_queue(self, c, discard=False)
+
+        Puts the experiments that were running or queued when the conductor was last stopped, as recovered from the queue journal, back at the beginning of the queue. Points of the experiment that was running are skipped if they were already taken. See :mod:`conductor.lib.journal`.
+
+        Args:
+            c: LabRAD context
+            discard (bool, optional): Forget the recovered experiments instead of queueing them. Defaults to False.
+
+        Returns:
+            int: Number of experiments in the queue
+        """
+        if not discard:
+            for experiment in reversed(self.journal.recovered):
+                self.experiment_queue.appendleft(experiment)
+                self.journal.append(experiment, left=True)
+        self.journal.forget_recovered()
         return len(self.experiment_queue)
 
     @setting(10, returns="b")
@@ -691,6 +740,7 @@ class ConductorServer(LabradServer):
                     parameter.value = []
         self.data = {}
         self.data_path = None
+        self.journal.stop()
         self.experiment_stopped(True)
         return True
 
@@ -760,6 +810,23 @@ class ConductorServer(LabradServer):
         """
         return json.dumps(self.data)
 
+    @setting(19, returns="s")
+    def get_experiment_name(self, c):
+        """
+        get_experiment_name(self, c)
+
+        Returns the name of the current experiment.
+
+        Args:
+            c: LabRAD context
+
+        Returns:
+            str: The name of the current experiment, or an empty string if no experiment is running
+        """
+        if self.data_path is None:
+            return ""
+        return getattr(self, "experiment_name", "")
+
     @inlineCallbacks
     def advance_experiment(self):
         """
@@ -772,6 +839,7 @@ class ConductorServer(LabradServer):
             self.experiment_stopped(True)
             # get next experiment from queue and keep a copy
             experiment = self.experiment_queue.popleft()
+            self.journal.popleft()
             experiment_copy = deepcopy(experiment)
 
             if "name" in experiment and "default" not in experiment["name"]:
@@ -785,6 +853,20 @@ class ConductorServer(LabradServer):
             parameter_values = experiment.get("parameter_values")
             if parameter_values:
                 yield self.set_parameter_values(None, json.dumps(parameter_values))
+
+            # skip points that were already taken, as parameters are advanced in advance_parameters
+            skip_points = experiment.get("skip_points", 0)
+            if skip_points:
+                if skip_points > remaining_points(self.parameters):
+                    print("all points of {} were already taken".format(experiment.get("name")))
+                    advanced = yield self.advance_experiment()
+                    returnValue(advanced)
+                for device_name, device_parameters in self.parameters.items():
+                    for parameter_name, parameter in device_parameters.items():
+                        if parameter.priority:
+                            for i in range(skip_points):
+                                parameter.advance()
+            self.journal.start(experiment)
             
             # signal that experiment has started again
             self.experiment_started(True)
@@ -792,8 +874,10 @@ class ConductorServer(LabradServer):
             if experiment.get("loop"):
                 # now we require appending data
                 experiment_copy["append_data"] = True
+                experiment_copy.pop("skip_points", None)
                 # add experiment to begining of queue
                 self.experiment_queue.appendleft(experiment_copy)
+                self.journal.append(experiment_copy, left=True)
 
             if not experiment.get("append_data"):
                 self.data = {}
@@ -821,6 +905,7 @@ class ConductorServer(LabradServer):
             # signal that experiment has stopped
             self.experiment_stopped(True)
             self.data_path = None
+            self.journal.stop()
             returnValue(False)
 
     @inlineCallbacks
@@ -831,6 +916,8 @@ class ConductorServer(LabradServer):
         Get new parameter values then send to devices. Calls :meth:`advance_experiment`.
         """
         advanced = False
+        # the point that was running has been taken
+        self.journal.done(self.shot)
         # check if we need to load next experiment
         pts = remaining_points(self.parameters)
         if not pts:
@@ -970,9 +1057,10 @@ class ConductorServer(LabradServer):
         """
         stopServer(self)
 
-        Called when the server is stopped. Saves the current parameters before closing.
+        Called when the server is stopped. Saves the current parameters before closing. The queue is already saved in the queue journal.
         """
         yield self._advance_logging(True)
+        self.journal.close()
 
         parameters_filename = self.parameters_directory + "current_parameters.json"
         if os.path.isfile(parameters_filename):
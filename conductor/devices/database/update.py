@@ -15,6 +15,8 @@ class Update(ConductorParameter):
     Update(ConductorParameter)
 
     Conductor parameter for saving the list of conductor parameters in MongoDB each shot
+
+    The shot number and experiment name are stored alongside the parameters, so shots can be found with the database server's indexed :meth:`database.database_server.DatabaseServer.query`.
     """
 
     priority = 5
@@ -44,11 +46,14 @@ class Update(ConductorParameter):
             synth_param = parameters_dict.pop("synthesizer", None)
             shot = yield self.logging.get_shot()
             if shot != None and shot != -1:
+                experiment = yield self.conductor.get_experiment_name()
                 now = datetime.now(pytz.timezone('US/Mountain'))
                 shot_id = now.strftime("%Y_%m_%d_{}").format(shot)
                 db_entry = {
                     "parameters": parameters_dict,
-                    "time": now
+                    "time": now,
+                    "shot": shot,
+                    "experiment": experiment
                 }
                 if db_param["update"] != None and len(db_param["update"]) > 0:
                     db_entry.update(db_param["update"])
@@ -1,3 +1,4 @@
+import json
 import sys
 import numpy as np
 from time import sleep
@@ -34,6 +35,8 @@ class Sin(ConductorParameter):
     """
 
     priority = 3
+    sin_keys = ["freq{}", "amplitude{}", "offset{}", "phase{}", "output{}"]
+    keys = ["ncycles{}", "FSKfreq{}"]
 
     def __init__(self, config={}):
         super(Sin, self).__init__(config)
@@ -76,32 +79,19 @@ class Sin(ConductorParameter):
     def update(self):
         if self.value:
             try:
-                keys = ["freq1", "amplitude1", "offset1", "phase1", "output1"]
-                if all(k in self.value for k in keys):
-                    yield self.cxn.polarkrb_dg4000.set_sin(
-                        1,
-                        float(self.value["freq1"]),
-                        float(self.value["amplitude1"]),
-                        float(self.value["offset1"]),
-                        float(self.value["phase1"]),
+                state = {}
+                for ch in [1, 2]:
+                    sin_keys = [k.format(ch) for k in self.sin_keys]
+                    if all(k in self.value for k in sin_keys):
+                        state.update({k: self.value[k] for k in sin_keys})
+                    state.update(
+                        {
+                            k.format(ch): self.value[k.format(ch)]
+                            for k in self.keys
+                            if k.format(ch) in self.value
+                        }
                     )
-                    yield self.cxn.polarkrb_dg4000.set_output(1, bool(self.value["output1"]))
-                if "ncycles1" in self.value:
-                    yield self.cxn.polarkrb_dg4000.set_ncycles(1, int(self.value["ncycles1"]))
-                if "FSKfreq1" in self.value:
-                    yield self.cxn.polarkrb_dg4000.set_fskfreq(1, float(self.value["FSKfreq1"]))
-                keys = ["freq2", "amplitude2", "offset2", "phase2", "output2"]
-                if all(k in self.value for k in keys):
-                    yield self.cxn.polarkrb_dg4000.set_sin(
-                        2,
-                        float(self.value["freq2"]),
-                        float(self.value["amplitude2"]),
-                        float(self.value["offset2"]),
-                        float(self.value["phase2"]),
-                    )
-                    yield self.cxn.polarkrb_dg4000.set_output(2, bool(self.value["output2"]))
-                if "ncycles2" in self.value:
-                    yield self.cxn.polarkrb_dg4000.set_ncycles(2, int(self.value["ncycles2"]))
+                yield self.cxn.polarkrb_dg4000.apply_state(json.dumps(state))
                 # yield self.cxn.polarkrb_dg4000.set_ncycles(1,int(self.value['ncycles1']))
                 # yield self.cxn.polarkrb_dg4000.set_ncycles(2,int(self.value['ncycles2']))
                 # yield self.cxn.polarkrb_dg4000.set_gated(1,bool(self.value['gated1']))
@@ -1,3 +1,4 @@
+import json
 import sys
 sys.path.append('../')
 from generic_device.generic_parameter import GenericParameter
@@ -38,6 +39,7 @@ class Sin(ConductorParameter):
             }
     """
     priority = 3
+    keys = ['freq1', 'amplitude1', 'offset1', 'phase1', 'output1', 'freq2', 'amplitude2', 'offset2', 'phase2', 'output2']
 
     def __init__(self, config={}):
         super(Sin, self).__init__(config)
@@ -52,12 +54,8 @@ class Sin(ConductorParameter):
             yield self.cxn.imaging_dg800.set_impedance(1, 50)
             yield self.cxn.imaging_dg800.set_impedance(2, 50)
 
-            yield self.cxn.imaging_dg800.set_sin(1,
-                self.value['freq1'], self.value['amplitude1'], self.value['offset1'], self.value['phase1'])
-            yield self.cxn.imaging_dg800.set_sin(2,
-                self.value['freq2'], self.value['amplitude2'], self.value['offset2'], self.value['phase2'])
-            yield self.cxn.imaging_dg800.set_output(1,bool(self.value['output1']))
-            yield self.cxn.imaging_dg800.set_output(2,bool(self.value['output2']))
+            # Read back the AWG's state, so that update only sends what changes
+            yield self.cxn.imaging_dg800.apply_state(self.get_state(), True)
             # yield self.cxn.imaging_dg800.set_ncycles(1,int(self.value['ncycles1']))
             # yield self.cxn.imaging_dg800.set_ncycles(2,int(self.value['ncycles2']))
             # yield self.cxn.imaging_dg800.set_gated(1,bool(self.value['gated1']))
@@ -69,15 +67,13 @@ class Sin(ConductorParameter):
     def update(self):
         if self.value:
             try:
-                yield self.cxn.imaging_dg800.set_sin(1,
-                    self.value['freq1'], self.value['amplitude1'], self.value['offset1'], self.value['phase1'])
-                yield self.cxn.imaging_dg800.set_sin(2,
-                    self.value['freq2'], self.value['amplitude2'], self.value['offset2'], self.value['phase2'])
-                yield self.cxn.imaging_dg800.set_output(1,bool(self.value['output1']))
-                yield self.cxn.imaging_dg800.set_output(2,bool(self.value['output2']))
+                yield self.cxn.imaging_dg800.apply_state(self.get_state())
                 # yield self.cxn.imaging_dg800.set_ncycles(1,int(self.value['ncycles1']))
                 # yield self.cxn.imaging_dg800.set_ncycles(2,int(self.value['ncycles2']))
                 # yield self.cxn.imaging_dg800.set_gated(1,bool(self.value['gated1']))
                 # yield self.cxn.imaging_dg800.set_gated(2,bool(self.value['gated2']))
             except Exception as e:
                 print(e)
+
+    def get_state(self):
+        return json.dumps({k: self.value[k] for k in self.keys})
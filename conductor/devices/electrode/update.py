@@ -2,7 +2,6 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 import json
-import requests
 
 from twisted.internet.defer import inlineCallbacks, returnValue
 from labrad.wrappers import connectAsync
@@ -20,6 +19,8 @@ from calibrations import ZEROS
 sys.path.append(LABRAD_FOLDER + 'electrode/clients/lib/forms/')
 from gui_defaults_helpers import *
 
+PRESETS_CHANGED_ID = 101013
+
 class Update(ConductorParameter):
     """
     Update(ConductorParameter)
@@ -28,6 +29,8 @@ class Update(ConductorParameter):
 
     Only supports setting existing presets by normal modes, but normal modes can be calculated from other values using the functions in `gui_defaults_helpers.py <https://github.com/krbjila/labrad_tools/blob/master/electrode/clients/lib/forms/gui_defaults_helpers.py>`_. The field is not updated and an error message is shown if the normal modes are out of range or aren't defined correctly.
 
+    Presets can also be set by optimizing for a target field with the ``optimize`` key, which is solved by :meth:`electrode.electrode.ElectrodeServer.optimize`. The presets are fetched from the electrode server once and kept until the server's ``presets_changed`` signal fires.
+
     Example config:
 
     .. code-block:: json
@@ -60,14 +63,30 @@ class Update(ConductorParameter):
     def initialize(self):
         self.cxn = yield connectAsync()
         self.server = yield self.cxn.electrode
+        self.presets = None
+        yield self.server.signal__presets_changed(PRESETS_CHANGED_ID)
+        yield self.server.addListener(listener=self._invalidate_presets, source=None, ID=PRESETS_CHANGED_ID)
         self.zeros = yield self.get_zeros()
-        self.url = 'http://127.0.0.1:8000/opt'
+
+    def _invalidate_presets(self, c, signal):
+        self.presets = None
+
+    @inlineCallbacks
+    def get_presets(self):
+        """
+        get_presets(self)
+
+        Returns the electrode server's presets, fetching them only if they have changed since the last call.
+        """
+        if self.presets is None:
+            s = yield self.server.get_presets()
+            self.presets = json.loads(s)
+        returnValue(self.presets)
 
     @inlineCallbacks
     def get_zeros(self):
-        s = yield self.server.get_presets()
-        d = json_loads_byteified(s)
-        for x in d:
+        presets = yield self.get_presets()
+        for x in presets:
             if x['id'] == '0':
                 returnValue(x)
         returnValue(ZEROS)
@@ -90,28 +109,25 @@ class Update(ConductorParameter):
                         if 'guess' in v['optimize']:
                             # if the guess is an int, it's a preset index
                             if isinstance(v['optimize']['guess'], int):
-                                presets = yield self.server.get_presets()
-                                preset = [p for p in json.loads(presets) if p["id"] == v['optimize']['guess']][0]
+                                presets = yield self.get_presets()
+                                preset = [p for p in presets if p["id"] == v['optimize']['guess']][0]
                                 guess = preset['normalModes']
                         # otherwise, the guess is already a normal mode dict
                             elif isinstance(v['optimize']['guess'], dict):
                                 guess = v['optimize']['guess']
                         else:
-                            presets = yield self.server.get_presets()
-                            preset = [p for p in json.loads(presets) if p["id"] == int(k)][0]
+                            presets = yield self.get_presets()
+                            preset = [p for p in presets if p["id"] == int(k)][0]
                             guess = preset['normalModes']
                         v["optimize"].update(NormalModesToVs(guess))
-                        r = requests.post(self.url, json={"p": [v['optimize']]})
-                        results = r.json()['p'][0]
-                        if r.status_code == 200:
-                            v['normalModes'] = VsToNormalModes(results['V'], 0)
-                            # TODO: Do we actually want this? The offset would otherwise be set by (I think) minimizing the least squares voltage of the rods. Left in for now for consistency.
-                            v['normalModes']['GlobalOffset'] = 0
-                            v['volts'] = NormalModesToVs(v['normalModes'])
-                            v['values'] = VsToDACs(v['volts'])
-                            validate_normal_modes(v)
-                        else:
-                            raise(ValueError("Optimization server failed: {}".format(r.json())))
+                        r = yield self.server.optimize(json.dumps([v['optimize']]))
+                        results = json.loads(r)[0]
+                        v['normalModes'] = VsToNormalModes(results['V'], 0)
+                        # TODO: Do we actually want this? The offset would otherwise be set by (I think) minimizing the least squares voltage of the rods. Left in for now for consistency.
+                        v['normalModes']['GlobalOffset'] = 0
+                        v['volts'] = NormalModesToVs(v['normalModes'])
+                        v['values'] = VsToDACs(v['volts'])
+                        validate_normal_modes(v)
                     elif 'normalModes' in v:
                         validate_normal_modes(v)
                         v['volts'] = NormalModesToVs(v['normalModes'])
@@ -7,23 +7,32 @@ from labrad.wrappers import connectAsync
 
 from conductor_device.conductor_parameter import ConductorParameter
 
-from motion.calibrated_picomotor import CalibratedPicomotor
-import numpy as np
+from motion.calibrated_picomotor import CalibratedPicomotor, load_calibration
+from motion.coupling_optimizer import CouplingOptimizer
 import time
 
 class FiberCouplerDevice(ConductorParameter):
     """
     Device for automatic fiber coupling.
+
+    Aligns with :class:`motion.coupling_optimizer.CouplingOptimizer`. The picomotor moves and power reads are Deferreds, so the conductor keeps running while aligning.
+
+    Unless given, the step size ratios and backlash of the picomotor axes are loaded with :func:`motion.calibrated_picomotor.load_calibration`, as saved when the controller was last calibrated.
     """
     priority = 4
 
-    def __init__(self, controller_id, labjack_channel, setpoint_var, calibration, config={}):
+    def __init__(self, controller_id, labjack_channel, setpoint_var, calibration=None, config={}, backlash=None):
         super(FiberCouplerDevice, self).__init__(config)
 
         self.controller_id = controller_id
         self.labjack_channel = labjack_channel
         self.setpoint_var = setpoint_var
+        if calibration is None:
+            (calibration, saved_backlash) = load_calibration(controller_id)
+            if backlash is None:
+                backlash = saved_backlash
         self.calibration = calibration
+        self.backlash = backlash
 
         self.min_power = 0.6
     
@@ -34,9 +43,12 @@ class FiberCouplerDevice(ConductorParameter):
             self.picomotor = self.cxn.polarkrb_picomotor
             self.labjack = self.cxn.polarkrb_labjack
             self.conductor = self.cxn.conductor
-            self.picomotor.select_device(self.controller_id)
+            yield self.picomotor.select_device(self.controller_id)
             self.signal_source = lambda: self.labjack.read_name(self.labjack_channel)
-            self.cpm = CalibratedPicomotor(self.picomotor, signal_source=self.signal_source, calibration=self.calibration)
+            positions = {}
+            for axis in [1, 2, 3, 4]:
+                positions[axis] = yield self.picomotor.get_position(axis)
+            self.cpm = CalibratedPicomotor(self.picomotor, calibration=self.calibration, positions=positions, backlash=self.backlash)
 
         except AttributeError as e:
             # Log a warning that the server can't be found.
@@ -46,67 +58,24 @@ class FiberCouplerDevice(ConductorParameter):
     @inlineCallbacks
     def update(self):
         if self.value and "optimize" in self.value:
-            try:
-                # TODO: Make sure the MOT is turned on, possibly using sequencer.run_sequence
-
-                params = yield self.conductor.get_parameter_values()
-                setpoint = params["sequencer"][self.setpoint_var]
-                current_value = self.signal_source()
-                if current_value > setpoint:
-                    return
-                if current_value < self.min_power:
-                    raise Exception("Power too low to optimize, aborting")
-                
-                def line_scan(axis, start, end, npoints):
-                    positions = np.linspace(start, end, npoints) + self.cpm.get_position(axis)
-                    voltages = np.zeros(npoints)
-                    for (i, position) in enumerate(positions):
-                        self.cpm.move_abs(axis, position)
-                        voltages[i] = self.signal_source()
-                    best_position = positions[np.argmax(voltages)]
-                    self.cpm.move_abs(axis, best_position)
-                    return best_position, self.signal_source()
-                
-                t = time.time()
-
-                ranges = [50]*20
-                last_side = {axis: 0 for axis in self.cpm.axes} # -1 for negative, 0 for none, 1 for positive
-                best_voltage = -10
-                rounds_since_best = 0
-                for (round_num, max_delta) in enumerate(ranges):
-                    for axis in self.cpm.axes:
-                        # if the power is too low, do nothing to avoid misalignment
-                        if self.signal_source() < self.min_power:
-                            raise Exception('Power is too low, aborting')
-
-                        start_position = self.cpm.get_position(axis)
-                        if last_side[axis] < 0:
-                            best_position, max_voltage = line_scan(axis, 0, -max_delta, 5)
-                        elif last_side[axis] > 0:
-                            best_position, max_voltage = line_scan(axis, 0, max_delta, 5)
-                        else:
-                            best_position, max_voltage = line_scan(axis, - max_delta, + max_delta, 7)
-                        print("Axis {} round {}: position {}, voltage {}".format(axis, round_num, best_position, max_voltage))
-                        if np.abs((best_position - start_position)/max_delta) > 0.8:
-                            last_side[axis] = np.sign(best_position - start_position)
-                        else:
-                            last_side[axis] = 0
-
-                    v = self.signal_source()
-                    if v > best_voltage:
-                        best_voltage = v
-                        rounds_since_best = 0
-                    else:
-                        rounds_since_best += 1
-                    if rounds_since_best > 3:
-                        break
-
-                final_voltage = self.signal_source()
-                print("Alignment took {} seconds".format(time.time() - t))
-                print("Final voltage: {}".format(final_voltage))
-
-                if final_voltage < setpoint:
-                    raise Exception("Alignment failed, aborting. Final voltage was {} but setpoint was {}".format(final_voltage, setpoint))
-                
-            except Exception as e:
-                raise(e)
+            # TODO: Make sure the MOT is turned on, possibly using sequencer.run_sequence
+
+            params = yield self.conductor.get_parameter_values()
+            setpoint = params["sequencer"][self.setpoint_var]
+            current_value = yield self.signal_source()
+            if current_value > setpoint:
+                return
+            if current_value < self.min_power:
+                raise Exception("Power too low to optimize, aborting")
+
+            t = time.time()
+
+            optimizer = CouplingOptimizer(len(self.cpm.axes), min_power=self.min_power)
+            x0 = [self.cpm.get_position(axis) for axis in self.cpm.axes]
+            (best_position, final_voltage) = yield optimizer.maximize(self.cpm.move_to_async, self.signal_source, x0)
+
+            print("Alignment took {} seconds and {} moves".format(time.time() - t, len(optimizer.history)))
+            print("Final position: {}, voltage: {}".format(best_position, final_voltage))
+
+            if final_voltage < setpoint:
+                raise Exception("Alignment failed, aborting. Final voltage was {} but setpoint was {}".format(final_voltage, setpoint))
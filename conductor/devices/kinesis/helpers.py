@@ -13,6 +13,8 @@ class KinesisDevice(ConductorParameter):
     Data format:::
 
         [...]
+
+    The value is either a position, which is moved to straight away, or a list of positions. The first of a list is moved to straight away, and the rest are each moved to on a trigger. Since a list of values is scanned over experiments, a sequence for one experiment is set as e.g. ``[[157, 330, 157]]``.
     """
     priority = 3
     value_type = 'single'
@@ -42,7 +44,9 @@ class KinesisDevice(ConductorParameter):
         if self.value:
             try:
                 yield self.server.select_device(self.channel)
-                self.server.move_to(self.value)
-                # yield self.server.move_sequence(self.value)
+                if isinstance(self.value, list):
+                    yield self.server.move_sequence(self.value)
+                else:
+                    yield self.server.move_to(self.value)
             except Exception as e:
                 print(e)
@@ -93,7 +93,7 @@ def update_electrode_values(seq, e_seq, presets, channels):
 def read_sequence_file(sequence_directory, filename):
     # Sequencer control sends the actual sequence dict
     if type(filename).__name__ == 'dict':
-        if filename.has_key('sequence'):
+        if 'sequence' in filename:
             try:
                 return (filename['sequence'], filename['meta']['electrodes'])
             except:
@@ -165,6 +165,14 @@ def substitute_sequence_parameters(x, parameter_values):
     else:
         return x
 
+def format_diagnostic(diagnostic):
+    """ one line describing a diagnostic from the sequencer's validate_sequence """
+    if diagnostic['column'] is None:
+        where = diagnostic['channel']
+    else:
+        where = '{}, column {}'.format(diagnostic['channel'], diagnostic['column'])
+    return '{} ({}): {}'.format(where, diagnostic['rule'], diagnostic['message'])
+
 def get_duration(sequence):
     return max([sum([s['dt'] for s in cs]) for cs in sequence.values()])
 
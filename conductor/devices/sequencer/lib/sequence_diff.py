@@ -0,0 +1,316 @@
+"""
+Compares two sequences column by column, e.g. the ``sequence.json`` of two shots, or two files saved by the sequencer control.
+
+The columns of the two sequences are aligned so that inserted and deleted columns are reported as such, rather than as changes to every later column. Aligned columns are then compared channel by channel. Durations that change the same way on every channel are reported once. Parameters (``'*name'``) are compared as written, and, given parameter values for each sequence, as resolved.
+
+Usage:
+
+.. code-block:: bash
+
+    python sequence_diff.py old_sequence new_sequence
+    python sequence_diff.py /path/to/shot/100/sequence.json /path/to/shot/101/sequence.json --resolve
+    python sequence_diff.py a.json b.json --parameters_a params_a.json --parameters_b params_b.json
+
+Sequence files are found in ``SEQUENCE_DIRECTORY`` as by the conductor, if they aren't paths to files. The diffs are tested in ``test_sequence_diff.py``.
+"""
+import os, sys
+import json
+import argparse
+from copy import deepcopy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from lib.helpers import read_sequence_file, combine_sequences, SEQUENCE_DIRECTORY, TIMING_CHANNEL
+
+# Scores for aligning a pair of columns; leaving a column unaligned scores 0
+IDENTICAL_SCORE = 3
+SAME_DT_SCORE = 2
+CHANGED_SCORE = 1
+
+
+def load_sequence(filename, sequence_directory=SEQUENCE_DIRECTORY):
+    """
+    load_sequence(filename, sequence_directory=SEQUENCE_DIRECTORY)
+
+    Args:
+        filename (str): A file saved by the sequencer control, a sequence, or a ``sequence.json`` saved by the conductor for a shot, in which case the sequence and parameters of the last shot in the file are used
+        sequence_directory (str, optional): Where to look for sequence files named in a shot's ``sequence.json``, as in :func:`read_sequence_file`. Defaults to ``SEQUENCE_DIRECTORY``.
+
+    Returns:
+        (dict, list, dict): The sequence, the description of each column (empty strings if there are none), and the sequencer parameter values saved with the shot (empty unless ``filename`` is from a shot)
+    """
+    if not os.path.exists(filename):
+        (sequence, _) = read_sequence_file(sequence_directory, filename)
+        return (sequence, [''] * len(sequence[TIMING_CHANNEL]), {})
+    with open(filename, 'r') as infile:
+        data = json.load(infile)
+
+    parameters = {}
+    if 'sequencer' in data and 'sequence' in data['sequencer']:
+        # A shot's sequence.json has the values of each conductor parameter for each shot
+        parameters = {k: v[-1] for (k, v) in data['sequencer'].items() if k.startswith('*') and v}
+        (sequences, descriptions) = ([], [])
+        for value in data['sequencer']['sequence'][-1]:
+            if isinstance(value, dict):
+                # Sent by the sequencer control, with or without its metadata
+                sequence = value.get('sequence', value)
+            else:
+                (sequence, _) = read_sequence_file(sequence_directory, value)
+            sequences.append(deepcopy(sequence))
+            try:
+                descriptions += value['meta']['descriptions']
+            except (TypeError, KeyError):
+                descriptions += [''] * len(sequence[TIMING_CHANNEL])
+        sequence = combine_sequences(sequences)
+    elif 'sequence' in data:
+        sequence = data['sequence']
+        descriptions = data.get('meta', {}).get('descriptions', [])
+    else:
+        sequence = data
+        descriptions = []
+
+    n_columns = len(sequence[TIMING_CHANNEL])
+    descriptions = (list(descriptions) + [''] * n_columns)[:n_columns]
+    return (sequence, descriptions, parameters)
+
+def load_parameters(filename):
+    """
+    load_parameters(filename)
+
+    Args:
+        filename (str): A JSON file of parameter values, either ``{'*name': value}`` or the conductor's ``{'sequencer': {'*name': value}}``. If the values are lists, as in a shot's ``sequence.json``, the last value is used.
+
+    Returns:
+        dict: The sequencer parameter values
+    """
+    with open(filename, 'r') as infile:
+        data = json.load(infile)
+    data = data.get('sequencer', data)
+    return {k: (v[-1] if isinstance(v, list) else v) for (k, v) in data.items() if k.startswith('*')}
+
+
+def is_parameter(x):
+    return hasattr(x, 'startswith') and x.startswith('*')
+
+def resolve(x, parameters):
+    """ x with the parameters in ``parameters`` substituted; unknown parameters are left as they are """
+    if is_parameter(x):
+        return parameters.get(x, x)
+    elif isinstance(x, list):
+        return [resolve(v, parameters) for v in x]
+    elif isinstance(x, dict):
+        return {k: resolve(v, parameters) for (k, v) in x.items()}
+    return x
+
+def match_channels(a, b):
+    """
+    match_channels(a, b)
+
+    Matches the channels of two sequences by key, then any left over by location, since channels are sometimes renamed.
+
+    Returns:
+        (list, list, list): ``(key_a, key_b)`` pairs, and the unmatched keys of ``a`` and of ``b``
+    """
+    matched = [(k, k) for k in sorted(a) if k in b]
+    only_a = [k for k in sorted(a) if k not in b]
+    only_b = [k for k in sorted(b) if k not in a]
+    locations_b = {}
+    for k in only_b:
+        locations_b.setdefault(k.split('@')[-1], []).append(k)
+    for k in list(only_a):
+        candidates = locations_b.get(k.split('@')[-1])
+        if candidates and '@' in k:
+            other = candidates.pop(0)
+            matched.append((k, other))
+            only_a.remove(k)
+            only_b.remove(other)
+    return (sorted(matched), only_a, only_b)
+
+def column_signatures(sequence, channels):
+    """ a hashable summary of each column of ``channels``, and of its duration """
+    columns = zip(*[sequence[k] for k in channels])
+    signatures = [json.dumps(column, sort_keys=True) for column in columns]
+    durations = [json.dumps(s.get('dt')) for s in sequence[TIMING_CHANNEL]] if TIMING_CHANNEL in sequence else [None] * len(signatures)
+    return (signatures, durations)
+
+def align_columns(a, b):
+    """
+    align_columns(a, b)
+
+    Globally aligns two lists of columns, scoring ``IDENTICAL_SCORE`` for aligning identical columns, ``SAME_DT_SCORE`` for columns with the same duration, ``CHANGED_SCORE`` for any other pair, and 0 for leaving a column unaligned. Changed columns are aligned rather than reported as one deleted and one inserted column.
+
+    Args:
+        a (tuple): ``(signatures, durations)`` of each column, as from :func:`column_signatures`
+        b (tuple): The same, for the other sequence
+
+    Returns:
+        list: ``(i, j)`` pairs of aligned columns, with ``j`` None for columns deleted from ``a`` and ``i`` None for columns inserted in ``b``, in order
+    """
+    (sig_a, dt_a) = a
+    (sig_b, dt_b) = b
+    (n, m) = (len(sig_a), len(sig_b))
+    # score[i][j] is the best score aligning the first i columns of a with the first j of b
+    score = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        row, previous = score[i], score[i - 1]
+        (s, d) = (sig_a[i - 1], dt_a[i - 1])
+        for j in range(1, m + 1):
+            if s == sig_b[j - 1]:
+                pair = IDENTICAL_SCORE
+            elif d == dt_b[j - 1]:
+                pair = SAME_DT_SCORE
+            else:
+                pair = CHANGED_SCORE
+            row[j] = max(previous[j - 1] + pair, previous[j], row[j - 1])
+
+    pairs = []
+    (i, j) = (n, m)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            if sig_a[i - 1] == sig_b[j - 1]:
+                pair = IDENTICAL_SCORE
+            elif dt_a[i - 1] == dt_b[j - 1]:
+                pair = SAME_DT_SCORE
+            else:
+                pair = CHANGED_SCORE
+            if score[i][j] == score[i - 1][j - 1] + pair:
+                pairs.append((i - 1, j - 1))
+                (i, j) = (i - 1, j - 1)
+                continue
+        if i > 0 and score[i][j] == score[i - 1][j]:
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1))
+            j -= 1
+    return pairs[::-1]
+
+def diff_sequences(a, b, parameters_a=None, parameters_b=None):
+    """
+    diff_sequences(a, b, parameters_a=None, parameters_b=None)
+
+    Args:
+        a (dict): The old sequence
+        b (dict): The new sequence
+        parameters_a (dict, optional): Parameter values for ``a``. If given with ``parameters_b``, steps are also compared with the parameters substituted. Defaults to None.
+        parameters_b (dict, optional): Parameter values for ``b``. Defaults to None.
+
+    Returns:
+        dict: with keys
+
+            * ``'columns'``: ``(i, j)`` pairs of aligned columns, as from :func:`align_columns`
+            * ``'deleted'``, ``'inserted'``: The columns of ``a`` with no counterpart in ``b``, and of ``b`` with none in ``a``
+            * ``'channels_removed'``, ``'channels_added'``: The channels only in ``a``, and only in ``b``
+            * ``'renamed'``: ``(key_a, key_b)`` of channels matched by location
+            * ``'changes'``: A dict for each change, with keys ``'column_a'``, ``'column_b'``, ``'channel'`` (``None`` for a duration change on every channel), ``'key'``, ``'a'``, ``'b'`` and ``'kind'``, which is ``'value'``, ``'parameter'`` if either value is a parameter, or ``'resolved'`` if the steps are the same as written but differ with the parameters substituted. Parameter changes also have the resolved values as ``'resolved_a'`` and ``'resolved_b'``, if there are parameter values.
+    """
+    (matched, only_a, only_b) = match_channels(a, b)
+    channels_a = [ka for (ka, _) in matched]
+    channels_b = [kb for (_, kb) in matched]
+    pairs = align_columns(column_signatures(a, channels_a), column_signatures(b, channels_b))
+    compare_resolved = parameters_a is not None and parameters_b is not None
+
+    changes = []
+    for (i, j) in pairs:
+        if i is None or j is None:
+            continue
+        column_changes = []
+        for (ka, kb) in matched:
+            (step_a, step_b) = (a[ka][i], b[kb][j])
+            if step_a == step_b and not compare_resolved:
+                continue
+            for key in sorted(set(step_a) | set(step_b)):
+                (va, vb) = (step_a.get(key), step_b.get(key))
+                change = {'column_a': i, 'column_b': j, 'channel': kb, 'key': key, 'a': va, 'b': vb}
+                if compare_resolved:
+                    (ra, rb) = (resolve(va, parameters_a), resolve(vb, parameters_b))
+                if va != vb:
+                    change['kind'] = 'parameter' if is_parameter(va) or is_parameter(vb) else 'value'
+                    if compare_resolved and change['kind'] == 'parameter':
+                        (change['resolved_a'], change['resolved_b']) = (ra, rb)
+                elif compare_resolved and ra != rb:
+                    change.update({'kind': 'resolved', 'a': ra, 'b': rb, 'parameter': va})
+                else:
+                    continue
+                column_changes.append(change)
+
+        # A column's duration is on every channel, so report it once if it changed the same way on all of them
+        dt_changes = [c for c in column_changes if c['key'] == 'dt']
+        if len(matched) > 1 and len(dt_changes) == len(matched) and all((c['a'], c['b'], c['kind']) == (dt_changes[0]['a'], dt_changes[0]['b'], dt_changes[0]['kind']) for c in dt_changes):
+            column_changes = [dict(dt_changes[0], channel=None)] + [c for c in column_changes if c['key'] != 'dt']
+        changes += column_changes
+
+    return {
+        'columns': pairs,
+        'deleted': [i for (i, j) in pairs if j is None],
+        'inserted': [j for (i, j) in pairs if i is None],
+        'channels_removed': only_a,
+        'channels_added': only_b,
+        'renamed': [(ka, kb) for (ka, kb) in matched if ka != kb],
+        'changes': changes,
+    }
+
+def format_diff(diff, a, b, descriptions_a=None, descriptions_b=None):
+    """
+    format_diff(diff, a, b, descriptions_a=None, descriptions_b=None)
+
+    Returns:
+        str: A readable summary of a diff from :func:`diff_sequences` of sequences ``a`` and ``b``, with the description of each column if given
+    """
+    def column(i, sequence, descriptions):
+        dt = sequence[TIMING_CHANNEL][i].get('dt') if TIMING_CHANNEL in sequence else None
+        description = descriptions[i] if descriptions and descriptions[i] else ''
+        return 'column {} (dt {}{})'.format(i, dt, ', ' + description if description else '')
+
+    n_a = len(a[TIMING_CHANNEL]) if TIMING_CHANNEL in a else 0
+    n_b = len(b[TIMING_CHANNEL]) if TIMING_CHANNEL in b else 0
+    lines = ['{} -> {} columns: {} inserted, {} deleted, {} changes'.format(n_a, n_b, len(diff['inserted']), len(diff['deleted']), len(diff['changes']))]
+    for k in diff['channels_removed']:
+        lines.append('- channel {}'.format(k))
+    for k in diff['channels_added']:
+        lines.append('+ channel {}'.format(k))
+    for (ka, kb) in diff['renamed']:
+        lines.append('  channel {} renamed {}'.format(ka, kb))
+
+    changes = {}
+    for c in diff['changes']:
+        changes.setdefault((c['column_a'], c['column_b']), []).append(c)
+    for (i, j) in diff['columns']:
+        if j is None:
+            lines.append('- {}'.format(column(i, a, descriptions_a)))
+        elif i is None:
+            lines.append('+ {}'.format(column(j, b, descriptions_b)))
+        elif (i, j) in changes:
+            lines.append('~ {} -> {}'.format(column(i, a, descriptions_a), column(j, b, descriptions_b)))
+            for c in changes[(i, j)]:
+                values = '{!r} -> {!r}'.format(c['a'], c['b'])
+                if c['kind'] == 'resolved':
+                    values += ' (resolving {})'.format(c['parameter'])
+                elif 'resolved_a' in c:
+                    values += ' (resolved {!r} -> {!r})'.format(c['resolved_a'], c['resolved_b'])
+                lines.append('    {}: {} {}'.format(c['channel'] or 'all channels', c['key'], values))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two sequences column by column")
+    parser.add_argument('a', help="old sequence: a file saved by the sequencer control, a shot's sequence.json, or a sequence name")
+    parser.add_argument('b', help="new sequence")
+    parser.add_argument('--parameters_a', help="JSON file of parameter values to resolve the old sequence with")
+    parser.add_argument('--parameters_b', help="JSON file of parameter values to resolve the new sequence with")
+    parser.add_argument('--resolve', action='store_true', help="resolve each sequence with the parameter values saved with its shot")
+    parser.add_argument('--json', action='store_true', help="print the diff as JSON")
+    args = parser.parse_args()
+
+    (a, descriptions_a, parameters_a) = load_sequence(args.a)
+    (b, descriptions_b, parameters_b) = load_sequence(args.b)
+    if not args.resolve:
+        (parameters_a, parameters_b) = (None, None)
+    if args.parameters_a or args.parameters_b:
+        parameters_a = load_parameters(args.parameters_a) if args.parameters_a else (parameters_a or {})
+        parameters_b = load_parameters(args.parameters_b) if args.parameters_b else (parameters_b or {})
+
+    diff = diff_sequences(a, b, parameters_a, parameters_b)
+    if args.json:
+        print(json.dumps(diff, indent=2))
+    else:
+        print(format_diff(diff, a, b, descriptions_a, descriptions_b))
@@ -0,0 +1,110 @@
+"""
+Tests of :mod:`sequence_diff` on synthetic edits to a random sequence of 100 channels by 200 columns.
+
+.. code-block:: bash
+
+    python -m unittest test_sequence_diff
+"""
+import random
+import unittest
+from copy import deepcopy
+
+from sequence_diff import diff_sequences, format_diff, TIMING_CHANNEL
+
+N_CHANNELS = 100
+N_COLUMNS = 200
+PARAMETERS = {'*tof': 0.01, '*v_mot': 1.0}
+
+
+def make_sequence(n_channels=N_CHANNELS, n_columns=N_COLUMNS, seed=0):
+    """ a random sequence, with its digital and analog channels """
+    rng = random.Random(seed)
+    digital = [TIMING_CHANNEL] + ['TTL{:02d}@A{:02d}'.format(i, i) for i in range(n_channels // 2 - 1)]
+    analog = ['DAC{:02d}@B{:02d}'.format(i, i) for i in range(n_channels - len(digital))]
+    dts = [rng.choice([1e-3, 1e-2, 0.1, 1, '*tof']) for _ in range(n_columns)]
+    sequence = {}
+    for k in digital:
+        sequence[k] = [{'dt': dt, 'out': rng.randint(0, 1)} for dt in dts]
+    for k in analog:
+        sequence[k] = [{'dt': dt, 'type': rng.choice(['s', 'lin', 'exp']), 'vf': rng.choice([0, 1.5, -2, '*v_mot'])} for dt in dts]
+    return (sequence, digital, analog)
+
+
+class TestSequenceDiff(unittest.TestCase):
+    def setUp(self):
+        (self.a, self.digital, self.analog) = make_sequence()
+        self.b = deepcopy(self.a)
+
+    def change(self):
+        self.b[self.digital[3]][10]['out'] ^= 1
+        self.b[self.analog[2]][20]['type'] = 'scurve'
+
+    def insert_delete(self):
+        for k in self.b:
+            self.b[k].insert(50, dict(self.b[k][49], dt=0.5))
+            del self.b[k][150]
+
+    def change_duration(self):
+        for k in self.b:
+            self.b[k][7]['dt'] = 2.5
+
+    def test_identical(self):
+        diff = diff_sequences(self.a, self.b)
+        self.assertEqual(diff['changes'], [])
+        self.assertEqual(diff['inserted'], [])
+        self.assertEqual(diff['deleted'], [])
+        self.assertEqual(diff['columns'], [(i, i) for i in range(N_COLUMNS)])
+
+    def test_changes(self):
+        self.change()
+        diff = diff_sequences(self.a, self.b)
+        self.assertEqual(sorted((c['channel'], c['column_a'], c['key']) for c in diff['changes']),
+                         sorted([(self.digital[3], 10, 'out'), (self.analog[2], 20, 'type')]))
+
+    def test_insert_delete(self):
+        # Columns are aligned around, not reported as changes to later columns
+        self.insert_delete()
+        diff = diff_sequences(self.a, self.b)
+        self.assertEqual(diff['inserted'], [50])
+        self.assertEqual(diff['deleted'], [149])
+        self.assertEqual(diff['changes'], [])
+
+    def test_duration(self):
+        # A duration change on every channel is reported once
+        self.change_duration()
+        diff = diff_sequences(self.a, self.b)
+        self.assertEqual([(c['channel'], c['key'], c['b']) for c in diff['changes']], [(None, 'dt', 2.5)])
+
+    def test_parameters(self):
+        self.b[self.analog[0]][30]['vf'] = '*v_evap'
+        diff = diff_sequences(self.a, self.b, PARAMETERS, {'*tof': 0.02, '*v_mot': 1.0, '*v_evap': 3.0})
+        self.assertEqual(set(c['kind'] for c in diff['changes']), set(['parameter', 'resolved']))
+        self.assertTrue(any(c['kind'] == 'parameter' and c['resolved_b'] == 3.0 for c in diff['changes']))
+        for c in diff['changes']:
+            if c['kind'] == 'resolved':
+                self.assertEqual((c['channel'], c['key']), (None, 'dt'))
+        # Without parameter values, only the parameter as written changed
+        self.assertEqual([c['kind'] for c in diff_sequences(self.a, self.b)['changes']], ['parameter'])
+
+    def test_channels(self):
+        self.b['MOT coils@B00'] = self.b.pop(self.analog[0])
+        self.b['New TTL@Z00'] = deepcopy(self.b[self.digital[1]])
+        diff = diff_sequences(self.a, self.b)
+        self.assertEqual(diff['renamed'], [(self.analog[0], 'MOT coils@B00')])
+        self.assertEqual(diff['channels_added'], ['New TTL@Z00'])
+        self.assertEqual(diff['changes'], [])
+
+    def test_format(self):
+        self.insert_delete()
+        self.change()
+        self.change_duration()
+        diff = diff_sequences(self.a, self.b, PARAMETERS, PARAMETERS)
+        self.assertEqual((diff['inserted'], diff['deleted'], len(diff['changes'])), ([50], [149], 3))
+        lines = format_diff(diff, self.a, self.b).split('\n')
+        self.assertEqual(lines[0], '200 -> 200 columns: 1 inserted, 1 deleted, 3 changes')
+        self.assertIn('+ column 50 (dt 0.5)', lines)
+        self.assertIn('    all channels: dt {!r} -> 2.5'.format(self.a[TIMING_CHANNEL][7]['dt']), lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
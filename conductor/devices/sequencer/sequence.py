@@ -25,6 +25,8 @@ class Sequence(ConductorParameter):
     def __init__(self, config={}):
         super(Sequence, self).__init__(config)
         self.value = [self.default_sequence]
+        # Printed once, rather than every shot, until they change
+        self.warnings = []
 
     @inlineCallbacks
     def initialize(self):
@@ -55,6 +57,16 @@ class Sequence(ConductorParameter):
             # with open(fname, "w+") as f:
             #     json.dump(sequence, f)
             # sleep(5)
+            diagnostics = yield self.cxn.sequencer.validate_sequence(json.dumps(sequence))
+            diagnostics = json.loads(diagnostics)
+            warnings = [format_diagnostic(d) for d in diagnostics if d['severity'] == 'warning']
+            if warnings != self.warnings:
+                for w in warnings:
+                    print('sequence warning: {}'.format(w))
+                self.warnings = warnings
+            errors = [format_diagnostic(d) for d in diagnostics if d['severity'] == 'error']
+            if errors:
+                raise Exception('Invalid sequence:\n' + '\n'.join(errors))
             yield self.cxn.sequencer.run_sequence(json.dumps(sequence))
             t_advance = get_duration(sequence)
             # yield self.cxn.conductor.advance_logging()
@@ -0,0 +1,205 @@
+"""
+Write-ahead journal of the conductor's experiment queue.
+
+The conductor writes a record to the journal, and fsyncs it, each time the queue changes, an experiment starts or stops, and a shot of the current experiment finishes. Each record is a line of JSON:
+
+.. code-block:: python
+
+    {"op": "append", "experiment": {...}}   # queued at the end of the queue
+    {"op": "appendleft", "experiment": {...}} # queued at the start of the queue
+    {"op": "popleft"}                       # taken from the start of the queue
+    {"op": "clear"}                         # queue emptied
+    {"op": "start", "experiment": {...}, "done": 0} # experiment started, with "done" of its points already taken
+    {"op": "done", "shot": 123}             # a point of the current experiment was taken, as shot 123
+    {"op": "stop"}                          # no experiment is running
+    {"op": "recovered", "experiments": [...]} # left over when the conductor last started, until resumed
+
+Replaying the records gives the queue, the current experiment and how many of its points were taken. A record that was only partly written when the conductor was killed ends the replay. When the conductor starts, whatever was running or queued becomes ``recovered``, which the conductor's ``resume_queue`` puts back at the start of the queue, or discards. The current experiment is recovered with ``skip_points`` set to the number of its points that were taken, so that those aren't run again. A point that was running when the conductor stopped is run again.
+
+``test_journal.py`` kills a made up scan part way through, many times, and checks what would be resumed.
+"""
+import os
+import json
+from copy import deepcopy
+
+COMPACT_RECORDS = 1000 # records after which the journal is rewritten as a snapshot
+
+class QueueJournal(object):
+    """
+    QueueJournal(object)
+
+    Args:
+        path (str, optional): The journal file, which is created if it doesn't exist. If None, nothing is written, and nothing is recovered. Defaults to None.
+        compact_records (int, optional): Rewrite the journal as a snapshot of its state once it has this many records. Defaults to ``COMPACT_RECORDS``.
+    """
+    def __init__(self, path=None, compact_records=COMPACT_RECORDS):
+        self.path = path
+        self.compact_records = compact_records
+        self.queue = []
+        self.experiment = None
+        self.done_points = 0
+        self.recovered = []
+        self.records = 0
+        self.outfile = None
+
+        if self.path is not None:
+            state = replay(self.path)
+            self.recovered = state['recovered'] + recoverable(state)
+            self._compact()
+
+    def append(self, experiment, left=False):
+        self.write({'op': 'appendleft' if left else 'append', 'experiment': experiment})
+
+    def popleft(self):
+        self.write({'op': 'popleft'})
+
+    def clear(self):
+        self.write({'op': 'clear'})
+
+    def start(self, experiment):
+        self.write({'op': 'start', 'experiment': experiment, 'done': 0})
+
+    def done(self, shot):
+        if self.experiment is not None:
+            self.write({'op': 'done', 'shot': shot})
+
+    def stop(self):
+        if self.experiment is not None:
+            self.write({'op': 'stop'})
+
+    def forget_recovered(self):
+        """
+        forget_recovered(self)
+
+        Forgets the recovered experiments, once they are queued again.
+        """
+        if self.recovered:
+            self.write({'op': 'recovered', 'experiments': []})
+
+    def write(self, record):
+        """
+        write(self, record)
+
+        Applies ``record`` to the state, then writes it to the journal and fsyncs it.
+
+        Args:
+            record (dict): The record. See the module documentation.
+        """
+        apply_record(self, record)
+        if self.outfile is None:
+            return
+        try:
+            self.outfile.write(json.dumps(record, default=lambda x: None) + '\n')
+            self.outfile.flush()
+            os.fsync(self.outfile.fileno())
+            self.records += 1
+            if self.records >= self.compact_records:
+                self._compact()
+        except Exception as e:
+            print("Could not write to queue journal: ", e)
+
+    def close(self):
+        if self.outfile is not None:
+            self.outfile.close()
+            self.outfile = None
+
+    def _compact(self):
+        """ atomically replaces the journal with records of the current state """
+        records = [{'op': 'recovered', 'experiments': self.recovered}]
+        records += [{'op': 'append', 'experiment': e} for e in self.queue]
+        if self.experiment is not None:
+            records.append({'op': 'start', 'experiment': self.experiment, 'done': self.done_points})
+
+        self.close()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as outfile:
+            for record in records:
+                outfile.write(json.dumps(record, default=lambda x: None) + '\n')
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.rename(temporary, self.path)
+        try:
+            descriptor = os.open(directory, os.O_RDONLY)
+            os.fsync(descriptor)
+            os.close(descriptor)
+        except OSError:
+            pass # Directories can't be fsynced on some platforms
+        self.outfile = open(self.path, 'a')
+        self.records = len(records)
+
+
+class _State(object):
+    def __init__(self):
+        self.queue = []
+        self.experiment = None
+        self.done_points = 0
+        self.recovered = []
+
+def apply_record(state, record):
+    """ applies a journal record to ``state``, which has ``queue``, ``experiment``, ``done_points`` and ``recovered`` attributes """
+    op = record['op']
+    if op == 'append':
+        state.queue.append(deepcopy(record['experiment']))
+    elif op == 'appendleft':
+        state.queue.insert(0, deepcopy(record['experiment']))
+    elif op == 'popleft':
+        if state.queue:
+            state.queue.pop(0)
+    elif op == 'clear':
+        state.queue = []
+    elif op == 'start':
+        state.experiment = deepcopy(record['experiment'])
+        state.done_points = record.get('done', 0)
+    elif op == 'done':
+        if state.experiment is not None:
+            state.done_points += 1
+    elif op == 'stop':
+        state.experiment = None
+        state.done_points = 0
+    elif op == 'recovered':
+        state.recovered = record['experiments']
+
+def replay(path):
+    """
+    replay(path)
+
+    Args:
+        path (str): The journal file
+
+    Returns:
+        dict: ``{'queue': [...], 'experiment': {...} or None, 'done': int, 'recovered': [...]}``. Empty if there is no journal.
+    """
+    state = _State()
+    if os.path.exists(path):
+        with open(path, 'r') as infile:
+            for line in infile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print("Queue journal {} ends with a partly written record, which was ignored".format(path))
+                    break
+                apply_record(state, record)
+    return {'queue': state.queue, 'experiment': state.experiment, 'done': state.done_points, 'recovered': state.recovered}
+
+def recoverable(state):
+    """
+    recoverable(state)
+
+    Args:
+        state (dict): As from :func:`replay`
+
+    Returns:
+        list: The experiments to run to resume ``state``. The current experiment, if there is one, has ``skip_points`` set, and doesn't loop again, since it was put back in the queue when it started if it loops.
+    """
+    experiments = []
+    if state['experiment'] is not None:
+        experiment = deepcopy(state['experiment'])
+        experiment['skip_points'] = experiment.get('skip_points', 0) + state['done']
+        experiment.pop('append_data', None)
+        experiment.pop('loop', None)
+        experiments.append(experiment)
+    return experiments + deepcopy(state['queue'])
+
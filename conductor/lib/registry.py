@@ -0,0 +1,158 @@
+"""
+Registry of the conductor's parameter classes.
+
+Parameter ``parameter_name`` of device ``device_name`` is the class ``ParameterName`` (as by ``inflection.camelize``) in ``devices/device_name/parameter_name.py``. :class:`ParameterRegistry` finds these by reading the files in ``devices``, without importing them, giving entries like::
+
+    {
+        'kd1.frequency': 'devices.kd1.frequency:Frequency',
+        'kinesis.latt1': 'devices.kinesis.latt1:Latt1',
+        ...
+    }
+
+A class is imported the first time it is used, and kept. It is only reloaded if its file was changed since, so that registering the same parameter again doesn't run its module, or those it imports, again.
+
+Running this module lists the parameters in ``devices``:
+
+.. code-block:: bash
+
+    python lib/registry.py
+"""
+import os
+import re
+import sys
+from time import time
+
+from inflection import camelize
+
+try:
+    from importlib import reload
+except ImportError:
+    pass # reload is a builtin in Python 2
+
+DEVICES_DIRECTORY = 'devices'
+GENERIC_PARAMETER = 'conductor_device.conductor_parameter'
+
+class ParameterRegistry(object):
+    """
+    ParameterRegistry(object)
+
+    Args:
+        directory (str, optional): The directory of devices, which is a package. Defaults to ``DEVICES_DIRECTORY``.
+    """
+    def __init__(self, directory=DEVICES_DIRECTORY):
+        self.directory = directory
+        self.package = os.path.basename(os.path.normpath(directory))
+        self.entries = {}
+        # key: [class, mtime of its file when imported]
+        self.classes = {}
+        # key: seconds taken to import it, the last time it was imported
+        self.import_times = {}
+        self.scan()
+
+    def scan(self):
+        """
+        scan(self)
+
+        Finds the parameters in each device's directory.
+        """
+        self.entries = {}
+        for device_name in sorted(os.listdir(self.directory)):
+            if os.path.isdir(os.path.join(self.directory, device_name)):
+                self.scan_device(device_name)
+
+    def scan_device(self, device_name):
+        """
+        scan_device(self, device_name)
+
+        Finds the parameters in the device's directory, i.e. files ``parameter_name.py`` that define a class ``ParameterName``.
+
+        Args:
+            device_name (str): Name of device (e.g. "dds1")
+        """
+        device_directory = os.path.join(self.directory, device_name)
+        if device_name.startswith(('_', '.')) or not os.path.isdir(device_directory):
+            return
+        for filename in sorted(os.listdir(device_directory)):
+            (parameter_name, extension) = os.path.splitext(filename)
+            if extension != '.py' or parameter_name.startswith('_'):
+                continue
+            class_name = camelize(parameter_name)
+            try:
+                with open(os.path.join(device_directory, filename), 'r') as infile:
+                    source = infile.read()
+            except (IOError, OSError):
+                continue
+            if re.search(r'^class\s+{}\b'.format(re.escape(class_name)), source, re.M):
+                key = '{}.{}'.format(device_name, parameter_name)
+                self.entries[key] = '{}.{}:{}'.format(self.package, key, class_name)
+
+    def get(self, device_name, parameter_name, generic=False):
+        """
+        get(self, device_name, parameter_name, generic=False)
+
+        Args:
+            device_name (str): Name of device (e.g. "dds1")
+            parameter_name (str): Name of parameter (e.g. "frequency")
+            generic (bool, optional): Whether to use the ``ConductorParameter`` base class if the parameter isn't found. Defaults to False.
+
+        Returns:
+            The parameter class, or None if it can't be found
+        """
+        key = '{}.{}'.format(device_name, parameter_name)
+        if key not in self.entries and os.path.isfile(os.path.join(self.directory, device_name, parameter_name) + '.py'):
+            # The parameter was added since the registry was scanned
+            self.scan_device(device_name)
+        if key not in self.entries:
+            if not generic:
+                return None
+            key = GENERIC_PARAMETER
+        return self.load(key)
+
+    def load(self, key):
+        """
+        load(self, key)
+
+        Imports the class for ``key``, the first time, or if its file has changed since it was last imported.
+
+        Args:
+            key (str): ``device_name.parameter_name``
+
+        Returns:
+            The parameter class
+        """
+        (module_name, class_name) = self.entries[key].split(':')
+        mtime = os.path.getmtime(os.path.join(self.directory, *key.split('.')) + '.py')
+        if key in self.classes and self.classes[key][1] == mtime:
+            return self.classes[key][0]
+
+        ti = time()
+        if key in self.classes and module_name in sys.modules:
+            module = reload(sys.modules[module_name])
+        else:
+            module = __import__(module_name, fromlist=[class_name])
+        self.import_times[key] = time() - ti
+        self.classes[key] = [getattr(module, class_name), mtime]
+        return self.classes[key][0]
+
+    def report(self):
+        """
+        report(self)
+
+        Returns:
+            str: The time taken to import each imported parameter, slowest first
+        """
+        lines = ["parameter import times:"]
+        for key in sorted(self.import_times, key=self.import_times.get, reverse=True):
+            lines.append("    {:.3f} s  {}".format(self.import_times[key], key))
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DEVICES_DIRECTORY)
+    ti = time()
+    registry = ParameterRegistry(directory)
+    tf = time()
+    for key in sorted(registry.entries):
+        print("{:32s} {}".format(key, registry.entries[key]))
+    print("found {} parameters in {:.1f} ms".format(len(registry.entries), 1e3 * (tf - ti)))
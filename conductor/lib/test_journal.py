@@ -0,0 +1,132 @@
+"""
+Tests of :mod:`journal`, killing a made up scan at random times in a subprocess and checking what would be resumed.
+
+.. code-block:: bash
+
+    python -m unittest test_journal
+"""
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from journal import QueueJournal, replay
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+N_EXPERIMENTS = 3
+N_POINTS = 20
+TRIALS = 20
+
+# Runs scan(path, shots_path) from this module in a subprocess
+SCAN = "import sys; sys.path.insert(0, {!r}); from test_journal import scan; scan(sys.argv[1], sys.argv[2])".format(DIRECTORY)
+
+
+def scan(path, shots_path, shot_time=0.01):
+    """ queues and runs a made up scan until killed, writing each taken point to ``shots_path`` before journalling it """
+    journal = QueueJournal(path)
+    for i in range(N_EXPERIMENTS):
+        journal.append({'name': 'scan{}'.format(i), 'parameter_values': {'sequencer': {'*x': list(range(N_POINTS))}}})
+    shots = open(shots_path, 'a')
+    shot = 0
+    while journal.queue:
+        experiment = journal.queue[0]
+        journal.popleft()
+        journal.start(experiment)
+        for x in experiment['parameter_values']['sequencer']['*x']:
+            time.sleep(shot_time)
+            shots.write('{} {}\n'.format(experiment['name'], x))
+            shots.flush()
+            os.fsync(shots.fileno())
+            journal.done(shot)
+            shot += 1
+        journal.stop()
+
+
+class TestQueueJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_killed_scan(self):
+        # Resuming runs each point that wasn't taken, and at most one that was
+        rng = random.Random(0)
+        shots_path = os.path.join(self.directory, 'shots.txt')
+        every_point = [('scan{}'.format(i), str(x)) for i in range(N_EXPERIMENTS) for x in range(N_POINTS)]
+        killed_mid_scan = 0
+        for trial in range(TRIALS):
+            for p in [self.path, shots_path]:
+                if os.path.exists(p):
+                    os.remove(p)
+            process = subprocess.Popen([sys.executable, '-c', SCAN, self.path, shots_path])
+            time.sleep(rng.uniform(0.1, 0.8))
+            process.kill()
+            process.wait()
+
+            taken = []
+            if os.path.exists(shots_path):
+                with open(shots_path) as infile:
+                    taken = [tuple(line.split()) for line in infile]
+            journal = QueueJournal(self.path)
+            resumed = journal.recovered
+            journal.forget_recovered()
+            journal.close()
+            if not os.path.exists(self.path) or (not resumed and not taken):
+                continue # Killed before anything was queued
+
+            points = []
+            for experiment in resumed:
+                xs = experiment['parameter_values']['sequencer']['*x']
+                points += [(experiment['name'], str(x)) for x in xs[experiment.get('skip_points', 0):]]
+            killed_mid_scan += 0 < len(taken) < len(every_point)
+            self.assertEqual(set(taken) | set(points), set(every_point), "a point would never be taken")
+            self.assertLessEqual(len(set(taken) & set(points)), 1, "points would be taken twice")
+            self.assertEqual(points, sorted(points, key=every_point.index))
+
+            # Resumed experiments aren't recovered again
+            journal = QueueJournal(self.path)
+            self.assertEqual(journal.recovered, [])
+            self.assertEqual(replay(self.path)['recovered'], [])
+            journal.close()
+        self.assertGreater(killed_mid_scan, TRIALS // 2, "the scan was rarely killed part way through")
+
+    def test_restart_without_resuming(self):
+        # Keeps what was recovered, and what was queued since, through compaction
+        journal = QueueJournal(self.path, compact_records=5)
+        for i in range(12):
+            journal.append({'name': 'e{}'.format(i)})
+        journal.popleft()
+        journal.start({'name': 'e0', 'loop': True})
+        journal.done(1)
+        journal.done(2)
+        journal.close()
+        journal = QueueJournal(self.path)
+        journal.append({'name': 'new'})
+        journal.close()
+        journal = QueueJournal(self.path)
+        recovered = journal.recovered
+        journal.close()
+        self.assertEqual([e['name'] for e in recovered], ['e{}'.format(i) for i in range(12)] + ['new'])
+        self.assertEqual(recovered[0]['skip_points'], 2)
+        self.assertNotIn('loop', recovered[0])
+
+    def test_partly_written_record(self):
+        journal = QueueJournal(self.path)
+        journal.append({'name': 'first'})
+        journal.append({'name': 'last'})
+        journal.popleft()
+        journal.close()
+        with open(self.path, 'a') as outfile:
+            outfile.write('{"op": "popl')
+        state = replay(self.path)
+        self.assertEqual([e['name'] for e in state['queue']], ['last'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Tests of resuming the conductor's queue from its journal, driving :meth:`conductor.ConductorServer.advance_experiment` and :meth:`conductor.ConductorServer.advance_parameters` without LabRAD.
+
+.. code-block:: bash
+
+    python -m unittest test_resume_queue
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from labrad.server import Signal
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from conductor import ConductorServer
+from lib.helpers import remaining_points
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+N_POINTS = 5
+
+
+def result(d):
+    """ the result of a Deferred that has already fired """
+    results = []
+    d.addBoth(results.append)
+    if isinstance(results[0], Failure):
+        results[0].raiseException()
+    return results[0]
+
+def scan(name, loop=False):
+    experiment = {'name': name, 'parameter_values': {'sequencer': {'*x': list(range(N_POINTS))}}}
+    if loop:
+        experiment['loop'] = True
+    return experiment
+
+
+class MockConductorServer(ConductorServer):
+    """ doesn't log shots, or send signals """
+    def __init__(self, config_path):
+        ConductorServer.__init__(self, config_path)
+        for name in dir(ConductorServer):
+            if isinstance(getattr(ConductorServer, name), Signal):
+                setattr(self, name, lambda *args, **kwargs: None)
+
+    def _advance_logging(self, end=False):
+        if not end:
+            self.shot += 1
+        return defer.succeed(None)
+
+
+class TestResumeQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(DIRECTORY, 'test_config.json'), 'r') as infile:
+            config = json.load(infile)
+        config['journal_path'] = os.path.join(self.directory, 'queue_journal.jsonl')
+        config['data_directory'] = os.path.join(self.directory, 'data') + '/'
+        self.config_path = os.path.join(self.directory, 'config.json')
+        with open(self.config_path, 'w') as outfile:
+            json.dump(config, outfile)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.journal.close()
+        shutil.rmtree(self.directory)
+
+    def start(self):
+        """ a conductor on the journal, as after a restart """
+        server = MockConductorServer(self.config_path)
+        self.servers.append(server)
+        return server
+
+    def run_points(self, server, n):
+        """ takes the current point, and the next n - 1 """
+        for _ in range(n - 1):
+            result(server.advance_parameters())
+
+    def x(self, server):
+        return server.parameters['sequencer']['*x'].value
+
+    def test_resume(self):
+        server = self.start()
+        for name in ['first', 'second']:
+            server.queue_experiment(None, json.dumps(scan(name)))
+        self.assertTrue(result(server.advance_experiment()))
+        self.run_points(server, 3)
+        self.assertEqual(self.x(server), 2)
+
+        # Killed while taking point 2 of 'first'
+        server.journal.close()
+        server = self.start()
+        self.assertEqual([e['name'] for e in server.journal.recovered], ['first', 'second'])
+        self.assertEqual(server.resume_queue(None), 2)
+        self.assertTrue(result(server.advance_experiment()))
+        self.assertEqual(server.experiment_name, 'first')
+        self.assertEqual(self.x(server), 2)
+        self.assertEqual(remaining_points(server.parameters), N_POINTS - 3)
+
+        self.run_points(server, N_POINTS - 2)
+        result(server.advance_parameters())
+        self.assertEqual(server.experiment_name, 'second')
+        self.assertEqual(self.x(server), 0)
+
+        # Resumed experiments aren't recovered again
+        server.journal.close()
+        server = self.start()
+        self.assertEqual([(e['name'], e.get('skip_points')) for e in server.journal.recovered], [('second', 0)])
+
+    def test_every_point_taken(self):
+        server = self.start()
+        server.queue_experiment(None, json.dumps(scan('first')))
+        server.queue_experiment(None, json.dumps(scan('second')))
+        result(server.advance_experiment())
+        self.run_points(server, N_POINTS)
+        # Killed after the last point was taken, but before the next experiment started
+        server.journal.done(server.shot)
+        server.journal.close()
+
+        server = self.start()
+        server.resume_queue(None)
+        self.assertTrue(result(server.advance_experiment()))
+        self.assertEqual(server.experiment_name, 'second')
+        self.assertEqual(self.x(server), 0)
+
+    def test_loop(self):
+        server = self.start()
+        server.queue_experiment(None, json.dumps(scan('loop', loop=True)))
+        result(server.advance_experiment())
+        self.run_points(server, 2)
+        server.journal.close()
+
+        # The loop is queued again behind the resumed experiment, which doesn't loop
+        server = self.start()
+        recovered = server.journal.recovered
+        self.assertEqual([(e['name'], e.get('skip_points'), e.get('loop')) for e in recovered], [('loop', 1, None), ('loop', None, True)])
+
+    def test_discard(self):
+        server = self.start()
+        server.queue_experiment(None, json.dumps(scan('first')))
+        result(server.advance_experiment())
+        server.journal.close()
+
+        server = self.start()
+        self.assertEqual(len(server.journal.recovered), 1)
+        self.assertEqual(server.resume_queue(None, True), 0)
+        self.assertFalse(result(server.advance_experiment()))
+        server.journal.close()
+
+        server = self.start()
+        self.assertEqual(server.journal.recovered, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
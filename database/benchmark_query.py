@@ -0,0 +1,86 @@
+"""
+Benchmark shot-metadata queries with and without the database server's secondary indexes.
+
+Fills a scratch collection with synthetic shot documents shaped like those written by :mod:`conductor.devices.database.update`, then times a range query on a sequencer parameter before and after creating the indexes listed in ``config.json``. Run against a local ``mongod``::
+
+    python benchmark_query.py --url mongodb://localhost:27017 --n 1000000
+
+The scratch collection is dropped at the end.
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from time import time
+
+import numpy as np
+from pymongo import MongoClient
+
+EXPERIMENTS = ['tofScan', 'ramseyScan', 'lifetime', 'stirapScan', 'default']
+BATCH = 10000
+
+
+def synthetic_shots(n, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        yield {
+            '_id': '{}_{}'.format((start + timedelta(days=i // 2000)).strftime('%Y_%m_%d'), i % 2000),
+            'shot': i % 2000,
+            'time': start + timedelta(seconds=45*i),
+            'experiment': EXPERIMENTS[i % len(EXPERIMENTS)],
+            'parameters': {
+                'sequencer': {
+                    '*tof': float(rng.uniform(0, 20e-3)),
+                    '*holdTime': float(rng.uniform(0, 1)),
+                },
+                'kd1': {'frequency': 1286},
+            },
+        }
+
+
+def time_query(collection, db_filter, sort, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time()
+        n = len(list(collection.find(db_filter, projection=['shot'], sort=sort)))
+        times.append(time() - t0)
+    plan = collection.find(db_filter, projection=['shot'], sort=sort).explain()
+    stage = json.dumps(plan['queryPlanner']['winningPlan'])
+    return n, min(times), 'IXSCAN' in stage
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='mongodb://localhost:27017')
+    parser.add_argument('--n', type=int, default=1000000)
+    parser.add_argument('--config', default='config.json', help="database server config listing the indexes to create")
+    args = parser.parse_args()
+
+    collection = MongoClient(args.url)['benchmark']['shots']
+    collection.drop()
+
+    print("Inserting {} synthetic shots...".format(args.n))
+    batch = []
+    for doc in synthetic_shots(args.n):
+        batch.append(doc)
+        if len(batch) == BATCH:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+    db_filter = {'experiment': 'tofScan', 'parameters.sequencer.*tof': {'$gte': 1e-3, '$lte': 3e-3}}
+    sort = [('time', -1)]
+
+    n, t, indexed = time_query(collection, db_filter, sort)
+    print("Without indexes: {} shots in {:.3f} s (index used: {})".format(n, t, indexed))
+
+    # The indexes the database server creates for data.shots
+    with open(args.config, 'r') as infile:
+        for keys in json.load(infile)['indexes']['data']['shots']:
+            collection.create_index([tuple(k) for k in keys])
+
+    n, t, indexed = time_query(collection, db_filter, sort)
+    print("With indexes: {} shots in {:.3f} s (index used: {})".format(n, t, indexed))
+
+    collection.drop()
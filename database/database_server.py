@@ -19,20 +19,125 @@ timeout = 20
 """
 
 
+import json
+
 from labrad.server import LabradServer, setting, Signal
-from twisted.internet.defer import inlineCallbacks, returnValue
-from pymongo import MongoClient, errors
+from twisted.internet import reactor
+from twisted.internet.defer import returnValue
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+from pymongo import MongoClient, errors, InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
 from bson.json_util import loads, dumps
 
+# Maximum number of database operations running at once. Also used as the size of the MongoDB connection pool.
+POOL_SIZE = 8
+
+# Default number of documents returned by :meth:`DatabaseServer.next_batch`
+BATCH_SIZE = 100
+
+BULK_OPERATIONS = {
+    "insert_one": InsertOne,
+    "update_one": UpdateOne,
+    "update_many": UpdateMany,
+    "replace_one": ReplaceOne,
+    "delete_one": DeleteOne,
+    "delete_many": DeleteMany,
+}
+
 class DatabaseServer(LabradServer):
     """
     Server for communicating with MongoDB databases.
 
-    Currently includes methods for inserting, modifying, and deleting data, and the basic query method :meth:`find_one`. 
+    Currently includes methods for inserting, modifying, and deleting data, the basic query method :meth:`find_one`, and cursors (:meth:`open_cursor`, :meth:`next_batch` and :meth:`close_cursor`) for paging through large queries.
+
+    All database operations are run in a thread pool of size ``POOL_SIZE``, so a slow query does not block the server from handling other requests. Contexts that connect to the same database share a single :py:class:`pymongo.mongo_client.MongoClient` and its connection pool.
+
+    Secondary indexes listed in ``config.json`` are created the first time a context selects the corresponding collection. The config has the form::
+
+        {
+            "indexes": {
+                "data": {
+                    "shots": [
+                        [["shot", 1]],
+                        [["time", -1]],
+                        [["experiment", 1], ["shot", 1]],
+                        [["parameters.sequencer.*tof", 1]]
+                    ]
+                }
+            }
+        }
+
+    where each index is a list of ``[key, direction]`` pairs. Use :meth:`query` for filtered, sorted and projected queries, and :meth:`explain` to check that a query uses an index.
 
     Uses :py:mod:`bson.json_util` for serializing and deserializing `BSON <https://bsonspec.org/>`__ data.
     """
     name = 'database'
+    client_class = MongoClient
+    indexes = {}
+
+    def __init__(self, config_path='./config.json'):
+        super(DatabaseServer, self).__init__()
+        self.clients = {}
+        self.indexed = set()
+        self.pool = ThreadPool(minthreads=1, maxthreads=POOL_SIZE, name='database')
+        self.load_config(config_path)
+
+    def load_config(self, path=None):
+        """
+        load_config(self, path=None)
+
+        Set instance attributes defined in ``config.json``.
+
+        Args:
+            path (str, optional): Location of the JSON config. Defaults to None, in which case ``self.config_path`` is loaded.
+        """
+        if path is not None:
+            self.config_path = path
+        try:
+            with open(self.config_path, 'r') as infile:
+                config = json.load(infile)
+                for key, value in config.items():
+                    setattr(self, key, value)
+        except Exception as e:
+            print("Could not load config {}: {}".format(self.config_path, e))
+
+    def initServer(self):
+        """
+        initServer(self)
+
+        Starts the thread pool for database operations.
+        """
+        self.pool.start()
+
+    def stopServer(self):
+        """
+        stopServer(self)
+
+        Closes all MongoDB clients and stops the thread pool.
+        """
+        for client in self.clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                print("Could not close MongoDB connection: {}".format(e))
+        self.clients = {}
+        self.pool.stop()
+
+    def initContext(self, c):
+        """
+        initContext(self, c)
+
+        Called when a new context is created. Initializes the context's connection and cursors.
+
+        Args:
+            c: LabRAD context
+        """
+        c.c = None
+        c.url = None
+        c.database = None
+        c.collection = None
+        c.cursors = {}
+        c.next_cursor = 0
 
     def expireContext(self, c):
         """
@@ -48,6 +153,21 @@ class DatabaseServer(LabradServer):
 
         self.close(c)
 
+    def _run(self, f, *args, **kwargs):
+        """
+        _run(self, f, *args, **kwargs)
+
+        Runs ``f(*args, **kwargs)`` in the database thread pool.
+
+        Returns:
+            Deferred: fires with the result of ``f``
+        """
+        return deferToThreadPool(reactor, self.pool, f, *args, **kwargs)
+
+    @staticmethod
+    def _get_collection(c):
+        return c.c[c.database][c.collection]
+
     @staticmethod
     def InsertOneResultToDict(result):
         """
@@ -128,13 +248,35 @@ class DatabaseServer(LabradServer):
             return_dict["raw_result"] = result.raw_result
         return return_dict
 
-    @inlineCallbacks
+    @staticmethod
+    def BulkWriteResultToDict(result):
+        """
+        BulkWriteResultToDict(res)
+
+        Converts a :py:class:`pymongo.results.BulkWriteResult` to a dictionary.
+
+        Args:
+            res (:py:class:`pymongo.results.BulkWriteResult`): The result to convert to a dictionary
+
+        Returns:
+            dict: A dictionary containing the result's fields
+        """
+
+        return_dict = {"acknowledged": result.acknowledged}
+        if return_dict["acknowledged"]:
+            return_dict["inserted_count"] = result.inserted_count
+            return_dict["matched_count"] = result.matched_count
+            return_dict["modified_count"] = result.modified_count
+            return_dict["deleted_count"] = result.deleted_count
+            return_dict["upserted_ids"] = result.upserted_ids
+        return return_dict
+
     @setting(9, address='s', port='i', user='s', password='s', database='s', collection='s', timeout='i', returns='s')
     def connect(self, c, address=None, port=None, user=None, password=None, database=None, collection=None, timeout=2000):
         """
         connect(self, c, address=None, port=None, user=None, password=None, database=None, collection=None)
 
-        Connect to a MongoDB database. Connections are maintained per LabRAD context.
+        Connect to a MongoDB database. The selected database and collection are maintained per LabRAD context, but contexts connecting to the same address share a client.
 
         Args:
             c: LabRAD context
@@ -150,9 +292,8 @@ class DatabaseServer(LabradServer):
             str: A BSON-dumped string of the result of :py:meth:`pymongo.mongo_client.MongoClient.server_info` if the connection was successful and the string ``{}`` otherwise.
         """
 
-        if hasattr(c, 'c') and c.c is not None:
+        if c.c is not None:
             self.close(c)
-        c.c = None
         c.database = None
         c.collection = None
 
@@ -188,9 +329,12 @@ class DatabaseServer(LabradServer):
                 returnValue("{}")
 
         url = "mongodb://{}:{}@{}:{}/?authSource=admin".format(user, password, address, port)
-        c.c = yield MongoClient(url, connectTimeoutMS=timeout)
+        if url not in self.clients:
+            self.clients[url] = self.client_class(url, connectTimeoutMS=timeout, maxPoolSize=POOL_SIZE)
+        c.c = self.clients[url]
+        c.url = url
         try:
-            server_info = yield c.c.server_info()
+            server_info = yield self._run(c.c.server_info)
             server_info_str = dumps(server_info)
             
             if database is not None:
@@ -200,30 +344,38 @@ class DatabaseServer(LabradServer):
 
             returnValue(server_info_str)
         except Exception as e:
-            c.c = None
+            self.close(c)
             print("Could not connect to MongoDB database: {}".format(e))
             returnValue("{}")
-        
+
 
     @setting(10)
     def close(self, c):
         """
         close(self, c)
 
-        Close the client's context's connection to the database.
+        Close the client's context's connection to the database, and any cursors it has open. The shared MongoDB client is closed once no contexts are using it.
 
         Args:
             c: LabRAD context
         """
 
-        try:
-            if c.c is not None:
-                c.c.close()
-        except Exception as e:
-            print("Could not close MongoDB connection: {}".format(e))
+        for cursor_id in list(c.cursors.keys()):
+            self.close_cursor(c, cursor_id)
+        url = c.url
         c.c = None
+        c.url = None
+        if url is not None and not any(ctx.url == url for ctx in self._contexts_using_clients()):
+            try:
+                self.clients.pop(url).close()
+            except Exception as e:
+                print("Could not close MongoDB connection: {}".format(e))
+
+    def _contexts_using_clients(self):
+        # A context that is still being initialized has no data yet
+        data = [getattr(ctx, 'data', None) for ctx in self.contexts.values()]
+        return [d for d in data if getattr(d, 'url', None) is not None]
 
-    @inlineCallbacks
     @setting(11, database='s', returns='b')
     def set_database(self, c, database):
         """
@@ -240,15 +392,15 @@ class DatabaseServer(LabradServer):
         """
         
         try:
-            yield c.c[database]
+            c.c[database]
             c.database = database
-            returnValue(True)
+            return True
         except errors.InvalidName:
             c.database = database
-            returnValue(False)
+            return False
         except Exception as e:
             print("Could not set database: {}".format(e))
-            returnValue(False)
+            return False
 
     @setting(12, collection='s', returns='b')
     def set_collection(self, c, collection):
@@ -265,17 +417,18 @@ class DatabaseServer(LabradServer):
             bool: ``True`` if the collection exists in the current database, ``False`` otherwise
         """
         try:
-            yield c.c[c.database][collection]
+            c.c[c.database][collection]
             c.collection = collection
-            returnValue(True)
+            if (c.url, c.database, collection) not in self.indexed:
+                self.ensure_indexes(c)
+            return True
         except errors.InvalidName:
             c.collection = collection
-            returnValue(False)
+            return False
         except Exception as e:
             print("Could not set database {}'s collection to {}: {}".format(c.database, collection, e))
-            returnValue(False)
+            return False
 
-    @inlineCallbacks
     @setting(13, document='s', returns='s')
     def insert_one(self, c, document):
         """
@@ -294,13 +447,13 @@ class DatabaseServer(LabradServer):
         """
         document = loads(document)
         try:
-            result = yield c.c[c.database][c.collection].insert_one(document)
+            result = yield self._run(self._get_collection(c).insert_one, document)
             returnValue(dumps(DatabaseServer.InsertOneResultToDict(result)))
         except Exception as e:
             print("Could not insert document into collection {} of database {}: {}".format(c.collection, c.database, e))
             returnValue("{}")
 
-    @setting(14, documents='*s', ordered='b', returns='s')
+    @setting(14, documents=['*s', 's'], ordered='b', returns='s')
     def insert_many(self, c, documents, ordered=True):
         """
         insert_many(self, c, documents, ordered=True)
@@ -311,15 +464,18 @@ class DatabaseServer(LabradServer):
 
         Args:
             c: LabRAD context
-            documents (list of str): list of BSON-dumped strings of the documents to insert
+            documents (list of str or str): list of BSON-dumped strings of the documents to insert, or a single BSON-dumped string of the list of documents
             ordered (bool, optional): If ``True`` (the default) documents will be inserted on the server serially, in the order provided. If an error occurs all remaining inserts are aborted. If ``False``, documents will be inserted on the server in arbitrary order, possibly in parallel, and all document inserts will be attempted.
 
         Returns:
             str: A BSON-dumped string of the :py:class:`pymongo.results.InsertManyResult` if the operation was successful and the string ``{}`` otherwise.
         """
-        documents = [loads(document) for document in documents]
+        if isinstance(documents, str):
+            documents = loads(documents)
+        else:
+            documents = [loads(document) for document in documents]
         try:
-            result = yield c.c[c.database][c.collection].insert_many(documents, ordered=ordered)
+            result = yield self._run(self._get_collection(c).insert_many, documents, ordered=ordered)
             returnValue(dumps(DatabaseServer.InsertManyResultToDict(result)))
         except Exception as e:
             print("Could not insert documents into collection {} of database {}: {}".format(c.collection, c.database, e))
@@ -346,7 +502,7 @@ class DatabaseServer(LabradServer):
         replacement = loads(replacement)
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].replace_one(db_filter, replacement, upsert=upsert)
+            result = yield self._run(self._get_collection(c).replace_one, db_filter, replacement, upsert=upsert)
             returnValue(dumps(DatabaseServer.UpdateResultToDict(result)))
         except Exception as e:
             print("Could not replace document matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
@@ -373,7 +529,7 @@ class DatabaseServer(LabradServer):
         update = loads(update)
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].update_one(db_filter, update, upsert=upsert)
+            result = yield self._run(self._get_collection(c).update_one, db_filter, update, upsert=upsert)
             returnValue(dumps(DatabaseServer.UpdateResultToDict(result)))
         except Exception as e:
             print("Could not update document matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
@@ -400,7 +556,7 @@ class DatabaseServer(LabradServer):
         update = loads(update)
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].update_many(db_filter, update, upsert=upsert)
+            result = yield self._run(self._get_collection(c).update_many, db_filter, update, upsert=upsert)
             returnValue(dumps(DatabaseServer.UpdateResultToDict(result)))
         except Exception as e:
             print("Could not update documents matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
@@ -424,7 +580,7 @@ class DatabaseServer(LabradServer):
         """
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].delete_one(db_filter)
+            result = yield self._run(self._get_collection(c).delete_one, db_filter)
             returnValue(dumps(DatabaseServer.DeleteResultToDict(result)))
         except Exception as e:
             print("Could not delete document matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
@@ -448,7 +604,7 @@ class DatabaseServer(LabradServer):
         """
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].delete_many(db_filter)
+            result = yield self._run(self._get_collection(c).delete_many, db_filter)
             returnValue(dumps(DatabaseServer.DeleteResultToDict(result)))
         except Exception as e:
             print("Could not delete documents matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
@@ -473,7 +629,7 @@ class DatabaseServer(LabradServer):
         """
         db_filter = loads(db_filter)
         try:
-            result = yield c.c[c.database][c.collection].find_one(db_filter, projection=projection)
+            result = yield self._run(self._get_collection(c).find_one, db_filter, projection=projection)
             if result is not None:
                 returnValue(dumps(result))
             else:
@@ -482,6 +638,264 @@ class DatabaseServer(LabradServer):
             print("Could not find document matching filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
             returnValue("{}")
 
+    @setting(21, operations='s', ordered='b', returns='s')
+    def bulk_write(self, c, operations, ordered=True):
+        """
+        bulk_write(self, c, operations, ordered=True)
+
+        Send a batch of write operations to the database in a single request.
+
+        See :py:meth:`pymongo.collection.Collection.bulk_write`.
+
+        Args:
+            c: LabRAD context
+            operations (str): BSON-dumped string of a list of operations. Each operation is a dictionary with a single key, the name of the operation (``insert_one``, ``update_one``, ``update_many``, ``replace_one``, ``delete_one`` or ``delete_many``), whose value is a dictionary of the keyword arguments of the corresponding :py:mod:`pymongo.operations` class. For example::
+
+                [
+                    {"insert_one": {"document": {"_id": 1}}},
+                    {"update_many": {"filter": {"shot": {"$gt": 10}}, "update": {"$set": {"flag": true}}}}
+                ]
+
+            ordered (bool, optional): If ``True`` (the default) the operations are performed serially, in the order provided, and the remaining operations are aborted if an error occurs. If ``False``, the operations are performed in arbitrary order and all of them are attempted.
+
+        Returns:
+            str: A BSON-dumped string of the :py:class:`pymongo.results.BulkWriteResult` if the operation was successful and the string ``{}`` otherwise.
+        """
+        try:
+            requests = []
+            for operation in loads(operations):
+                (name, kwargs), = operation.items()
+                requests.append(BULK_OPERATIONS[name](**kwargs))
+            result = yield self._run(self._get_collection(c).bulk_write, requests, ordered=ordered)
+            returnValue(dumps(DatabaseServer.BulkWriteResultToDict(result)))
+        except Exception as e:
+            print("Could not perform bulk write in collection {} of database {}: {}".format(c.collection, c.database, e))
+            returnValue("{}")
+
+    @staticmethod
+    def _find_kwargs(projection=None, sort=None, limit=0, skip=0):
+        kwargs = {'projection': projection, 'limit': limit, 'skip': skip}
+        if sort is not None:
+            kwargs['sort'] = [tuple(s) for s in loads(sort)]
+        return kwargs
+
+    @setting(25, returns='*s')
+    def ensure_indexes(self, c):
+        """
+        ensure_indexes(self, c)
+
+        Create the indexes listed in ``config.json`` for the context's collection, if they do not already exist. Called automatically by :meth:`set_collection`.
+
+        Args:
+            c: LabRAD context
+
+        Returns:
+            [str]: The names of the indexes
+        """
+        keys_list = self.indexes.get(c.database, {}).get(c.collection, [])
+        collection = self._get_collection(c)
+
+        def create_indexes():
+            return [collection.create_index([tuple(k) for k in keys], background=True) for keys in keys_list]
+
+        try:
+            names = yield self._run(create_indexes)
+            # Only once they exist, so that a failed index build is tried again the next time the collection is selected
+            self.indexed.add((c.url, c.database, c.collection))
+            returnValue(names)
+        except Exception as e:
+            print("Could not create indexes in collection {} of database {}: {}".format(c.collection, c.database, e))
+            returnValue([])
+
+    @setting(26, keys='s', unique='b', returns='s')
+    def create_index(self, c, keys, unique=False):
+        """
+        create_index(self, c, keys, unique=False)
+
+        Create an index on the context's collection.
+
+        See :py:meth:`pymongo.collection.Collection.create_index`.
+
+        Args:
+            c: LabRAD context
+            keys (str): BSON-dumped string of a list of ``[key, direction]`` pairs, e.g. ``[["parameters.sequencer.*tof", 1]]``
+            unique (bool, optional): Whether the index should enforce uniqueness. Defaults to ``False``.
+
+        Returns:
+            str: The name of the index, or an empty string if it could not be created
+        """
+        keys = [tuple(k) for k in loads(keys)]
+        try:
+            name = yield self._run(self._get_collection(c).create_index, keys, unique=unique, background=True)
+            returnValue(name)
+        except Exception as e:
+            print("Could not create index {} in collection {} of database {}: {}".format(keys, c.collection, c.database, e))
+            returnValue("")
+
+    @setting(27, returns='s')
+    def list_indexes(self, c):
+        """
+        list_indexes(self, c)
+
+        List the indexes on the context's collection.
+
+        Args:
+            c: LabRAD context
+
+        Returns:
+            str: A BSON-dumped string of the index information, as returned by :py:meth:`pymongo.collection.Collection.index_information`
+        """
+        try:
+            info = yield self._run(self._get_collection(c).index_information)
+            returnValue(dumps(info))
+        except Exception as e:
+            print("Could not list indexes in collection {} of database {}: {}".format(c.collection, c.database, e))
+            returnValue("{}")
+
+    @setting(28, db_filter='s', projection='*s', sort='s', limit='i', skip='i', returns='s')
+    def query(self, c, db_filter, projection=None, sort=None, limit=0, skip=0):
+        """
+        query(self, c, db_filter, projection=None, sort=None, limit=0, skip=0)
+
+        Get the documents matching ``db_filter``. For example, to get the shot numbers of all shots of an experiment where ``*tof`` was between 1 and 3 ms::
+
+            database.query(
+                dumps({"experiment": "tofScan", "parameters.sequencer.*tof": {"$gte": 1e-3, "$lte": 3e-3}}),
+                ["shot"],
+                dumps([["shot", 1]]),
+            )
+
+        For large results, use :meth:`open_cursor` instead. See :py:meth:`pymongo.collection.Collection.find` for information on how ``db_filter`` (called ``filter`` in the documentation) works.
+
+        Args:
+            c: LabRAD context
+            db_filter (str): BSON-dumped string of the filter
+            projection ([str]): a list of field names that should be returned in the result set. Defaults to ``None``, in which case all fields are returned.
+            sort (str, optional): BSON-dumped string of a list of ``[key, direction]`` pairs to sort by. Defaults to ``None``.
+            limit (int, optional): The maximum number of documents to return. Defaults to 0, meaning no limit.
+            skip (int, optional): The number of documents to skip. Defaults to 0.
+
+        Returns:
+            str: A BSON-dumped string of the list of documents, or ``[]`` if the query failed
+        """
+        db_filter = loads(db_filter)
+        kwargs = self._find_kwargs(projection, sort, limit, skip)
+        collection = self._get_collection(c)
+        try:
+            result = yield self._run(lambda: list(collection.find(db_filter, **kwargs)))
+            returnValue(dumps(result))
+        except Exception as e:
+            print("Could not query filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
+            returnValue("[]")
+
+    @setting(29, db_filter='s', projection='*s', sort='s', limit='i', skip='i', returns='s')
+    def explain(self, c, db_filter, projection=None, sort=None, limit=0, skip=0):
+        """
+        explain(self, c, db_filter, projection=None, sort=None, limit=0, skip=0)
+
+        Get MongoDB's query plan and execution statistics for a :meth:`query` with the same arguments. The winning plan contains an ``IXSCAN`` stage if an index is used, and a ``COLLSCAN`` stage otherwise.
+
+        Args:
+            c: LabRAD context
+            db_filter (str): BSON-dumped string of the filter
+            projection ([str]): a list of field names that should be returned in the result set. Defaults to ``None``.
+            sort (str, optional): BSON-dumped string of a list of ``[key, direction]`` pairs to sort by. Defaults to ``None``.
+            limit (int, optional): The maximum number of documents to return. Defaults to 0, meaning no limit.
+            skip (int, optional): The number of documents to skip. Defaults to 0.
+
+        Returns:
+            str: A BSON-dumped string of the output of :py:meth:`pymongo.cursor.Cursor.explain`, or ``{}`` if it failed
+        """
+        db_filter = loads(db_filter)
+        kwargs = self._find_kwargs(projection, sort, limit, skip)
+        collection = self._get_collection(c)
+        try:
+            result = yield self._run(lambda: collection.find(db_filter, **kwargs).explain())
+            returnValue(dumps(result))
+        except Exception as e:
+            print("Could not explain filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
+            returnValue("{}")
+
+    @setting(22, db_filter='s', projection='*s', sort='s', limit='i', batch_size='i', returns='i')
+    def open_cursor(self, c, db_filter, projection=None, sort=None, limit=0, batch_size=BATCH_SIZE):
+        """
+        open_cursor(self, c, db_filter, projection=None, sort=None, limit=0, batch_size=BATCH_SIZE)
+
+        Open a cursor over the documents matching ``db_filter``. Retrieve the documents with :meth:`next_batch` and close the cursor with :meth:`close_cursor`. Cursors are closed automatically when the context expires.
+
+        See :py:meth:`pymongo.collection.Collection.find` for information on how ``db_filter`` (called ``filter`` in the documentation) works.
+
+        Args:
+            c: LabRAD context
+            db_filter (str): BSON-dumped string of the filter
+            projection ([str]): a list of field names that should be returned in the result set. Defaults to ``None``, in which case all fields are returned.
+            sort (str, optional): BSON-dumped string of a list of ``[key, direction]`` pairs to sort by. Defaults to ``None``.
+            limit (int, optional): The maximum number of documents to return. Defaults to 0, meaning no limit.
+            batch_size (int, optional): The number of documents retrieved from the database per round trip. Defaults to ``BATCH_SIZE``.
+
+        Returns:
+            int: The cursor ID, or -1 if the cursor could not be opened
+        """
+        db_filter = loads(db_filter)
+        try:
+            kwargs = self._find_kwargs(projection, sort, limit)
+            cursor = self._get_collection(c).find(db_filter, batch_size=batch_size, **kwargs)
+            cursor_id = c.next_cursor
+            c.next_cursor += 1
+            c.cursors[cursor_id] = cursor
+            return cursor_id
+        except Exception as e:
+            print("Could not open cursor for filter {} in collection {} of database {}: {}".format(db_filter, c.collection, c.database, e))
+            return -1
+
+    @setting(23, cursor_id='i', n='i', returns='s')
+    def next_batch(self, c, cursor_id, n=BATCH_SIZE):
+        """
+        next_batch(self, c, cursor_id, n=BATCH_SIZE)
+
+        Get the next documents from a cursor opened with :meth:`open_cursor`.
+
+        Args:
+            c: LabRAD context
+            cursor_id (int): The cursor ID returned by :meth:`open_cursor`
+            n (int, optional): The maximum number of documents to return. Defaults to ``BATCH_SIZE``.
+
+        Returns:
+            str: A BSON-dumped string of a list of up to ``n`` documents. The list is empty once the cursor is exhausted.
+        """
+        cursor = c.cursors[cursor_id]
+
+        def get_batch():
+            batch = []
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= n:
+                    break
+            return batch
+
+        try:
+            batch = yield self._run(get_batch)
+            returnValue(dumps(batch))
+        except Exception as e:
+            print("Could not get documents from cursor {}: {}".format(cursor_id, e))
+            self.close_cursor(c, cursor_id)
+            returnValue("[]")
+
+    @setting(24, cursor_id='i')
+    def close_cursor(self, c, cursor_id):
+        """
+        close_cursor(self, c, cursor_id)
+
+        Close a cursor opened with :meth:`open_cursor`.
+
+        Args:
+            c: LabRAD context
+            cursor_id (int): The cursor ID returned by :meth:`open_cursor`
+        """
+        cursor = c.cursors.pop(cursor_id, None)
+        if cursor is not None:
+            self._run(cursor.close)
+
 if __name__ == '__main__':
     from labrad import util
     util.runServer(DatabaseServer())
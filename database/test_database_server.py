@@ -0,0 +1,148 @@
+"""
+Tests of :mod:`database.database_server` against an in-memory database from `mongomock <https://github.com/mongomock/mongomock>`__, so that no MongoDB server is needed.
+
+.. code-block:: bash
+
+    python -m unittest test_database_server
+"""
+import os
+import unittest
+
+import mongomock
+from bson.json_util import loads, dumps
+from labrad.server import Context
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from database_server import DatabaseServer
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+
+class ContextData(object):
+    pass
+
+class MockDatabaseServer(DatabaseServer):
+    """ runs database operations synchronously, on mongomock clients """
+    client_class = mongomock.MongoClient
+
+    def _run(self, f, *args, **kwargs):
+        return defer.maybeDeferred(f, *args, **kwargs)
+
+
+def result(d):
+    """ the result of a Deferred that has already fired """
+    results = []
+    d.addBoth(results.append)
+    if isinstance(results[0], Failure):
+        results[0].raiseException()
+    return results[0]
+
+
+class TestDatabaseServer(unittest.TestCase):
+    def setUp(self):
+        self.server = MockDatabaseServer(CONFIG_PATH)
+        self.n_contexts = 0
+
+    def new_context(self, database='data', collection='shots', address='localhost'):
+        context = Context()
+        context.data = ContextData()
+        self.server.initContext(context.data)
+        self.server.contexts[(0, self.n_contexts)] = context
+        self.n_contexts += 1
+        server_info = result(self.server.connect(context.data, address, 27017, 'user', 'password', database, collection))
+        self.assertNotEqual(server_info, "{}")
+        return context.data
+
+    def test_bulk_write(self):
+        c = self.new_context()
+        operations = [
+            {"insert_one": {"document": {"_id": i, "shot": i}}} for i in range(5)
+        ] + [
+            {"update_many": {"filter": {"shot": {"$gt": 2}}, "update": {"$set": {"flag": True}}}},
+            {"delete_one": {"filter": {"_id": 0}}},
+        ]
+        response = loads(result(self.server.bulk_write(c, dumps(operations))))
+        self.assertTrue(response["acknowledged"])
+        self.assertEqual(response["inserted_count"], 5)
+        self.assertEqual(response["modified_count"], 2)
+        self.assertEqual(response["deleted_count"], 1)
+
+        collection = self.server.clients[c.url]['data']['shots']
+        self.assertEqual(sorted(d["_id"] for d in collection.find()), [1, 2, 3, 4])
+        self.assertEqual(sorted(d["_id"] for d in collection.find({"flag": True})), [3, 4])
+
+    def test_bulk_write_unknown_operation(self):
+        c = self.new_context()
+        response = result(self.server.bulk_write(c, dumps([{"insert": {"document": {}}}])))
+        self.assertEqual(response, "{}")
+
+    def test_cursor(self):
+        c = self.new_context()
+        result(self.server.insert_many(c, [dumps({"_id": i, "shot": i}) for i in range(25)]))
+
+        cursor_id = self.server.open_cursor(c, dumps({"shot": {"$gte": 5}}), ["shot"], dumps([["shot", -1]]), 0, 10)
+        self.assertNotEqual(cursor_id, -1)
+        shots = []
+        for expected in [10, 10, 0]:
+            batch = loads(result(self.server.next_batch(c, cursor_id, 10)))
+            self.assertEqual(len(batch), expected)
+            shots += [document["shot"] for document in batch]
+        self.assertEqual(shots, list(range(24, 4, -1)))
+
+        self.server.close_cursor(c, cursor_id)
+        self.assertNotIn(cursor_id, c.cursors)
+        self.assertNotEqual(self.server.open_cursor(c, dumps({})), cursor_id)
+
+    def test_close_closes_cursors(self):
+        c = self.new_context()
+        self.server.open_cursor(c, dumps({}))
+        self.server.open_cursor(c, dumps({}))
+        self.server.expireContext(c)
+        self.assertEqual(c.cursors, {})
+        self.assertIsNone(c.c)
+
+    def test_shared_client(self):
+        c1 = self.new_context()
+        c2 = self.new_context(collection='other')
+        c3 = self.new_context(address='otherhost')
+        self.assertIs(c1.c, c2.c)
+        self.assertIsNot(c1.c, c3.c)
+        self.assertEqual(len(self.server.clients), 2)
+
+        # A context that is still being initialized has no data
+        self.server.contexts[(0, self.n_contexts)] = Context()
+
+        self.server.close(c1)
+        self.assertIn(c2.url, self.server.clients)
+        self.server.close(c2)
+        self.assertEqual(list(self.server.clients), [c3.url])
+        self.server.stopServer()
+        self.assertEqual(self.server.clients, {})
+
+    def test_indexes(self):
+        c = self.new_context()
+        indexes = self.server.clients[c.url]['data']['shots'].index_information()
+        self.assertIn("parameters.sequencer.*tof_1", indexes)
+        self.assertIn("experiment_1_shot_1", indexes)
+        self.assertIn((c.url, 'data', 'shots'), self.server.indexed)
+
+    def test_failed_indexes_are_retried(self):
+        c = self.new_context(collection=None)
+        create_index = mongomock.Collection.create_index
+        def fail(*args, **kwargs):
+            raise mongomock.OperationFailure("index build failed")
+        mongomock.Collection.create_index = fail
+        try:
+            self.assertTrue(self.server.set_collection(c, 'shots'))
+        finally:
+            mongomock.Collection.create_index = create_index
+        self.assertNotIn((c.url, 'data', 'shots'), self.server.indexed)
+
+        self.assertTrue(self.server.set_collection(c, 'shots'))
+        self.assertIn((c.url, 'data', 'shots'), self.server.indexed)
+        self.assertIn("time_-1", self.server.clients[c.url]['data']['shots'].index_information())
+
+
+if __name__ == '__main__':
+    unittest.main()
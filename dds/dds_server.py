@@ -26,17 +26,22 @@ from time import sleep
 
 from labrad.server import LabradServer, setting, Signal
 from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.threads import deferToThread
 
 import json
 
 import datetime
 import os
+import threading
 
 from copy import deepcopy
 
 sys.path.append('../')
 from server_tools.device_server import DeviceServer
 
+# Serializes appends to the backup file from worker threads
+BACKUP_LOCK = threading.Lock()
+
 class ddsServer(DeviceServer):
     """Provides access to hardware's serial interface """
     name = '%LABRADNODE%_dds'
@@ -74,84 +79,60 @@ class ddsServer(DeviceServer):
 
 
     # Updating the DDS
-    @setting(12, sequence='s')
-    def update_dds(self, c, sequence):
-        # Get the sequence
+    @setting(12, sequence='s', force='b')
+    def update_dds(self, c, sequence, force=False):
+        """
+        Expects a json-dumped dict of format:
+        {"device": [{"address": address, "frequency": frequency}, ... ], ...}
+
+        Only channels whose tuning word changed are written, unless force is True.
+        Written channels are appended to the day's backup file in a worker thread.
+        """
         sequence = json.loads(sequence)
 
-        # Check whether any channels are actually changing!    
-        fixed_sequence = {}
+        written = {}
         for key, value in sequence.items():
-
-            # If the device name ("key") is not in the self.current_values dict and
-            # it refers to a real device, add it
-            if key not in self.current_values and key in self.devices:
+            if key not in self.devices:
+                continue
+            dev = self.devices[key]
+            if key not in self.current_values:
                 self.current_values[key] = {}
 
-            # If the key is valid
-            if key in self.devices:
-                fixed_sequence[key] = []
-                channels = [c.__dict__ for c in self.devices[key].channels]
-                
-                # Data is coming in as
-                # sequence = {device: [{"address": address, "frequency": frequency}, ...], ...}
-                for entry in value:
-                    # For convenience, the current values are located in a dict of format:
-                    # self.current_values = {
-                    #     device: {"channel_name": frequency}
-                    # }
-                    # So we need to get the channel names
-                    for c in channels:
-                        if entry['address'] == c['loc']:
-                            entry['name'] = c['name']
-                    try:
-                        # Check if the channel name is in the dict already
-                        if entry['name'] in self.current_values[key].keys():
-                            # If frequency is not the same, then we add it to the list of changes
-                            # Edit: update all the channels all the time
-                            # if entry['frequency'] != self.current_values[key][entry['name']]:
-                                fixed_sequence[key].append(entry)
-                        # If it's not, that's because the channel has never been updated since the server has been alive
-                        # so it doesn't know what the value is
-                        else:
-                            fixed_sequence[key].append(entry)
-
-                        # Set the current value in the dict to the current frequency
-                        self.current_values[key][entry['name']] = entry['frequency']
-                    except Exception as e:
-                        print(e)
-
-
-        # Expect a dict of format:
-        # {"device": [{"address": address, "frequency": frequency}, ... ], ...}
-        flag = 0 # Flag keeps track of whether any channels were actually updated
-        for key, value in fixed_sequence.items():
-            if key in self.devices and len(value) > 0:
-                dev = self.devices[key]
-                yield dev.program_frequencies(value)
-                flag = 1
+            # For convenience, the current values are located in a dict of format:
+            # self.current_values = {
+            #     device: {"channel_name": frequency}
+            # }
+            # So we need to get the channel names
+            names = {tuple(ch.loc): ch.name for ch in dev.channels}
+            for entry in value:
+                entry['name'] = names.get(tuple(entry['address']))
+                self.current_values[key][entry['name']] = entry['frequency']
+
+            entries = yield dev.program_frequencies(value, force)
+            if len(entries) > 0:
+                written[key] = entries
 
         # If an update occurred, need to update the backup
-        if flag == 1:
-            # Check directory for backup
+        if len(written) > 0:
             nowtime = datetime.datetime.now()
-            # savedir = nowtime.strftime('.\\backup\\' + '%Y%m%d\\')
-            savedir = nowtime.strftime('.\\backup\\')
+            self.last_update_time = nowtime.strftime('%H:%M:%S')
+            deferToThread(self.write_backup, nowtime, written)
+
+    def write_backup(self, nowtime, written):
+        # Check directory for backup
+        # savedir = nowtime.strftime('.\\backup\\' + '%Y%m%d\\')
+        savedir = nowtime.strftime('.\\backup\\')
+        try:
             if not os.path.isdir(savedir):
                 os.makedirs(savedir)
 
-            self.last_update_time = nowtime.strftime('%H:%M:%S')
-
-            # # Write the json string to the backup file
-            # with open(savedir + nowtime.strftime('%H_%M_%S') + ".txt", 'w') as f:
-            #     f.write(json.dumps(fixed_sequence))
-            
             # Write the json string to the backup file
-            with open(savedir + nowtime.strftime('%Y%m%d') + ".txt", 'a') as f:
-                f.write(self.last_update_time + " :\n")
-                f.write(json.dumps(fixed_sequence))
+            with BACKUP_LOCK, open(savedir + nowtime.strftime('%Y%m%d') + ".txt", 'a') as f:
+                f.write(nowtime.strftime('%H:%M:%S') + " :\n")
+                f.write(json.dumps(written))
                 f.write("\n")
-
+        except Exception as e:
+            print("Could not write DDS backup: {}".format(e))
 
     @setting(13, returns='s')
     def get_last_update_time(self, c):
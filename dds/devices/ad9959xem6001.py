@@ -1,18 +1,21 @@
 import json
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.task import deferLater
 import sys
 
 sys.path.append('../../')
 from server_tools.device_server import DeviceWrapper
 
-from time import sleep
-
 ### DDS parameters ####
 
 MULTIPLIER = 20
 VCOGAIN = 1 # 1 for on, 0 for off
 CLOCK = 20
 
+# Time to hold the channel select wire in before clearing it (s)
+WRITE_DELAY = 0.1
+
 class ddsChannel(object):
     def __init__(self, config):
         """ defaults """
@@ -44,8 +47,11 @@ class ad9959xem6001(DeviceWrapper):
 
         self.bitfile = 'dds3_ad9959.bit'
         self.data_wires = [0x00, 0x01, 0x02]
+        self.write_delay = WRITE_DELAY
 
         self.current_values = [None]*self.numchannels
+        # Tuning words last written to the hardware
+        self.current_words = [None]*self.numchannels
 
         """ non-defaults"""
         for key, value in config.items():
@@ -79,43 +85,54 @@ class ad9959xem6001(DeviceWrapper):
     @inlineCallbacks
     # sequence should be a list of dicts
     # [{"address": address, "frequency": frequency}, ..., ]
-    def program_frequencies(self, sequence):
+    def program_frequencies(self, sequence, force=False):
+        """
+        Writes frequencies to the DDS channels, skipping channels whose tuning word is
+        already programmed unless force is True. Each channel's wire ins are set and
+        updated in one request, and the channel select is cleared write_delay later
+        without blocking the reactor.
+
+        Returns the list of entries that were written to the hardware.
+        """
+        written = []
         for item in sequence:
             try:
                 address = item['address']
                 frequency = item['frequency']
+                index = 4*address[0] + address[1]
 
                 if frequency >= 0 and frequency < self.clk * self.multiplier / 2.0:
                     # Calculate tuning word 
                     tuningword = self.freq2word(float(frequency), self.clk * self.multiplier)
-                    ep02, ep01 = self.wordsplit(tuningword)
-
-                    # Get channel select and clock 
-                    ep00 = self.cselect(address[0], address[1], self.multiplier, self.vcogain)
 
                     # Get channel name
-                    name = self.channels[4*address[0] + address[1]].name
-                    print("{0} MHz written to {1}".format(frequency, name))
+                    name = self.channels[index].name
 
                     # Update current_values array
-                    self.current_values[4*address[0] + address[1]] = {"name": name, "frequency": frequency}
+                    self.current_values[index] = {"name": name, "frequency": frequency}
 
-                    # Set wire ins to FPGA
-                    yield self.connection.set_wire_in(0x00, ep00)
-                    yield self.connection.set_wire_in(0x01, ep01)
-                    yield self.connection.set_wire_in(0x02, ep02)
-                    yield self.connection.update_wire_ins()
+                    if tuningword == self.current_words[index] and not force:
+                        continue
 
-                    sleep(0.1)
-                    # yield sleep(0.001)
+                    ep02, ep01 = self.wordsplit(tuningword)
+
+                    # Get channel select and clock 
+                    ep00 = self.cselect(address[0], address[1], self.multiplier, self.vcogain)
 
-                    yield self.connection.set_wire_in(0x00, 0)
-                    yield self.connection.update_wire_ins()
+                    # Set wire ins to FPGA
+                    yield self.connection.set_wire_ins([(0x00, ep00), (0x01, ep01), (0x02, ep02)])
+                    yield deferLater(reactor, self.write_delay, lambda: None)
+                    yield self.connection.set_wire_ins([(0x00, 0)])
+
+                    self.current_words[index] = tuningword
+                    written.append(item)
+                    print("{0} MHz written to {1}".format(frequency, name))
                 else:
                     print("Channel ({}, {}): Frequency out of range.\n".format(address[0], address[1]))
             
             except Exception as e:
                 print(e)
+        returnValue(written)
 
     def freq2word(self, frequency, clock):
         #Convert frequency in MHz to tuning word
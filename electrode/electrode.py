@@ -27,11 +27,13 @@ import pty
 from time import sleep
 
 import os
+from collections import OrderedDict
 from datetime import datetime
 
 from labrad.server import LabradServer, setting, Signal
 from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
 
 sys.path.append('../')
 from server_tools.device_server import DeviceServer
@@ -40,9 +42,12 @@ sys.path.append('./clients/lib/')
 from helpers import json_load_byteified, json_loads_byteified
 
 from calibrations import *
+from optimizer import PythonOptimizer, JuliaOptimizer
 
 PRESETS_PATH = 'values.json'
 BACKUP_PATH = '/dataserver/data/'
+OPTIMIZER_URL = 'http://127.0.0.1:8000/opt'
+OPTIMIZATION_CACHE_SIZE = 256
 
 class ElectrodeServer(LabradServer):
     """
@@ -50,6 +55,8 @@ class ElectrodeServer(LabradServer):
     
     Loads preset values from ``PRESETS_PATH`` (currently ``value.json``) when started and saves backup files to ``BACKUP_PATH`` (currently ``/dataserver/data/``).
 
+    Also solves for electrode voltages that produce a target field with :meth:`optimize`. The backend is set by ``optimizer_backend`` in ``config.json``: either ``"python"`` (:class:`electrode.optimizer.PythonOptimizer`, the default) or ``"julia"`` (the Genie app at ``optimizer_url``, which is only started if selected).
+
     Electrode presets are stored in JSON files, with a typical entry being of the form
 
     .. code-block:: json
@@ -93,6 +100,8 @@ class ElectrodeServer(LabradServer):
     presets_changed = Signal(101010, 'signal: presets changed', 'b')
     
     verbose = False
+    optimizer_backend = 'python'
+    optimizer_url = OPTIMIZER_URL
 
     def __init__(self, config_path='./config.json'):
         super(ElectrodeServer, self).__init__()
@@ -101,11 +110,12 @@ class ElectrodeServer(LabradServer):
         self.load_config(config_path)
         self._reload_presets()
         self.time = None
+        self.webserver = None
 
-        try:
-            subprocess.check_output("curl http://127.0.0.1:8000/", shell=True)
-        except:
-            self.start_webserver()
+        self.optimizers = {}
+        self.optimization_cache = OrderedDict()
+        if self.optimizer_backend == 'julia':
+            self._ensure_webserver()
         
         l = LoopingCall(self.daily_backup)
         l.start(60)
@@ -134,6 +144,12 @@ class ElectrodeServer(LabradServer):
             for key, value in config.items():
                 setattr(self, key, value)
 
+    def _ensure_webserver(self):
+        try:
+            subprocess.check_output("curl {}".format(self.optimizer_url.rsplit('/', 1)[0] + '/'), shell=True)
+        except:
+            self.start_webserver()
+
     def start_webserver(self):
         """
         start_webserver(self)
@@ -176,9 +192,10 @@ class ElectrodeServer(LabradServer):
         """
         stopServer(self)
 
-        Called when the server is stopped. Shuts down the electrode calculator web server.
+        Called when the server is stopped. Shuts down the electrode calculator web server, if it was started.
         """
-        self.stop_webserver()
+        if self.webserver is not None:
+            self.stop_webserver()
 
     @setting(1, returns='s')
     def get_presets(self, c):
@@ -377,6 +394,66 @@ class ElectrodeServer(LabradServer):
             self.verbose = False
             return "Verbose setting off."
 
+    def _get_optimizer(self, backend):
+        if backend not in self.optimizers:
+            if backend == 'python':
+                self.optimizers[backend] = PythonOptimizer()
+            elif backend == 'julia':
+                self._ensure_webserver()
+                self.optimizers[backend] = JuliaOptimizer(self.optimizer_url)
+            else:
+                raise ValueError("Unknown optimizer backend {}".format(backend))
+        return self.optimizers[backend]
+
+    @setting(7, points='s', backend='s', returns='s')
+    def optimize(self, c, points, backend=None):
+        """
+        optimize(self, c, points, backend=None)
+
+        Finds electrode voltages that produce the target fields in ``points``. See :mod:`electrode.optimizer` for the format of the points and results.
+
+        The optimization runs in the reactor's thread pool, so the server can handle other requests in the meantime. Results are cached by the targets, weights and initial guess (usually the voltages of the preset being optimized), so repeating a request with the same preset returns immediately.
+
+        Args:
+            c: LabRAD context
+            points (str): A JSON-formatted list of dicts of target field parameters
+            backend (str, optional): ``"python"`` or ``"julia"``. Defaults to None, in which case ``optimizer_backend`` from ``config.json`` is used.
+
+        Returns:
+            str: A JSON-formatted list of results, one for each point
+        """
+        if backend is None:
+            backend = self.optimizer_backend
+        key = (backend, json.dumps(json.loads(points), sort_keys=True))
+        if key in self.optimization_cache:
+            results = self.optimization_cache.pop(key)
+        else:
+            optimizer = self._get_optimizer(backend)
+            results = yield deferToThread(optimizer.optimize_points, json.loads(points))
+        self.optimization_cache[key] = results
+        while len(self.optimization_cache) > OPTIMIZATION_CACHE_SIZE:
+            self.optimization_cache.popitem(last=False)
+        returnValue(json.dumps(results))
+
+    @setting(8, backend='s', returns='s')
+    def set_optimizer_backend(self, c, backend=None):
+        """
+        set_optimizer_backend(self, c, backend=None)
+
+        Gets or sets the default backend for :meth:`optimize`.
+
+        Args:
+            c: LabRAD context
+            backend (str, optional): ``"python"`` or ``"julia"``. Defaults to None, in which case the backend is not changed.
+
+        Returns:
+            str: The current default backend
+        """
+        if backend is not None:
+            self._get_optimizer(backend)
+            self.optimizer_backend = backend
+        return self.optimizer_backend
+
     
 if __name__ == "__main__":
     from labrad import util
@@ -0,0 +1,235 @@
+"""
+Optimization backends for finding electrode voltages that produce a target field.
+
+:class:`PythonOptimizer` is a NumPy/SciPy port of the least-squares solver in the Julia Genie app (`webservers/ElectrodeCalculator <https://github.com/krbjila/labrad_tools/tree/master/webservers/ElectrodeCalculator>`_). It runs in-process, so :class:`electrode.electrode.ElectrodeServer` can call it from a worker thread instead of blocking on an HTTP request.
+
+:class:`JuliaOptimizer` forwards the same requests to the Genie app's ``/opt`` route, and is kept as an optional backend.
+
+Both backends take a list of points, each of the form
+
+.. code-block:: json
+
+    {
+        "bias": 1019.0,
+        "angle": 36.0,
+        "dEdx": 30.0,
+        "dEdy": 6000.0,
+        "LP": 3.08, "UP": -3.08, "LW": 0.0, "LE": 0.0, "UE": 0.0, "UW": 0.0,
+        "weights": {"bias": 1, "dipole": 0, "angle": 1, "dEdx": 1, "dEdy": 1, "nux": 0, "nuy": 0, "d2Edx2": 1, "d2Edy2": 1}
+    }
+
+Targets that are missing from ``PARAM_ORDER`` are given zero weight. The electrode voltages (``KEY_ORDER``) are the initial guess, and ``weights`` is optional. If a point has no initial guess or weights, the result of the previous point is used, as in the Julia app. Each result is a dict with keys ``V``, ``P``, ``weights`` and ``info``.
+"""
+import json
+import os
+from math import factorial
+
+import numpy as np
+from numpy.polynomial.polynomial import polyval, polyder
+
+COEFFS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clients/lib/efield/comsol/data/fit_coeffs.json')
+KEY_ORDER = ['LP', 'UP', 'LW', 'LE', 'UE', 'UW']
+PARAM_ORDER = ['bias', 'dipole', 'angle', 'dEdx', 'dEdy', 'nux', 'nuy', 'd2Edx2', 'd2Edy2']
+
+# Optimization constants
+WEIGHTS = np.array([1, 0, 1, 1, 1, 0, 0, 1, 1], dtype=float)
+V_MAX = 5000.*np.ones(6)
+V_MIN = -5000.*np.ones(6)
+TOLERANCE = 1E-8
+
+# Physical constants
+AMU = 1.66054e-27 # kg
+DVCM_TO_J = 3.33564e-28 # J
+
+# Physical parameters for KRb
+D_POLY_FIT = np.array([0, 0.0561, -0.00337, 1.03812e-4, -1.42283e-6, 5.34778e-9])
+MASS = 127*AMU
+
+# Polynomial order of the COMSOL fits
+ORDER = 7
+
+
+class PythonOptimizer(object):
+    """
+    PythonOptimizer(object)
+
+    In-process electrode optimizer, equivalent to ``CalculatorController`` in the Julia app.
+
+    The COMSOL fits are only ever evaluated at the origin, so the field and its derivatives are precomputed as linear maps from the electrode voltages.
+
+    Args:
+        path (str, optional): Path to the JSON file of fitted electrode polynomials. Defaults to ``COEFFS_PATH``.
+    """
+    name = 'python'
+
+    def __init__(self, path=COEFFS_PATH):
+        with open(path, 'r') as f:
+            coeffs = json.load(f)
+        c = np.array([np.reshape(coeffs[k], (ORDER + 1, ORDER + 1)) for k in KEY_ORDER])
+
+        def d(i, j):
+            # d^(i+j) V / dx^i dy^j at the origin for each electrode; the fits are in units of 10^(i+j)
+            return c[:, i, j] * 10.**(i + j) * factorial(i) * factorial(j)
+
+        self.ExV = -np.array([d(1, 0), d(0, 1)]).T
+        self.dEdxV = -np.array([d(2, 0), d(1, 1)]).T
+        self.dEdyV = -np.array([d(1, 1), d(0, 2)]).T
+        self.d2Edx2V = -np.array([d(3, 0), d(2, 1)]).T
+        self.d2Edy2V = -np.array([d(1, 2), d(0, 3)]).T
+
+        self.dDdE_poly = polyder(D_POLY_FIT, 1)
+        self.d2DdE2_poly = polyder(D_POLY_FIT, 2)
+
+    def get_params(self, V):
+        """
+        get_params(self, V)
+
+        Args:
+            V (array): Electrode voltages, in the order of ``KEY_ORDER``
+
+        Returns:
+            array: Field parameters, in the order of ``PARAM_ORDER``
+        """
+        Ev = np.dot(V, self.ExV)
+        dEdxv = np.dot(V, self.dEdxV)
+        dEdyv = np.dot(V, self.dEdyV)
+        d2Edx2v = np.dot(V, self.d2Edx2V)
+        d2Edy2v = np.dot(V, self.d2Edy2V)
+
+        bias = np.sqrt(np.dot(Ev, Ev))
+        angle = np.degrees(np.arctan2(Ev[0], Ev[1]))
+        if bias != 0.0:
+            dEdx = np.dot(Ev, dEdxv)/bias
+            dEdy = np.dot(Ev, dEdyv)/bias
+            d2Edx2 = (np.dot(dEdxv, dEdxv) + np.dot(d2Edx2v, Ev) - dEdx**2)/bias
+            d2Edy2 = (np.dot(dEdyv, dEdyv) + np.dot(d2Edy2v, Ev) - dEdy**2)/bias
+        else:
+            dEdx = dEdy = d2Edx2 = d2Edy2 = 0.0
+
+        # The dipole fit is in kV/cm
+        dipole = polyval(bias/1000., D_POLY_FIT)
+        dDdE = polyval(bias/1000., self.dDdE_poly)/1000.
+        d2DdE2 = polyval(bias/1000., self.d2DdE2_poly)/1000./1000.
+
+        dipoleoverbias = dipole/bias if bias != 0.0 else 0.0
+        biaspoly = 2*dDdE + bias*d2DdE2
+        kx = (dipoleoverbias + dDdE)*np.dot(Ev, d2Edx2v) + dEdx**2*biaspoly
+        ky = (dipoleoverbias + dDdE)*np.dot(Ev, d2Edy2v) + dEdy**2*biaspoly
+        nux = -np.sign(kx)*np.sqrt(abs(100*DVCM_TO_J*kx)/(2*np.pi*MASS))
+        nuy = -np.sign(ky)*np.sqrt(abs(100*DVCM_TO_J*ky)/(2*np.pi*MASS))
+
+        return np.array([bias, dipole, angle, dEdx, dEdy, nux, nuy, d2Edx2, d2Edy2])
+
+    def _barrier(self, V):
+        tiny = np.nextafter(0., 1.)
+        return np.sum(-np.log(np.maximum(V - V_MIN, tiny)) - np.log(np.maximum(V_MAX - V, tiny)))
+
+    def _err(self, p, V, w):
+        return np.dot(w, (self.get_params(V) - p)**2)
+
+    def optimize(self, p, V0=None, w=WEIGHTS):
+        """
+        optimize(self, p, V0=None, w=WEIGHTS)
+
+        Minimizes the weighted least-squares error between the field parameters and the targets ``p`` with BFGS. A log barrier keeps the voltages within ``V_MIN`` and ``V_MAX``.
+
+        Args:
+            p (array): Target field parameters, in the order of ``PARAM_ORDER``
+            V0 (array, optional): Initial guess for the electrode voltages. Defaults to None, in which case a random guess is used.
+            w (array, optional): Weights for each parameter. Defaults to ``WEIGHTS``.
+
+        Returns:
+            dict: The optimized voltages ``V``, the resulting parameters ``P``, the ``weights``, and an ``info`` dict with the error and number of iterations.
+        """
+        from scipy.optimize import minimize
+
+        if V0 is None:
+            V0 = np.random.randn(6)
+        f = lambda V: self._err(p, V, w) + self._barrier(V)
+        res = minimize(f, V0, method='BFGS', options={'gtol': TOLERANCE})
+
+        bestV = np.clip(res.x, V_MIN, V_MAX)
+        p2 = self.get_params(bestV)
+        return {
+            'V': {k: float(bestV[i]) for (i, k) in enumerate(KEY_ORDER)},
+            'P': {k: float(p2[i]) for (i, k) in enumerate(PARAM_ORDER)},
+            'weights': {k: float(w[i]) for (i, k) in enumerate(PARAM_ORDER)},
+            'info': {
+                'err': float(self._err(p, bestV, w)),
+                'iter': int(res.nit),
+                'barrier': float(self._barrier(bestV)),
+            },
+        }
+
+    def optimize_points(self, points):
+        """
+        optimize_points(self, points)
+
+        Optimizes a list of points, with the same semantics as the ``/opt`` route of the Julia app.
+
+        Args:
+            points (list): List of dicts of target parameters. See the module docstring for the format.
+
+        Returns:
+            list: List of result dicts, one for each point
+        """
+        results = []
+        last_result = None
+        last_weight = None
+        for point in points:
+            p = np.array([float(point.get(k) or 0) for k in PARAM_ORDER])
+            if KEY_ORDER[0] in point:
+                V0 = np.array([float(point[k]) for k in KEY_ORDER])
+            else:
+                V0 = last_result
+
+            if 'weights' in point:
+                w = np.array([float(point['weights'][k]) for k in PARAM_ORDER])
+            elif last_weight is not None:
+                w = np.copy(last_weight)
+            else:
+                w = np.copy(WEIGHTS)
+            for (i, k) in enumerate(PARAM_ORDER):
+                if point.get(k) is None:
+                    w[i] = 0
+
+            result = self.optimize(p, V0, w)
+            last_result = np.array([result['V'][k] for k in KEY_ORDER])
+            last_weight = w
+            results.append(result)
+        return results
+
+
+class JuliaOptimizer(object):
+    """
+    JuliaOptimizer(object)
+
+    Forwards optimization requests to the Julia Genie app. This blocks until the app responds, so it should be called from a worker thread.
+
+    Args:
+        url (str): URL of the app's ``/opt`` route
+    """
+    name = 'julia'
+
+    def __init__(self, url):
+        self.url = url
+
+    def optimize_points(self, points):
+        """
+        optimize_points(self, points)
+
+        Args:
+            points (list): List of dicts of target parameters. See the module docstring for the format.
+
+        Raises:
+            ValueError: if the app does not return successfully
+
+        Returns:
+            list: List of result dicts, one for each point
+        """
+        import requests
+
+        r = requests.post(self.url, json={'p': points})
+        if r.status_code != 200:
+            raise ValueError("Optimization server failed: {}".format(r.text))
+        return r.json()['p']
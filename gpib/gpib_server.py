@@ -23,6 +23,7 @@ import sys
 import pyvisa
 
 from labrad.server import LabradServer, setting
+from twisted.internet.defer import returnValue
 
 sys.path.append('../')
 from server_tools.hardware_interface_server import HardwareInterfaceServer
@@ -32,21 +33,24 @@ class GPIBServer(HardwareInterfaceServer):
     """Provides direct access to GPIB-enabled hardware."""
     name = '%LABRADNODE%_gpib'
 
-    def refresh_available_interfaces(self):
-        """ Fill self.interfaces with available connections using Python VISA """
-        rm = pyvisa.ResourceManager('@py')
-        addresses = rm.list_resources()
-        additions = set(addresses) - set(self.interfaces.keys())
-        deletions = set(self.interfaces.keys()) - set(addresses)
-        for address in additions:
-            if address.startswith('GPIB'):
-                inst = rm.open_resource(address)
-                inst.write_termination = ''
-                #inst.clear()
-                self.interfaces[address] = inst
-                print('connected to GPIB device {}'.format(address)) 
-        for addr in deletions:
-            del self.interfaces[addr]
+    rm = None
+
+    def get_resource_manager(self):
+        """ The Python VISA resource manager, which is reused """
+        if self.rm is None:
+            self.rm = pyvisa.ResourceManager('@py')
+        return self.rm
+
+    def list_addresses(self):
+        """ Addresses of the GPIB devices, using Python VISA """
+        return [a for a in self.get_resource_manager().list_resources() if a.startswith('GPIB')]
+
+    def open_interface(self, address):
+        inst = self.get_resource_manager().open_resource(address)
+        inst.write_termination = ''
+        #inst.clear()
+        print('connected to GPIB device {}'.format(address))
+        return inst
 
     @setting(3, data='s', returns='')
     def write(self, c, data):
@@ -59,7 +63,7 @@ class GPIBServer(HardwareInterfaceServer):
             c: The LabRAD context
             data (string): The string to be written to the GPIB bus
         """   
-        self.call_if_available('write', c, data)
+        yield self.call_in_thread('write', c, data)
 
     @setting(4, n_bytes='w', returns='s')
     def read(self, c, n_bytes=None):
@@ -76,8 +80,8 @@ class GPIBServer(HardwareInterfaceServer):
         Returns:
             string: The bytes returned from the device, with leading and trailing whitespace stripped
         """  
-        response = self.call_if_available('read', c)
-        return response.strip()
+        response = yield self.call_in_thread('read', c)
+        returnValue(response.strip())
 
     @setting(5, data='s', returns='s')
     def query(self, c, data):
@@ -95,8 +99,8 @@ class GPIBServer(HardwareInterfaceServer):
         """ 
 #        self.call_if_available('write', c, data)
 #        ans = self.call_if_available('read_raw', c)
-        response = self.call_if_available('query', c, data)
-        return response.strip()
+        response = yield self.call_in_thread('query', c, data)
+        returnValue(response.strip())
 
     @setting(6, timeout='v', returns='v')
     def timeout(self, c, timeout=None):
@@ -117,6 +121,37 @@ class GPIBServer(HardwareInterfaceServer):
             interface.timeout = timeout
         return interface.timeout
 
+    @setting(7, reset='b', returns='s')
+    def get_interface_stats(self, c, reset=False):
+        """
+        get_interface_stats(self, c, reset=False)
+
+        Gets the number of calls, errors and timeouts, and the latency, of the GPIB devices that have been written to or read from.
+
+        Args:
+            c: The LabRAD context
+            reset (bool, optional): Whether to reset the counters after reading them. Defaults to False.
+
+        Returns:
+            str: A serialized json of ``{address: {"calls": ..., "errors": ..., "timeouts": ..., "mean_latency": ..., "max_latency": ..., "last_latency": ...}}``, with latencies in seconds
+        """
+        return self.get_stats(reset)
+
+    @setting(8, returns='s')
+    def get_interface_discovery_stats(self, c):
+        """
+        get_interface_discovery_stats(self, c)
+
+        Gets how many times the GPIB devices were listed, opened and removed, and how many times each was rediscovered after failing.
+
+        Args:
+            c: The LabRAD context
+
+        Returns:
+            str: A serialized json of ``{"enumerations": ..., "rescans": ..., "opened": ..., "removed": ..., "addresses": {address: {"rediscoveries": ..., "failures": ..., "skipped": ..., "backoff": ...}}}``, where ``skipped`` counts rediscoveries not tried during a backoff, and ``backoff`` is in seconds
+        """
+        return self.get_discovery_stats()
+
 
 if __name__ == '__main__':
     from labrad import util
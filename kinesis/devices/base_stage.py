@@ -0,0 +1,145 @@
+import os, sys
+import threading
+from time import time
+
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../..'))
+from server_tools.device_server import DeviceWrapper
+
+STATUS_INTERVAL = 0.02 # s, between status checks while waiting for a move to finish
+TOLERANCE = 0.01 # how close to the target a move has to end, in the stage's units
+
+class BaseStage(DeviceWrapper):
+    """
+    BaseStage(DeviceWrapper)
+
+    Common logic for Kinesis stages. Subclasses implement the blocking primitives (``_enable``, ``_disable``, ``_home``, ``_move_to``, ``_move_by``, ``_position``, ``_is_moving`` and ``_arm``), which are called from threads so that slow moves don't block the reactor.
+
+    Move sequences are run by arming the first position to be moved to on the next trigger, waiting in a thread for the stage to stop within ``tolerance`` of it, checking every ``STATUS_INTERVAL``, and then arming the next position straight away. The targets, final position errors, move times and the latency of arming each position after the previous move finished are kept in ``self.report``.
+    """
+    def __init__(self, config):
+        self.tolerance = TOLERANCE
+
+        for key, value in config.items():
+            setattr(self, key, value)
+
+        self.address = self.serial
+        self.cancel = threading.Event()
+        self.report = []
+        self.sequence = None
+        super(BaseStage, self).__init__({})
+
+    def enable(self):
+        return deferToThread(self._enable)
+
+    def disable(self):
+        return deferToThread(self._disable)
+
+    def home(self, timeout=10.0):
+        """
+        home(self, timeout=10)
+
+        Homes the stage.
+
+        Args:
+            timeout (float, optional): The timeout in seconds. Defaults to 10.
+        """
+        return deferToThread(self._home, timeout)
+
+    def move_to(self, position, timeout=10.0):
+        return deferToThread(self._move_to, position, timeout)
+
+    def move_by(self, displacement, timeout=10.0):
+        return deferToThread(self._move_by, displacement, timeout)
+
+    def get_position(self):
+        return deferToThread(self._position)
+
+    def move_on_trigger(self, position):
+        return deferToThread(self._arm, position)
+
+    @inlineCallbacks
+    def move_sequence(self, positions, immediate_move=True):
+        """
+        move_sequence(self, positions, immediate_move=True)
+
+        Starts a sequence of moves, each made on a trigger, stopping any sequence that is already running. Fires once the first triggered move is armed; the rest of the sequence runs in the background.
+
+        Args:
+            positions (list): The positions to move to
+            immediate_move (bool, optional): Whether to move to the first position straight away, instead of on a trigger. Defaults to True.
+        """
+        self.stop_sequence()
+        cancel = self.cancel = threading.Event()
+        self.report = []
+
+        positions = list(positions)
+        if immediate_move and positions:
+            yield self.move_to(positions[0])
+            positions = positions[1:]
+        if positions:
+            yield self.move_on_trigger(positions[0])
+            self.sequence = self._run_sequence(positions, cancel, time())
+            self.sequence.addErrback(self._sequence_failed)
+
+    def stop_sequence(self):
+        """
+        stop_sequence(self)
+
+        Stops waiting for the moves of the running sequence, if any. A move that has already been armed will still be made on the next trigger.
+        """
+        self.cancel.set()
+
+    def _sequence_failed(self, failure):
+        print("Kinesis move sequence on {} failed: {}".format(self.name, failure.getErrorMessage()))
+        self.report.append({'error': failure.getErrorMessage()})
+
+    @inlineCallbacks
+    def _run_sequence(self, positions, cancel, armed):
+        for (i, position) in enumerate(positions):
+            if i > 0:
+                yield deferToThread(self._arm, position)
+                armed = time()
+            result = yield deferToThread(self._wait_for_arrival, position, cancel)
+            if result is None:
+                return
+            (started, arrived, error) = result
+            self.report.append({
+                'target': position,
+                'position_error': error,
+                'move_time': arrived - started if started is not None else None,
+                'arm_latency': armed - self.report[-1]['arrived'] if self.report else None,
+                'arrived': arrived,
+            })
+
+    def _wait_for_arrival(self, position, cancel, timeout=None):
+        """
+        _wait_for_arrival(self, position, cancel, timeout=None)
+
+        Blocks until the stage has stopped within ``tolerance`` of ``position``. If it is already there, e.g. because the same position was armed twice, returns straight away.
+
+        Args:
+            position (float): The target position
+            cancel (threading.Event): Stops waiting when set
+            timeout (float, optional): Raises an exception after this many seconds. Defaults to None, to wait as long as it takes for the trigger to arrive.
+
+        Returns:
+            (float, float, float): The times that the motion was first seen and that the stage was seen to arrive, and the final position error. The first is None if no motion was seen. Returns None if cancelled.
+        """
+        t0 = time()
+        started = None
+        while not cancel.is_set():
+            now = time()
+            if self._is_moving():
+                if started is None:
+                    started = now
+            else:
+                error = self._position() - position
+                if abs(error) <= self.tolerance:
+                    return (started, now, error)
+            if timeout is not None and now - t0 > timeout:
+                raise Exception("Timed out waiting for {} to move to {}".format(self.name, position))
+            cancel.wait(STATUS_INTERVAL)
+        return None
@@ -0,0 +1,203 @@
+"""
+Simulated Kinesis stage, for validating move sequences without hardware.
+
+Moves follow a trapezoidal velocity profile, limited by ``max_velocity`` and ``acceleration``. Triggered moves start when :meth:`FakeStage.trigger` is called, or every ``trigger_period`` seconds if it is set in the device's config, e.g.
+
+.. code-block:: json
+
+    {
+        "devices": {
+            "fake_waveplate": {
+                "servername": "imaging_kinesis",
+                "device_type": "FakeStage",
+                "serial": "fake",
+                "trigger_period": 2.0
+            }
+        }
+    }
+
+Running this module checks that the stage can keep up with a sequence:
+
+.. code-block:: bash
+
+    python fake_stage.py 157 330 157 --trigger_period 0.5
+"""
+import os, sys
+import threading
+from time import time, sleep
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from base_stage import BaseStage
+
+class FakeStage(BaseStage):
+    """
+    FakeStage(BaseStage)
+
+    Simulated stage, with the defaults roughly those of a DDR25 rotation stage, in degrees.
+    """
+    def __init__(self, config):
+        self.max_velocity = 360.0
+        self.acceleration = 1800.0
+        self.trigger_period = None
+        super(FakeStage, self).__init__(config)
+
+        self.lock = threading.Lock()
+        self.start_position = 0.0
+        self.target = 0.0
+        self.start_time = 0.0
+        self.armed = None
+        self.enabled = False
+
+    def initialize(self):
+        if self.trigger_period:
+            self.trigger_thread = threading.Thread(target=self._trigger_periodically)
+            self.trigger_thread.daemon = True
+            self.trigger_thread.start()
+
+    def _trigger_periodically(self):
+        while True:
+            sleep(self.trigger_period)
+            self.trigger()
+
+    def trigger(self):
+        """ starts the armed move, as an input trigger would """
+        with self.lock:
+            if self.armed is not None and self.enabled:
+                self._start(self.armed)
+
+    def move_duration(self, distance):
+        """
+        move_duration(self, distance)
+
+        Args:
+            distance (float): The length of the move
+
+        Returns:
+            float: The time taken by the trapezoidal (or, for short moves, triangular) velocity profile, in seconds
+        """
+        distance = abs(distance)
+        t_accel = self.max_velocity / self.acceleration
+        if distance < self.max_velocity * t_accel:
+            return 2 * (distance / self.acceleration)**0.5
+        return distance / self.max_velocity + t_accel
+
+    def _profile(self, now):
+        # Position along the current move at a given time
+        distance = self.target - self.start_position
+        duration = self.move_duration(distance)
+        t = min(now - self.start_time, duration)
+        sign = 1 if distance >= 0 else -1
+        t_accel = min(self.max_velocity / self.acceleration, duration / 2)
+        v_peak = self.acceleration * t_accel
+        if t < t_accel:
+            travelled = 0.5 * self.acceleration * t**2
+        elif t < duration - t_accel:
+            travelled = 0.5 * v_peak * t_accel + v_peak * (t - t_accel)
+        else:
+            t_left = duration - t
+            travelled = abs(distance) - 0.5 * self.acceleration * t_left**2
+        return self.start_position + sign * travelled
+
+    def _start(self, target):
+        self.start_position = self._profile(time())
+        self.target = target
+        self.start_time = time()
+
+    def _enable(self):
+        self.enabled = True
+
+    def _disable(self):
+        self.enabled = False
+
+    def _home(self, timeout):
+        self._move_to(0.0, timeout)
+
+    def _move_to(self, position, timeout):
+        with self.lock:
+            if not self.enabled:
+                raise Exception("{} is not enabled".format(self.name))
+            self._start(position)
+            duration = self.move_duration(position - self.start_position)
+        if duration > timeout:
+            raise Exception("Move of {} to {} would take {} s, longer than the {} s timeout".format(self.name, position, duration, timeout))
+        sleep(duration)
+
+    def _move_by(self, displacement, timeout):
+        self._move_to(self._position() + displacement, timeout)
+
+    def _position(self):
+        with self.lock:
+            return self._profile(time())
+
+    def _is_moving(self):
+        with self.lock:
+            return time() - self.start_time < self.move_duration(self.target - self.start_position)
+
+    def _arm(self, position):
+        with self.lock:
+            self.armed = position
+
+
+def validate_sequence(positions, trigger_period, **config):
+    """
+    validate_sequence(positions, trigger_period, **config)
+
+    Runs a move sequence on a :class:`FakeStage`, triggered every ``trigger_period``, using the same code as the real stage. Must be run with the reactor running, e.g. with :func:`twisted.internet.task.react`.
+
+    Args:
+        positions (list): The positions to move to. The first is moved to straight away.
+        trigger_period (float): The time between triggers, in seconds
+        **config: Passed to :class:`FakeStage`, e.g. ``max_velocity``
+
+    Returns:
+        Deferred: fires with the report of each triggered move (see :class:`base_stage.BaseStage`). A move that had not finished by the next trigger, or was never made, has ``'missed'`` set.
+    """
+    from twisted.internet import reactor
+    from twisted.internet.defer import inlineCallbacks, returnValue
+    from twisted.internet.task import deferLater
+
+    FakeStage.name = 'fake_stage'
+    config.setdefault('serial', 'fake')
+    config.setdefault('servername', 'fake')
+    stage = FakeStage(config)
+
+    @inlineCallbacks
+    def run():
+        yield stage.enable()
+        yield stage.move_sequence(positions)
+        t0 = time()
+        for i in range(len(positions) - 1):
+            yield deferLater(reactor, t0 + (i + 1) * trigger_period - time(), stage.trigger)
+        yield deferLater(reactor, stage.move_duration(max(positions) - min(positions)) + 0.1, lambda: None)
+        stage.stop_sequence()
+
+        # A move that finished after the next trigger was due missed that trigger, and the
+        # moves after it were never made
+        report = [dict(move) for move in stage.report]
+        for (i, move) in enumerate(report):
+            move['missed'] = move['arrived'] - t0 > (i + 2) * trigger_period
+        report += [{'target': position, 'missed': True} for position in positions[1 + len(report):]]
+        returnValue(report)
+
+    return run()
+
+
+if __name__ == '__main__':
+    import argparse
+    from twisted.internet import task
+
+    parser = argparse.ArgumentParser(description="Check that a simulated Kinesis stage can keep up with a move sequence")
+    parser.add_argument('positions', type=float, nargs='+')
+    parser.add_argument('--trigger_period', type=float, default=1.0)
+    parser.add_argument('--max_velocity', type=float, default=360.0)
+    parser.add_argument('--acceleration', type=float, default=1800.0)
+    args = parser.parse_args()
+
+    def main(reactor):
+        d = validate_sequence(args.positions, args.trigger_period, max_velocity=args.max_velocity, acceleration=args.acceleration)
+        def show(report):
+            for move in report:
+                print(move)
+        return d.addCallback(show)
+
+    task.react(main)
@@ -1,8 +1,7 @@
 import os, sys
-from twisted.internet.defer import inlineCallbacks, returnValue
 
-sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../..'))
-from server_tools.device_server import DeviceWrapper
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from base_stage import BaseStage, STATUS_INTERVAL
 
 import clr
 clr.AddReference("C:\\Program Files\\Thorlabs\\Kinesis\\Thorlabs.MotionControl.DeviceManagerCLI.dll.")
@@ -15,67 +14,58 @@ from Thorlabs.MotionControl.GenericMotorCLI.Settings import KCubeTriggerConfigSe
 from Thorlabs.MotionControl.KCube.BrushlessMotorCLI import *
 from System import Decimal
 
-class Stage(DeviceWrapper):
-    def __init__(self, config):
+class Stage(BaseStage):
+    """
+    Stage(BaseStage)
 
-        for key, value in config.items():
-            setattr(self, key, value)
+    Thorlabs KCube brushless motor controller, e.g. for a DDR25 rotation stage.
+    """
+    def __init__(self, config):
+        self.trigger_configured = False
+        super(Stage, self).__init__(config)
 
-        self.address = self.serial
-        super(Stage, self).__init__({})
-    
-    @inlineCallbacks
     def initialize(self):
-        yield DeviceManagerCLI.BuildDeviceList()
-        self.stage = yield KCubeBrushlessMotor.CreateKCubeBrushlessMotor(self.serial)
-        yield self.stage.Connect(self.serial)
-        yield self.stage.StartPolling(50)
+        DeviceManagerCLI.BuildDeviceList()
+        self.stage = KCubeBrushlessMotor.CreateKCubeBrushlessMotor(self.serial)
+        self.stage.Connect(self.serial)
+        # Update the status as often as it is checked while waiting for moves
+        self.stage.StartPolling(round(STATUS_INTERVAL*1E3))
 
         if not self.stage.IsSettingsInitialized():
-            yield self.stage.WaitForSettingsInitialized(10000)  # 10 second timeout
+            self.stage.WaitForSettingsInitialized(10000)  # 10 second timeout
             assert self.stage.IsSettingsInitialized() is True
 
         # Before homing or moving device, ensure the motors configuration is loaded
-        m_config = yield self.stage.LoadMotorConfiguration(self.serial, DeviceConfiguration.DeviceSettingsUseOptionType.UseDeviceSettings)
-
-    @inlineCallbacks
-    def enable(self):
-        yield self.stage.EnableDevice()
-
-    @inlineCallbacks
-    def disable(self):
-        yield self.stage.DisableDevice()
-    
-    @inlineCallbacks
-    def home(self, timeout=10.0):
-        """
-        home(self, timeout=10)
-
-        Homes the stage.
-
-        Args:
-            timeout (float, optional): The timeout in seconds. Defaults to 10.
-        """
-        yield self.stage.Home(round(timeout*1E3))
-
-    @inlineCallbacks
-    def move_to(self, position, timeout=10.0):
-        yield self.stage.MoveTo(Decimal(position), round(timeout*1E3))
-    
-    @inlineCallbacks
-    def move_by(self, displacement, timeout=10.0):
-        yield self.stage.MoveBy(Decimal(displacement), round(timeout*1E3))
-    
-    @inlineCallbacks
-    def get_position(self):
-        position = yield self.stage.get_DevicePosition()
-        returnValue(float(str(position)))
-
-    @inlineCallbacks
-    def move_on_trigger(self, position):
-        trigger_config_params = yield self.stage.GetTriggerConfigParams()
-        trigger_config_params.Trigger1Mode = KCubeTriggerConfigSettings.TriggerPortMode.TrigIN_AbsoluteMove
-        trigger_config_params.Trigger1Polarity = KCubeTriggerConfigSettings.TriggerPolarity.TriggerHigh
-        yield self.stage.SetTriggerConfigParams(trigger_config_params)
-
-        yield self.stage.SetMoveAbsolutePosition(Decimal(position))
+        m_config = self.stage.LoadMotorConfiguration(self.serial, DeviceConfiguration.DeviceSettingsUseOptionType.UseDeviceSettings)
+
+    def _enable(self):
+        self.stage.EnableDevice()
+
+    def _disable(self):
+        self.stage.DisableDevice()
+
+    def _home(self, timeout):
+        self.stage.Home(round(timeout*1E3))
+
+    def _move_to(self, position, timeout):
+        self.stage.MoveTo(Decimal(position), round(timeout*1E3))
+
+    def _move_by(self, displacement, timeout):
+        self.stage.MoveBy(Decimal(displacement), round(timeout*1E3))
+
+    def _position(self):
+        return float(str(self.stage.get_DevicePosition()))
+
+    def _is_moving(self):
+        return self.stage.Status.IsInMotion
+
+    def _arm(self, position):
+        # The trigger only needs configuring once
+        if not self.trigger_configured:
+            trigger_config_params = self.stage.GetTriggerConfigParams()
+            trigger_config_params.Trigger1Mode = KCubeTriggerConfigSettings.TriggerPortMode.TrigIN_AbsoluteMove
+            trigger_config_params.Trigger1Polarity = KCubeTriggerConfigSettings.TriggerPolarity.TriggerHigh
+            self.stage.SetTriggerConfigParams(trigger_config_params)
+            self.trigger_configured = True
+
+        self.stage.SetMoveAbsolutePosition(Decimal(position))
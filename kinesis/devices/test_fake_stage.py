@@ -0,0 +1,84 @@
+"""
+Tests of :mod:`base_stage`'s move sequences, run on a :class:`fake_stage.FakeStage`.
+
+.. code-block:: bash
+
+    python -m unittest test_fake_stage
+"""
+import threading
+import unittest
+
+from twisted.internet import reactor
+from twisted.internet.threads import blockingCallFromThread
+
+from fake_stage import FakeStage, validate_sequence
+
+# A stage that moves 90 degrees in 0.1 s
+CONFIG = {'max_velocity': 1800.0, 'acceleration': 36000.0}
+
+
+def setUpModule():
+    global reactor_thread
+    reactor_thread = threading.Thread(target=reactor.run, kwargs={'installSignalHandlers': False})
+    reactor_thread.daemon = True
+    reactor_thread.start()
+
+def tearDownModule():
+    reactor.callFromThread(reactor.stop)
+    reactor_thread.join()
+
+
+class TestFakeStage(unittest.TestCase):
+    def setUp(self):
+        FakeStage.name = 'fake_stage'
+        self.stage = FakeStage(dict(CONFIG, serial='fake', servername='fake'))
+        self.stage._enable()
+
+    def test_move_duration(self):
+        # Triangular profile for short moves, trapezoidal for long ones
+        self.assertAlmostEqual(self.stage.move_duration(1.0), 2 * (1.0 / 36000.0)**0.5)
+        self.assertAlmostEqual(self.stage.move_duration(90.0), 90.0 / 1800.0 + 1800.0 / 36000.0)
+        self.assertEqual(self.stage.move_duration(-90.0), self.stage.move_duration(90.0))
+
+    def test_profile(self):
+        self.stage._start(90.0)
+        t0 = self.stage.start_time
+        duration = self.stage.move_duration(90.0)
+        # Times are absolute, so only good to about a microsecond
+        self.assertAlmostEqual(self.stage._profile(t0), 0.0, places=3)
+        self.assertAlmostEqual(self.stage._profile(t0 + duration / 2), 45.0, places=3)
+        self.assertAlmostEqual(self.stage._profile(t0 + duration), 90.0, places=3)
+        self.assertAlmostEqual(self.stage._profile(t0 + 2 * duration), 90.0, places=3)
+
+    def test_triggered_move(self):
+        self.stage._arm(30.0)
+        self.assertFalse(self.stage._is_moving())
+        self.stage.trigger()
+        (started, arrived, error) = self.stage._wait_for_arrival(30.0, threading.Event(), timeout=1.0)
+        self.assertIsNotNone(started)
+        self.assertLessEqual(abs(error), self.stage.tolerance)
+
+    def test_wait_cancelled(self):
+        self.stage._arm(30.0)
+        cancel = threading.Event()
+        cancel.set()
+        self.assertIsNone(self.stage._wait_for_arrival(30.0, cancel))
+
+    def test_sequence_keeps_up(self):
+        positions = [0.0, 90.0, 0.0, 45.0]
+        report = blockingCallFromThread(reactor, validate_sequence, positions, 0.3, **CONFIG)
+        self.assertEqual([move['target'] for move in report], positions[1:])
+        for move in report:
+            self.assertFalse(move['missed'])
+            self.assertLessEqual(abs(move['position_error']), 0.01)
+        self.assertIsNone(report[0]['arm_latency'])
+        self.assertTrue(all(move['arm_latency'] < 0.1 for move in report[1:]))
+
+    def test_sequence_too_fast(self):
+        # Each move takes 0.1 s, so a trigger every 0.05 s comes before the previous move is done
+        report = blockingCallFromThread(reactor, validate_sequence, [0.0, 90.0, 0.0, 90.0], 0.05, **CONFIG)
+        self.assertTrue(any(move['missed'] for move in report))
+
+
+if __name__ == '__main__':
+    unittest.main()
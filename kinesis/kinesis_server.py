@@ -20,12 +20,11 @@ Interface for Thorlabs Kinesis hardware.
 """
 
 import os, sys
+import json
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
 from server_tools.device_server import DeviceServer
 
 from twisted.internet.defer import inlineCallbacks, returnValue
-from twisted.internet import task
-from twisted.internet import reactor
 from labrad.server import setting 
 
 class KinesisServer(DeviceServer):
@@ -89,25 +88,31 @@ class KinesisServer(DeviceServer):
     @inlineCallbacks
     @setting(17, 'move_sequence', sequence='*v', immediate_move='b')
     def move_sequence(self, c, sequence, immediate_move=True):
-        """Move to a sequence of positions."""
+        """Move to a sequence of positions, each on a trigger. Returns once the first triggered move is armed."""
         device = self.get_device(c)
+        yield device.move_sequence(sequence, immediate_move)
+
+    @setting(18, 'get_sequence_report', returns='s')
+    def get_sequence_report(self, c):
+        """Get the target, final position error, move time and arming latency of each move of the last sequence, as JSON."""
+        device = self.get_device(c)
+        return json.dumps(device.report)
+
+    @setting(19, 'stop_sequence')
+    def stop_sequence(self, c):
+        """Stop the running move sequence."""
+        device = self.get_device(c)
+        device.stop_sequence()
+
+    def stopServer(self):
+        """
+        stopServer(self)
+
+        Stops the running move sequences, whose waits for a trigger would otherwise hold threads of the reactor's thread pool, which is joined on shutdown.
+        """
+        for device in self.devices.values():
+            device.stop_sequence()
 
-        @inlineCallbacks
-        def move_sequence_async(positions):
-            yield device.move_on_trigger(positions[0])
-            current_position = yield device.get_position()
-            if abs(current_position - positions[0]) < 0.01:
-                if len(positions) > 1:
-                    task.deferLater(reactor, 0.05, move_sequence_async, positions[1:])
-            else:
-                task.deferLater(reactor, 0.05, move_sequence_async, positions)
-        if immediate_move:
-            yield self.move_to(c, sequence[0])
-            if len(sequence) > 1:
-                yield move_sequence_async(sequence[1:])
-        else:
-            yield move_sequence_async(sequence)
-        
 
 if __name__ == "__main__":
     from labrad import util
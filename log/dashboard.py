@@ -2,27 +2,69 @@ import json
 import sys
 from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtWidgets import QMenu, QAction
-import pycurl
-from io import BytesIO
 from functools import partial
 import random
 from time import time
 import labrad
+from labrad.wrappers import connectAsync
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import blockingCallFromThread
+
+WAVEMETER_ID = 314161
 
 # TODO: Fix Sphinx autodoc reporting the superclass as sphinx.ext.autodoc.importer._MockObject
 class laser_dashboard_gui(QtWidgets.QMainWindow):
     """
     Displays the status of the laser locks, including the measured laser frequencies and an indicator if the laser is unlocked. Also provides audible warnings when lasers come unlocked.
+
+    The display is updated whenever the wavemeter server emits ``signal__wavelengths_changed``.
     """
+    wavelengths_received = QtCore.pyqtSignal(str)
+
     def __init__(self, Parent=None):
         super(laser_dashboard_gui, self).__init__(Parent)
         self.setWindowIcon(QtGui.QIcon("laser_icon.png"))
         self.setWindowTitle("KRb Laser Dashboard")
         self.initialize()
+        self.data = {}
         self.cxn = labrad.connect()
         self.alerter = self.cxn.polarkrb_alerter
         self.wavemeter = self.cxn.wavemeterlaptop_wavemeter
         self._createMenuBar()
+        self.connect_signals()
+
+    def connect_signals(self):
+        """
+        Subscribes to the wavemeter server's ``signal__wavelengths_changed``. Messages arrive on the LabRAD connection's thread, so they are forwarded to :meth:`receive_wavelengths` in the GUI thread through a Qt signal.
+        """
+        self.wavelengths_received.connect(self.receive_wavelengths)
+        blockingCallFromThread(reactor, self.listen)
+        self.receive_wavelengths(self.wavemeter.get_wavelengths())
+
+    @inlineCallbacks
+    def listen(self):
+        """
+        Listens for the signal on an asynchronous connection, since the synchronous one can't add listeners. Runs in the reactor thread started by :code:`labrad.connect`.
+        """
+        self.signal_cxn = yield connectAsync(name="laser dashboard")
+        wavemeter = self.signal_cxn.wavemeterlaptop_wavemeter
+        yield wavemeter.signal__wavelengths_changed(WAVEMETER_ID)
+        yield wavemeter.addListener(listener=lambda c, data: self.wavelengths_received.emit(data), source=None, ID=WAVEMETER_ID)
+
+    def receive_wavelengths(self, data):
+        """
+        Decodes new wavemeter data and updates the display.
+
+        Args:
+            data (str): JSON-encoded wavemeter data
+        """
+        try:
+            self.data = json.loads(data)
+        except Exception as e:
+            print("could not decode wavemeter data: ", e)
+            return
+        self.update()
 
     def _createMenuBar(self):
         menuBar = self.menuBar()
@@ -129,14 +171,9 @@ class laser_dashboard_gui(QtWidgets.QMainWindow):
 
     def update(self):
         """
-        Gets the latest data from the wavemeter and updates buttons and plays warning audio if laser is unlocked.
+        Updates buttons from the latest wavemeter data and plays warning audio if laser is unlocked.
         """
-        # c = pycurl.Curl()
         try:
-            try:
-                self.data = json.loads(json.loads(self.wavemeter.get_wavelengths()))
-            except Exception as e:
-                print("could not connect to wavemeter: ", e)
             play = False
             names = []
 
@@ -180,9 +217,8 @@ class laser_dashboard_gui(QtWidgets.QMainWindow):
                     else:
                         s = ""
                     self.alerter.say(("The %s laser is unlocked!" + s) % (n))
-        except pycurl.error as e:
-            print("could not connect to wavemeter: ", e)
-            self.data = ''
+        except Exception as e:
+            print("could not update laser dashboard: ", e)
 
     def pressed(self, button, i):
         """
@@ -215,10 +251,6 @@ if __name__ == "__main__":
     timer.timeout.connect(w.status)
     timer.start(100)
 
-    timer2 = QtCore.QTimer()
-    timer2.timeout.connect(w.update)
-    timer2.start(500)
-
     # Run event loop
     ret = app.exec_()
     app.engine.stop()
@@ -149,6 +149,29 @@ class LoggingServer(LabradServer):
         self.logfile.write(logmessage)
         self.logfile.flush()
 
+    @setting(7, entries="*(st)")
+    def log_batch(self, c, entries):
+        """
+        log_batch(self, c, entries)
+
+        Saves several timestamped messages to the log file at once, e.g. readings buffered by an instrument. Otherwise the same as :meth:`log`.
+
+        Args:
+            c: A LabRAD context
+            entries (list): A list of (message, time) tuples, where time is a datetime.datetime
+        """
+        if not entries:
+            return
+        if self.shot is None and self.opentime.date() != entries[-1][1].date():
+            self.set_save_location()
+        logmessages = "".join(
+            "%s - %s: %s\n" % (time.strftime("%Y-%m-%d %H:%M:%S.%f"), c["name"], message)
+            for (message, time) in entries
+        )
+        print(logmessages)
+        self.logfile.write(logmessages)
+        self.logfile.flush()
+
     @setting(2, shot="i")
     def set_shot(self, c, shot=None):
         """
@@ -469,7 +492,7 @@ class LoggingServer(LabradServer):
         # write wavemeter data
         try:
             wavelengths = yield self.wavemeter.get_wavelengths()
-            wavelens = loads(loads(wavelengths))
+            wavelens = loads(wavelengths)
             freqs = {}
             for i, l in enumerate(self.lasers):
                 if l["i"] < 8:
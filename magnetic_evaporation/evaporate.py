@@ -1,19 +1,25 @@
 import json
+import os
 import numpy as np
 import matplotlib.pyplot as plt
- 
+
+EVAP_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'evap.json')
+
+# Trajectory points, as streamed to the synthesizer
+SAMPLE_DTYPE = np.dtype([('time', float), ('frequency', float), ('amplitude', float)])
+
 class evaporation():
- 
-    def __init__(self, trajpath = "./evap.json"):
-        self.dt = 0.1 #Update freq with timestep [s]
+
+    def __init__(self, trajpath = EVAP_PATH, dt = 0.1):
+        self.dt = dt #Update freq with timestep [s]
         self.loadtraj(trajpath)
         self.trajgen()
- 
+
     def loadtraj(self, path):
         if path is not None:
-            with open("/home/bialkali/labrad_tools/magnetic_evaporation/evap.json", 'r') as infile:
+            with open(path, 'r') as infile:
                 evap = json.load(infile)
- 
+
             n = []
             for key, value in evap.items():
                 setattr(self, key, value)
@@ -23,34 +29,36 @@ class evaporation():
                 raise Exception("All parameters must have the same length")
             else:
                 self.nstep = n[0]
-     
+
     def trajgen(self):
-        F = np.array([])
-        A = np.array([])
-        for k in range(self.nstep):
-            x = self.exponential(self.start[k],self.stop[k],self.asymp[k],self.tau[k])
-            F = np.append(F,x)
-            A = np.append(A,np.ones(len(x))*self.amplitudes[k])
-        self.trajectory = F
-        self.amps = A
-        self.time = np.arange(len(F))*self.dt
+        self.samples = self.resample(self.dt)
+        self.trajectory = self.samples['frequency']
+        self.amps = self.samples['amplitude']
+        self.time = self.samples['time']
         self.totaltime = max(self.time)
         self.points = len(self.time)
-         
-    def exponential(self,fi,fs,fa,tau):
-        if fi <= fa or fs <= fa:
+
+    def resample(self, dt):
+        """ trajectory sampled every dt [s], as a structured array with SAMPLE_DTYPE. dt can be smaller than self.dt """
+        fi, fs, fa, tau = [np.array(getattr(self, key)[:self.nstep], dtype=float) for key in ['start', 'stop', 'asymp', 'tau']]
+        if np.any(fi <= fa) or np.any(fs <= fa):
             raise Exception("Initial and final frequencies must be larger than asymptotic frequency")
-         
-        if fi > fs:
-            tf = tau*np.log((float(fi)-fa)/(fs-fa))
-            N = int(np.floor(tf/self.dt))
- 
-             
-            Y = np.zeros(N)
-            T = np.zeros(N)
-            for k in range(int(N)):
-                T[k] = k*self.dt
-                Y[k] = (fi-fa)*np.exp(-T[k]/tau) + fa
-            return Y
- 
- 
+        if np.any(fi <= fs):
+            raise Exception("Initial frequencies must be larger than final frequencies")
+
+        # Number of points in each segment, then each point's time from the start of its segment
+        tf = tau*np.log((fi-fa)/(fs-fa))
+        N = np.floor(tf/dt).astype(int)
+        segment = np.repeat(np.arange(self.nstep), N)
+        T = (np.arange(N.sum()) - np.repeat(np.cumsum(N) - N, N))*dt
+
+        samples = np.zeros(N.sum(), dtype=SAMPLE_DTYPE)
+        samples['time'] = np.arange(N.sum())*dt
+        samples['frequency'] = (fi-fa)[segment]*np.exp(-T/tau[segment]) + fa[segment]
+        samples['amplitude'] = np.array(self.amplitudes[:self.nstep], dtype=float)[segment]
+        return samples
+
+    def chunks(self, size):
+        """ yield consecutive blocks of at most size samples, for streaming to hardware """
+        for k in range(0, self.points, size):
+            yield self.samples[k:k+size]
@@ -0,0 +1,68 @@
+"""
+Tests of :mod:`evaporate`, comparing the vectorized trajectory with the loop that it replaced.
+
+.. code-block:: bash
+
+    python -m unittest test_trajectory
+"""
+import json
+import unittest
+
+import numpy as np
+
+from evaporate import evaporation, EVAP_PATH
+
+
+def reference_trajectory(evap, dt):
+    """ the trajectory as previously generated, one exponential segment and one point at a time """
+    F = np.array([])
+    A = np.array([])
+    for k in range(evap.nstep):
+        fi, fs, fa, tau = evap.start[k], evap.stop[k], evap.asymp[k], evap.tau[k]
+        tf = tau*np.log((float(fi)-fa)/(fs-fa))
+        N = int(np.floor(tf/dt))
+        Y = np.zeros(N)
+        for i in range(N):
+            Y[i] = (fi-fa)*np.exp(-i*dt/tau) + fa
+        F = np.append(F, Y)
+        A = np.append(A, np.ones(len(Y))*evap.amplitudes[k])
+    return F, A, np.arange(len(F))*dt
+
+
+class TestTrajectory(unittest.TestCase):
+    def test_evap_json(self):
+        evap = evaporation(EVAP_PATH)
+        F, A, T = reference_trajectory(evap, evap.dt)
+        np.testing.assert_array_equal(evap.trajectory, F)
+        np.testing.assert_array_equal(evap.amps, A)
+        np.testing.assert_array_equal(evap.time, T)
+        self.assertEqual(evap.points, len(F))
+        self.assertEqual(evap.totaltime, max(T))
+
+    def test_resample(self):
+        evap = evaporation(EVAP_PATH)
+        for dt in [0.01, 0.05, 0.3]:
+            samples = evap.resample(dt)
+            F, A, T = reference_trajectory(evap, dt)
+            np.testing.assert_allclose(samples['frequency'], F, rtol=0, atol=1e-9)
+            np.testing.assert_array_equal(samples['amplitude'], A)
+            np.testing.assert_allclose(samples['time'], T)
+
+    def test_chunks(self):
+        evap = evaporation(EVAP_PATH)
+        chunks = list(evap.chunks(64))
+        self.assertTrue(all(len(chunk) <= 64 for chunk in chunks))
+        np.testing.assert_array_equal(np.concatenate(chunks), evap.samples)
+
+    def test_start_below_stop(self):
+        with open(EVAP_PATH, 'r') as infile:
+            config = json.load(infile)
+        evap = evaporation(EVAP_PATH)
+        evap.start = list(config['stop'])
+        evap.stop = list(config['start'])
+        with self.assertRaises(Exception):
+            evap.resample(evap.dt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,46 @@
+import json
+import os
 import numpy as np
 from scipy.optimize import minimize
 from matplotlib import pyplot as plt
 import time
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, inlineCallbacks
+
+# Step size ratios and backlash of each picomotor controller, as saved by CalibratedPicomotor.save_calibration
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'picomotor_calibration.json')
+
+def sleep(secs):
+    d = Deferred()
+    reactor.callLater(secs, d.callback, None)
+    return d
+
+def load_calibration(device, path=CALIBRATION_PATH):
+    """Loads the calibration of a picomotor controller saved by :meth:`CalibratedPicomotor.save_calibration`.
+
+    Args:
+        device (str): The picomotor controller, e.g. ``"RbMOT"``
+        path (str, optional): The calibration file. Defaults to ``CALIBRATION_PATH``.
+
+    Returns:
+        (dict, dict): The step size ratio and the backlash of each axis
+    """
+    with open(path, 'r') as infile:
+        saved = json.load(infile)[device]
+    calibration = {int(axis): ratio for (axis, ratio) in saved['calibration'].items()}
+    backlash = {int(axis): steps for (axis, steps) in saved.get('backlash', {}).items()}
+    return calibration, backlash or None
 
 class CalibratedPicomotor():
-    def __init__(self, picomotor, calibration=None, positions=None, signal_source=None, velocity=2000):
+    def __init__(self, picomotor, calibration=None, positions=None, signal_source=None, velocity=2000, backlash=None, sleep=sleep):
         self.picomotor = picomotor
         self.calibration = calibration
         self.axes = [1, 2, 3, 4]
+        # Steps lost when an axis reverses direction
+        self.backlash = backlash if backlash is not None else {axis: 0 for axis in self.axes}
+        self.directions = {axis: 0 for axis in self.axes}
+        # Returns a Deferred that fires after the given time, for the _async moves
+        self.sleep = sleep
 
         self.velocity = velocity
         for axis in self.axes:
@@ -23,27 +56,80 @@ class CalibratedPicomotor():
                 raise ValueError("Must provide either calibration or signal_source for self-calibration")
             self.calibration = {axis: self._calibrate(axis, signal_source) for axis in self.axes}
 
+    def save_calibration(self, device, path=CALIBRATION_PATH):
+        """Saves the step size ratios and backlash of each axis, to be loaded with :func:`load_calibration`. Calibrations of other controllers in the file are kept.
+
+        Args:
+            device (str): The picomotor controller, e.g. ``"RbMOT"``
+            path (str, optional): The calibration file. Defaults to ``CALIBRATION_PATH``.
+        """
+        saved = {}
+        if os.path.exists(path):
+            with open(path, 'r') as infile:
+                saved = json.load(infile)
+        saved[device] = {
+            'calibration': {str(axis): float(ratio) for (axis, ratio) in self.calibration.items()},
+            'backlash': {str(axis): float(steps) for (axis, steps) in self.backlash.items()},
+        }
+        with open(path, 'w') as outfile:
+            json.dump(saved, outfile, indent=4)
+
     def get_position(self, axis):
         return self.positions[axis]
     
     def move_abs(self, axis, position):
-        if position == self.positions[axis]:
-            return
-        delta_position = position - self.positions[axis]
-        if self.calibration is not None and delta_position < 0:
-            delta_position *= self.calibration[axis]
-        self.picomotor.move_rel(axis, round(delta_position))
-        time.sleep(abs(delta_position) / self.velocity + 0.04)
-        self.positions[axis] = position
+        self.move_rel(axis, position - self.positions[axis])
 
     def move_rel(self, axis, delta_position):
         if delta_position == 0:
             return
         self.positions[axis] += delta_position
+        steps, wait = self._steps(axis, delta_position)
+        self.picomotor.move_rel(axis, steps)
+        time.sleep(wait)
+
+    def move_abs_async(self, axis, position):
+        """Like :meth:`move_abs`, but returns a Deferred that fires once the move is done, instead of blocking."""
+        return self.move_rel_async(axis, position - self.positions[axis])
+
+    @inlineCallbacks
+    def move_rel_async(self, axis, delta_position):
+        """Like :meth:`move_rel`, but returns a Deferred that fires once the move is done, instead of blocking."""
+        if delta_position == 0:
+            return
+        self.positions[axis] += delta_position
+        steps, wait = self._steps(axis, delta_position)
+        yield self.picomotor.move_rel(axis, steps)
+        yield self.sleep(wait)
+
+    @inlineCallbacks
+    def move_to_async(self, positions):
+        """Moves each axis in turn to its position in ``positions``, which is in the order of ``self.axes``.
+
+        Returns:
+            Deferred: fires once all the moves are done
+        """
+        for (axis, position) in zip(self.axes, positions):
+            yield self.move_abs_async(axis, position)
+
+    def _steps(self, axis, delta_position):
+        """Converts a move to motor steps, correcting for the smaller reverse step size and for backlash when the axis changes direction.
+
+        Args:
+            axis (int): The axis to move
+            delta_position (float): The move, in calibrated (forward) steps
+
+        Returns:
+            (int, float): The number of motor steps, and the time to wait for the move in seconds
+        """
+        direction = int(np.sign(delta_position))
         if self.calibration is not None and delta_position < 0:
             delta_position *= self.calibration[axis]
-        self.picomotor.move_rel(axis, round(delta_position))
-        time.sleep(abs(delta_position) / self.velocity + 0.04)
+        steps = round(delta_position)
+        if self.directions[axis] and direction != self.directions[axis]:
+            steps += direction * round(self.backlash[axis])
+        self.directions[axis] = direction
+        return int(steps), abs(steps) / self.velocity + 0.04
 
     def _calibrate(self, axis, signal_source, make_plot=False):
         """Calibrates the step size of a picomotor axis.
@@ -53,10 +139,10 @@ class CalibratedPicomotor():
             signal_source (function): A function that returns the signal to use for calibration, which should change as a function of real position.
 
         Returns:
-            float: The ratio of the forward and reverse step sizes of the picomotor.
+            float: The ratio of the forward and reverse step sizes of the picomotor. The backlash, in steps, is stored in ``self.backlash[axis]``.
         """
         x0 = self.positions[axis]
-        positions = np.arange(x0+300, x0-300, 10)
+        positions = np.arange(x0+300, x0-300, -10)
         forward_voltages = np.zeros(len(positions))
 
         for (i, position) in enumerate(positions):
@@ -68,11 +154,12 @@ class CalibratedPicomotor():
             self.move_abs(axis, position)
             reverse_voltages[-i-1] = signal_source()
 
-        def rescale_positions(scale):
-            return positions[-1] + scale * (positions - positions[-1])
+        # The reverse sweep starts by turning around, so it lags by the backlash
+        def rescale_positions(scale, backlash=0):
+            return positions[-1] + scale * (positions - positions[-1] - backlash)
         
-        def cost(scale):
-            rescaled_positions = rescale_positions(scale)
+        def cost(params):
+            rescaled_positions = rescale_positions(*params)
             valid_range = (max(min(positions), min(rescaled_positions)), min(max(positions), max(rescaled_positions)))
 
             # make a sorted version of the positions and voltages for interpolation
@@ -84,13 +171,14 @@ class CalibratedPicomotor():
             res = np.sum((forward_voltages_interp - reverse_voltages_interp)**2)
             return res
         
-        res = minimize(cost, [1])
+        res = minimize(cost, [1, 0], method='Nelder-Mead')
+        self.backlash[axis] = max(0, res.x[1])
 
         if make_plot:
             plt.figure()
             plt.plot(positions, forward_voltages, label='forward')
             plt.plot(positions, reverse_voltages, label='reverse')
-            plt.plot(rescale_positions(res.x[0]), reverse_voltages, label='rescaled')
+            plt.plot(rescale_positions(*res.x), reverse_voltages, label='rescaled')
             plt.legend()
             plt.show()
 
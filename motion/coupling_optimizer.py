@@ -0,0 +1,288 @@
+"""
+Model-based optimizer for coupling light into a fiber with picomotor-driven mirrors.
+
+Near the optimum, the coupled power is close to a Gaussian in the picomotor positions, so its logarithm is a quadratic. :class:`CouplingOptimizer` probes a few points around the starting position, fits a quadratic to the log of the measured powers (:func:`fit_model`), and moves to the model's maximum within a trust region. Each new measurement is added to the fit, and the trust region grows when the model predicts the improvement well and shrinks when it doesn't. This typically needs a few tens of moves for four axes, instead of the hundreds used by a line scan along each axis in turn.
+
+Moves and power reads are Deferreds, so the optimizer does not block the reactor. For example, with a :class:`motion.calibrated_picomotor.CalibratedPicomotor` ``cpm`` and an asynchronous LabRAD connection to a LabJack:
+
+.. code-block:: python
+
+    optimizer = CouplingOptimizer(len(cpm.axes), radius=50)
+    x0 = [cpm.get_position(axis) for axis in cpm.axes]
+    read_power = lambda: labjack.read_name("AIN0")
+    best, power = yield optimizer.maximize(cpm.move_to_async, read_power, x0)
+
+Picomotor backlash and the different forward and reverse step sizes are corrected by the :class:`motion.calibrated_picomotor.CalibratedPicomotor`, using its calibration. :mod:`motion.simulated_fiber` can be used to benchmark the optimizer offline.
+"""
+import numpy as np
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+
+def quadratic_features(d):
+    """
+    quadratic_features(d)
+
+    Args:
+        d (numpy.ndarray): ``(m, n)`` array of offsets from the center of the model
+
+    Returns:
+        numpy.ndarray: ``(m, 1 + n + n(n+1)/2)`` design matrix for ``c + g.d - d.H.d/2``, with the upper triangle of ``H`` in row-major order
+    """
+    n = d.shape[1]
+    (i, j) = np.triu_indices(n)
+    quadratic = -d[:, i] * d[:, j] * np.where(i == j, 0.5, 1.0)
+    return np.hstack([np.ones((len(d), 1)), d, quadratic])
+
+
+class CouplingModel(object):
+    """
+    CouplingModel(object)
+
+    Local Gaussian model of the coupled power, ``log(P) = c + g.d - d.H.d/2``, where ``d = (x - center)/scale``.
+
+    Args:
+        center (numpy.ndarray): The position that the model is expanded around
+        scale (float): The length scale of the fit, in steps
+        c (float): The log of the power at ``center``
+        g (numpy.ndarray): The gradient
+        H (numpy.ndarray): The curvature
+    """
+    def __init__(self, center, scale, c, g, H):
+        self.center = center
+        self.scale = scale
+        self.c = c
+        self.g = g
+        self.H = H
+
+    def predict(self, x):
+        """
+        predict(self, x)
+
+        Args:
+            x (numpy.ndarray): A position
+
+        Returns:
+            float: The log of the predicted power
+        """
+        d = (np.asarray(x, dtype=float) - self.center) / self.scale
+        return self.c + self.g.dot(d) - 0.5 * d.dot(self.H).dot(d)
+
+    def step(self, radius, min_curvature=1e-2):
+        """
+        step(self, radius, min_curvature=1e-2)
+
+        Finds the maximum of the model within ``radius`` of ``center``, by solving ``(H + mu I) d = g`` for the smallest ``mu`` that keeps the step within the trust region. Directions that the model thinks are flat or curved upwards are given a curvature of ``min_curvature``, so that the step along them is limited by the gradient.
+
+        Args:
+            radius (float): The trust region radius, in steps
+            min_curvature (float, optional): Defaults to 1e-2.
+
+        Returns:
+            numpy.ndarray: The step, in steps
+        """
+        r = radius / self.scale
+        (eigenvalues, eigenvectors) = np.linalg.eigh(self.H)
+        eigenvalues = np.maximum(eigenvalues, min_curvature)
+        g = eigenvectors.T.dot(self.g)
+
+        def length(mu):
+            return np.linalg.norm(g / (eigenvalues + mu))
+
+        mu = 0
+        if length(0) > r:
+            (lo, hi) = (0, 1.0)
+            while length(hi) > r:
+                hi *= 2
+            for _ in range(50):
+                mu = (lo + hi) / 2
+                if length(mu) > r:
+                    lo = mu
+                else:
+                    hi = mu
+            mu = hi
+        return self.scale * eigenvectors.dot(g / (eigenvalues + mu))
+
+
+def fit_model(x, p, center, scale, prior_curvature=1.0, regularization=1e-2):
+    """
+    fit_model(x, p, center, scale, prior_curvature=1.0, regularization=1e-2)
+
+    Fits a :class:`CouplingModel` to the log of the measured powers by weighted linear least squares. Points are weighted by the square of their power, since the log of a noisy measurement of a small power is noisy. The curvature is regularized towards ``prior_curvature`` times the identity, so that the fit is well defined with fewer points than parameters, e.g. when only probing along each axis.
+
+    Args:
+        x (numpy.ndarray): ``(m, n)`` array of positions
+        p (numpy.ndarray): The ``m`` measured powers
+        center (numpy.ndarray): The position to expand the model around
+        scale (float): The length scale of the fit, in steps
+        prior_curvature (float, optional): In units of ``1/scale**2``. Defaults to 1.0.
+        regularization (float, optional): Strength of the prior, relative to the total weight of the points. Defaults to 1e-2.
+
+    Returns:
+        CouplingModel: The fitted model
+    """
+    x = np.asarray(x, dtype=float)
+    p = np.asarray(p, dtype=float)
+    n = x.shape[1]
+
+    floor = 1e-3 * max(np.max(p), 1e-12)
+    y = np.log(np.maximum(p, floor))
+    w = (np.maximum(p, floor) / np.max(np.maximum(p, floor)))**2
+
+    A = quadratic_features((x - center) / scale)
+    (i, j) = np.triu_indices(n)
+    prior = np.zeros(A.shape[1])
+    prior[1 + n:] = np.where(i == j, prior_curvature, 0)
+    strength = np.zeros(A.shape[1])
+    strength[1 + n:] = regularization * np.sum(w)
+
+    lhs = A.T.dot(w[:, None] * A) + np.diag(strength)
+    rhs = A.T.dot(w * y) + strength * prior
+    theta = np.linalg.lstsq(lhs, rhs, rcond=None)[0]
+
+    H = np.zeros((n, n))
+    H[i, j] = theta[1 + n:]
+    H[j, i] = theta[1 + n:]
+    return CouplingModel(np.asarray(center, dtype=float), scale, theta[0], theta[1:1 + n], H)
+
+
+class CouplingOptimizer(object):
+    """
+    CouplingOptimizer(object)
+
+    Trust region optimizer for fiber coupling, using a :class:`CouplingModel` fitted to the recent measurements.
+
+    Args:
+        n_axes (int, optional): The number of picomotor axes. Defaults to 4.
+        radius (float, optional): The initial trust region radius, and the distance of the initial probes, in steps. Defaults to 50.
+        min_radius (float, optional): Stops once the trust region is smaller than this, in steps. Defaults to 5.
+        max_radius (float, optional): Defaults to 400.
+        max_evaluations (int, optional): The maximum number of moves and power measurements. Defaults to 80.
+        tolerance (float, optional): Stops once the model predicts a fractional improvement smaller than this. Defaults to 1e-3.
+        n_reads (int, optional): The number of power reads to average at each point. Defaults to 1.
+        min_power (float, optional): Raises an exception if the power drops below this, to avoid walking off the fiber. Defaults to None.
+        on_evaluate (function, optional): Called with each position and power, e.g. for plotting. Defaults to None.
+    """
+    def __init__(self, n_axes=4, radius=50, min_radius=5, max_radius=400, max_evaluations=80, tolerance=1e-3, n_reads=1, min_power=None, on_evaluate=None):
+        self.n_axes = n_axes
+        self.radius = radius
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self.max_evaluations = max_evaluations
+        self.tolerance = tolerance
+        self.n_reads = n_reads
+        self.min_power = min_power
+        self.on_evaluate = on_evaluate
+        self.history = []
+
+    @inlineCallbacks
+    def evaluate(self, move_to, read_power, x):
+        """
+        evaluate(self, move_to, read_power, x)
+
+        Moves to ``x`` and measures the power there. The result is appended to ``self.history``.
+
+        Returns:
+            Deferred: fires with the mean of ``n_reads`` power reads
+        """
+        yield move_to(x)
+        powers = []
+        for _ in range(self.n_reads):
+            power = yield read_power()
+            powers.append(power)
+        power = float(np.mean(powers))
+        self.history.append((np.array(x, dtype=float), power))
+        if self.on_evaluate is not None:
+            self.on_evaluate(x, power)
+        if self.min_power is not None and power < self.min_power:
+            raise Exception("Power {} is below {}, aborting".format(power, self.min_power))
+        returnValue(power)
+
+    def near(self, center, radius):
+        x = np.array([h[0] for h in self.history])
+        return np.linalg.norm(x - center, axis=1) <= radius
+
+    def n_near(self, center, radius):
+        return np.count_nonzero(self.near(center, radius))
+
+    def fit(self, center, radius):
+        # Only the points near the current best are described well by a Gaussian
+        near = self.near(center, 3 * max(radius, self.radius))
+        x = np.array([h[0] for h in self.history])[near]
+        p = np.array([h[1] for h in self.history])[near]
+        return fit_model(x, p, center, self.radius)
+
+    @inlineCallbacks
+    def maximize(self, move_to, read_power, x0):
+        """
+        maximize(self, move_to, read_power, x0)
+
+        Maximizes the coupled power, starting from ``x0``, and leaves the picomotors at the best position found.
+
+        Args:
+            move_to (function): Called with an array of positions, in steps, and returns a Deferred that fires once the picomotors are there, e.g. :meth:`motion.calibrated_picomotor.CalibratedPicomotor.move_to_async`
+            read_power (function): Returns a Deferred that fires with the coupled power
+            x0 (list): The starting positions, in steps
+
+        Returns:
+            Deferred: fires with the best positions found and the power measured there once back at them
+        """
+        self.history = []
+        best = np.round(np.asarray(x0, dtype=float))
+        best_power = yield self.evaluate(move_to, read_power, best)
+
+        # Probe along each axis to get started
+        for axis in range(self.n_axes):
+            for sign in [1, -1]:
+                x = best.copy()
+                x[axis] += sign * self.radius
+                yield self.evaluate(move_to, read_power, x)
+        (best, best_power) = max(self.history, key=lambda h: h[1])
+
+        # Once the model sees no way up, probe around the best point along each axis and then along
+        # diagonals, to learn the curvature and how the axes are coupled, until there are enough
+        # points within the trust region for a full quadratic fit
+        n_params = 1 + self.n_axes + self.n_axes * (self.n_axes + 1) // 2
+        directions = list(np.vstack([np.eye(self.n_axes), -np.eye(self.n_axes)]))
+        for i in range(self.n_axes):
+            for j in range(i + 1, self.n_axes):
+                for sign in [1, -1]:
+                    direction = np.zeros(self.n_axes)
+                    direction[[i, j]] = [1 / np.sqrt(2), sign / np.sqrt(2)]
+                    directions.append(direction)
+        probes = list(directions)
+
+        radius = self.radius
+        probe = False
+        while len(self.history) < self.max_evaluations and radius >= self.min_radius:
+            if probe:
+                x = np.round(best + radius * probes.pop(0))
+                power = yield self.evaluate(move_to, read_power, x)
+                if power > best_power:
+                    (best, best_power, probes) = (x, power, list(directions))
+                probe = False
+                continue
+
+            model = self.fit(best, radius)
+            x = np.round(best + model.step(radius))
+            predicted = np.expm1(model.predict(x) - model.predict(best))
+            if np.array_equal(x, best) or predicted < self.tolerance:
+                ratio = 0
+            else:
+                power = yield self.evaluate(move_to, read_power, x)
+                ratio = (power - best_power) / (best_power * predicted)
+                length = np.linalg.norm(x - best)
+                if power > best_power:
+                    (best, best_power, probes) = (x, power, list(directions))
+                if ratio > 0.75 and length >= 0.9 * radius:
+                    radius = min(2 * radius, self.max_radius)
+
+            # The model was wrong, so either it needs more points or the trust region is too big
+            if ratio < 0.25:
+                if probes and self.n_near(best, 1.5 * radius) < n_params:
+                    probe = True
+                else:
+                    (radius, probes) = (radius / 2, list(directions))
+
+        yield move_to(best)
+        power = yield read_power()
+        returnValue((best, power))
@@ -0,0 +1,253 @@
+"""
+Simulated fiber coupling setup, for benchmarking fiber alignment offline.
+
+:class:`SimulatedPicomotor` stands in for a LabRAD connection to :mod:`motion.picomotor_server`, with a smaller step size in reverse and backlash when an axis changes direction. :class:`SimulatedCoupling` stands in for reading the coupled power from the LabJack, with the power a Gaussian in the real mirror positions plus noise. Axes 1 and 3, and 2 and 4, steer the beam in the same plane on different mirrors, so they are coupled: the power depends on both the beam's position and its angle at the fiber. Moves and reads take no real time; the time that they would take is kept by a :class:`VirtualClock`.
+
+Running this module compares the line scan used before :mod:`motion.coupling_optimizer` with the model-based optimizer:
+
+.. code-block:: bash
+
+    python simulated_fiber.py
+"""
+import os, sys
+
+import numpy as np
+from twisted.internet.defer import inlineCallbacks, returnValue, succeed
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from calibrated_picomotor import CalibratedPicomotor
+from coupling_optimizer import CouplingOptimizer
+
+AXES = [1, 2, 3, 4]
+# Pairs of axes that steer in the same plane
+PAIRS = [(1, 3), (2, 4)]
+
+# Time to read the power from the LabJack (s)
+READ_TIME = 0.02
+
+
+class VirtualClock(object):
+    """Keeps track of the time that the simulated moves and reads would take."""
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def sleep(self, secs):
+        self.elapsed += secs
+        return succeed(None)
+
+
+class SimulatedPicomotor(object):
+    """
+    SimulatedPicomotor(object)
+
+    Simulated picomotor controller, with the settings used by :class:`motion.calibrated_picomotor.CalibratedPicomotor`.
+
+    Args:
+        ratios (dict, optional): Ratio of the forward to the reverse step size of each axis. Defaults to 1.2 for each axis.
+        backlash (dict, optional): Steps lost when each axis changes direction. Defaults to 20 for each axis.
+        step_noise (float, optional): Fractional random error of each move. Defaults to 0.02.
+        seed (int, optional): Seed for the random errors. Defaults to None.
+    """
+    def __init__(self, ratios=None, backlash=None, step_noise=0.02, seed=None):
+        self.ratios = ratios if ratios is not None else {axis: 1.2 for axis in AXES}
+        self.backlash = backlash if backlash is not None else {axis: 20 for axis in AXES}
+        self.step_noise = step_noise
+        self.rng = np.random.default_rng(seed)
+        self.positions = {axis: 0 for axis in AXES}
+        self.real_positions = {axis: 0.0 for axis in AXES}
+        self.directions = {axis: 0 for axis in AXES}
+        self.velocities = {axis: 2000 for axis in AXES}
+        self.steps_moved = 0
+
+    def set_velocity(self, axis, speed):
+        self.velocities[axis] = speed
+
+    def get_position(self, axis):
+        return self.positions[axis]
+
+    def move_rel(self, axis, distance):
+        if distance == 0:
+            return
+        direction = int(np.sign(distance))
+        self.positions[axis] += distance
+        self.steps_moved += abs(distance)
+
+        steps = abs(distance)
+        if self.directions[axis] and direction != self.directions[axis]:
+            steps = max(0, steps - self.backlash[axis])
+        self.directions[axis] = direction
+
+        step_size = 1.0 if direction > 0 else 1.0 / self.ratios[axis]
+        self.real_positions[axis] += direction * steps * step_size * (1 + self.step_noise * self.rng.standard_normal())
+
+
+class SimulatedCoupling(object):
+    """
+    SimulatedCoupling(object)
+
+    Simulated coupled power. Calling it reads the power.
+
+    Args:
+        picomotor (SimulatedPicomotor): The picomotor steering the beam
+        clock (VirtualClock): Advanced by ``READ_TIME`` for each read
+        optimum (dict, optional): Real position of each axis at the peak. Defaults to 0 for each axis.
+        width (float, optional): 1/e^2 radius of the coupling, in steps. Defaults to 150.
+        coupling (float, optional): How strongly the axes in each of ``PAIRS`` are coupled. Defaults to 0.7.
+        peak (float, optional): The power at the peak. Defaults to 1.0.
+        noise (float, optional): RMS noise, as a fraction of the peak. Defaults to 0.003.
+        seed (int, optional): Seed for the noise. Defaults to None.
+    """
+    def __init__(self, picomotor, clock, optimum=None, width=150, coupling=0.7, peak=1.0, noise=0.003, seed=None):
+        self.picomotor = picomotor
+        self.clock = clock
+        self.optimum = optimum if optimum is not None else {axis: 0.0 for axis in AXES}
+        self.width = width
+        self.peak = peak
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.reads = 0
+
+        # Rows are the beam position and angle in each plane
+        self.mixing = np.zeros((len(AXES), len(AXES)))
+        for (k, (a, b)) in enumerate(PAIRS):
+            (i, j) = (AXES.index(a), AXES.index(b))
+            self.mixing[2*k, [i, j]] = [1, coupling]
+            self.mixing[2*k + 1, [i, j]] = [coupling, -1]
+
+    def power(self):
+        """ the noiseless power at the current real positions """
+        d = np.array([self.picomotor.real_positions[axis] - self.optimum[axis] for axis in AXES])
+        u = self.mixing.dot(d)
+        return self.peak * np.exp(-2 * u.dot(u) / self.width**2)
+
+    def __call__(self):
+        self.reads += 1
+        self.clock.sleep(READ_TIME)
+        return succeed(self.power() + self.noise * self.peak * self.rng.standard_normal())
+
+
+@inlineCallbacks
+def line_scan(cpm, read_power, rounds=20, max_delta=50):
+    """
+    line_scan(cpm, read_power, rounds=20, max_delta=50)
+
+    The coordinate-wise line scan previously used by :mod:`conductor.devices.fiberCoupler.helpers`, for comparison.
+
+    Returns:
+        Deferred: fires with the final power
+    """
+    @inlineCallbacks
+    def scan(axis, start, end, npoints):
+        positions = np.linspace(start, end, npoints) + cpm.get_position(axis)
+        voltages = np.zeros(npoints)
+        for (i, position) in enumerate(positions):
+            yield cpm.move_abs_async(axis, position)
+            voltages[i] = yield read_power()
+        best_position = positions[np.argmax(voltages)]
+        yield cpm.move_abs_async(axis, best_position)
+        returnValue(best_position)
+
+    last_side = {axis: 0 for axis in cpm.axes}
+    best_voltage = -10
+    rounds_since_best = 0
+    for _ in range(rounds):
+        for axis in cpm.axes:
+            start_position = cpm.get_position(axis)
+            if last_side[axis] < 0:
+                best_position = yield scan(axis, 0, -max_delta, 5)
+            elif last_side[axis] > 0:
+                best_position = yield scan(axis, 0, max_delta, 5)
+            else:
+                best_position = yield scan(axis, -max_delta, max_delta, 7)
+            if np.abs((best_position - start_position)/max_delta) > 0.8:
+                last_side[axis] = np.sign(best_position - start_position)
+            else:
+                last_side[axis] = 0
+
+        v = yield read_power()
+        if v > best_voltage:
+            best_voltage = v
+            rounds_since_best = 0
+        else:
+            rounds_since_best += 1
+        if rounds_since_best > 3:
+            break
+    power = yield read_power()
+    returnValue(power)
+
+
+def run(method, start, seed, compensate=True):
+    """
+    run(method, start, seed, compensate=True)
+
+    Aligns a simulated setup, starting ``start`` real steps away from the optimum.
+
+    Args:
+        method (str): ``'line scan'`` or ``'model'``
+        start (dict): Starting real position of each axis
+        seed (int): Seed for the simulated noise
+        compensate (bool, optional): Whether to correct for the step size ratios and backlash. Defaults to True.
+
+    Returns:
+        dict: The number of reads, steps moved, time taken in seconds, and final fraction of the peak power
+    """
+    clock = VirtualClock()
+    picomotor = SimulatedPicomotor(seed=seed)
+    picomotor.real_positions.update(start)
+    coupling = SimulatedCoupling(picomotor, clock, seed=seed)
+    if compensate:
+        cpm = CalibratedPicomotor(picomotor, calibration=dict(picomotor.ratios), backlash=dict(picomotor.backlash), sleep=clock.sleep)
+    else:
+        cpm = CalibratedPicomotor(picomotor, calibration={axis: 1.0 for axis in AXES}, sleep=clock.sleep)
+
+    if method == 'line scan':
+        d = line_scan(cpm, coupling)
+    else:
+        optimizer = CouplingOptimizer(len(cpm.axes))
+        x0 = [cpm.get_position(axis) for axis in cpm.axes]
+        d = optimizer.maximize(cpm.move_to_async, coupling, x0)
+
+    # Everything fires synchronously, since nothing really waits
+    results = []
+    d.addCallback(results.append)
+    if not results:
+        raise Exception("Alignment did not finish")
+    return {
+        'reads': coupling.reads,
+        'steps': picomotor.steps_moved,
+        'time': clock.elapsed,
+        'power': coupling.power() / coupling.peak,
+    }
+
+
+def benchmark(trials=10, offset=100, min_power=0.05, seed=0):
+    """
+    benchmark(trials=10, offset=100, min_power=0.05, seed=0)
+
+    Prints the mean number of reads, steps moved, time and final power of each method, over ``trials`` random starting positions.
+
+    Args:
+        trials (int, optional): Defaults to 10.
+        offset (float, optional): RMS distance of the starting position of each axis from the optimum, in real steps. Defaults to 100.
+        min_power (float, optional): Starting positions are redrawn until the power there is above this fraction of the peak, since the alignment is not started below a minimum power. Defaults to 0.05.
+        seed (int, optional): Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    starts = []
+    while len(starts) < trials:
+        start = {axis: offset * rng.standard_normal() for axis in AXES}
+        picomotor = SimulatedPicomotor()
+        picomotor.real_positions.update(start)
+        if SimulatedCoupling(picomotor, VirtualClock()).power() > min_power:
+            starts.append(start)
+
+    for method in ['line scan', 'model']:
+        results = [run(method, start, seed + k) for (k, start) in enumerate(starts)]
+        means = {key: np.mean([r[key] for r in results]) for key in results[0]}
+        worst = min([r['power'] for r in results])
+        print("{:>10}: {:6.1f} reads, {:7.0f} steps, {:6.1f} s, final power {:.3f} of peak (worst {:.3f})".format(
+            method, means['reads'], means['steps'], means['time'], means['power'], worst))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,69 @@
+"""
+Tests of :mod:`motion.calibrated_picomotor` and :mod:`motion.coupling_optimizer`, on the simulated setup of :mod:`motion.simulated_fiber`.
+
+.. code-block:: bash
+
+    python -m unittest test_calibrated_picomotor
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from calibrated_picomotor import CalibratedPicomotor, load_calibration, CALIBRATION_PATH
+from simulated_fiber import SimulatedPicomotor, VirtualClock, AXES, run
+
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'calibration.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saved_calibrations(self):
+        for device in ['RbMOT', 'KMOT']:
+            (calibration, backlash) = load_calibration(device, CALIBRATION_PATH)
+            self.assertEqual(sorted(calibration), AXES)
+            self.assertEqual(sorted(backlash), AXES)
+        (calibration, backlash) = load_calibration('RbMOT', CALIBRATION_PATH)
+        self.assertEqual(calibration[2], 1/0.8211087379097065)
+
+    def test_save_and_load(self):
+        picomotor = SimulatedPicomotor(seed=0)
+        cpm = CalibratedPicomotor(picomotor, calibration=dict(picomotor.ratios), backlash={1: 12.5, 2: 0, 3: 30, 4: 7}, sleep=VirtualClock().sleep)
+        with open(self.path, 'w') as outfile:
+            json.dump({'other': {'calibration': {'1': 1.0}}}, outfile)
+        cpm.save_calibration('RbMOT', self.path)
+
+        (calibration, backlash) = load_calibration('RbMOT', self.path)
+        self.assertEqual(calibration, picomotor.ratios)
+        self.assertEqual(backlash, {1: 12.5, 2: 0, 3: 30, 4: 7})
+        # Other controllers are kept, and a calibration saved without backlash has none
+        self.assertEqual(load_calibration('other', self.path), ({1: 1.0}, None))
+
+    def test_backlash(self):
+        picomotor = SimulatedPicomotor(seed=0)
+        cpm = CalibratedPicomotor(picomotor, calibration={axis: 1.0 for axis in AXES}, backlash={axis: 20 for axis in AXES}, sleep=VirtualClock().sleep)
+        self.assertEqual(cpm._steps(1, 100)[0], 100)
+        self.assertEqual(cpm._steps(1, 50)[0], 50)
+        # Turning around takes up the backlash first
+        self.assertEqual(cpm._steps(1, -50)[0], -70)
+        self.assertEqual(cpm._steps(1, -50)[0], -50)
+        self.assertEqual(cpm._steps(1, 10)[0], 30)
+
+
+class TestCouplingOptimizer(unittest.TestCase):
+    def test_alignment(self):
+        starts = [{1: 60, 2: -40, 3: -30, 4: 50}, {1: -80, 2: 20, 3: 40, 4: -20}, {1: 10, 2: 90, 3: -20, 4: -60}]
+        for (seed, start) in enumerate(starts):
+            model = run('model', start, seed)
+            line_scan = run('line scan', start, seed)
+            self.assertGreater(model['power'], 0.95)
+            self.assertLess(model['reads'], line_scan['reads'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,17 +20,69 @@ Provides access to Agilent 34410A multimeters.
 """
 
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from labrad.server import LabradServer, setting
 from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.task import LoopingCall
 
+UPDATE_TIME = 0.05 # s, between polls when not buffering
+DRAIN_TIME = 1.0 # s, between reads of the reading memory when buffering
+NO_READING = -9000.0
+
+# The 34410A's reading memory holds 50,000 readings
+MAX_SAMPLES = 50000
+
+# Returns the trigger and sample settings to their defaults of one reading per INIT, which polling relies on
+POLLING_COMMANDS = ["TRIG:SOUR IMM", "TRIG:COUN 1", "SAMP:SOUR IMM", "SAMP:COUN 1"]
+
+def join_commands(commands):
+    """
+    join_commands(commands)
+
+    Joins SCPI commands into one message. Each command after the first starts with :code:`:`, so that its header is from the root rather than relative to the previous command's (e.g. :code:`TRIG:SOUR IMM;:TRIG:COUN 1`, since :code:`TRIG:SOUR IMM;TRIG:COUN 1` would mean :code:`TRIG:TRIG:COUN 1`).
+
+    Args:
+        commands (list): The commands, e.g. :code:`["TRIG:SOUR IMM", "TRIG:COUN 1"]`
+
+    Returns:
+        str: The message, ending with a newline
+    """
+    return ";:".join(commands) + "\n"
+
+def parse_block(response):
+    """
+    parse_block(response)
+
+    Parses the readings returned by :code:`R?`, which are in a definite-length block, e.g. :code:`#227+1.23456789E-01,+1.2...`
+
+    Args:
+        response (str): The response to :code:`R?`
+
+    Returns:
+        list: The readings, as floats
+    """
+    response = response.strip()
+    if response.startswith('#'):
+        n_digits = int(response[1])
+        response = response[2 + n_digits:]
+    return [float(v) for v in response.split(',') if v.strip()]
+
 class ag34410aServer(LabradServer):
-    """Provides access to Agilent 34410A multimeters."""
+    """
+    Provides access to Agilent 34410A multimeters.
+
+    Each LabRAD context selects its own multimeter, using its own context on the USB server, so that clients don't change each other's selection. Readings are logged from the first multimeter found, in a context of the server's own.
+
+    By default the multimeter is polled every ``UPDATE_TIME``, with each reading logged separately. In buffered mode (see :meth:`start_buffered_logging`), the multimeter instead stores readings in its memory, which are read every ``DRAIN_TIME`` with a single :code:`R?` query and logged in a single call.
+    """
     name = '%LABRADNODE%_ag34410a'
 
     def __init__(self):
         self.USB_server_name = 'polarkrb_usb'
+        self.buffer_interval = None
+        self.buffer_mode = None
+        self.logging_call = None
+        self.drain_call = None
         LabradServer.__init__(self)
     
     @inlineCallbacks
@@ -38,36 +90,41 @@ class ag34410aServer(LabradServer):
         """
         initServer(self)
 
-        Lists connected multimeters, if any, and connects to the first one.
+        Lists connected multimeters, if any, and starts logging from the first one.
         """
-        update_time = 0.05 # s
         self.USB = yield self.client.servers[self.USB_server_name]
+        self.log_context = self.client.context()
         devices = yield self.get_devices(None)
         self.logging = self.client.servers['imaging_logging']
         self.logging.set_name("multimeter")
         if len(devices):
-            self.select_device(None, devices[0])
+            yield self.USB.select_interface(devices[0], context=self.log_context)
             self.logging_call = LoopingCall(self.log_multimeter)
-            self.logging_call.start(update_time, now=False)
+            self.logging_call.start(UPDATE_TIME, now=False)
+
+    def initContext(self, c):
+        c['usb'] = self.client.context()
+        c['device'] = None
 
     @setting(5, returns='*s')
     def get_devices(self, c):
         """
         get_devices(self, c)
         
-        Lists connected multimeters. Note that the function connects to each device to check its ID.
+        Lists connected multimeters. Note that the function connects to each device to check its ID, in a context of its own, so it does not change which device is selected.
 
         Args:
-            c: A LabRAD context (which is passed on to passed to :meth:`ag34410aServer.select_device`)
+            c: A LabRAD context (not used)
 
         Yields:
             A list of strings corresponding to the IDs of connected multimeters
         """
         interfaces = yield self.USB.get_interface_list()
+        context = self.client.context()
         self.devices = []
         for i in interfaces:
-            self.select_device(c, i)
-            id = yield self.USB.query('*IDN?\n')
+            yield self.USB.select_interface(i, context=context)
+            id = yield self.USB.query('*IDN?\n', context=context)
             if "34410" in id:
                 self.devices.append(i)
         returnValue(self.devices)
@@ -77,13 +134,14 @@ class ag34410aServer(LabradServer):
         """
         select_device(self, c, device)
         
-        Select a connected multimeter
+        Select a connected multimeter for this context
 
         Args:
-            c: A LabRAD context (not used)
+            c: A LabRAD context
             device (string): The ID of the multimeter to connect to, as returned by :meth:`ag34410aServer.get_devices`
         """
-        self.USB.select_interface(device)
+        yield self.USB.select_interface(device, context=c['usb'])
+        c['device'] = device
 
     @inlineCallbacks
     @setting(10, returns='v')
@@ -91,24 +149,84 @@ class ag34410aServer(LabradServer):
         """
         read(self, c)
         
-        Reads the current data from the multimeter
+        Reads the current data from the multimeter selected in this context
 
         Args:
-            c: A LabRAD context (not used)
+            c: A LabRAD context
 
         Yields:
-            [type]: [description]
+            float: The reading, or ``NO_READING`` if there is no new reading
         """
-        val = yield self._read()
+        if c['device'] is None:
+            raise Exception("No multimeter selected")
+        val = yield self._read(c['usb'])
         returnValue(val)
 
+    @setting(11, mode='s', interval='v', samples='w', drain_time='v')
+    def start_buffered_logging(self, c, mode='timed', interval=UPDATE_TIME, samples=1, drain_time=DRAIN_TIME):
+        """
+        start_buffered_logging(self, c, mode='timed', interval=UPDATE_TIME, samples=1, drain_time=DRAIN_TIME)
+
+        Configures the logged multimeter to store its readings in its memory, and logs them every ``drain_time`` instead of polling it.
+
+        In ``'timed'`` mode, the readings are timestamped by counting back from the time they are read, using ``interval``. In ``'triggered'`` mode, the times of the triggers aren't known, so each reading is timestamped with the time it was read, which is up to ``drain_time`` after it was taken. Use a shorter ``drain_time`` for finer timestamps.
+
+        Args:
+            c: A LabRAD context (not used)
+            mode (str, optional): ``'timed'`` to sample continuously every ``interval``, or ``'triggered'`` to take ``samples`` readings, ``interval`` apart, on each external trigger. Defaults to ``'timed'``.
+            interval (float, optional): The time between readings in seconds. Defaults to ``UPDATE_TIME``.
+            samples (int, optional): The number of readings per trigger in ``'triggered'`` mode. Defaults to 1.
+            drain_time (float, optional): The time between reads of the reading memory in seconds. Defaults to ``DRAIN_TIME``. The memory must not fill up in this time.
+        """
+        if mode == 'timed':
+            commands = ["TRIG:SOUR IMM", "TRIG:COUN INF", "SAMP:SOUR TIM", "SAMP:TIM %f" % interval, "SAMP:COUN %d" % MAX_SAMPLES]
+        elif mode == 'triggered':
+            commands = ["TRIG:SOUR EXT", "TRIG:COUN INF", "SAMP:SOUR TIM", "SAMP:TIM %f" % interval, "SAMP:COUN %d" % samples]
+        else:
+            raise ValueError("Unknown mode {}. Use 'timed' or 'triggered'.".format(mode))
+        if drain_time / interval > MAX_SAMPLES:
+            raise ValueError("The reading memory would overflow in {} s. Use a shorter drain_time.".format(drain_time))
+
+        self._stop_loops()
+        yield self.USB.write(join_commands(["ABOR"] + commands + ["INIT"]), context=self.log_context)
+        self.buffer_interval = interval
+        self.buffer_mode = mode
+        self.drain_call = LoopingCall(self.drain_buffer)
+        self.drain_call.start(drain_time, now=False)
+
+    @setting(12)
+    def stop_buffered_logging(self, c):
+        """
+        stop_buffered_logging(self, c)
+
+        Logs what is left in the multimeter's memory, then returns its trigger and sample settings to one reading per :code:`INIT` (``POLLING_COMMANDS``) and goes back to polling it every ``UPDATE_TIME``.
+
+        Args:
+            c: A LabRAD context (not used)
+        """
+        if self.buffer_interval is None:
+            return
+        self._stop_loops()
+        yield self.USB.write("ABOR\n", context=self.log_context)
+        yield self.drain_buffer()
+        yield self.USB.write(join_commands(POLLING_COMMANDS + ["INIT"]), context=self.log_context)
+        self.buffer_interval = None
+        self.buffer_mode = None
+        self.logging_call = LoopingCall(self.log_multimeter)
+        self.logging_call.start(UPDATE_TIME, now=False)
+
+    def _stop_loops(self):
+        for call in [self.logging_call, self.drain_call]:
+            if call is not None and call.running:
+                call.stop()
+
     @inlineCallbacks
-    def _read(self):
-        has_points = yield self.USB.query("DATA:POIN?\n")
-        out = -9000.0
+    def _read(self, context):
+        has_points = yield self.USB.query("DATA:POIN?\n", context=context)
+        out = NO_READING
         if int(has_points):
-            val = yield self.USB.query("FETC?\n")
-            yield self.USB.write("INIT\n")
+            val = yield self.USB.query("FETC?\n", context=context)
+            yield self.USB.write("INIT\n", context=context)
             out = float(val)
         returnValue(out)
     
@@ -120,13 +238,39 @@ class ag34410aServer(LabradServer):
         Logs the current multimeter data using the :py:mod:`log.logging_server`
         """
         try:
-            val = yield self._read()
+            val = yield self._read(self.log_context)
         except Exception as e:
             print("Could not get value from multimeter: %s" % (e))
             return
-        if val != -9000.0:
+        if val != NO_READING:
             self.logging.log("%s" % val, datetime.now())
 
+    @inlineCallbacks
+    def drain_buffer(self):
+        """
+        drain_buffer(self)
+
+        Reads and removes all the readings in the multimeter's memory with one query, and logs them with one call to the :py:mod:`log.logging_server`. See :meth:`start_buffered_logging` for how they are timestamped.
+        """
+        try:
+            response = yield self.USB.query("R?\n", context=self.log_context)
+            now = datetime.now()
+            values = parse_block(response)
+        except Exception as e:
+            print("Could not get values from multimeter: %s" % (e))
+            return
+        if values:
+            n = len(values)
+            if self.buffer_mode == 'timed':
+                times = [now - timedelta(seconds=(n - 1 - k) * self.buffer_interval) for k in range(n)]
+            else:
+                # The times of the triggers aren't known
+                times = [now] * n
+            try:
+                yield self.logging.log_batch([("%s" % v, t) for (v, t) in zip(values, times)])
+            except Exception as e:
+                print("Could not log multimeter values: %s" % (e))
+
 if __name__ == '__main__':
     from labrad import util
     util.runServer(ag34410aServer())
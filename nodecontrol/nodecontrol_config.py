@@ -1,5 +1,5 @@
 """
-A list of LabRAD servers, by node, which are started and stopped by the :mod:`nodecontrol.nodecontrol_start` and :mod:`nodecontrol.nodecontrol_stop` scripts. They are started and stopped in the order that they appear in the file.
+A list of LabRAD servers, by node, which are started and stopped by the :mod:`nodecontrol.nodecontrol_start` and :mod:`nodecontrol.nodecontrol_stop` scripts. They are stopped in the order that they appear in the file, and started as soon as the servers that they need, listed in ``dependencies``, have started.
 """
 
 node_dicts = [
@@ -57,3 +57,18 @@ node_dicts = [
         ],
     },
 ]
+
+# Servers that need other servers to be running when they start. A server needed by a server on
+# the same node is waited for on that node; otherwise it is waited for on every node running it.
+# Servers that aren't started by nodecontrol, e.g. because they are commented out above, are not
+# waited for.
+dependencies = {
+    'ad9910': ['serial'],
+    'ag34410a': ['usb'],
+    'conductor': ['sequencer', 'logging', 'database'],
+    'dg4000': ['usb'],
+    'elliptec': ['serial'],
+    'logging': ['wavemeter'],
+    'sequencer': ['okfpga'],
+    'stirap': ['ad9910'],
+}
@@ -1,38 +1,306 @@
 """
-A script which starts the LabRAD servers listed in :mod:`nodecontrol.nodecontrol_config` in the order that they appear in the file.
+A script which starts the LabRAD servers listed in :mod:`nodecontrol.nodecontrol_config`.
+
+Servers are started concurrently on all nodes, except that a server is only started once the servers that it needs, listed in :data:`nodecontrol.nodecontrol_config.dependencies`, have registered with the manager. A server whose dependencies failed to start is skipped. A summary of how long each server took to start is printed at the end.
+
+The startup order can be checked offline with fake nodes, which take ``--startup_time`` seconds to start each server:
+
+.. code-block:: bash
+
+    python nodecontrol_start.py --dry_run --fail okfpga
 """
+import sys, os
+import argparse
+from collections import OrderedDict
 
-import labrad 
-import numpy as np
+from twisted.internet import task
+from twisted.internet.defer import inlineCallbacks, returnValue, DeferredList, succeed
 
-import sys, os  
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from nodecontrol_config import node_dicts, dependencies
 
-from nodecontrol_config import node_dicts
+STARTUP_TIMEOUT = 60 # s, to wait for a started server to register with the manager
+REGISTER_INTERVAL = 0.1 # s, between checks that a started server has registered
 
+# Outcomes of starting a server that its dependents can be started after
+READY = ('started', 'running')
 
-if __name__ == "__main__":
-    cxn = labrad.connect()
+
+def startup_graph(node_dicts, dependencies):
+    """
+    startup_graph(node_dicts, dependencies)
+
+    Args:
+        node_dicts (list): The servers to start on each node, as in :mod:`nodecontrol.nodecontrol_config`
+        dependencies (dict): The servers that each server needs
+
+    Returns:
+        OrderedDict: the ``(node, server)`` pairs that each ``(node, server)`` pair has to wait for, in the order that they appear in ``node_dicts``
+    """
+    locations = OrderedDict()
+    for node_dict in node_dicts:
+        for (node, servers) in node_dict.items():
+            for server in servers:
+                locations.setdefault(server, []).append(node)
+
+    graph = OrderedDict()
     for node_dict in node_dicts:
-        for node in node_dict.keys():
-            if node in cxn.servers: 
-                print('{}:'.format(node))
-                cxn.servers[node].refresh_servers()
-                running_servers = np.array(cxn.servers[node].running_servers())
-                for server in node_dict[node]:
-                    if server in running_servers: 
-                        print('{} is running'.format(server))
+        for (node, servers) in node_dict.items():
+            for server in servers:
+                requires = []
+                for dependency in dependencies.get(server, []):
+                    nodes = locations.get(dependency, [])
+                    if node in nodes:
+                        requires.append((node, dependency))
                     else:
-                        print('starting ' + server)
-                        try:
-                            cxn.servers[node].start(server)
-                            if server == 'rf':
-                                cxn = labrad.connect()
-                                cxn.servers[node].restart(server)
-                        except Exception as e:
-                            print('error with ' + server)
-                            print(e)
+                        requires += [(other, dependency) for other in nodes]
+                graph[(node, server)] = requires
+    return graph
+
+
+def startup_order(graph):
+    """
+    startup_order(graph)
+
+    Args:
+        graph (OrderedDict): As returned by :func:`startup_graph`
+
+    Raises:
+        ValueError: If the dependencies are circular
+
+    Returns:
+        list: Lists of ``(node, server)`` pairs, each of which can be started once all the previous lists have started
+    """
+    levels = []
+    done = set()
+    remaining = OrderedDict(graph)
+    while remaining:
+        level = [key for (key, requires) in remaining.items() if done.issuperset(requires)]
+        if not level:
+            raise ValueError("Circular dependencies between {}".format(", ".join("{} on {}".format(server, node) for (node, server) in remaining)))
+        for key in level:
+            del remaining[key]
+        done.update(level)
+        levels.append(level)
+    return levels
+
+
+class Startup(object):
+    """
+    Startup(object)
+
+    Starts the servers in a :func:`startup_graph`, each as soon as the servers it needs have started.
+
+    Args:
+        cxn: An asynchronous LabRAD connection, e.g. from :func:`labrad.wrappers.connectAsync`, or a :class:`FakeConnection`
+        graph (OrderedDict): As returned by :func:`startup_graph`
+        reactor: Defaults to the global reactor.
+        timeout (float, optional): The time to wait for a started server to register, in seconds. Defaults to ``STARTUP_TIMEOUT``.
+    """
+    def __init__(self, cxn, graph, reactor=None, timeout=STARTUP_TIMEOUT):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.cxn = cxn
+        self.graph = graph
+        self.reactor = reactor
+        self.timeout = timeout
+        self.results = OrderedDict()
+
+    @inlineCallbacks
+    def run(self):
+        """
+        run(self)
+
+        Returns:
+            Deferred: fires with an OrderedDict of the outcome of starting each ``(node, server)`` pair, and the times that it was started and finished, relative to the start of the run
+        """
+        self.t0 = self.reactor.seconds()
+        self.results = OrderedDict((key, None) for key in self.graph)
+
+        self.running = {}
+        for node in OrderedDict((node, None) for (node, _) in self.graph):
+            if node in self.cxn.servers:
+                yield self.cxn[node].refresh_servers()
+                running_servers = yield self.cxn[node].running_servers()
+                self.running[node] = set(name for (name, _) in running_servers)
             else:
                 print('{} is not running'.format(node))
 
-    print('done!')
+        started = {}
+        for level in startup_order(self.graph):
+            for key in level:
+                started[key] = self.start(key, [started[dependency] for dependency in self.graph[key]])
+        yield DeferredList(list(started.values()))
+        returnValue(self.results)
+
+    @inlineCallbacks
+    def start(self, key, requires):
+        """
+        start(self, key, requires)
+
+        Starts a server once the Deferreds for the servers that it needs have fired.
+
+        Returns:
+            Deferred: fires with the outcome, one of ``'started'``, ``'running'``, ``'skipped'``, ``'node not running'`` or ``'failed'``
+        """
+        (node, server) = key
+        outcomes = yield DeferredList(requires)
+        started = self.reactor.seconds() - self.t0
+        if not all(outcome in READY for (_, outcome) in outcomes):
+            failed = [s for ((_, s), (_, outcome)) in zip(self.graph[key], outcomes) if outcome not in READY]
+            outcome = 'skipped'
+            print('skipping {} on {}, since {} did not start'.format(server, node, ", ".join(failed)))
+        elif node not in self.running:
+            outcome = 'node not running'
+        elif server in self.running[node]:
+            outcome = 'running'
+            print('{} is running on {}'.format(server, node))
+        else:
+            print('starting {} on {}'.format(server, node))
+            try:
+                # Settings called in the same context are handled one at a time, so each server
+                # gets its own context to be started concurrently with the others on its node
+                instance = yield self.cxn[node].start(server, context=self.cxn.context())
+                yield self.wait_for_registration(instance)
+                outcome = 'started'
+            except Exception as e:
+                print('error starting {} on {}: {}'.format(server, node, e))
+                outcome = 'failed'
+        self.results[key] = (outcome, started, self.reactor.seconds() - self.t0)
+        returnValue(outcome)
+
+    @inlineCallbacks
+    def wait_for_registration(self, instance):
+        """
+        wait_for_registration(self, instance)
+
+        Waits for a server instance to be listed by the manager, checking every ``REGISTER_INTERVAL``.
+
+        Raises:
+            Exception: If the instance has not registered within ``timeout``
+        """
+        deadline = self.reactor.seconds() + self.timeout
+        while True:
+            servers = yield self.cxn.manager.servers()
+            if instance in [name for (_, name) in servers]:
+                return
+            if self.reactor.seconds() > deadline:
+                raise Exception("{} did not register within {} s".format(instance, self.timeout))
+            yield task.deferLater(self.reactor, REGISTER_INTERVAL, lambda: None)
+
+    def summary(self):
+        """
+        summary(self)
+
+        Returns:
+            str: A table of the outcome and timing of starting each server, and the total time compared to starting the servers one at a time
+        """
+        lines = ['{:<24}{:<14}{:<18}{:>10}{:>10}'.format('node', 'server', 'outcome', 'start (s)', 'took (s)')]
+        total = 0
+        for ((node, server), result) in self.results.items():
+            if result is None:
+                continue
+            (outcome, started, finished) = result
+            lines.append('{:<24}{:<14}{:<18}{:>10.1f}{:>10.1f}'.format(node, server, outcome, started, finished - started))
+            total += finished - started
+        elapsed = max([result[2] for result in self.results.values() if result is not None] + [0])
+        lines.append('done in {:.1f} s, compared to {:.1f} s one at a time'.format(elapsed, total))
+        return '\n'.join(lines)
+
+
+class FakeManager(object):
+    """Lists the servers registered with a :class:`FakeConnection`."""
+    def __init__(self):
+        self.registered = []
+
+    def servers(self):
+        return succeed([(i + 1, name) for (i, name) in enumerate(self.registered)])
+
+
+class FakeNode(object):
+    """
+    FakeNode(object)
+
+    Fake node manager, for dry runs of :class:`Startup`. Servers take ``startup_time`` to start, and then register with the :class:`FakeManager`.
+
+    Args:
+        name (str): The node's name, e.g. ``'node krbjila'``
+        manager (FakeManager)
+        reactor
+        startup_time (float, optional): Defaults to 1.
+        fail (list, optional): Servers that fail to start. Defaults to None, for none.
+    """
+    def __init__(self, name, manager, reactor, startup_time=1.0, fail=None):
+        self.name = name
+        self.manager = manager
+        self.reactor = reactor
+        self.startup_time = startup_time
+        self.fail = fail if fail is not None else []
+        self.instances = []
+
+    def refresh_servers(self):
+        return succeed(None)
+
+    def running_servers(self):
+        return succeed(list(self.instances))
+
+    def start(self, server, context=None):
+        instance = '{}_{}'.format(self.name.replace('node ', ''), server)
+        def register():
+            if server in self.fail:
+                raise Exception("Server '{}' failed to start.".format(server))
+            self.instances.append((server, instance))
+            self.manager.registered.append(instance)
+            return instance
+        return task.deferLater(self.reactor, self.startup_time, register)
+
+
+class FakeConnection(object):
+    """
+    FakeConnection(object)
+
+    Fake asynchronous LabRAD connection to a :class:`FakeNode` for each node in ``node_dicts``.
+
+    Args:
+        node_dicts (list): As in :mod:`nodecontrol.nodecontrol_config`
+        reactor
+        **kwargs: Passed to :class:`FakeNode`
+    """
+    def __init__(self, node_dicts, reactor, **kwargs):
+        self.manager = FakeManager()
+        self.servers = OrderedDict()
+        for node_dict in node_dicts:
+            for node in node_dict:
+                self.servers[node] = FakeNode(node, self.manager, reactor, **kwargs)
+
+    def __getitem__(self, node):
+        return self.servers[node]
+
+    def context(self):
+        return object()
+
+
+@inlineCallbacks
+def main(reactor, args):
+    graph = startup_graph(node_dicts, dependencies)
+    if args.dry_run:
+        for (i, level) in enumerate(startup_order(graph)):
+            print('{}: {}'.format(i, ", ".join("{} on {}".format(server, node) for (node, server) in level)))
+        cxn = FakeConnection(node_dicts, reactor, startup_time=args.startup_time, fail=args.fail)
+    else:
+        from labrad.wrappers import connectAsync
+        cxn = yield connectAsync()
+
+    startup = Startup(cxn, graph, reactor, args.timeout)
+    yield startup.run()
+    print(startup.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the LabRAD servers listed in nodecontrol_config.py")
+    parser.add_argument('--dry_run', action='store_true', help="use fake nodes instead of connecting to LabRAD")
+    parser.add_argument('--startup_time', type=float, default=1.0, help="time for a fake node to start a server, in seconds")
+    parser.add_argument('--fail', nargs='*', default=[], help="servers that fake nodes fail to start")
+    parser.add_argument('--timeout', type=float, default=STARTUP_TIMEOUT, help="time to wait for a server to register, in seconds")
+    args = parser.parse_args()
+    task.react(main, [args])
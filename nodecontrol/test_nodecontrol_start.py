@@ -0,0 +1,103 @@
+"""
+Tests of :mod:`nodecontrol_start` on fake nodes, with a :class:`twisted.internet.task.Clock` instead of the reactor.
+
+.. code-block:: bash
+
+    python -m unittest test_nodecontrol_start
+"""
+import unittest
+
+from twisted.internet import task
+
+from nodecontrol_start import startup_graph, startup_order, Startup, FakeConnection
+
+STARTUP_TIME = 1.0
+
+NODE_DICTS = [
+    {'node a': ['serial', 'usb', 'ad9910']},
+    {'node b': ['wavemeter']},
+    {'node c': ['serial', 'logging', 'conductor']},
+]
+DEPENDENCIES = {
+    'ad9910': ['serial'],
+    'logging': ['wavemeter', 'usb'],
+    'conductor': ['logging', 'database'],
+}
+
+
+class TestStartupOrder(unittest.TestCase):
+    def test_graph(self):
+        graph = startup_graph(NODE_DICTS, DEPENDENCIES)
+        self.assertEqual(list(graph), [('node a', 'serial'), ('node a', 'usb'), ('node a', 'ad9910'), ('node b', 'wavemeter'), ('node c', 'serial'), ('node c', 'logging'), ('node c', 'conductor')])
+        # A server on the same node is waited for there, others on every node running them
+        self.assertEqual(graph[('node a', 'ad9910')], [('node a', 'serial')])
+        self.assertEqual(graph[('node c', 'logging')], [('node b', 'wavemeter'), ('node a', 'usb')])
+        # Servers that aren't started aren't waited for
+        self.assertEqual(graph[('node c', 'conductor')], [('node c', 'logging')])
+
+    def test_order(self):
+        levels = startup_order(startup_graph(NODE_DICTS, DEPENDENCIES))
+        self.assertEqual(levels, [
+            [('node a', 'serial'), ('node a', 'usb'), ('node b', 'wavemeter'), ('node c', 'serial')],
+            [('node a', 'ad9910'), ('node c', 'logging')],
+            [('node c', 'conductor')],
+        ])
+
+    def test_circular(self):
+        dependencies = dict(DEPENDENCIES, wavemeter=['conductor'])
+        graph = startup_graph(NODE_DICTS, dependencies)
+        with self.assertRaises(ValueError):
+            startup_order(graph)
+        # Nothing is started
+        clock = task.Clock()
+        cxn = FakeConnection(NODE_DICTS, clock, startup_time=STARTUP_TIME)
+        d = Startup(cxn, graph, clock).run()
+        failures = []
+        d.addErrback(failures.append)
+        self.assertEqual([f.type for f in failures], [ValueError])
+        self.assertEqual(cxn.manager.registered, [])
+
+
+class TestStartup(unittest.TestCase):
+    def run_startup(self, fail=None, running=None):
+        clock = task.Clock()
+        cxn = FakeConnection(NODE_DICTS, clock, startup_time=STARTUP_TIME, fail=fail)
+        for (node, server) in running or []:
+            cxn[node].instances.append((server, server))
+        startup = Startup(cxn, startup_graph(NODE_DICTS, DEPENDENCIES), clock, timeout=10)
+        results = []
+        startup.run().addCallback(results.append)
+        for _ in range(100):
+            if results:
+                break
+            clock.advance(STARTUP_TIME / 4)
+        self.assertEqual(len(results), 1, "startup did not finish")
+        return (results[0], cxn)
+
+    def test_cross_node(self):
+        (results, cxn) = self.run_startup()
+        self.assertTrue(all(outcome == 'started' for (outcome, _, _) in results.values()))
+        # logging on node c waits for wavemeter on node b and usb on node a
+        self.assertAlmostEqual(results[('node c', 'logging')][1], STARTUP_TIME)
+        self.assertAlmostEqual(results[('node c', 'conductor')][1], 2 * STARTUP_TIME)
+        self.assertLess(results[('node a', 'ad9910')][1], 1.5 * STARTUP_TIME)
+        self.assertEqual(len(cxn.manager.registered), len(results))
+
+    def test_failed_dependency(self):
+        (results, cxn) = self.run_startup(fail=['wavemeter'])
+        outcomes = dict((key, outcome) for (key, (outcome, _, _)) in results.items())
+        self.assertEqual(outcomes[('node b', 'wavemeter')], 'failed')
+        # Its dependents, and theirs, are skipped, but the other servers are started
+        self.assertEqual(outcomes[('node c', 'logging')], 'skipped')
+        self.assertEqual(outcomes[('node c', 'conductor')], 'skipped')
+        self.assertEqual(outcomes[('node a', 'ad9910')], 'started')
+        self.assertNotIn('c_logging', cxn.manager.registered)
+
+    def test_running(self):
+        (results, cxn) = self.run_startup(running=[('node b', 'wavemeter')])
+        self.assertEqual(results[('node b', 'wavemeter')][0], 'running')
+        self.assertAlmostEqual(results[('node c', 'logging')][1], STARTUP_TIME)
+
+
+if __name__ == '__main__':
+    unittest.main()
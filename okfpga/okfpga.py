@@ -73,6 +73,14 @@ class OKFPGAServer(HardwareInterfaceServer):
     def update_wire_ins(self, c):
         self.call_if_available('UpdateWireIns', c)
 
+    @setting(14, wires='*(ii)', update='b')
+    def set_wire_ins(self, c, wires, update=True):
+        """ set several (wire, value) pairs, then optionally update wire ins, in a single request """
+        for wire, value in wires:
+            self.call_if_available('SetWireInValue', c, wire, value)
+        if update:
+            self.call_if_available('UpdateWireIns', c)
+
 if __name__ == "__main__":
     from labrad import util
     util.runServer(OKFPGAServer())
@@ -82,6 +82,10 @@ class TestOkfpga(HardwareInterfaceServer):
         # self.call_if_available('UpdateWireIns', c)
         pass
 
+    @setting(14, wires='*(ii)', update='b')
+    def set_wire_ins(self, c, wires, update=True):
+        pass
+
 if __name__ == "__main__":
     from labrad import util
     util.runServer(TestOkfpga())
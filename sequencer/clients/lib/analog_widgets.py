@@ -1,5 +1,4 @@
 import json
-import numpy as np
 import sys
 
 import matplotlib
@@ -10,7 +9,7 @@ from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt4agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
-from helpers import substitute_sequence_parameters
+from ramp_plot import RampPlot
 sys.path.append('../')
 from devices.lib.analog_ramps import RampMaker
 
@@ -73,21 +72,11 @@ class AnalogArray(FigureCanvas):
 
         self.on_move_id = self.mpl_connect('motion_notify_event', self.on_move)
 
-    def plotSequence(self, sequence):
-        self.axes.cla()
-#        for i, c in enumerate(self.channels):
-        for i, nl in enumerate(sorted(self.channels, key=lambda nl: nl.split('@')[1])):
-            channel_sequence = sequence[nl]
-            T, V = self.rampMaker(channel_sequence).get_plottable(scale='step')
-            V = np.array(V) - i*20
-            self.axes.plot(T, V)
-        for i in range(len(self.channels)-1):
-            self.axes.axhline(-10-i*20, linestyle="--", color='grey')
-        for i in range(len(sequence[self.config.timing_channel])-1):
-            self.axes.axvline(i*99+98, color='grey')
-        self.axes.set_ylim(-20*len(self.channels)+10, 10)
-        self.axes.set_xlim(0, len(T))
-        self.draw()
+        channels = sorted(self.channels, key=lambda nl: nl.split('@')[1])
+        self.ramps = RampPlot(self, self.axes, channels, 20, self.config.timing_channel, self.rampMaker)
+
+    def plotSequence(self, sequence, parameter_values, channels=None):
+        self.ramps.update(sequence, parameter_values, channels)
 
     def on_move(self, event):
         col = int(event.xdata / 99)
@@ -140,10 +129,8 @@ class AnalogControl(QtGui.QWidget):
     def displaySequence(self, sequence):
         self.sequence = sequence
 
-    def updateParameters(self, parameter_values):
-        plottable_sequence = substitute_sequence_parameters(self.sequence,
-                                                            parameter_values)
-        self.array.plotSequence(plottable_sequence)
+    def updateParameters(self, parameter_values, channels=None):
+        self.array.plotSequence(self.sequence, parameter_values, channels)
     
     def connectWidgets(self):
         self.vscrolls = [self.nameColumn.scrollArea.verticalScrollBar(), 
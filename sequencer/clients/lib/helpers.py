@@ -21,6 +21,14 @@ def get_sequence_parameters(x):
     else:
         return []
 
+def parameter_dependencies(sequence):
+    """ map each parameter in the sequence to the set of channels that use it """
+    dependencies = {}
+    for nameloc, channel_sequence in sequence.items():
+        for parameter in get_sequence_parameters(channel_sequence):
+            dependencies.setdefault(parameter, set()).add(nameloc)
+    return dependencies
+
 def substitute_sequence_parameters(x, parameter_values):
     if type(x).__name__ in ['str', 'unicode']:
         if x[0] == '*':
@@ -33,3 +41,11 @@ def substitute_sequence_parameters(x, parameter_values):
         return {k: substitute_sequence_parameters(v, parameter_values) for k, v in x.items()}
     else:
         return x
+
+def format_diagnostic(diagnostic):
+    """ one line describing a diagnostic from the sequencer's validate_sequence """
+    if diagnostic['column'] is None:
+        where = diagnostic['channel']
+    else:
+        where = '{}, column {}'.format(diagnostic['channel'], diagnostic['column'])
+    return '{} ({}): {}'.format(where, diagnostic['rule'], diagnostic['message'])
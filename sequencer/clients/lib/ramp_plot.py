@@ -0,0 +1,229 @@
+"""
+Incremental plotting of analog and electrode ramps in the sequencer GUI.
+
+:class:`RampPlot` keeps a ``Line2D`` for each channel and only recomputes the ramps of the channels that it is told may have changed, skipping any whose sequence, with the parameter values substituted, is the same as last time. The grid lines and axis limits are only redrawn when the number of columns changes; otherwise the lines are blitted over a cached background. Updates are throttled to one every ``REFRESH_INTERVAL``.
+
+Running this module benchmarks replotting offscreen:
+
+.. code-block:: bash
+
+    python ramp_plot.py
+"""
+import os, sys
+from copy import deepcopy
+
+import numpy as np
+
+from helpers import substitute_sequence_parameters
+
+REFRESH_INTERVAL = 16 # ms, about the time between frames of a 60 Hz display
+COLUMN_POINTS = 99 # points per column in RampMaker.get_plottable(scale='step')
+
+class RampPlot(object):
+    """
+    RampPlot(object)
+
+    Plots the ramps of several channels one above the other on ``axes``.
+
+    Args:
+        canvas: The matplotlib canvas that ``axes`` is drawn on
+        axes: The matplotlib axes to plot on
+        channels (list): The namelocs of the channels, from top to bottom
+        spacing (float): The vertical distance between channels
+        timing_channel (str): The nameloc of the channel whose sequence gives the number of columns
+        ramp_maker: The ``RampMaker`` class for the channels, from :mod:`sequencer.devices.lib.analog_ramps` or :mod:`sequencer.devices.lib.ad5791_ramps`
+    """
+    def __init__(self, canvas, axes, channels, spacing, timing_channel, ramp_maker):
+        self.canvas = canvas
+        self.axes = axes
+        self.channels = channels
+        self.spacing = spacing
+        self.timing_channel = timing_channel
+        self.ramp_maker = ramp_maker
+
+        self.lines = {}
+        self.plotted = {}
+        self.n_columns = None
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        self.sequence = {}
+        self.parameter_values = {}
+        self.pending = set()
+        self.scheduled = False
+        self.timer = self.canvas.new_timer(interval=REFRESH_INTERVAL)
+        self.timer.single_shot = True
+        self.timer.add_callback(self.flush)
+
+    def update(self, sequence, parameter_values, channels=None):
+        """
+        update(self, sequence, parameter_values, channels=None)
+
+        Replots ``channels`` after ``REFRESH_INTERVAL``, along with the channels of any other updates before then.
+
+        Args:
+            sequence (dict): The sequence, possibly containing parameters
+            parameter_values (dict): The values to substitute for the parameters
+            channels (set, optional): The channels that may have changed. Defaults to None, for all channels.
+        """
+        self.sequence = sequence
+        self.parameter_values = parameter_values
+        if channels is None:
+            self.pending = None
+        elif self.pending is not None:
+            self.pending.update(channels)
+        if not self.scheduled:
+            self.scheduled = True
+            self.timer.start()
+
+    def flush(self):
+        """ replots the channels of the updates since the last replot """
+        self.scheduled = False
+        (pending, self.pending) = (self.pending, set())
+        channels = [nl for nl in self.channels if pending is None or nl in pending]
+        plottable = substitute_sequence_parameters({nl: self.sequence[nl] for nl in channels}, self.parameter_values)
+        self.plot(plottable, len(self.sequence[self.timing_channel]), channels)
+
+    def plot(self, sequence, n_columns, channels=None):
+        """
+        plot(self, sequence, n_columns, channels=None)
+
+        Replots ``channels`` straight away.
+
+        Args:
+            sequence (dict): The sequences of at least ``channels``, with the parameter values substituted
+            n_columns (int): The number of columns in the sequence
+            channels (list, optional): The channels to replot, if they have changed. Defaults to None, for all channels.
+
+        Returns:
+            bool: Whether anything was replotted
+        """
+        relayout = n_columns != self.n_columns
+        if relayout:
+            self.layout(n_columns)
+
+        changed = False
+        for (i, nl) in enumerate(self.channels):
+            if channels is not None and nl not in channels:
+                continue
+            if self.plotted.get(nl) == sequence[nl]:
+                continue
+            self.plotted[nl] = deepcopy(sequence[nl])
+            # RampMaker modifies the sequence that it's given
+            T, V = self.ramp_maker(sequence[nl]).get_plottable(scale='step')
+            self.lines[nl].set_data(T, np.array(V) - i*self.spacing)
+            changed = True
+
+        if relayout:
+            self.canvas.draw_idle()
+        elif changed:
+            self.blit()
+        return relayout or changed
+
+    def layout(self, n_columns):
+        """ clears the axes and draws the grid lines for ``n_columns`` columns """
+        self.n_columns = n_columns
+        self.axes.cla()
+        self.lines = {nl: self.axes.plot([], [], animated=True)[0] for nl in self.channels}
+        self.plotted = {}
+        for i in range(len(self.channels)-1):
+            self.axes.axhline(-self.spacing/2.0-i*self.spacing, linestyle="--", color='grey')
+        for i in range(n_columns-1):
+            self.axes.axvline(i*COLUMN_POINTS+COLUMN_POINTS-1, color='grey')
+        self.axes.set_ylim(-self.spacing*len(self.channels)+self.spacing/2.0, self.spacing/2.0)
+        self.axes.set_xlim(0, COLUMN_POINTS*n_columns)
+
+    def on_draw(self, event):
+        # The lines are animated, so aren't drawn by a full draw; save what was drawn to blit them over
+        self.background = self.canvas.copy_from_bbox(self.axes.figure.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line in self.lines.values():
+            self.axes.draw_artist(line)
+
+    def blit(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.axes.figure.bbox)
+
+
+def benchmark(n_channels=24, n_columns=60, repeats=10, seed=0):
+    """
+    benchmark(n_channels=24, n_columns=60, repeats=10, seed=0)
+
+    Prints the time to replot a random sequence offscreen: clearing the axes and replotting every channel, as before :class:`RampPlot`, and with :class:`RampPlot` when one or every channel's parameters change.
+    """
+    from time import time
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../..'))
+    from devices.lib.analog_ramps import RampMaker
+
+    rng = np.random.RandomState(seed)
+    channels = ['A{:02d}@A{:02d}'.format(i, i) for i in range(n_channels)]
+    sequence = {}
+    parameter_values = {}
+    for nl in channels:
+        parameter = '*v_' + nl.split('@')[0]
+        parameter_values[parameter] = 0.0
+        sequence[nl] = []
+        for j in range(n_columns):
+            ramp = {'type': rng.choice(['lin', 'exp', 's']), 'vf': rng.uniform(-10, 10), 'dt': rng.uniform(1e-3, 1)}
+            if ramp['type'] == 'exp':
+                ramp['tau'] = rng.uniform(-1, 1)
+                ramp['pts'] = 5
+            if j == n_columns // 2:
+                ramp['vf'] = parameter
+            sequence[nl].append(ramp)
+
+    def make_figure():
+        fig = Figure(figsize=(20, 10))
+        canvas = FigureCanvasAgg(fig)
+        return (canvas, fig.add_subplot(111))
+
+    # As AnalogArray.plotSequence did
+    (canvas, axes) = make_figure()
+    def replot_all():
+        axes.cla()
+        plottable = substitute_sequence_parameters(sequence, parameter_values)
+        for i, nl in enumerate(channels):
+            T, V = RampMaker(plottable[nl]).get_plottable(scale='step')
+            axes.plot(T, np.array(V) - i*20)
+        for i in range(len(channels)-1):
+            axes.axhline(-10-i*20, linestyle="--", color='grey')
+        for i in range(n_columns-1):
+            axes.axvline(i*99+98, color='grey')
+        axes.set_ylim(-20*len(channels)+10, 10)
+        axes.set_xlim(0, len(T))
+        canvas.draw()
+
+    (canvas_new, axes_new) = make_figure()
+    ramps = RampPlot(canvas_new, axes_new, channels, 20, channels[0], RampMaker)
+    ramps.plot(substitute_sequence_parameters(sequence, parameter_values), n_columns)
+    canvas_new.draw()
+
+    def replot(changed):
+        for nl in changed:
+            parameter_values['*v_' + nl.split('@')[0]] += 1.0
+        ramps.update(sequence, parameter_values, changed)
+        ramps.flush()
+
+    def timed(f, *args):
+        t0 = time()
+        for _ in range(repeats):
+            f(*args)
+        return (time() - t0) / repeats * 1e3
+
+    print("{} channels, {} columns:".format(n_channels, n_columns))
+    print("  clear and replot every channel:        {:7.1f} ms".format(timed(replot_all)))
+    print("  RampPlot, one channel's parameter:     {:7.1f} ms".format(timed(replot, set(channels[:1]))))
+    print("  RampPlot, every channel's parameter:   {:7.1f} ms".format(timed(replot, set(channels))))
+    print("  RampPlot, unused parameter:            {:7.1f} ms".format(timed(replot, set())))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,198 @@
+"""
+Undo and redo history for the sequencer control.
+
+:class:`SequenceHistory` keeps snapshots of the sequence and of the ``descriptions`` and ``electrodes`` metadata. A snapshot only copies the channels (and metadata lists) that changed since the previous snapshot, and shares the rest with it, so that an edit to one channel of a long sequence costs about as much memory as that channel. Edits made within ``COALESCE_TIME`` of each other are undone together, e.g. typing a duration. The oldest snapshots are forgotten once the history takes more than ``MAX_HISTORY_BYTES``.
+
+It doesn't use Qt, and is tested in ``test_sequence_history.py``.
+"""
+import json
+import time
+from copy import deepcopy
+
+COALESCE_TIME = 1.0 # s, between edits that are undone together
+MAX_HISTORY_BYTES = 16 * 2**20 # of JSON, roughly
+METADATA_KEYS = ['descriptions', 'electrodes']
+
+class SequenceHistory(object):
+    """
+    SequenceHistory(object)
+
+    Args:
+        max_bytes (int, optional): The approximate size of the snapshots to keep. Defaults to ``MAX_HISTORY_BYTES``.
+        coalesce_time (float, optional): Edits recorded within this many seconds of the previous edit replace it. Defaults to ``COALESCE_TIME``.
+        clock (optional): Returns the time in seconds. Defaults to ``time.time``.
+    """
+    def __init__(self, max_bytes=MAX_HISTORY_BYTES, coalesce_time=COALESCE_TIME, clock=time.time):
+        self.max_bytes = max_bytes
+        self.coalesce_time = coalesce_time
+        self.clock = clock
+
+        self.states = []
+        self.index = -1
+        self.last_edit = None
+        # id of each list kept by a snapshot: [list, number of snapshots keeping it, size]
+        self.kept = {}
+        self.size = 0
+
+    def reset(self, sequence, metadata):
+        """
+        reset(self, sequence, metadata)
+
+        Forgets the history, e.g. when a sequence is loaded.
+
+        Args:
+            sequence (dict): The current sequence
+            metadata (dict): The current metadata
+        """
+        self.states = []
+        self.kept = {}
+        self.size = 0
+        self.states.append(self._snapshot(sequence, metadata, None))
+        self._keep(self.states[0])
+        self.index = 0
+        self.last_edit = None
+
+    def record(self, sequence, metadata):
+        """
+        record(self, sequence, metadata)
+
+        Records an edit, unless the sequence and metadata are the same as at the current snapshot. Forgets anything that could have been redone.
+
+        Args:
+            sequence (dict): The edited sequence
+            metadata (dict): The edited metadata
+
+        Returns:
+            bool: Whether anything had changed. Always False before :meth:`reset`.
+        """
+        if self.index < 0:
+            return False
+        now = self.clock()
+        current = self.states[self.index]
+        state = self._snapshot(sequence, metadata, current)
+        if state == current:
+            return False
+
+        for dropped in self.states[self.index+1:]:
+            self._forget(dropped)
+        del self.states[self.index+1:]
+
+        if self.last_edit is not None and now - self.last_edit < self.coalesce_time and self.index > 0:
+            self._forget(self.states.pop())
+            self.index -= 1
+            # An edit that was made and then reverted leaves nothing to undo
+            if state == self.states[self.index]:
+                self.last_edit = None
+                return True
+        self.states.append(state)
+        self._keep(state)
+        self.index += 1
+        self.last_edit = now
+
+        while self.size > self.max_bytes and self.index > 0:
+            self._forget(self.states.pop(0))
+            self.index -= 1
+        return True
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return 0 <= self.index < len(self.states) - 1
+
+    def undo(self):
+        """
+        undo(self)
+
+        Returns:
+            tuple: ``(sequence, metadata, channels, columns)`` of the previous snapshot, as for :meth:`restore`, or None if there is nothing to undo
+        """
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        return self.restore(self.states[self.index+1])
+
+    def redo(self):
+        """
+        redo(self)
+
+        Returns:
+            tuple: ``(sequence, metadata, channels, columns)`` of the next snapshot, as for :meth:`restore`, or None if there is nothing to redo
+        """
+        if not self.can_redo():
+            return None
+        self.index += 1
+        return self.restore(self.states[self.index-1])
+
+    def restore(self, previous):
+        """
+        restore(self, previous)
+
+        Args:
+            previous (tuple): The snapshot that was displayed before the current one
+
+        Returns:
+            tuple: ``(sequence, metadata, channels, columns)``, where ``sequence`` and ``metadata`` are copies of the current snapshot, ``channels`` is the set of channels that differ from ``previous``, and ``columns`` is the set of columns that differ, or None if the number of columns differs
+        """
+        self.last_edit = None
+        (sequence, metadata) = self.states[self.index]
+        (previous_sequence, previous_metadata) = previous
+
+        channels = set(nl for nl in sequence if _differs(sequence[nl], previous_sequence.get(nl)))
+        lengths = set(len(v) for v in list(sequence.values()) + list(previous_sequence.values()))
+        if len(lengths) > 1:
+            columns = None
+        else:
+            columns = set()
+            changed = [(sequence[nl], previous_sequence[nl]) for nl in channels]
+            changed += [(metadata[k], previous_metadata[k]) for k in METADATA_KEYS if _differs(metadata[k], previous_metadata[k])]
+            for (new, old) in changed:
+                if len(new) != len(old):
+                    columns = None
+                    break
+                columns.update(i for (i, (n, o)) in enumerate(zip(new, old)) if n != o)
+        return (deepcopy(sequence), deepcopy(metadata), channels, columns)
+
+    def _snapshot(self, sequence, metadata, previous):
+        if previous is None:
+            (previous_sequence, previous_metadata) = ({}, {})
+        else:
+            (previous_sequence, previous_metadata) = previous
+        metadata = {k: metadata.get(k, []) for k in METADATA_KEYS}
+        return (_share(sequence, previous_sequence), _share(metadata, previous_metadata))
+
+    def _lists(self, state):
+        (sequence, metadata) = state
+        return list(sequence.values()) + list(metadata.values())
+
+    def _keep(self, state):
+        for v in self._lists(state):
+            if id(v) in self.kept:
+                self.kept[id(v)][1] += 1
+            else:
+                size = len(json.dumps(v))
+                self.kept[id(v)] = [v, 1, size]
+                self.size += size
+
+    def _forget(self, state):
+        for v in self._lists(state):
+            kept = self.kept[id(v)]
+            kept[1] -= 1
+            if not kept[1]:
+                self.size -= kept[2]
+                del self.kept[id(v)]
+
+
+def _share(new, previous):
+    """ copies the values of ``new``, except those equal to the value in ``previous``, which are shared """
+    shared = {}
+    for (k, v) in new.items():
+        if k in previous and previous[k] == v:
+            shared[k] = previous[k]
+        else:
+            shared[k] = deepcopy(v)
+    return shared
+
+def _differs(a, b):
+    return a is not b and a != b
+
@@ -0,0 +1,130 @@
+"""
+Tests of :class:`sequence_history.SequenceHistory` on a made up sequence of 56 channels.
+
+.. code-block:: bash
+
+    python -m unittest test_sequence_history
+"""
+import json
+import unittest
+from copy import deepcopy
+
+from sequence_history import SequenceHistory
+
+CHANNELS = ['D{:02d}@D{:02d}'.format(i, i) for i in range(32)] + ['A{:02d}@A{:02d}'.format(i, i) for i in range(24)]
+N_COLUMNS = 60
+
+
+def make_column(dt):
+    return {nl: ({'dt': dt, 'out': 0} if nl[0] == 'D' else {'dt': dt, 'type': 's', 'vf': 0}) for nl in CHANNELS}
+
+def make_sequence(n_columns=N_COLUMNS):
+    columns = [make_column(1.0) for _ in range(n_columns)]
+    return {nl: [c[nl] for c in columns] for nl in CHANNELS}
+
+def make_metadata(n_columns=N_COLUMNS):
+    return {'descriptions': [''] * n_columns, 'electrodes': [{'dt': 1.0} for _ in range(n_columns)]}
+
+
+class TestSequenceHistory(unittest.TestCase):
+    def setUp(self):
+        self.time = 0.0
+        self.history = SequenceHistory(clock=lambda: self.time)
+        self.sequence = make_sequence()
+        self.metadata = make_metadata()
+        self.history.reset(self.sequence, self.metadata)
+
+    def record(self, sequence=None, metadata=None, dt=10.0):
+        self.time += dt
+        return self.history.record(sequence or self.sequence, metadata or self.metadata)
+
+    def test_record_before_reset(self):
+        history = SequenceHistory()
+        self.assertFalse(history.record(make_sequence(), make_metadata()))
+        self.assertFalse(history.can_undo())
+
+    def test_only_changed_channels_are_copied(self):
+        base_size = self.history.size
+        self.sequence['D03@D03'][10]['out'] = 1
+        self.assertTrue(self.record())
+        self.assertEqual(self.history.size - base_size, len(json.dumps(self.sequence['D03@D03'])))
+        self.assertFalse(self.record())
+
+    def test_coalesce(self):
+        self.sequence['D03@D03'][10]['out'] = 1
+        self.record()
+        self.sequence['A05@A05'][20]['vf'] = 1
+        self.record()
+        for vf in [2, 3, 4]:
+            self.sequence['A05@A05'][20]['vf'] = vf
+            self.record(dt=0.1)
+        self.assertEqual(len(self.history.states), 3)
+
+        (restored, restored_metadata, changed, columns) = self.history.undo()
+        self.assertEqual(restored['A05@A05'][20]['vf'], 0)
+        self.assertEqual(restored['D03@D03'][10]['out'], 1)
+        self.assertEqual(changed, set(['A05@A05']))
+        self.assertEqual(columns, set([20]))
+        (restored, restored_metadata, changed, columns) = self.history.redo()
+        self.assertEqual(restored['A05@A05'][20]['vf'], 4)
+        self.assertEqual(columns, set([20]))
+        self.assertIsNone(self.history.redo())
+
+        # Restored copies don't change the history when they are edited
+        restored['A05@A05'][20]['vf'] = 5
+        restored_metadata['electrodes'][0]['dt'] = 2.0
+        self.assertEqual(self.history.states[self.history.index][0]['A05@A05'][20]['vf'], 4)
+        self.assertEqual(self.history.states[self.history.index][1]['electrodes'][0]['dt'], 1.0)
+
+    def test_reverted_edit(self):
+        self.sequence['D00@D00'][0]['out'] = 1
+        self.record()
+        self.sequence['D00@D00'][0]['out'] = 0
+        self.record(dt=0.1)
+        self.assertEqual(len(self.history.states), 1)
+        self.assertFalse(self.history.can_undo())
+
+    def test_columns(self):
+        # Adding a column changes every channel and the metadata
+        grown = {nl: v[:30] + [dict(v[30])] + v[30:] for (nl, v) in self.sequence.items()}
+        grown_metadata = {'descriptions': self.metadata['descriptions'] + ['new'], 'electrodes': self.metadata['electrodes'] + [{'dt': 1.0}]}
+        self.record(grown, grown_metadata)
+        (_, restored_metadata, changed, columns) = self.history.undo()
+        self.assertIsNone(columns)
+        self.assertEqual(changed, set(CHANNELS))
+        self.assertEqual(len(restored_metadata['descriptions']), N_COLUMNS)
+
+        # A description edit only changes its column
+        self.history.redo()
+        edited_metadata = deepcopy(grown_metadata)
+        edited_metadata['descriptions'][7] = 'MOT'
+        self.record(grown, edited_metadata)
+        (_, _, changed, columns) = self.history.undo()
+        self.assertEqual(changed, set())
+        self.assertEqual(columns, set([7]))
+
+        # An edit after undoing forgets what could have been redone
+        edited = deepcopy(grown)
+        edited['D01@D01'][0]['out'] = 1
+        self.assertTrue(self.record(edited, grown_metadata))
+        self.assertFalse(self.history.can_redo())
+
+    def test_budget(self):
+        channel_size = len(json.dumps(self.sequence['D00@D00']))
+        self.history = SequenceHistory(max_bytes=self.history.size + 20 * channel_size, clock=lambda: self.time)
+        self.history.reset(self.sequence, self.metadata)
+        for i in range(100):
+            self.sequence['D{:02d}@D{:02d}'.format(i % 32, i % 32)][i % N_COLUMNS]['out'] ^= 1
+            self.record()
+            self.assertLessEqual(self.history.size, self.history.max_bytes)
+        unique = dict((id(v), v) for state in self.history.states for v in self.history._lists(state))
+        self.assertEqual(self.history.size, sum(len(json.dumps(v)) for v in unique.values()))
+        self.assertTrue(10 < len(self.history.states) < 100)
+        undone = 0
+        while self.history.undo() is not None:
+            undone += 1
+        self.assertEqual(undone, len(self.history.states) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
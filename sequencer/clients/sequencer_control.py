@@ -26,7 +26,8 @@ from lib.add_dlt_widgets import AddDltRow
 from lib.analog_editor import AnalogVoltageEditor
 from lib.analog_manual_control import AnalogVoltageManualControl
 from lib.analog_manual_control import ControlConfig as AnalogControlConfig
-from lib.helpers import get_sequence_parameters, ConfigWrapper
+from lib.helpers import get_sequence_parameters, substitute_sequence_parameters, parameter_dependencies, format_diagnostic, ConfigWrapper
+from lib.sequence_history import SequenceHistory
 
 from copy import deepcopy
 
@@ -67,6 +68,15 @@ class SequencerControl(QtGui.QWidget):
         self.metadata = {}
 
         self.parameter_values = {}
+        self.dependencies = {}
+        self.channels = {}
+
+        # Edits are recorded once the signals from each edit have been handled
+        self.history = SequenceHistory()
+        self.recordTimer = QtCore.QTimer()
+        self.recordTimer.setSingleShot(True)
+        self.recordTimer.setInterval(0)
+        self.recordTimer.timeout.connect(self.recordHistory)
 
         self.last_update = {}
 
@@ -100,6 +110,8 @@ class SequencerControl(QtGui.QWidget):
                 self.cxn.add_on_disconnect("sequencer", self.onDisconnect)
                 self.cxn.add_on_disconnect("electrode", self.onDisconnect)
 
+                # Subscribe before fetching the channels, so that no mode change is missed in between
+                yield self.connectChannelSignals()
                 yield self.getChannels()
                 self.parameter_values = yield self.getParameters()
                 
@@ -113,7 +125,8 @@ class SequencerControl(QtGui.QWidget):
                 else:
                     self.displaySequence(self.getSequence())
                 yield self.connectSignals()
-                yield self.update_sequencer(None, True)
+                # Resync with the channels fetched after subscribing; after this, only changes are sent
+                self.displayModeStates(self.channels)
 
                 if '*' in str(self.windowTitle):
                     self.setWindowTitle("sequencer control*")
@@ -159,10 +172,13 @@ class SequencerControl(QtGui.QWidget):
             + [(nameloc, [{'type': 's', 'vf': 0, 'dt': 1}]) 
                   for nameloc in self.electrode_channels])
 
+    @inlineCallbacks
+    def connectChannelSignals(self):
+        yield self.sequencer.signal__channels_changed(self.config.sequencer_channels_changed_id)
+        yield self.sequencer.addListener(listener=self.update_channels, source=None, ID=self.sequencer_channels_changed_id)
+
     @inlineCallbacks
     def connectSignals(self):
-        yield self.sequencer.signal__update(self.config.sequencer_update_id)
-        yield self.sequencer.addListener(listener=self.update_sequencer, source=None, ID=self.sequencer_update_id)
         # Handle parameters changed while the editor dialogs are open
         # TODO: refactor this to use the old one?? if perf sucks
         yield self.conductor.signal__parameters_updated(self.config.conductor_update_id)
@@ -395,6 +411,7 @@ class SequencerControl(QtGui.QWidget):
             if success and v in variables:
                 self.digitalControl.array.set_button_variable(str(nameloc), int(column), v)
                 self.displaySequence(self.getSequence())
+                self.sequenceChanged()
         return odvc()
 
     def onDigitalNameClick(self, channel_name):
@@ -512,6 +529,33 @@ class SequencerControl(QtGui.QWidget):
             json.dump(toSave, outfile)
 
         self.setWindowTitle('sequencer control')
+        self.validateSequence(sequence)
+
+    @inlineCallbacks
+    def validateSequence(self, sequence):
+        """ warns about anything that the sequencer can't run, with the current parameter values. Warnings alone are only printed. """
+        warnings = []
+        try:
+            substituted = substitute_sequence_parameters(sequence, self.parameter_values)
+        except KeyError as e:
+            errors = ['Parameter {} was not found in the conductor'.format(e)]
+        else:
+            try:
+                diagnostics = yield self.sequencer.validate_sequence(json.dumps(substituted))
+            except Exception as e:
+                print("Could not validate sequence: {}".format(e))
+                return
+            errors = [format_diagnostic(d) for d in json.loads(diagnostics) if d['severity'] == 'error']
+            warnings = [format_diagnostic(d) for d in json.loads(diagnostics) if d['severity'] == 'warning']
+        if errors:
+            msg = QtGui.QMessageBox()
+            msg.setIcon(QtGui.QMessageBox.Warning)
+            msg.setText("The sequence was saved, but the sequencer can't run it, because of {} error(s).".format(len(errors)))
+            msg.setDetailedText("\n".join(errors + warnings))
+            msg.exec_()
+        else:
+            for w in warnings:
+                print("sequence warning: {}".format(w))
 
     @inlineCallbacks
     def runSequence(self, c):
@@ -566,6 +610,7 @@ class SequencerControl(QtGui.QWidget):
         try:
             sequence = yield self.sequencer.fix_sequence_keys(json.dumps(sequence))
             self.displaySequence(json.loads(sequence))
+            self.history.reset(self.getSequence(), self.metadata)
             self.loadSaveRun.locationBox.setText(filepath)
 
             self.setWindowTitle('sequencer control')
@@ -574,6 +619,7 @@ class SequencerControl(QtGui.QWidget):
 
     def displaySequence(self, sequence):
         self.sequence = sequence
+        self.dependencies = parameter_dependencies(sequence)
 
         # Note that "displaySequence" method doesn't actually update the GUI for widgets that use variables
         self.durationRow.displaySequence(sequence)
@@ -592,10 +638,17 @@ class SequencerControl(QtGui.QWidget):
     def updateParameters(self, changed_parameters, force=False):
         if len(changed_parameters) or force:
             self.parameter_values.update(changed_parameters)
+            # Only replot the analog and electrode channels that use the changed parameters
+            if force:
+                channels = None
+            else:
+                channels = set()
+                for parameter in changed_parameters:
+                    channels.update(self.dependencies.get(parameter, set()))
             self.durationRow.updateParameters(self.parameter_values)
             self.digitalControl.updateParameters(self.parameter_values)
-            self.analogControl.updateParameters(self.parameter_values)
-            self.electrodeControl.updateParameters(self.parameter_values)
+            self.analogControl.updateParameters(self.parameter_values, channels)
+            self.electrodeControl.updateParameters(self.parameter_values, channels)
             self.addDltRow.updateParameters(self.parameter_values)
 
     @inlineCallbacks
@@ -619,12 +672,20 @@ class SequencerControl(QtGui.QWidget):
             self.last_update = changed_parameters
             self.updateParameters(self.last_update)
 
-    @inlineCallbacks
-    def update_sequencer(self, c, signal):
-        if signal:
-            channels = yield self.sequencer.get_channels()
-            for l in self.digitalControl.nameColumn.labels.values():
-                l.displayModeState(json.loads(channels)[l.nameloc])
+    def update_channels(self, c, signal):
+        changed = json.loads(signal)
+        for nameloc, state in changed.items():
+            if nameloc in self.channels:
+                self.channels[nameloc].update(state)
+        # Before the GUI is populated, connect() displays the channels once they are fetched
+        if self.GUI_initialized:
+            self.displayModeStates(changed)
+
+    def displayModeStates(self, channels):
+        labels = self.digitalControl.nameColumn.labels
+        for nameloc in channels:
+            if nameloc in labels:
+                labels[nameloc].displayModeState(self.channels[nameloc])
     
     def getSequence(self):
         durations = [b.value() for b in self.durationRow.boxes 
@@ -652,6 +713,13 @@ class SequencerControl(QtGui.QWidget):
     
     def sequenceChanged(self):
         self.setWindowTitle('sequencer control*')
+        if not self.recordTimer.isActive():
+            self.recordTimer.start()
+
+    def recordHistory(self):
+        # Nothing is recorded until a sequence has been loaded, since the default sequence has no metadata
+        if self.history.states:
+            self.history.record(self.getSequence(), self.metadata)
 
     def addColumn(self, i):
         def ac():
@@ -663,6 +731,7 @@ class SequencerControl(QtGui.QWidget):
             self.metadata['descriptions'].insert(i, '')
             self.metadata['electrodes'].insert(i, deepcopy(self.metadata['electrodes'][i]))
             self.updateDescriptionTooltips()
+            self.sequenceChanged()
         return ac
 
     def dltColumn(self, i):
@@ -675,15 +744,39 @@ class SequencerControl(QtGui.QWidget):
             self.metadata['descriptions'].pop(i)
             self.metadata['electrodes'].pop(i)
             self.updateDescriptionTooltips()
+            self.sequenceChanged()
         return dc
 
     def undo(self):
-        pass
-        #self.updateParameters()
+        self.recordHistory()
+        self.restoreHistory(self.history.undo())
 
     def redo(self):
-        pass
-        #self.updateParameters()
+        self.recordHistory()
+        self.restoreHistory(self.history.redo())
+
+    def restoreHistory(self, restored):
+        if restored is None:
+            return
+        (sequence, metadata, channels, columns) = restored
+        self.metadata.update(metadata)
+        if columns is None:
+            self.displaySequence(sequence)
+        else:
+            # Only redisplay the columns and channels that changed
+            self.sequence = sequence
+            self.dependencies = parameter_dependencies(sequence)
+            timing_sequence = sequence[self.config.timing_channel]
+            for i in columns:
+                self.durationRow.boxes[i].display(timing_sequence[i]['dt'])
+                self.digitalControl.array.columns[i].setLogic(sequence)
+                self.digitalControl.array.columns[i].updateParameters(self.parameter_values)
+            self.analogControl.displaySequence(sequence)
+            self.electrodeControl.displaySequence(sequence)
+            self.analogControl.updateParameters(self.parameter_values, channels)
+            self.electrodeControl.updateParameters(self.parameter_values, channels)
+        self.updateDescriptionTooltips()
+        self.sequenceChanged()
 
     def keyPressEvent(self, c):
         super(SequencerControl, self).keyPressEvent(c)
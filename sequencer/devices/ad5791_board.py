@@ -2,12 +2,14 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 import json
-import math
+
+import numpy as np
 
 from twisted.internet.defer import inlineCallbacks, returnValue
 
 from server_tools.device_server import DeviceWrapper
 from lib.ad5791_ramps import RampMaker
+from lib.validation import diagnostic, check_steps, programmable_steps, limit_range
 
 (VREFN, VREFP) = (-5., 5.)
 (VMIN, VMAX) = (-2.6, 2.6)
@@ -18,7 +20,7 @@ FPGA_CLOCK = 4e6
 N_CHANNELS = 6
 
 RAM_DEPTH = 10
-MAX_STEPS = (2**RAM_DEPTH - 1) / 3 - 1
+MAX_STEPS = (2**RAM_DEPTH - 1) // 3 - 1
 
 MIN_TICKS_TO_OUTPUT = 31 # Number of clock cycles to output 1 value
 # Let's pad this a bit to be safe
@@ -27,28 +29,95 @@ MIN_TIME = float(TICKS_TO_OUTPUT) / FPGA_CLOCK
 MAX_TIME = (2**DT_BITS - 1) / float(FPGA_CLOCK)
 
 def time_to_ticks(clk, time):
-    if time > MAX_TIME:
-        return -1
-    return max(int(abs(clk*time)), 1)
+    """ times (s) to clock ticks, -1 if longer than MAX_TIME. works on scalars and arrays """
+    time = np.asarray(time, dtype=float)
+    ticks = np.maximum(np.trunc(np.abs(clk*time)), 1).astype(np.int64)
+    return np.where(time > MAX_TIME, -1, ticks)
 
 # 2's complement
 def calcD(v):
+    """ voltages to DAC words. works on scalars and arrays """
     CONV_FACTOR = 2**DAC_BITS - 1
 
-    if v > VMAX:
-        v = VMAX 
-    elif v < VMIN:
-        v = VMIN
+    v = np.clip(np.asarray(v, dtype=float), VMIN, VMAX)
+    v = np.where(v >= VREFP, VREFP - (VREFP - VREFN) / CONV_FACTOR, v)
+    v = np.where(v < VREFN, VREFN, v)
 
-    if v >= VREFP:
-        v = VREFP - (VREFP - VREFN) / CONV_FACTOR
-    elif v < VREFN:
-        v = VREFN
+    positive = np.trunc(CONV_FACTOR * v / (VREFP - VREFN))
+    negative = np.trunc(CONV_FACTOR * (VREFP - VREFN + v) / (VREFP - VREFN) + 1)
+    return np.where(v >= 0, positive, negative).astype(np.int64)
 
-    if v >= 0:
-        return long(CONV_FACTOR * v / (VREFP - VREFN))
-    else:
-        return long(CONV_FACTOR * (VREFP - VREFN + v) / (VREFP - VREFN) + 1)
+def remove_redundant(dt, v):
+    """
+    Redundant ramps are when we have 3 ramps with the same setpoint in a row.
+    Each run of equal setpoints is kept as its first ramp followed by one ramp
+    lasting the rest of the run.
+    """
+    merged = np.zeros(len(v), dtype=bool)
+    merged[2:] = (v[2:] == v[1:-1]) & (v[2:] == v[:-2])
+    kept = np.flatnonzero(~merged)
+    group = np.cumsum(~merged) - 1
+    position = np.arange(len(v)) - kept[group]
+
+    # Add up the merged durations in order, one position in the run at a time,
+    # so that the sums round the same as adding them one by one
+    out = dt[kept]
+    for p in range(1, position.max() + 1 if len(v) else 0):
+        i = np.flatnonzero(position == p)
+        out[group[i]] = dt[i] + out[group[i]]
+    return out, v[kept]
+
+def enforce_min_time(dt):
+    """
+    dt_accumulated is the accumulated error due to ramps being requested too fast
+
+    When this happens, we will just output as fast as we can until there is a
+    long enough block where we can catch up to the sequence
+    """
+    out = dt.copy()
+    short = np.flatnonzero(dt < MIN_TIME)
+    if not len(short):
+        return out
+
+    dt_accumulated = 0
+    for i in range(short[0], len(dt)):
+        dt_accumulated += float(dt[i])
+        if dt_accumulated < MIN_TIME:
+            out[i] = MIN_TIME
+            dt_accumulated -= MIN_TIME
+        else:
+            out[i] = dt_accumulated
+            dt_accumulated = 0
+    return out
+
+def split_long(dt, v):
+    """ split ramps longer than MAX_TIME into equal pieces, ramping linearly from the previous setpoint """
+    split = dt > MAX_TIME
+    n_steps = np.where(split, np.ceil(dt / MAX_TIME), 1).astype(np.int64)
+    last_v = np.concatenate([[0.], v[:-1]])
+
+    index = np.repeat(np.arange(len(v)), n_steps)
+    step = np.arange(len(index)) - np.repeat(np.cumsum(n_steps) - n_steps, n_steps) + 1
+    split, n_steps, last_v = split[index], n_steps[index], last_v[index]
+
+    dt = np.where(split, dt[index] / n_steps, dt[index])
+    v = np.where(split, last_v + (v[index] - last_v) * step / n_steps, v[index])
+    return dt, v
+
+def ramp_bytes(clk, dt, v):
+    """ ramps to bytes, [end_voltage[20], duration[28]] little endian, with padding """
+    ticks = time_to_ticks(clk, dt) << 4
+    D = calcD(v)
+
+    words = np.stack([
+        D & 0xff,
+        D >> 8 & 0xff,
+        (D >> 16 & 0xff) + (ticks & 0xff),
+        ticks >> 8 & 0xff,
+        ticks >> 16 & 0xff,
+        ticks >> 24 & 0xff,
+    ], axis=-1)
+    return np.concatenate([words.ravel(), np.zeros(6, dtype=np.int64)]).astype(np.uint8)
 
 
 class AD5791Channel(object):
@@ -130,26 +199,25 @@ class AD5791Board(DeviceWrapper):
     @inlineCallbacks
     def set_mode(self, mode):
         mode_int = self.mode_ints[mode]
-        yield self.connection.set_wire_in(self.mode_wire, mode_int)
-        yield self.connection.update_wire_ins()
+        yield self.connection.set_wire_ins([(self.mode_wire, mode_int)])
         self.mode = mode
 
     @inlineCallbacks
     def set_load_channel(self, channel):
-        yield self.connection.set_wire_in(self.channel_wire, channel)
-        yield self.connection.update_wire_ins()
+        yield self.connection.set_wire_ins([(self.channel_wire, channel)])
         self.load_channel = channel
 
     @inlineCallbacks
     def program_sequence(self, sequence):
-        byte_array = self.make_sequence_bytes(sequence)
+        # compile everything first, so a bad sequence fails before touching the board
+        buffer, offsets = self.compile_sequence(sequence)
         yield self.set_mode('idle')
         yield self.set_mode('load')
 
-        for c in self.channels:
-            index = c.index
-            yield self.set_load_channel(index)
-            yield self.connection.write_to_pipe_in(self.sequence_pipe, json.dumps(byte_array[c.loc]))
+        # the firmware loads one channel's RAM per pipe transfer
+        for (i, c) in enumerate(self.channels):
+            yield self.set_load_channel(c.index)
+            yield self.connection.write_to_pipe_in(self.sequence_pipe, json.dumps(buffer[offsets[i]:offsets[i+1]].tolist()))
         yield self.set_mode('idle')
 
     @inlineCallbacks
@@ -162,102 +230,71 @@ class AD5791Board(DeviceWrapper):
         yield self.connection.activate_trigger_in(self.reset_trigger, 0)
 
 
-    def make_sequence_bytes(self, sequence):
-        """ 
-        take readable {channel: [{}]} to programmable [end_voltage[20], duration[28]]
+    def compile_sequence(self, sequence):
         """
+        take readable {channel: [{}]} to programmable [end_voltage[20], duration[28]]
+        for all channels, staged in one buffer
 
-        byte_array = {}
+        returns (buffer, offsets), where channel c's program is buffer[offsets[i]:offsets[i+1]]
+        for the ith channel of self.channels
+        """
+        programs = []
         for c in self.channels:
-            byte_array[c.loc] = []
-
             # Generate the list of ramps from the sequence
             ramps = RampMaker(sequence[c.key]).get_programmable()
+            dt = np.array([r['dt'] for r in ramps], dtype=float)
+            v = np.array([r['v'] for r in ramps], dtype=float)
 
             # Consolidate ramps:
             # The amount of RAM is limited on the FPGA
             # Each linear ramp counts as a step
             # Want to consolidate these to avoid taking up too much memory
-            consolidated_ramps = []
-
-            # First walk through the ramp array and remove any redundancy
-            # Redundant ramps are when we have 3 ramps with the same setpoint in a row
-            # In this case we can consolidate the second 2
-            c_ramps = ramps[0:2]
-            for i in range(2, len(ramps)):
-                r = ramps[i]
-                rm = ramps[i-1]
-                rmm = ramps[i-2]
-
-                if r['v'] == rm['v'] and r['v'] == rmm['v']:
-                    rp = c_ramps.pop()
-                    c_ramps.append({'dt': r['dt']+rp['dt'], 'v': r['v']})
-                else:
-                    c_ramps.append(r)
-
-            # Now enforce the MIN_TIME to update the DAC
-            # dt_accumulated is the accumulated error due to ramps being requested too fast
-            #
-            # When this happens, we will just output as fast as we can until there is a
-            # long enough block where we can catch up to the sequence
-            dt_accumulated = 0
-            for r in c_ramps:
-                dt_accumulated += r['dt']
-                if dt_accumulated < MIN_TIME:
-                    consolidated_ramps.append({'dt': MIN_TIME, 'v': r['v']})
-                    dt_accumulated -= MIN_TIME
-                else:
-                    consolidated_ramps.append({'dt': dt_accumulated, 'v': r['v']})
-                    dt_accumulated = 0
-
-
-            # Need to check that we haven't created any ramps that are
-            # longer than the maximum ramp time.
-            # If we did, then just need to split the ramp.
-            final_ramps = []
-            for (idx, r) in enumerate(consolidated_ramps):
-                if r['dt'] > MAX_TIME:
-                    if idx > 0:
-                        last_v = consolidated_ramps[idx - 1]['v']
-                    else:
-                        last_v = 0
-                    n_steps = math.ceil(r['dt'] / MAX_TIME)
-                    dt = float(r['dt']) / n_steps
-                    for i in range(n_steps):
-                        v = last_v + (r['v'] - last_v) * float(i+1) / n_steps
-                        final_ramps.append({'dt': dt, 'v': v})
-                else:
-                    final_ramps.append(r)
-
-            # Print a warning if there are too many ramps
-            if len(final_ramps) > MAX_STEPS:
-                print("Too many steps! Program will be truncated!!!")
-         
-            # Trucate the array at the maximum program length 
-            try:
-                final_ramps = final_ramps[0:MAX_STEPS]
-            except: pass
-
-            # Convert final ramps to sequence bytes
-            for r in final_ramps:
-                r['dt'] = time_to_ticks(self.clk, r['dt'])
-                r['dt'] = r['dt'] << 4
-
-                r['v'] = calcD(r['v'])
-
-                dtbits = []
-                for i in range(4):
-                    dtbits.append(int((r['dt'] >> 8*i) & 0xff))
-
-                dvbits = []
-                for i in range(3):
-                    dvbits.append(int((r['v'] >> 8*i) & 0xff))
-
-                bits = dvbits[0:2] + [dvbits[2] + dtbits[0]] + dtbits[1:]
-
-                byte_array[c.loc] += bits
-
-            # Pad
-            byte_array[c.loc] += [0]*6
-
-        return byte_array
+            dt, v = remove_redundant(dt, v)
+            dt = enforce_min_time(dt)
+            dt, v = split_long(dt, v)
+
+            if len(dt) > MAX_STEPS:
+                raise ValueError("Channel {} needs {} steps, but the board can only store {}. Simplify its sequence.".format(c.key, len(dt), MAX_STEPS))
+            programs.append(ramp_bytes(self.clk, dt, v))
+
+        offsets = np.cumsum([0] + [len(p) for p in programs])
+        return np.concatenate(programs), offsets
+
+    def make_sequence_bytes(self, sequence):
+        """ 
+        take readable {channel: [{}]} to programmable {channel: [bytes]}
+        """
+        buffer, offsets = self.compile_sequence(sequence)
+        return {c.loc: buffer[offsets[i]:offsets[i+1]].tolist() for (i, c) in enumerate(self.channels)}
+
+    def validate_sequence(self, sequence):
+        """
+        validate_sequence(self, sequence)
+
+        Checks this board's channels in a fully substituted sequence, as they would be compiled by :meth:`compile_sequence`.
+
+        Args:
+            sequence (dict): Steps of each channel, keyed by channel key. Channels that aren't in ``sequence`` are skipped.
+
+        Returns:
+            list: Diagnostics, as described in :mod:`sequencer.devices.lib.validation`
+        """
+        diagnostics = []
+        for c in self.channels:
+            if c.key not in sequence:
+                continue
+            (ramps, columns, errors) = programmable_steps(c.key, sequence[c.key], RampMaker)
+            diagnostics += errors
+            if not ramps:
+                continue
+            dt = np.array([r['dt'] for r in ramps], dtype=float)
+            v = np.array([r['v'] for r in ramps], dtype=float)
+            voltage_range = limit_range(c.voltage_range, (VMIN, VMAX))
+            diagnostics += check_steps(c.key, columns, dt, v, voltage_range, self.clk, TICKS_TO_OUTPUT, None)
+
+            # As compile_sequence consolidates the ramps
+            (dt, v) = remove_redundant(dt, v)
+            (dt, v) = split_long(enforce_min_time(dt), v)
+            if len(dt) > MAX_STEPS:
+                diagnostics.append(diagnostic(c.key, None, 'max_steps', 'Needs {} steps, but the board can only store {}'.format(len(dt), MAX_STEPS)))
+        return diagnostics
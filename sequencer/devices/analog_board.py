@@ -9,6 +9,7 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from lib.analog_ramps import RampMaker
+from lib.validation import check_steps, programmable_steps, limit_range
 
 VOLTAGE_RANGE = (-10., 10.)
 DAC_BITS = 16
@@ -176,6 +177,31 @@ class AnalogBoard(DeviceWrapper):
         # add dead space
         byte_array += [0]*24
         return byte_array
+
+    def validate_sequence(self, sequence):
+        """
+        validate_sequence(self, sequence)
+
+        Checks this board's channels in a fully substituted sequence, as they would be compiled by :meth:`make_sequence_bytes`.
+
+        Args:
+            sequence (dict): Steps of each channel, keyed by channel key. Channels that aren't in ``sequence`` are skipped.
+
+        Returns:
+            list: Diagnostics, as described in :mod:`sequencer.devices.lib.validation`
+        """
+        diagnostics = []
+        for c in self.channels:
+            if c.key not in sequence:
+                continue
+            (ramps, columns, errors) = programmable_steps(c.key, sequence[c.key], RampMaker)
+            diagnostics += errors
+            if ramps:
+                dt = np.array([r['dt'] for r in ramps], dtype=float)
+                v = np.cumsum([r['dv'] for r in ramps])
+                voltage_range = limit_range(c.voltage_range, VOLTAGE_RANGE)
+                diagnostics += check_steps(c.key, columns, dt, v, voltage_range, self.clk, 1, 2**32 - 1)
+        return diagnostics
     
     @inlineCallbacks
     def write_channel_modes(self):
@@ -1,8 +1,14 @@
 import json
+import numpy as np
 from twisted.internet.defer import inlineCallbacks, returnValue
 
 from server_tools.device_server import DeviceWrapper
 
+import sys, os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from lib.validation import diagnostic, check_steps, is_number
+
 T_TRIG = 10e-6
 # T_TRIG = 0
 T_END = 10e-3
@@ -169,6 +175,29 @@ class DigitalBoard(DeviceWrapper):
                     for i in range(0, 32, 8)])
         byte_array += [0]*24
         return byte_array
+
+    def validate_sequence(self, sequence):
+        """
+        validate_sequence(self, sequence)
+
+        Checks this board's channels in a fully substituted sequence, as they would be compiled by :meth:`make_sequence_bytes`.
+
+        Args:
+            sequence (dict): Steps of each channel, keyed by channel key. Channels that aren't in ``sequence`` are skipped.
+
+        Returns:
+            list: Diagnostics, as described in :mod:`sequencer.devices.lib.validation`
+        """
+        diagnostics = []
+        for c in self.channels:
+            if c.key not in sequence:
+                continue
+            for (i, s) in enumerate(sequence[c.key]):
+                if not is_number(s.get('out')):
+                    diagnostics.append(diagnostic(c.key, i, 'output', 'Output {!r} is not a number'.format(s.get('out'))))
+            dt = [s['dt'] for s in sequence[c.key]]
+            diagnostics += check_steps(c.key, np.arange(len(dt)), dt, None, None, self.clk, 0, 2**32 - 1)
+        return diagnostics
     
     @inlineCallbacks
     def write_channel_modes(self):
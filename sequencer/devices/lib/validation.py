@@ -0,0 +1,150 @@
+"""
+Checks of fully substituted sequences, shared by the sequencer boards.
+
+A diagnostic is a dict that can be JSON-dumped:
+
+.. code-block:: python
+
+    {
+        'channel': 'Stark DAC@E00', # the channel's key
+        'column': 12, # or None, for the whole channel
+        'rule': 'voltage_range',
+        'message': 'Ramps to 3.2 V, outside [-2.6, 2.6] V',
+        'severity': 'error', # or 'warning'
+    }
+
+Errors are sequences that a board can't run, or would run with the wrong outputs; warnings are sequences that a board runs, but with some steps late or skipped. The checks work on NumPy arrays of all of a channel's steps at once.
+"""
+from copy import deepcopy
+
+import numpy as np
+
+# Ticks that a step can run for longer than written without a warning. A step that rounds to nothing, e.g. what is left of a column exactly as long as its ramp, runs for a tick.
+ROUNDING_TICKS = 1 + 1e-6
+
+def diagnostic(channel, column, rule, message, severity='error'):
+    return {'channel': channel, 'column': column, 'rule': rule, 'message': message, 'severity': severity}
+
+def is_number(x):
+    return isinstance(x, (int, float, np.number))
+
+def find_parameters(x):
+    """ parameters (strings starting with '*') left in x """
+    if isinstance(x, dict):
+        return [p for v in x.values() for p in find_parameters(v)]
+    elif isinstance(x, list):
+        return [p for v in x for p in find_parameters(v)]
+    elif hasattr(x, 'startswith') and x.startswith('*'):
+        return [x]
+    return []
+
+def check_timing(channel, channel_sequence, timing_sequence):
+    """
+    check_timing(channel, channel_sequence, timing_sequence)
+
+    Checks that each column of a channel is a step with a positive duration, the same as the timing channel's, and has no parameters left in it.
+
+    Args:
+        channel (str): The channel's key
+        channel_sequence (list): The channel's steps
+        timing_sequence (list): The timing channel's steps
+
+    Returns:
+        list: Diagnostics. If there are any, the channel can't be compiled.
+    """
+    diagnostics = []
+    if not isinstance(channel_sequence, list) or not all(isinstance(s, dict) for s in channel_sequence):
+        return [diagnostic(channel, None, 'format', 'Sequence must be a list of steps')]
+    if len(channel_sequence) != len(timing_sequence):
+        return [diagnostic(channel, None, 'column_count', 'Has {} columns, but the timing channel has {}'.format(len(channel_sequence), len(timing_sequence)))]
+
+    for (i, s) in enumerate(channel_sequence):
+        parameters = find_parameters(s)
+        if parameters:
+            diagnostics.append(diagnostic(channel, i, 'parameter', 'Parameters {} were not substituted'.format(', '.join(sorted(set(parameters))))))
+        elif not is_number(s.get('dt')):
+            diagnostics.append(diagnostic(channel, i, 'dt', 'Duration {!r} is not a number'.format(s.get('dt'))))
+
+    dt = np.array([s['dt'] if is_number(s.get('dt')) else np.nan for s in channel_sequence], dtype=float)
+    for i in np.flatnonzero(dt <= 0):
+        diagnostics.append(diagnostic(channel, int(i), 'dt', 'Duration {} s is not positive'.format(dt[i])))
+    timing_dt = np.array([s['dt'] if is_number(s.get('dt')) else np.nan for s in timing_sequence], dtype=float)
+    for i in np.flatnonzero((dt != timing_dt) & (dt > 0) & ~np.isnan(timing_dt)):
+        diagnostics.append(diagnostic(channel, int(i), 'dt_mismatch', 'Duration {} s differs from the timing channel\'s {} s'.format(dt[i], timing_dt[i])))
+    return sorted(diagnostics, key=lambda x: x['column'])
+
+def check_steps(channel, columns, step_dt, step_v, voltage_range, clk, min_ticks, max_ticks, units='V'):
+    """
+    check_steps(channel, columns, step_dt, step_v, voltage_range, clk, min_ticks, max_ticks, units='V')
+
+    Checks the steps that a channel is compiled to, reporting the first bad step in each column. Durations are checked in clock ticks, as the boards' ``time_to_ticks`` converts them: a step of ``dt`` runs for ``max(int(abs(clk*dt)), min_ticks)`` ticks. A step that runs more than ``ROUNDING_TICKS`` longer than written, e.g. the rest of a column too short for its ramp, is warned about, since it delays the rest of the channel.
+
+    Args:
+        channel (str): The channel's key
+        columns (array): The column of each step
+        step_dt (array): The duration of each step, in seconds
+        step_v (array): The voltage at the end of each step, or None to skip checking voltages
+        voltage_range (tuple): The lowest and highest voltages that the channel can output
+        clk (float): The board's clock, in Hz
+        min_ticks (int): The fewest ticks that the board runs a step for. Steps that round to 0 ticks are skipped.
+        max_ticks (int): The most ticks that the board can run a step for, or None if longer steps are split
+
+    Returns:
+        list: Diagnostics
+    """
+    step_dt = np.asarray(step_dt, dtype=float)
+    columns = np.asarray(columns, dtype=int)
+    diagnostics = []
+
+    def first_in_each_column(bad):
+        (_, first) = np.unique(columns[bad], return_index=True)
+        return np.flatnonzero(bad)[first]
+
+    if step_v is not None:
+        step_v = np.asarray(step_v, dtype=float)
+        (vmin, vmax) = (min(voltage_range), max(voltage_range))
+        for i in first_in_each_column((step_v < vmin - 1e-9) | (step_v > vmax + 1e-9) | np.isnan(step_v)):
+            diagnostics.append(diagnostic(channel, int(columns[i]), 'voltage_range', 'Ramps to {:.4g} {}, outside [{}, {}] {}'.format(step_v[i], units, vmin, vmax, units)))
+
+    ticks = clk * step_dt
+    board_ticks = np.maximum(np.trunc(np.abs(ticks)), min_ticks)
+    if max_ticks is not None:
+        for i in first_in_each_column(board_ticks > max_ticks):
+            diagnostics.append(diagnostic(channel, int(columns[i]), 'max_time', 'Step of {:.4g} s is longer than the longest the board can run, {:.4g} s'.format(step_dt[i], max_ticks / clk)))
+    late = board_ticks - ticks > ROUNDING_TICKS
+    for i in first_in_each_column(late & (ticks < 0)):
+        diagnostics.append(diagnostic(channel, int(columns[i]), 'min_time', 'Column is too short for its ramp, leaving a step of {:.3g} s, which the board runs for {:.3g} s, so the rest of the channel will be delayed'.format(step_dt[i], board_ticks[i] / clk), 'warning'))
+    for i in first_in_each_column(late & (ticks >= 0)):
+        diagnostics.append(diagnostic(channel, int(columns[i]), 'min_time', 'Step of {:.3g} s is shorter than the shortest the board can run, {:.3g} s, so the rest of the channel will be delayed'.format(step_dt[i], min_ticks / clk), 'warning'))
+    for i in first_in_each_column((board_ticks == 0) & (ticks > 0)):
+        diagnostics.append(diagnostic(channel, int(columns[i]), 'min_time', 'Step of {:.3g} s is shorter than a clock tick, so will be skipped'.format(step_dt[i]), 'warning'))
+    return diagnostics
+
+def programmable_steps(channel, channel_sequence, ramp_maker):
+    """
+    programmable_steps(channel, channel_sequence, ramp_maker)
+
+    Args:
+        channel (str): The channel's key
+        channel_sequence (list): The channel's columns, which are not modified
+        ramp_maker: The ``RampMaker`` class for the channel
+
+    Returns:
+        (list, array, list): The steps, as from ``ramp_maker(...).get_programmable()``, the column of each step, and a diagnostic if the steps couldn't be made
+    """
+    try:
+        ramps = ramp_maker(deepcopy(channel_sequence))
+        # As get_programmable, keeping track of which column each ramp, including those of 'sub' sequences, is in
+        ends = np.cumsum([s['dt'] for s in channel_sequence])
+        (steps, columns) = ([], [])
+        for s in ramps.sequence:
+            lins = ramps.available_ramps[s['type']](s).to_lin()
+            steps += lins
+            columns += [min(np.searchsorted(ends, s['ti'] + 1e-12, side='right'), len(ends) - 1)] * len(lins)
+        return (steps, np.array(columns, dtype=int), [])
+    except Exception as e:
+        return ([], np.zeros(0, dtype=int), [diagnostic(channel, None, 'ramp', 'Could not compile ramps: {!r}'.format(e))])
+
+def limit_range(channel_range, board_range):
+    """ the overlap of the channel's configured voltage range and what the board can output """
+    return (max(min(channel_range), min(board_range)), min(max(channel_range), max(board_range)))
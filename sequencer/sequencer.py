@@ -27,10 +27,12 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 
 sys.path.append('../')
 from server_tools.device_server import DeviceServer
+from devices.lib.validation import diagnostic, check_timing
 
 from time import sleep
 
 UPDATE_ID = 698032
+CHANNELS_CHANGED_ID = 698033
 TRIGGER_CHANNEL = 'Trigger@D15'
 
 class SequencerServer(DeviceServer):
@@ -42,6 +44,7 @@ class SequencerServer(DeviceServer):
     TODO: Finish documenting all the methods.
     """
     update = Signal(UPDATE_ID, 'signal: update', 'b')
+    channels_changed = Signal(CHANNELS_CHANGED_ID, 'signal: channels_changed', 's')
     name = 'sequencer'
     
     def id2channel(self, channel_id):
@@ -139,25 +142,62 @@ class SequencerServer(DeviceServer):
     @setting(12, channel_id='s', mode='s')
     def channel_mode(self, c, channel_id, mode=None):
         channel = self.id2channel(channel_id)
+        state = self._channel_state(channel)
         if mode is not None:
             yield channel.set_mode(mode)
         yield self.send_update(c)
+        self._notify_channel_changed(channel, state)
         returnValue(channel.mode)
     
     @setting(13, channel_id='s', output='?')
     def channel_manual_output(self, c, channel_id, output=None):
         channel = self.id2channel(channel_id)
+        state = self._channel_state(channel)
         if output is not None:
             yield channel.set_manual_output(output)
         yield self.send_update(c)
+        self._notify_channel_changed(channel, state)
         returnValue(channel.manual_output)
 
+    def _channel_state(self, channel):
+        return {'mode': channel.mode, 'manual_output': channel.manual_output}
+
+    def _notify_channel_changed(self, channel, state):
+        """
+        _notify_channel_changed(self, channel, state)
+
+        Sends the ``channels_changed`` signal if a channel's mode or manual output has changed. The signal is a JSON-dumped dictionary of the new mode and manual output of each changed channel, keyed by the channels' keys, so that clients don't have to fetch all the channels with :meth:`get_channels` after every change.
+
+        Args:
+            channel: The channel that may have changed
+            state (dict): The channel's mode and manual output before the change
+        """
+        new_state = self._channel_state(channel)
+        if new_state != state:
+            self.channels_changed(json.dumps({channel.key: new_state}, default=lambda x: None))
+
     @setting(14, sequence='s', returns='s')
     def fix_sequence_keys(self, c, sequence):
         sequence = json.loads(sequence)
         sequence_keyfix = self._fix_sequence_keys(sequence)
         return json.dumps(sequence_keyfix)
     
+    @setting(16, sequence='s', returns='s')
+    def validate_sequence(self, c, sequence):
+        """
+        validate_sequence(self, c, sequence)
+
+        Checks a fully substituted sequence before it's run, without programming any boards. See :meth:`_validate_sequence`.
+
+        Args:
+            c: The LabRAD context
+            sequence (str): A JSON-dumped sequence, as for :meth:`run_sequence`
+
+        Returns:
+            str: A JSON-dumped list of diagnostics, each a dictionary with keys ``'channel'``, ``'column'``, ``'rule'``, ``'message'`` and ``'severity'``, which is ``'error'`` or ``'warning'``. Empty if the sequence is valid.
+        """
+        return json.dumps(self._validate_sequence(json.loads(sequence)))
+
     @setting(15, sequencer='s', returns='s')
     def sequencer_mode(self, c, sequencer):
         return self.devices[sequencer].mode
@@ -176,6 +216,49 @@ class SequencerServer(DeviceServer):
                     fixed_sequence.update({c.key: default_sequence})
         return fixed_sequence
 
+    def _validate_sequence(self, sequence):
+        """
+        _validate_sequence(self, sequence)
+
+        Checks that every channel in the sequence exists, and reports channels that are missing from it, which :meth:`_fix_sequence_keys` fills in with their manual outputs. Then checks that each channel has the same columns as the trigger channel, with positive durations and no unsubstituted parameters. Each board checks its channels that passed, using its own limits, as described in :mod:`sequencer.devices.lib.validation`.
+
+        Args:
+            sequence (dict): The sequence, keyed by channel IDs as accepted by :meth:`id2channel`
+
+        Returns:
+            list: Diagnostics, ordered by channel and column
+        """
+        diagnostics = []
+        keyed_sequence = {}
+        for (channel_id, channel_sequence) in sequence.items():
+            try:
+                keyed_sequence[self.id2channel(channel_id).key] = channel_sequence
+            except KeyError:
+                diagnostics.append(diagnostic(channel_id, None, 'unknown_channel', 'No channel matches {}'.format(channel_id)))
+
+        if TRIGGER_CHANNEL not in keyed_sequence:
+            diagnostics.append(diagnostic(TRIGGER_CHANNEL, None, 'missing_channel', 'The trigger channel sets the columns, so must be in the sequence'))
+            return diagnostics
+        timing_sequence = keyed_sequence[TRIGGER_CHANNEL]
+        if not isinstance(timing_sequence, list) or not timing_sequence:
+            diagnostics.append(diagnostic(TRIGGER_CHANNEL, None, 'format', 'Sequence must be a non-empty list of steps'))
+            return diagnostics
+
+        checked = {}
+        for d in self.devices.values():
+            for c in d.channels:
+                if c.key not in keyed_sequence:
+                    diagnostics.append(diagnostic(c.key, None, 'missing_channel', 'Not in the sequence, so will stay at its manual output {}'.format(c.manual_output), 'warning'))
+                    continue
+                errors = check_timing(c.key, keyed_sequence[c.key], timing_sequence)
+                diagnostics += errors
+                if not errors:
+                    checked[c.key] = keyed_sequence[c.key]
+
+        for d in self.devices.values():
+            diagnostics += d.validate_sequence(checked)
+        return sorted(diagnostics, key=lambda x: (x['channel'], -1 if x['column'] is None else x['column']))
+
     @setting(2)
     def send_update(self, c):
         yield self.update(True)
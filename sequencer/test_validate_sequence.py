@@ -0,0 +1,84 @@
+"""
+Tests of :meth:`sequencer.SequencerServer._validate_sequence` on the boards in ``test_config.json``, which are made without connecting to them.
+
+``test_sequence.json`` runs on the sequencer as it is, so it must validate without errors, with its parameters set to the conductor's defaults in ``conductor/clients/variables_config.py``.
+
+.. code-block:: bash
+
+    python -m unittest test_validate_sequence
+"""
+import json
+import os
+import sys
+import unittest
+from copy import deepcopy
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(DIRECTORY))
+
+from conductor.clients.variables_config import variables_dict
+from conductor.devices.sequencer.lib.helpers import substitute_sequence_parameters
+from server_tools.device_server import get_device_wrapper
+from sequencer import SequencerServer, TRIGGER_CHANNEL
+
+ANALOG_CHANNEL = 'DAC0: QTrap Voltage@I00'
+
+
+def make_server():
+    server = SequencerServer(os.path.join(DIRECTORY, 'test_config.json'))
+    for (name, config) in server.config.devices.items():
+        device_wrapper = get_device_wrapper(config)
+        device_wrapper.name = name
+        server.devices[name] = device_wrapper(config)
+    return server
+
+def load_sequence():
+    with open(os.path.join(DIRECTORY, 'test_sequence.json'), 'r') as infile:
+        sequence = json.load(infile)['sequence']
+    return substitute_sequence_parameters(sequence, dict(variables_dict))
+
+
+class TestValidateSequence(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = make_server()
+        cls.sequence = load_sequence()
+
+    def diagnostics(self, sequence, channel=None, severity=None):
+        return [d for d in self.server._validate_sequence(sequence)
+                if (channel is None or d['channel'] == channel) and (severity is None or d['severity'] == severity)]
+
+    def set_column(self, sequence, i, dt):
+        for channel_sequence in sequence.values():
+            channel_sequence[i]['dt'] = dt
+
+    def test_test_sequence(self):
+        self.assertEqual(self.diagnostics(self.sequence, severity='error'), [])
+
+    def test_rounding(self):
+        # A column as long as its ramp, but for rounding errors in its duration
+        sequence = deepcopy(self.sequence)
+        self.set_column(sequence, 0, 0.7e-4 + 0.3e-4)
+        self.assertEqual([d for d in self.diagnostics(sequence, ANALOG_CHANNEL) if d['column'] == 0], [])
+
+    def test_column_shorter_than_ramp(self):
+        sequence = deepcopy(self.sequence)
+        self.set_column(sequence, 0, 5e-5)
+        diagnostics = [d for d in self.diagnostics(sequence, ANALOG_CHANNEL) if d['column'] == 0]
+        self.assertEqual([(d['rule'], d['severity']) for d in diagnostics], [('min_time', 'warning')])
+
+    def test_step_too_long(self):
+        sequence = deepcopy(self.sequence)
+        self.set_column(sequence, 1, 100.)
+        errors = self.diagnostics(sequence, TRIGGER_CHANNEL, 'error')
+        self.assertEqual([(d['rule'], d['column']) for d in errors], [('max_time', 1)])
+
+    def test_parameter(self):
+        sequence = deepcopy(self.sequence)
+        sequence[ANALOG_CHANNEL][3]['vf'] = '*QTrap'
+        errors = self.diagnostics(sequence, ANALOG_CHANNEL, 'error')
+        self.assertEqual([(d['rule'], d['column']) for d in errors], [('parameter', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
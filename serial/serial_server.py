@@ -23,6 +23,7 @@ MAKE SURE YOU CHECK THE WRITE TERMINATION... it is set to ``\r\n`` by default.
 import sys
 import pyvisa as visa
 from labrad.server import LabradServer, setting
+from twisted.internet.defer import returnValue
 sys.path.append('../')
 from server_tools.hardware_interface_server import HardwareInterfaceServer
 import json
@@ -31,26 +32,26 @@ class SerialServer(HardwareInterfaceServer):
     """Provides direct access to ASRL-enabled hardware."""
     name = '%LABRADNODE%_serial'
 
-    def refresh_available_interfaces(self):
-        """ Fill self.interfaces with available connections using Python VISA """
-        rm = visa.ResourceManager()
-        addresses = rm.list_resources()
-        additions = set(addresses) - set(self.interfaces.keys())
-        deletions = set(self.interfaces.keys()) - set(addresses)
-        for address in additions:
-            if address.startswith('ASRL'):
-                try:
-                    inst = rm.open_resource(address)
-                    try:
-                        inst.clear()
-                    except:
-                        pass
-                    self.interfaces[address] = inst
-                    print('connected to ASRL device ' + address)
-                except Exception as e:
-                    print("Could not connect to {}: {}".format(address, e))
-        for addr in deletions:
-            del self.interfaces[addr]
+    rm = None
+
+    def get_resource_manager(self):
+        """ The Python VISA resource manager, which is reused """
+        if self.rm is None:
+            self.rm = visa.ResourceManager()
+        return self.rm
+
+    def list_addresses(self):
+        """ Addresses of the ASRL devices, using Python VISA """
+        return [a for a in self.get_resource_manager().list_resources() if a.startswith('ASRL')]
+
+    def open_interface(self, address):
+        inst = self.get_resource_manager().open_resource(address)
+        try:
+            inst.clear()
+        except:
+            pass
+        print('connected to ASRL device ' + address)
+        return inst
 
     @setting(3, data='s', returns='')
     def write(self, c, data):
@@ -63,7 +64,7 @@ class SerialServer(HardwareInterfaceServer):
             c: The LabRAD context
             data (str): The string to be written to the serial port
         """        
-        self.call_if_available('write', c, data)
+        yield self.call_in_thread('write', c, data)
 
     @setting(4, n_bytes='w', returns='s')
     def read(self, c, n_bytes=None):
@@ -80,8 +81,8 @@ class SerialServer(HardwareInterfaceServer):
         Returns:
             str: The bytes returned from the device, with leading and trailing whitespace stripped
         """        
-        response = self.call_if_available('read', c)
-        return response.strip()
+        response = yield self.call_in_thread('read', c)
+        returnValue(response.strip())
 
     @setting(8, returns='s')
     def read_line(self, c):
@@ -96,9 +97,39 @@ class SerialServer(HardwareInterfaceServer):
         Returns:
             str: The bytes returned from the device, with leading and trailing whitespace stripped
         """
-        response = self.call_if_available('read', c, '\n') 
-        return response.strip()
+        response = yield self.call_in_thread('read', c, '\n') 
+        returnValue(response.strip())
+
+
+    @setting(12, data='y', returns='')
+    def write_bytes(self, c, data):
+        """
+        write_bytes(self, c, data)
+        
+        Write binary data to the serial port, without a termination.
 
+        Args:
+            c: The LabRAD context
+            data (bytes): The bytes to be written to the serial port
+        """
+        yield self.call_in_thread('write_raw', c, data)
+
+    @setting(13, n_bytes='w', returns='y')
+    def read_bytes(self, c, n_bytes):
+        """
+        read_bytes(self, c, n_bytes)
+        
+        Read binary data from the serial port.
+
+        Args:
+            c: The LabRAD context
+            n_bytes (int): The number of bytes to read
+
+        Returns:
+            bytes: The bytes returned from the device, unstripped
+        """
+        response = yield self.call_in_thread('read_bytes', c, n_bytes)
+        returnValue(response)
 
     @setting(5, data='s', returns='s')
     def query(self, c, data):
@@ -119,8 +150,8 @@ class SerialServer(HardwareInterfaceServer):
         """        
 #        self.call_if_available('write', c, data)
 #        ans = self.call_if_available('read_raw', c)
-        response = self.call_if_available('query', c, data)
-        return response.strip()
+        response = yield self.call_in_thread('query', c, data)
+        returnValue(response.strip())
 
     @setting(6, timeout='v', returns='v')
     def timeout(self, c, timeout=None):
@@ -199,6 +230,37 @@ class SerialServer(HardwareInterfaceServer):
             interface.baud_rate = baud
         return interface.baud_rate
 
+    @setting(11, reset='b', returns='s')
+    def get_interface_stats(self, c, reset=False):
+        """
+        get_interface_stats(self, c, reset=False)
+
+        Gets the number of calls, errors and timeouts, and the latency, of the serial devices that have been written to or read from.
+
+        Args:
+            c: The LabRAD context
+            reset (bool, optional): Whether to reset the counters after reading them. Defaults to False.
+
+        Returns:
+            str: A serialized json of ``{address: {"calls": ..., "errors": ..., "timeouts": ..., "mean_latency": ..., "max_latency": ..., "last_latency": ...}}``, with latencies in seconds
+        """
+        return self.get_stats(reset)
+
+    @setting(14, returns='s')
+    def get_interface_discovery_stats(self, c):
+        """
+        get_interface_discovery_stats(self, c)
+
+        Gets how many times the ASRL devices were listed, opened and removed, and how many times each was rediscovered after failing.
+
+        Args:
+            c: The LabRAD context
+
+        Returns:
+            str: A serialized json of ``{"enumerations": ..., "rescans": ..., "opened": ..., "removed": ..., "addresses": {address: {"rediscoveries": ..., "failures": ..., "skipped": ..., "backoff": ...}}}``, where ``skipped`` counts rediscoveries not tried during a backoff, and ``backoff`` is in seconds
+        """
+        return self.get_discovery_stats()
+
 
 if __name__ == '__main__':
     from labrad import util
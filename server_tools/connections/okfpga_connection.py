@@ -29,4 +29,6 @@ class OKFPGAConnection(object):
     def update_wire_ins(self):
         yield self.server.update_wire_ins()
 
-
+    @inlineCallbacks
+    def set_wire_ins(self, wires, update=True):
+        yield self.server.set_wire_ins(wires, update)
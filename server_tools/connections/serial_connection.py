@@ -32,6 +32,11 @@ class SerialConnection(object):
         ans = yield self.server.write(x)
         returnValue(ans)
 
+    @inlineCallbacks
+    def write_bytes(self, x):
+        ans = yield self.server.write_bytes(x)
+        returnValue(ans)
+
     @inlineCallbacks
     def write_termination(self, t):
         ans = yield self.server.termination(t)
@@ -52,6 +57,11 @@ class SerialConnection(object):
         ans = yield self.server.read(x)
         returnValue(ans)
     
+    @inlineCallbacks
+    def read_bytes(self, n):
+        ans = yield self.server.read_bytes(n)
+        returnValue(ans)
+
     @inlineCallbacks
     def read_line(self):
         ans = yield self.server.read_line()
@@ -1,52 +1,378 @@
+import json
+from time import time
+
 from labrad.server import LabradServer, setting
+from twisted.internet import reactor
+from twisted.internet.defer import DeferredLock, inlineCallbacks, returnValue
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 
 
 class HardwareInterfaceServer(LabradServer):
-    """ Template for hardware interface server """
+    """
+    Template for hardware interface server
+
+    Subclasses either override :meth:`refresh_available_interfaces`, or define :meth:`list_addresses` and :meth:`open_interface`, in which case:
+
+        * the list of addresses is cached for ``enumeration_ttl``,
+        * an interface that fails, or an address that isn't open yet, is rediscovered on its own, without opening any others, listing the addresses again if it isn't among the cached ones. :meth:`call_in_thread` does this in the thread pool. Each failed rediscovery of an address doubles the time before the next is tried, from ``rediscover_backoff`` up to ``max_rediscover_backoff``,
+        * devices are listed and opened in the thread pool every ``rescan_interval``, so that the reactor isn't blocked.
+    """
+    # Minimum time between refreshes of the available interfaces after an error (s)
+    refresh_interval = 5
+    # Maximum number of interfaces that call_in_thread talks to at once
+    pool_size = 8
+    # Time for which the list of addresses is used before listing them again (s)
+    enumeration_ttl = 30
+    # Time between background rescans of the available interfaces, or 0 for none (s)
+    rescan_interval = 60
+    # Time before an address is rediscovered again after failing, doubled for each failure in a row (s)
+    rediscover_backoff = 1
+    max_rediscover_backoff = 60
 
     def initServer(self):
         self.interfaces = {}
+        self.locks = {}
+        self.stats = {}
+        self.pool = None
+        self.last_refresh = 0
+        self.addresses = None
+        self.addresses_time = 0
+        # address: [time before which it isn't rediscovered, backoff]
+        self.backoff = {}
+        self.discovery_stats = {'enumerations': 0, 'rescans': 0, 'opened': 0, 'removed': 0, 'addresses': {}}
+        self.rescan_call = None
         self.refresh_available_interfaces()
+        if self.rescan_interval and self.can_rediscover():
+            self.rescan_call = LoopingCall(self.rescan)
+            self.rescan_call.start(self.rescan_interval, now=False)
 
     def stopServer(self):
         """ notify connected device servers of closing connetion"""
+        rescan_call = getattr(self, 'rescan_call', None)
+        if rescan_call is not None and rescan_call.running:
+            rescan_call.stop()
 
     def refresh_available_interfaces(self):
         """ fill self.interfaces with available hardware """
+        if self.can_rediscover():
+            self.sync_interfaces(self.available_addresses(max_age=0))
+
+    def list_addresses(self):
+        """ addresses of the available hardware. may be called from a thread """
+        raise NotImplementedError
+
+    def open_interface(self, address):
+        """ opens and returns the interface at address. may be called from a thread """
+        raise NotImplementedError
+
+    def interface_alive(self, interface):
+        """ whether an open interface can still be used """
+        return True
+
+    def can_rediscover(self):
+        """ whether the subclass defines list_addresses and open_interface """
+        return type(self).list_addresses is not HardwareInterfaceServer.list_addresses
+
+    def available_addresses(self, max_age=None):
+        """ the addresses from list_addresses, listed again if older than max_age (defaults to enumeration_ttl) """
+        if max_age is None:
+            max_age = self.enumeration_ttl
+        if self.addresses is None or time() - self.addresses_time >= max_age:
+            self.addresses = list(self.list_addresses())
+            self.addresses_time = time()
+            self.discovery_stats['enumerations'] += 1
+        return self.addresses
+
+    def sync_interfaces(self, addresses, opened=None):
+        """ opens interfaces at new addresses (unless already in opened) and forgets those at addresses that are gone """
+        opened = opened or {}
+        for address in addresses:
+            if address in self.interfaces:
+                if address in opened:
+                    self.close_interface(opened[address])
+                continue
+            try:
+                interface = opened[address] if address in opened else self.open_interface(address)
+            except Exception as e:
+                print("Could not connect to {}: {}".format(address, e))
+                continue
+            if interface is not None:
+                self.interfaces[address] = interface
+                self.discovery_stats['opened'] += 1
+        for address in set(self.interfaces) - set(addresses):
+            print('{} unavailable'.format(address))
+            self.close_interface(self.interfaces.pop(address))
+            self.discovery_stats['removed'] += 1
+
+    def close_interface(self, interface):
+        try:
+            interface.close()
+        except Exception:
+            pass
+
+    def rediscover(self, address):
+        """
+        rediscover(self, address)
+
+        Checks that the interface at ``address`` is still available, opening it again if it isn't, after a call to it fails or if it isn't open yet. If ``address`` isn't among the cached addresses, they are listed again once before giving up. Servers that don't define :meth:`list_addresses` refresh all of their interfaces instead, at most once every ``refresh_interval``.
+
+        Args:
+            address (str): The interface's address
+
+        Returns:
+            bool: Whether the interface is available, and so the call can be tried again
+        """
+        if not self.can_rediscover():
+            return self.refresh_if_stale()
+        if self._backing_off(address):
+            return False
+        try:
+            self._close_if_dead(address)
+            if address not in self.available_addresses() and address not in self.available_addresses(max_age=0):
+                raise Exception('not listed')
+            if address not in self.interfaces:
+                self._reopened(address, self.open_interface(address))
+            return self._rediscovered(address)
+        except Exception as e:
+            return self._rediscover_failed(address, e)
+
+    @inlineCallbacks
+    def rediscover_in_thread(self, address):
+        """
+        rediscover_in_thread(self, address)
+
+        Like :meth:`rediscover`, but lists the addresses and opens the interface in the thread pool, as :meth:`rescan` does, so that the reactor isn't blocked.
+
+        Args:
+            address (str): The interface's address
+
+        Returns:
+            Deferred: fires with whether the interface is available
+        """
+        if not self.can_rediscover():
+            returnValue(self.refresh_if_stale())
+        if self._backing_off(address):
+            returnValue(False)
+        try:
+            self._close_if_dead(address)
+            fresh = self.addresses is not None and time() - self.addresses_time < self.enumeration_ttl
+            cached = self.addresses if fresh else []
+            is_open = address in self.interfaces
+            def find():
+                addresses = None
+                if address not in cached:
+                    addresses = list(self.list_addresses())
+                    if address not in addresses:
+                        return (addresses, None)
+                return (addresses, None if is_open else self.open_interface(address))
+            (addresses, interface) = yield deferToThreadPool(reactor, self.get_pool(), find)
+            if addresses is not None:
+                self.addresses = addresses
+                self.addresses_time = time()
+                self.discovery_stats['enumerations'] += 1
+                if address not in addresses:
+                    raise Exception('not listed')
+            if interface is not None:
+                if address in self.interfaces:
+                    self.close_interface(interface)
+                else:
+                    self._reopened(address, interface)
+            returnValue(self._rediscovered(address))
+        except Exception as e:
+            returnValue(self._rediscover_failed(address, e))
+
+    def _backing_off(self, address):
+        """ counts a rediscovery of address, or one skipped because it failed too recently """
+        stats = self.discovery_stats['addresses'].setdefault(address, {'rediscoveries': 0, 'failures': 0, 'skipped': 0, 'backoff': 0})
+        if address in self.backoff and time() < self.backoff[address][0]:
+            stats['skipped'] += 1
+            return True
+        stats['rediscoveries'] += 1
+        return False
+
+    def _close_if_dead(self, address):
+        if address in self.interfaces and not self.interface_alive(self.interfaces[address]):
+            self.close_interface(self.interfaces.pop(address))
+
+    def _reopened(self, address, interface):
+        self.interfaces[address] = interface
+        self.discovery_stats['opened'] += 1
+        print('reconnected to {}'.format(address))
+
+    def _rediscovered(self, address):
+        self.backoff.pop(address, None)
+        self.discovery_stats['addresses'][address]['backoff'] = 0
+        return True
+
+    def _rediscover_failed(self, address, e):
+        """ doubles the time before address is rediscovered again, from rediscover_backoff up to max_rediscover_backoff """
+        if address in self.backoff:
+            backoff = min(2 * self.backoff[address][1], self.max_rediscover_backoff)
+        else:
+            backoff = self.rediscover_backoff
+        self.backoff[address] = [time() + backoff, backoff]
+        stats = self.discovery_stats['addresses'][address]
+        stats['failures'] += 1
+        stats['backoff'] = backoff
+        print('{} unavailable ({}), not trying again for {} s'.format(address, e, backoff))
+        return False
+
+    @inlineCallbacks
+    def rescan(self):
+        """ lists the addresses, and opens new interfaces, in the thread pool, then updates self.interfaces """
+        known = set(self.interfaces)
+        def scan():
+            addresses = list(self.list_addresses())
+            opened = {}
+            for address in set(addresses) - known:
+                try:
+                    opened[address] = self.open_interface(address)
+                except Exception as e:
+                    print("Could not connect to {}: {}".format(address, e))
+            return (addresses, opened)
+        try:
+            (addresses, opened) = yield deferToThreadPool(reactor, self.get_pool(), scan)
+        except Exception as e:
+            print("Could not rescan interfaces: {}".format(e))
+            return
+        self.addresses = addresses
+        self.addresses_time = time()
+        self.discovery_stats['enumerations'] += 1
+        self.discovery_stats['rescans'] += 1
+        self.sync_interfaces([a for a in addresses if a in self.interfaces or a in opened], opened)
+        for address in opened:
+            self.backoff.pop(address, None)
+
+    def refresh_if_stale(self):
+        """ refresh available interfaces, at most once every refresh_interval. returns whether a refresh happened """
+        if time() - getattr(self, 'last_refresh', 0) < self.refresh_interval:
+            return False
+        self.last_refresh = time()
+        self.refresh_available_interfaces()
+        return True
 
     def call_if_available(self, f, c, *args, **kwargs):
         try:
             interface = self.get_interface(c)
-            ans = getattr(interface, f)(*args, **kwargs)
-            return ans
-        except:
-            try:
-                self.refresh_available_interfaces()
-                interface = self.get_interface(c)
-                return getattr(interface, f)(*args, **kwargs)
-            except:
-                self.interface = self.get_interface(c)
-                return getattr(interface, f)
+            return getattr(interface, f)(*args, **kwargs)
+        except Exception:
+            if not self.rediscover(c.get('address')):
+                raise
+        interface = self.get_interface(c)
+        return getattr(interface, f)(*args, **kwargs)
 
     def get_interface(self, c):
         if 'address' not in c:
             raise Exception('no interface selected')
         if c['address'] not in self.interfaces.keys():
-            self.refresh_available_interfaces()
+            if self.can_rediscover():
+                self.rediscover(c['address'])
+            else:
+                self.refresh_available_interfaces()
             if c['address'] not in self.interfaces.keys():
                 raise Exception(c['address'] + 'is unavailable')
         return self.interfaces[c['address']]
 
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ThreadPool(maxthreads=self.pool_size, name=self.name)
+            self.pool.start()
+            reactor.addSystemEventTrigger('before', 'shutdown', self.pool.stop)
+        return self.pool
+
+    @inlineCallbacks
+    def call_in_thread(self, f, c, *args, **kwargs):
+        """
+        call_in_thread(self, f, c, *args, **kwargs)
+
+        Like :meth:`call_if_available`, but calls the interface's method from a thread pool, so that a slow interface does not block the others. Calls to the same interface are made one at a time, in the order they were requested.
+
+        If the call fails, other than by timing out, the interface is rediscovered (see :meth:`rediscover`) and the call is retried. The latency and number of errors and timeouts of each interface are recorded in ``self.stats``.
+
+        Args:
+            f (str): The name of the interface's method to call
+            c: The LabRAD context, whose selected interface is used
+            *args, **kwargs: Passed to the interface's method
+
+        Returns:
+            Deferred: fires with the return value of the method
+        """
+        address = c.get('address')
+        lock = self.locks.setdefault(address, DeferredLock())
+        yield lock.acquire()
+        try:
+            try:
+                ans = yield self._timed_call(address, f, c, *args, **kwargs)
+            except Exception as e:
+                if is_timeout(e):
+                    raise
+                available = yield self.rediscover_in_thread(address)
+                if not available:
+                    raise
+                ans = yield self._timed_call(address, f, c, *args, **kwargs)
+            returnValue(ans)
+        finally:
+            lock.release()
+
+    @inlineCallbacks
+    def _timed_call(self, address, f, c, *args, **kwargs):
+        if address is not None and address not in self.interfaces and self.can_rediscover():
+            yield self.rediscover_in_thread(address)
+        interface = self.get_interface(c)
+        stats = self.stats.setdefault(address, {'calls': 0, 'errors': 0, 'timeouts': 0, 'total_latency': 0.0, 'last_latency': 0.0, 'max_latency': 0.0})
+        t0 = time()
+        try:
+            ans = yield deferToThreadPool(reactor, self.get_pool(), getattr(interface, f), *args, **kwargs)
+            returnValue(ans)
+        except Exception as e:
+            stats['errors'] += 1
+            if is_timeout(e):
+                stats['timeouts'] += 1
+            raise
+        finally:
+            latency = time() - t0
+            stats['calls'] += 1
+            stats['total_latency'] += latency
+            stats['last_latency'] = latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+
+    def get_stats(self, reset=False):
+        """ returns a json string of the latency (s), error and timeout counters of each interface used with call_in_thread """
+        out = {}
+        for address, stats in self.stats.items():
+            out[address] = dict(stats)
+            out[address]['mean_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+        if reset:
+            self.stats = {}
+        return json.dumps(out)
+
+    def get_discovery_stats(self):
+        """ returns a json string of the number of times the addresses were listed, and interfaces opened and removed, and of rediscoveries, failed rediscoveries, rediscoveries skipped during backoff and the current backoff (s) of each address """
+        return json.dumps(self.discovery_stats)
+
     @setting(0, returns='*s')
     def get_interface_list(self, c):
         """Get a list of available interfaces"""
-        self.refresh_available_interfaces()
+        if self.can_rediscover():
+            self.sync_interfaces(self.available_addresses())
+        else:
+            self.refresh_available_interfaces()
         return sorted(self.interfaces.keys())
 
     @setting(1, address='s', returns='s')
     def select_interface(self, c, address):
-        self.refresh_available_interfaces()
+        if not self.can_rediscover():
+            self.refresh_available_interfaces()
+        elif address not in self.interfaces:
+            self.rediscover(address)
         if address not in self.interfaces:
             raise Exception(c['address'] + 'is unavailable')
         c['address'] = address
-        return c['address'] 
+        return c['address']
+
+
+def is_timeout(e):
+    """ whether an exception from a VISA or serial call was a timeout """
+    return 'VI_ERROR_TMO' in repr(e) or 'timeout' in str(e).lower() or 'timed out' in str(e).lower()
@@ -21,9 +21,10 @@ TODO:
 """
 
 from labrad.server import LabradServer, setting
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, DeferredLock, DeferredList
+from twisted.internet.task import deferLater
 import json
-import time
 
 
 class StirapServer(LabradServer):
@@ -37,6 +38,8 @@ class StirapServer(LabradServer):
     The program also allows for frequency sweeps, which are useful for performing adiabatic rapid passages (ARPs).
     
     Currently, this server assumes this general architecture; however, it should be straightforward to add new hardware implementations (``./devices``) in the future.
+
+    Each channel is programmed in its own context of the AD9910 server, so channels on different Arduinos are programmed concurrently. Every request is sent and triggered, since the Arduino's position in the program it holds isn't known.
     """
     name = 'stirap'
     default_up_freq = 200
@@ -44,6 +47,8 @@ class StirapServer(LabradServer):
     dt = 1
     nsteps = 5000
     servername = 'ad9910'
+    settle_time = 1 # s, between the Arduino echoing the program and the first forced trigger
+    trigger_interval = 0.002 # s, between forced triggers
 
     channels = {"up" : {"channel" : "stirap_ch1", "last_freq": default_up_freq}, 
                 "down" : {"channel" : "stirap_ch2", "last_freq": default_down_freq}}
@@ -51,13 +56,15 @@ class StirapServer(LabradServer):
     profiles = json.dumps([{'profile':i,'freq':10, 'ampl': 0, 'phase':0} for i in range(8)])
         
     def initServer(self):
+        self.device_contexts = {}
+        self.locks = {}
         self.connect()
 
     @inlineCallbacks
     def connect(self):
         self.server = yield self.client.servers[self.servername]
     
-    def _program_from_freqs(self, channel, freqs):
+    def _compile_program(self, channel, freqs):
         program = [{"mode": "sweep", "start": self.channels[channel]['last_freq'], "stop":self.channels[channel]['last_freq'], "dt":10, "nsteps": self.nsteps}]
         program.append({"mode": "sweep", "start": self.channels[channel]['last_freq'], "stop":freqs[0], "dt":self.dt, "nsteps": self.nsteps})
         for i in range(len(freqs)-1):
@@ -72,7 +79,7 @@ class StirapServer(LabradServer):
         """
         set_eom_freqs(self, c, channel, freqs)
 
-        TODO:
+        Programs a channel to sweep from its last frequency through ``freqs``, one sweep per trigger, and triggers it twice to get to the first frequency.
 
         Args:
             c: LabRAD context
@@ -82,23 +89,54 @@ class StirapServer(LabradServer):
 
         """
         try:
-            program = self._program_from_freqs(channel,freqs)
-            # print(program)
-            self.channels[channel]['last_freq'] = freqs[-1]
-            yield self.server.select_device(self.channels[channel]['channel'])
-            yield self.server.write_data(program, self.profiles)
-            time.sleep(1)
-            yield self.server.force_trigger()
-            time.sleep(0.002)
-            yield self.server.force_trigger()
-            
+            yield self._set_eom_freqs(channel, freqs)
 
         except KeyError:
             print('Please select a valid device: {}\n'.format(self.channels.keys()))
         
         except IndexError:
             print('Freqs list was empty\n')
-        
+
+    @setting(11, "Set All EOM Freqs", channel_freqs='*(s*v)')
+    def set_all_eom_freqs(self, c, channel_freqs):
+        """
+        set_all_eom_freqs(self, c, channel_freqs)
+
+        Programs several channels at once, as in :meth:`set_eom_freqs`. Channels on different Arduinos are programmed concurrently.
+
+        Args:
+            c: LabRAD context
+            channel_freqs ([(str, [float])]): list of dds channel names and the frequencies to set for each
+        """
+        results = yield DeferredList([self._set_eom_freqs(channel, freqs) for (channel, freqs) in channel_freqs], consumeErrors=True)
+        for (success, result) in results:
+            if not success:
+                result.raiseException()
+
+    @inlineCallbacks
+    def _set_eom_freqs(self, channel, freqs):
+        device = self.channels[channel]['channel']
+        # Only one program is sent to each Arduino at a time
+        lock = self.locks.setdefault(device, DeferredLock())
+        yield lock.acquire()
+        try:
+            program = self._compile_program(channel, freqs)
+            self.channels[channel]['last_freq'] = freqs[-1]
+
+            if device not in self.device_contexts:
+                context = self.client.context()
+                yield self.server.select_device(device, context=context)
+                self.device_contexts[device] = context
+            context = self.device_contexts[device]
+
+            # The Arduino echoes the program once it has been received
+            yield self.server.write_data(program, self.profiles, context=context)
+            yield deferLater(reactor, self.settle_time, lambda: None)
+            yield self.server.force_trigger(context=context)
+            yield deferLater(reactor, self.trigger_interval, lambda: None)
+            yield self.server.force_trigger(context=context)
+        finally:
+            lock.release()
 
 
 if __name__ == '__main__':
@@ -21,6 +21,7 @@ Provides direct access to USB-enabled hardware.
 import sys
 import pyvisa
 from labrad.server import LabradServer, setting
+from twisted.internet.defer import returnValue
 sys.path.append('../')
 from server_tools.hardware_interface_server import HardwareInterfaceServer
 
@@ -29,21 +30,24 @@ class USBServer(HardwareInterfaceServer):
     """Provides direct access to USB-enabled hardware."""
     name = '%LABRADNODE%_usb'
 
-    def refresh_available_interfaces(self):
-        """ Fill self.interfaces with available connections using Python VISA """
-        rm = pyvisa.ResourceManager()
-        addresses = rm.list_resources()
-        additions = set(addresses) - set(self.interfaces.keys())
-        deletions = set(self.interfaces.keys()) - set(addresses)
-        for address in additions:
-            if address.startswith('USB'):
-                inst = rm.open_resource(address)
-                inst.write_termination = ''
-                #inst.clear()
-                self.interfaces[address] = inst
-                print('connected to USB device ' + address)
-        for addr in deletions:
-            del self.interfaces[addr]
+    rm = None
+
+    def get_resource_manager(self):
+        """ The Python VISA resource manager, which is reused """
+        if self.rm is None:
+            self.rm = pyvisa.ResourceManager()
+        return self.rm
+
+    def list_addresses(self):
+        """ Addresses of the USB devices, using Python VISA """
+        return [a for a in self.get_resource_manager().list_resources() if a.startswith('USB')]
+
+    def open_interface(self, address):
+        inst = self.get_resource_manager().open_resource(address)
+        inst.write_termination = ''
+        #inst.clear()
+        print('connected to USB device ' + address)
+        return inst
 
     @setting(3, data='s', returns='')
     def write(self, c, data):
@@ -56,7 +60,7 @@ class USBServer(HardwareInterfaceServer):
             c: The LabRAD context
             data (string): The string to be written to the USB bus
         """        
-        self.call_if_available('write', c, data)
+        yield self.call_in_thread('write', c, data)
 
     @setting(4, n_bytes='w', returns='s')
     def read(self, c, n_bytes=None):
@@ -73,8 +77,8 @@ class USBServer(HardwareInterfaceServer):
         Returns:
             string: The bytes returned from the device, with leading and trailing whitespace stripped
         """        
-        response = self.call_if_available('read', c)
-        return response.strip()
+        response = yield self.call_in_thread('read', c)
+        returnValue(response.strip())
 
     @setting(5, data='s', returns='s')
     def query(self, c, data):
@@ -92,8 +96,8 @@ class USBServer(HardwareInterfaceServer):
         """        
 #        self.call_if_available('write', c, data)
 #        ans = self.call_if_available('read_raw', c)
-        response = self.call_if_available('query', c, data)
-        return response.strip()
+        response = yield self.call_in_thread('query', c, data)
+        returnValue(response.strip())
 
     @setting(6, timeout='v', returns='v')
     def timeout(self, c, timeout=None):
@@ -155,6 +159,38 @@ class USBServer(HardwareInterfaceServer):
             interface.baud_rate  = baud_rate 
         return interface.baud_rate 
 
+    @setting(9, reset='b', returns='s')
+    def get_interface_stats(self, c, reset=False):
+        """
+        get_interface_stats(self, c, reset=False)
+
+        Gets the number of calls, errors and timeouts, and the latency, of the USB devices that have been written to or read from.
+
+        Args:
+            c: The LabRAD context
+            reset (bool, optional): Whether to reset the counters after reading them. Defaults to False.
+
+        Returns:
+            str: A serialized json of ``{address: {"calls": ..., "errors": ..., "timeouts": ..., "mean_latency": ..., "max_latency": ..., "last_latency": ...}}``, with latencies in seconds
+        """
+        return self.get_stats(reset)
+
+    @setting(10, returns='s')
+    def get_interface_discovery_stats(self, c):
+        """
+        get_interface_discovery_stats(self, c)
+
+        Gets how many times the USB devices were listed, opened and removed, and how many times each was rediscovered after failing.
+
+        Args:
+            c: The LabRAD context
+
+        Returns:
+            str: A serialized json of ``{"enumerations": ..., "rescans": ..., "opened": ..., "removed": ..., "addresses": {address: {"rediscoveries": ..., "failures": ..., "skipped": ..., "backoff": ...}}}``, where ``skipped`` counts rediscoveries not tried during a backoff, and ``backoff`` is in seconds
+        """
+        return self.get_discovery_stats()
+
+
 if __name__ == '__main__':
     from labrad import util
     util.runServer(USBServer())
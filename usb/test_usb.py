@@ -0,0 +1,179 @@
+"""
+Mock up of :mod:`usb.USB_server` for working on the AWG servers without being connected to hardware.
+
+Runs under the same name as the real USB server, so start it instead of ``USB_server.py``. It serves a fake Rigol DG832 and DG4202, which keep track of the state set by the SCPI commands used by :mod:`awgs.RigolDG800Server` and :mod:`awgs.RigolDG4000Server`, and count the number of transactions made with them.
+
+..
+    ### BEGIN NODE INFO
+    [info]
+    name = test_usb
+    version = 1
+    description = Mock up server for working on AWG servers without being connected to hardware
+    instancename = %LABRADNODE%_usb
+
+    [startup]
+    cmdline = %PYTHON% %FILE%
+    timeout = 20
+
+    [shutdown]
+    message = 987654321
+    timeout = 20
+    ### END NODE INFO
+"""
+import sys
+from labrad.server import setting
+sys.path.append('../')
+from server_tools.hardware_interface_server import HardwareInterfaceServer
+
+
+class FakeRigol(object):
+    """
+    FakeRigol(object)
+
+    Fake VISA resource for a Rigol DG800 or DG4000 series AWG. Understands the subset of SCPI used by the AWG servers, including several commands separated by semicolons.
+
+    Args:
+        model (str): The model returned by :code:`*IDN?`, e.g. :code:`"DG832"`
+    """
+    def __init__(self, model):
+        self.model = model
+        self.timeout = 2000
+        self.write_termination = ''
+        self.read_termination = '\n'
+        self.baud_rate = 9600
+        self.transactions = 0
+        self.commands = []
+        self.response = ''
+        self.channels = {ch: {
+            'function': 'SIN', 'freq': 1000.0, 'amplitude': 5.0, 'offset': 0.0, 'phase': 0.0,
+            'output': False, 'impedance': 'INF', 'ncycles': 1, 'gated': False, 'FSKfreq': 100.0,
+        } for ch in [1, 2]}
+
+    def _channel(self, header, prefix):
+        return int(header[len(prefix)])
+
+    def _execute(self, command):
+        self.commands.append(command)
+        command = command.strip()
+        header, _, args = command.partition(' ')
+        header = header.upper()
+        args = args.split(',') if args else []
+
+        if header == '*IDN?':
+            return 'Rigol Technologies,{},DG0000000000000,00.01.00'.format(self.model)
+        if header == '*OPC?':
+            return '1'
+
+        if header.startswith(':OUTP'):
+            state = self.channels[self._channel(header, ':OUTP')]
+            if header.endswith(':IMP'):
+                state['impedance'] = args[0]
+            elif header.endswith(':IMP?'):
+                return state['impedance']
+            elif header.endswith('?'):
+                return 'ON' if state['output'] else 'OFF'
+            else:
+                state['output'] = args[0].upper() == 'ON'
+            return None
+
+        if header.startswith(':SOUR'):
+            state = self.channels[self._channel(header, ':SOUR')]
+            subsystem = header[len(':SOUR') + 1:]
+            if subsystem == ':APPL:SIN':
+                state['function'] = 'SIN'
+                state['freq'], state['amplitude'], state['offset'], state['phase'] = [float(v) for v in args]
+            elif subsystem == ':APPL?':
+                return '"{},{:E},{:E},{:E},{:E}"'.format(state['function'], state['freq'], state['amplitude'], state['offset'], state['phase'])
+            elif subsystem == ':BURS:NCYC':
+                state['ncycles'] = int(args[0])
+            elif subsystem == ':BURS:NCYC?':
+                return '{:E}'.format(state['ncycles'])
+            elif subsystem == ':BURS:MODE':
+                state['gated'] = args[0].upper().startswith('GAT')
+            elif subsystem == ':BURS:MODE?':
+                return 'GAT' if state['gated'] else 'TRIG'
+            elif subsystem == ':MOD:FSK:FREQ':
+                state['FSKfreq'] = float(args[0])
+            elif subsystem == ':MOD:FSK:FREQ?':
+                return '{:E}'.format(state['FSKfreq'])
+            else:
+                raise ValueError("Unknown command {}".format(command))
+            return None
+
+        raise ValueError("Unknown command {}".format(command))
+
+    def write(self, data):
+        self.transactions += 1
+        responses = [self._execute(cmd) for cmd in data.split(';') if cmd.strip()]
+        self.response = ';'.join([r for r in responses if r is not None])
+
+    def read(self):
+        response, self.response = self.response, ''
+        return response + self.read_termination
+
+    def query(self, data):
+        self.write(data)
+        return self.read()
+
+
+class TestUSBServer(HardwareInterfaceServer):
+    """Mock up of the USB server, with fake Rigol AWGs attached."""
+    name = '%LABRADNODE%_usb'
+
+    def refresh_available_interfaces(self):
+        if not self.interfaces:
+            self.interfaces = {
+                'USB0::0x1AB1::0x0643::DG8A000000001::INSTR': FakeRigol('DG832'),
+                'USB0::0x1AB1::0x0641::DG4E000000001::INSTR': FakeRigol('DG4202'),
+            }
+
+    @setting(3, data='s', returns='')
+    def write(self, c, data):
+        self.call_if_available('write', c, data)
+
+    @setting(4, n_bytes='w', returns='s')
+    def read(self, c, n_bytes=None):
+        response = self.call_if_available('read', c)
+        return response.strip()
+
+    @setting(5, data='s', returns='s')
+    def query(self, c, data):
+        response = self.call_if_available('query', c, data)
+        return response.strip()
+
+    @setting(6, timeout='v', returns='v')
+    def timeout(self, c, timeout=None):
+        interface = self.get_interface(c)
+        if timeout is not None:
+            interface.timeout = timeout
+        return interface.timeout
+
+    @setting(7, write='s', read='s', returns='(s,s)')
+    def termination(self, c, write=None, read=None):
+        interface = self.get_interface(c)
+        if write is not None:
+            interface.write_termination = write
+        if read is not None:
+            interface.read_termination = read
+        return (interface.write_termination, interface.read_termination)
+
+    @setting(8, baud_rate='i', returns='i')
+    def baud_rate(self, c, baud_rate=None):
+        interface = self.get_interface(c)
+        if baud_rate is not None:
+            interface.baud_rate = baud_rate
+        return interface.baud_rate
+
+    @setting(9, returns='i')
+    def get_transactions(self, c):
+        """
+        get_transactions(self, c)
+
+        Returns:
+            int: The number of writes and queries made to the selected fake instrument
+        """
+        return self.get_interface(c).transactions
+
+if __name__ == '__main__':
+    from labrad import util
+    util.runServer(TestUSBServer())
@@ -7,7 +7,10 @@ from time import time
 
 from simple_pid import PID
 import labrad
+from labrad.wrappers import connectAsync
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import blockingCallFromThread
 
 import board
 import busio
@@ -102,6 +105,12 @@ class PID_GUI(QtWidgets.QWidget):
         # self.wavemeter.signal__setpoint_changed.connect(self.setpoint_changed)
         # self.wavemeter.addListener(listener=self.setpoint_changed, source=None, ID=PID_GUI.ID)
 
+        # Keep the latest wavemeter reading, updated by the wavemeter server's signal.
+        # The server returns an empty string until it has a reading
+        data = self.wavemeter.get_wavelengths()
+        self.wavemeter_data = loads(data) if data else None
+        blockingCallFromThread(reactor, self.listen)
+
         # Record the start time
         self.start_time = time()
 
@@ -352,7 +361,9 @@ class PID_GUI(QtWidgets.QWidget):
             self.setpoint_display.setText(str(wavemeter_setpoint))
             self.update_setpoint()
 
-        # Run the PID
+        # Run the PID, once there is a wavemeter reading
+        if self.wavemeter_data is None:
+            return
         frequency = self.get_frequency(self.channel.currentIndex())
         error = self.setpoint - frequency
         self.error_display.setText(str(round(error, 6)))
@@ -411,10 +422,21 @@ class PID_GUI(QtWidgets.QWidget):
         self.current_output = float(self.current_output_display.text())
         self.set_current(self.current_output)
 
+    @inlineCallbacks
+    def listen(self):
+        # The synchronous connection can't add listeners, so listen on an asynchronous one, in the reactor thread started by labrad.connect
+        self.signal_cxn = yield connectAsync(name="PID GUI")
+        wavemeter = self.signal_cxn.wavemeterlaptop_wavemeter
+        yield wavemeter.signal__wavelengths_changed(PID_GUI.ID)
+        yield wavemeter.addListener(listener=self.receive_wavelengths, source=None, ID=PID_GUI.ID)
+
+    def receive_wavelengths(self, c, data):
+        # Called on the labrad connection's thread; only store the reading here
+        self.wavemeter_data = loads(data)
+
     def get_frequency(self, channel):
-        # Get the frequency from the wavemeter
-        data = loads(loads(self.wavemeter.get_wavelengths()))
-        wavelength = data["wavelengths"][channel]
+        # Get the frequency from the latest wavemeter reading
+        wavelength = self.wavemeter_data["wavelengths"][channel]
         frequency = 299792.458/wavelength
         self.frequency_display.setText(str(round(frequency, 6)))
         return frequency
@@ -0,0 +1,63 @@
+"""
+Stand-in for the py-ws7 wavemeter HTTP API, for running the wavemeter server without the wavemeter.
+
+Serves ``http://localhost:8000/wavemeter/api/`` with the same JSON fields used by :mod:`wavemeter.wavemeter_server` and its clients: ``wavelengths`` (nm, one per channel) and ``freq`` (MHz). The readings random walk around the values in ``WAVELENGTHS`` and are only refreshed every ``UPDATE_INTERVAL``, like the real wavemeter's exposure cycle.
+
+Run me, then start ``wavemeter_server.py`` as usual::
+
+    python test_wavemeter_api.py [port]
+"""
+import json
+import random
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time
+
+PATH = '/wavemeter/api/'
+PORT = 8000
+UPDATE_INTERVAL = 0.2 # s
+
+WAVELENGTHS = [968.2985, 689.2815, 770.1087, 766.7010, 1028.7397, 780.2412, 780.2304, 0.0] # nm
+NOISE = 1e-6 # nm
+FREQ = 1000.0 # MHz
+
+
+class FakeWavemeter(object):
+    def __init__(self):
+        self.wavelengths = list(WAVELENGTHS)
+        self.freq = FREQ
+        self.last_update = 0
+
+    def reading(self):
+        if time() - self.last_update > UPDATE_INTERVAL:
+            self.wavelengths = [w + random.gauss(0, NOISE) if w else w for w in self.wavelengths]
+            self.freq += random.gauss(0, 0.1)
+            self.last_update = time()
+        return {'wavelengths': self.wavelengths, 'freq': self.freq}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep connections alive, like the real API
+    protocol_version = 'HTTP/1.1'
+    wavemeter = FakeWavemeter()
+
+    def do_GET(self):
+        if self.path.rstrip('/') != PATH.rstrip('/'):
+            self.send_error(404)
+            return
+        body = json.dumps(self.wavemeter.reading()).encode('iso-8859-1')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    server = ThreadingHTTPServer(('localhost', port), Handler)
+    print("Serving fake wavemeter at http://localhost:{}{}".format(port, PATH))
+    server.serve_forever()
@@ -20,61 +20,142 @@ import sys
 from labrad.server import LabradServer, setting, Signal
 sys.path.append("../client_tools")
 # from connection import connection
-from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.task import LoopingCall
 from twisted.internet import reactor
 from labrad.util import getNodeName
 import json
 import pycurl
 from io import BytesIO
+from time import time, sleep
+
+POLL_INTERVAL = 0.1 # s
+STALE_TIME = 2 # s
+TIMEOUT = 1 # s
 
 class WavemeterServer(LabradServer):
-    """Provides access to Highfinesse WS-7 Wavemeter. Requires that the server from https://github.com/stepansnigirev/py-ws7 be running. The URL is hardcoded to localhost port 8000."""
+    """
+    Provides access to Highfinesse WS-7 Wavemeter. Requires that the server from https://github.com/stepansnigirev/py-ws7 be running. The URL is hardcoded to localhost port 8000.
+
+    The wavemeter is polled every ``POLL_INTERVAL`` in a background thread over a single keep-alive connection, and the latest reading is cached. Clients should listen to ``signal__wavelengths_changed`` rather than polling :meth:`get_wavelengths`. A reading older than ``STALE_TIME`` is reported as stale by :meth:`get_reading`.
+    """
     name = '%LABRADNODE%_wavemeter'
     url = 'http://localhost:8000/wavemeter/api/'
 
-    
+    wavelengths_changed = Signal(314160, 'signal: wavelengths changed', 's')
+    """
+        signal__wavelengths_changed
+
+        Emitted when a new reading differs from the previous one.
+
+        .. note::
+            Payload (str): The wavemeter data, in the same format as returned by :meth:`get_wavelengths`.
+    """
 
     def __init__(self):
         self.name = '{}_wavemeter'.format(getNodeName())
         self.data = ''
+        self.timestamp = None
+        self.polling = False
         self.setpoint = round(299792.458 / 1028.7397, 6) # THz
         super(WavemeterServer, self).__init__()
 
-    def update(self):
+    def initServer(self):
         """
-        update(self)
+        initServer(self)
 
-        Updates internal state with the latest wavelengths from the wavemeter
+        Starts polling the wavemeter in a background thread.
         """
-        try:
-            buffer = BytesIO()
-            c = pycurl.Curl()
-            c.setopt(c.URL, self.url)
-            c.setopt(c.WRITEFUNCTION, buffer.write)
-            c.perform()
-            c.close()
-            body = buffer.getvalue()
-            self.data = json.dumps(body.decode('iso-8859-1'))
-        except Exception as e:
-            print("Could not connect to wavemeter: %s" % (e))
-    
-    @inlineCallbacks
+        self.polling = True
+        reactor.callInThread(self.poll)
+
+    def stopServer(self):
+        """
+        stopServer(self)
+
+        Stops polling the wavemeter.
+        """
+        self.polling = False
+
+    def poll(self):
+        """
+        poll(self)
+
+        Polls the wavemeter every ``POLL_INTERVAL`` until :meth:`stopServer` is called. Runs in a background thread, and reuses one curl handle so the HTTP connection is kept alive between requests.
+        """
+        curl = None
+        connected = True
+        while self.polling:
+            t0 = time()
+            try:
+                if curl is None:
+                    curl = pycurl.Curl()
+                    curl.setopt(curl.URL, self.url)
+                    curl.setopt(curl.TIMEOUT, TIMEOUT)
+                buffer = BytesIO()
+                curl.setopt(curl.WRITEFUNCTION, buffer.write)
+                curl.perform()
+                body = buffer.getvalue().decode('iso-8859-1')
+                reactor.callFromThread(self.update, body, t0)
+                if not connected:
+                    print("Reconnected to wavemeter")
+                connected = True
+            except Exception as e:
+                if connected:
+                    print("Could not connect to wavemeter: %s" % (e))
+                connected = False
+                if curl is not None:
+                    curl.close()
+                curl = None
+            sleep(max(0, POLL_INTERVAL - (time() - t0)))
+        if curl is not None:
+            curl.close()
+
+    def update(self, data, timestamp):
+        """
+        update(self, data, timestamp)
+
+        Updates internal state with the latest wavelengths from the wavemeter, and emits ``signal__wavelengths_changed`` if they changed. Called in the reactor thread by :meth:`poll`.
+
+        Args:
+            data (str): The JSON-encoded reading from the wavemeter
+            timestamp (float): The time the reading was requested
+        """
+        self.timestamp = timestamp
+        if data != self.data:
+            self.data = data
+            self.wavelengths_changed(data)
+
     @setting(5, returns='s')
     def get_wavelengths(self, c):
         """
         get_wavelengths(self, c)
         
-        Updates and returns data from the wavemeter
+        Returns the latest cached data from the wavemeter
 
         Args:
             c: A LabRAD context (not used)
 
-        Yields:
+        Returns:
             Returns a string containing the latest wavemeter data encoded as a JSON.
         """
-        yield self.update()
-        returnValue(self.data)
+        return self.data
+
+    @setting(8, returns='s')
+    def get_reading(self, c):
+        """
+        get_reading(self, c)
+
+        Returns the latest cached data from the wavemeter, along with when it was taken.
+
+        Args:
+            c: A LabRAD context (not used)
+
+        Returns:
+            Returns a JSON-encoded string of a dict with keys ``data`` (the decoded wavemeter data, or ``None`` if no reading has been taken), ``timestamp`` (the Unix time of the reading) and ``stale`` (``True`` if the reading is older than ``STALE_TIME``).
+        """
+        stale = self.timestamp is None or time() - self.timestamp > STALE_TIME
+        data = json.loads(self.data) if self.data else None
+        return json.dumps({'data': data, 'timestamp': self.timestamp, 'stale': stale})
 
     @setting(6, returns='v')
     def set_setpoint(self, c, setpoint):